@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Benchmark: authentication and encrypted storage paths.
+
+Times the operations an authorization request and the setup wizard go
+through: TOTP verification (valid, wrong and malformed codes), recovery
+code lookup with 10 and 100 stored codes, recovery code generation,
+SecureStorage key derivation (PBKDF2, for a new salt and for another
+instance on the same salt) and the save/load/remove round trips on
+auth.enc, loading through one instance and through a fresh one, and the
+cached recovery code count. Storage
+runs in a temporary directory, so nothing needs root or a display.
+
+Before every timed call a small batch of a fixed reference workload
+(HMAC-SHA1 of a counter, the core of a TOTP check) is timed as well, and
+each case records the median ratio of call to reference time, so a load
+spike during a case slows both. Those relative medians are compared with
+the baseline kept next to this script (benchmarks/baseline_auth.json, or
+--baseline), so a machine that is uniformly slower or busier than the one
+that made the baseline does not fail the gate; the exit status is 1 if any
+case is slower than --max-regression times the baseline. After an
+intentional change in performance, refresh the baseline with
+--output benchmarks/baseline_auth.json in its own commit.
+
+Usage:
+    python3 benchmarks/bench_auth.py [--output results.json] [--baseline benchmarks/baseline_auth.json]
+                                     [--no-baseline] [--scale 1.0] [--max-regression 1.5]
+"""
+
+import argparse
+import hashlib
+import hmac
+import json
+import platform
+import random
+import shutil
+import statistics
+import struct
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.auth.storage import SecureStorage
+from src.auth.totp import TOTPAuthenticator, RecoveryCodeManager, RecoveryCodeIndex
+
+BASELINE = Path(__file__).parent / 'baseline_auth.json'
+
+# Reference digests timed before each call
+REFERENCE_BATCH = 8
+_REFERENCE_KEY = bytes(range(20))
+_REFERENCE_COUNTERS = [struct.pack('>Q', i) for i in range(REFERENCE_BATCH)]
+
+
+def reference() -> float:
+    """Time one batch of the reference workload, in microseconds per digest."""
+    start = time.perf_counter()
+    for counter in _REFERENCE_COUNTERS:
+        hmac.new(_REFERENCE_KEY, counter, hashlib.sha1).digest()
+    return (time.perf_counter() - start) * 1e6 / REFERENCE_BATCH
+
+
+def time_calls(func, args: list, prepare=None) -> list:
+    """
+    Return (call, reference) timings in microseconds, one pair per call.
+
+    prepare runs untimed before each call.
+    """
+    for arg in args[:min(len(args) // 10, 100)]:  # Warm up caches and the allocator
+        if prepare is not None:
+            prepare()
+        func(arg)
+
+    timings = []
+    for arg in args:
+        if prepare is not None:
+            prepare()
+        ref = reference()
+        start = time.perf_counter()
+        func(arg)
+        timings.append(((time.perf_counter() - start) * 1e6, ref))
+    return timings
+
+
+def summarize(label: str, timings: list) -> dict:
+    """Summarize a case from its (call, reference) timings."""
+    ordered = sorted(call for call, _ in timings)
+    result = {
+        'median_us': round(statistics.median(ordered), 3),
+        'p99_us': round(ordered[int(len(ordered) * 0.99)], 3),
+        'ops_per_s': round(1e6 / statistics.mean(ordered), 1),
+        'calls': len(ordered),
+        'reference_us': round(statistics.median(ref for _, ref in timings), 3),
+        'relative': round(statistics.median(call / max(ref, 1e-9) for call, ref in timings), 4),
+    }
+    print(f"{label:<30} median {result['median_us']:10.2f}us  "
+          f"p99 {result['p99_us']:10.2f}us  {result['ops_per_s']:10.0f} ops/s  "
+          f"{result['relative']:9.3f}x ref")
+    return result
+
+
+def totp_cases(count: int) -> dict:
+    auth = TOTPAuthenticator()
+    rng = random.Random(1)
+    valid = auth.get_current_code()
+    wrong = [f'{rng.randrange(1000000):06d}' for _ in range(count)]
+    wrong = [code for code in wrong if code != valid]
+    malformed = ['12345', '1234567', '12a456', '', 'abcdef'] * (count // 5)
+
+    # A valid code is accepted once per authenticator, so each timed call
+    # gets a fresh one (built and warmed with a wrong code, untimed)
+    fresh = [auth]
+
+    def renew():
+        fresh[0] = TOTPAuthenticator(auth.get_secret())
+        fresh[0].verify_code(wrong[0])
+
+    def verify_fresh(code):
+        return fresh[0].verify_code(code)
+
+    return {
+        'totp_verify_valid': summarize("totp verify (valid)",
+                                       time_calls(verify_fresh, [valid] * count, prepare=renew)),
+        'totp_verify_wrong': summarize("totp verify (wrong)", time_calls(auth.verify_code, wrong)),
+        'totp_verify_malformed': summarize("totp verify (malformed)", time_calls(auth.verify_code, malformed)),
+    }
+
+
+def recovery_cases(count: int) -> dict:
+    results = {}
+    wrong = RecoveryCodeManager.generate_codes(100)
+    for stored in (10, 100):
+        codes = RecoveryCodeManager.generate_codes(stored)
+        index = RecoveryCodeIndex(RecoveryCodeManager.hash_code(code) for code in codes)
+        misses = [code for code in wrong if code not in codes] * (count // 100 + 1)
+        hits = [codes[i % stored] for i in range(count)]
+
+        results[f'recovery_match_{stored}_wrong'] = summarize(
+            f"recovery {stored} codes (wrong)", time_calls(index.match, misses[:count]))
+        results[f'recovery_match_{stored}_valid'] = summarize(
+            f"recovery {stored} codes (valid)", time_calls(index.match, hits))
+
+    results['recovery_generate_10'] = summarize(
+        "recovery generate (10)", time_calls(RecoveryCodeManager.generate_codes, [10] * (count // 10)))
+    return results
+
+
+def storage_cases(root: Path, kdf_count: int, count: int) -> dict:
+    results = {}
+    secret = TOTPAuthenticator().get_secret()
+    hashes = [RecoveryCodeManager.hash_code(code) for code in RecoveryCodeManager.generate_codes(10)]
+
+    def init(i):
+        # Force the PBKDF2 derivation the first encrypt/decrypt would do
+        return SecureStorage(root / f'kdf{i}').cipher
+
+    def reopen(_):
+        # Another instance on an existing salt (daemon restart of storage, wizard, CLI)
+        return SecureStorage(root / 'kdf0').cipher
+
+    results['storage_init_kdf'] = summarize("storage init + PBKDF2", time_calls(init, list(range(kdf_count))))
+    results['storage_init_same_salt'] = summarize("storage init (same salt)", time_calls(reopen, list(range(count))))
+
+    storage = SecureStorage(root / 'auth')
+    storage.save_auth_data(secret, hashes)
+
+    results['storage_save'] = summarize(
+        "save_auth_data", time_calls(lambda _: storage.save_auth_data(secret, hashes), list(range(count))))
+    results['storage_load'] = summarize(
+        "load_auth_data", time_calls(lambda _: storage.load_auth_data(), list(range(count))))
+    results['storage_codes_count'] = summarize(
+        "remaining recovery codes",
+        time_calls(lambda _: storage.get_remaining_recovery_codes_count(), list(range(count))))
+    results['storage_load_uncached'] = summarize(
+        "load_auth_data (new instance)",
+        time_calls(lambda _: SecureStorage(root / 'auth').load_auth_data(), list(range(count))))
+    results['storage_remove_code'] = summarize(
+        "remove_recovery_code",
+        time_calls(storage.remove_recovery_code, [hashes[0]] * count,
+                   prepare=lambda: storage.save_auth_data(secret, hashes)))
+    return results
+
+
+def compare(results: dict, baseline: dict, max_regression: float) -> list:
+    """Print each case's relative median against the baseline and return the names that regressed."""
+    regressed = []
+    print(f"\n{'case':<30} {'baseline':>10} {'current':>10} {'ratio':>7}   (medians relative to reference)")
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None or 'relative' not in previous:
+            print(f"{name:<30} {'-':>10} {current['relative']:10.3f} {'new':>7}")
+            continue
+        ratio = current['relative'] / max(previous['relative'], 1e-9)
+        flag = ''
+        if ratio > max_regression:
+            regressed.append(name)
+            flag = '  REGRESSION'
+        print(f"{name:<30} {previous['relative']:10.3f} {current['relative']:10.3f} "
+              f"{ratio:6.2f}x{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--output', type=Path, help="write results as JSON to this file")
+    parser.add_argument('--baseline', type=Path, default=BASELINE,
+                        help="results file to compare against (default: %(default)s)")
+    parser.add_argument('--no-baseline', action='store_true', help="only measure, do not compare")
+    parser.add_argument('--scale', type=float, default=1.0, help="multiply the number of calls per case")
+    parser.add_argument('--max-regression', type=float, default=1.5,
+                        help="fail if a relative median exceeds the baseline's by this factor")
+    args = parser.parse_args()
+
+    def calls(count):
+        return max(10, int(count * args.scale))
+
+    root = Path(tempfile.mkdtemp(prefix='secureusb-bench-'))
+    try:
+        results = {}
+        results.update(totp_cases(calls(20000)))
+        results.update(recovery_cases(calls(5000)))
+        results.update(storage_cases(root, calls(20), calls(500)))
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    report = {
+        'benchmark': 'auth',
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cases': results,
+    }
+
+    # Read the baseline first: --output may be refreshing it
+    baseline = None
+    if not args.no_baseline:
+        try:
+            baseline = json.loads(args.baseline.read_text())['cases']
+        except (OSError, ValueError, KeyError) as e:
+            print(f"cannot read baseline {args.baseline}: {e}")
+            return 2
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2, sort_keys=True) + '\n')
+        print(f"\nresults written to {args.output}")
+
+    if baseline is not None:
+        regressed = compare(results, baseline, args.max_regression)
+        if regressed:
+            print(f"\n{len(regressed)} case(s) slower than {args.max_regression}x baseline: "
+                  f"{', '.join(regressed)}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Benchmark: policy compilation and evaluation with a large rule set.
+
+Generates N rules spread over every condition type (serial, vendor/product,
+vendor, port, interface class), compiles them with PolicyEngine and times
+evaluation of random devices. A linear first-match scan over the same rules
+is timed for comparison.
+
+Usage:
+    python3 benchmarks/bench_policy.py [--rules 50000] [--devices 2000]
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.daemon.policy import PolicyEngine
+
+
+def build_rules(count: int) -> list:
+    """Create count rules cycling through the condition types."""
+    rules = []
+    for i in range(count):
+        kind = i % 5
+        action = 'allow' if i % 2 else 'block'
+        if kind == 0:
+            rule = {'serial_number': f'SERIAL{i:06d}'}
+        elif kind == 1:
+            rule = {'vendor_id': f'{i % 4096:04x}', 'product_id': f'{i // 4096:04x}'}
+        elif kind == 2:
+            rule = {'vendor_id': f'{i % 65536:04x}', 'hours': '08:00-18:00'}
+        elif kind == 3:
+            rule = {'port': f'{i % 16 + 1}-{i % 8 + 1}.{i % 4 + 1}', 'interface_classes': ['03']}
+        else:
+            rule = {'interface_classes': [f'{i % 256:02x}'], 'days': ['mon', 'tue']}
+        rule.update(id=f'rule-{i}', action=action)
+        rules.append(rule)
+    return rules
+
+
+def build_devices(count: int, rule_count: int) -> list:
+    """Create random devices, some of which hit rules."""
+    rng = random.Random(1)
+    devices = []
+    for _ in range(count):
+        devices.append({
+            'device_id': f'{rng.randint(1, 16)}-{rng.randint(1, 8)}.{rng.randint(1, 4)}',
+            'vendor_id': f'{rng.randrange(65536):04x}',
+            'product_id': f'{rng.randrange(16):04x}',
+            'serial_number': f'SERIAL{rng.randrange(rule_count * 2):06d}',
+            'interface_classes': [f'{rng.randrange(256):02x}'],
+        })
+    return devices
+
+
+def time_calls(func, devices: list) -> list:
+    """Return per-device timings in microseconds."""
+    timings = []
+    for device in devices:
+        start = time.perf_counter()
+        func(device)
+        timings.append((time.perf_counter() - start) * 1e6)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rules', type=int, default=50000)
+    parser.add_argument('--devices', type=int, default=2000)
+    args = parser.parse_args()
+
+    rules = build_rules(args.rules)
+    devices = build_devices(args.devices, args.rules)
+    now = datetime(2024, 5, 13, 12, 0)
+
+    start = time.perf_counter()
+    engine = PolicyEngine(rules)
+    compile_ms = (time.perf_counter() - start) * 1000
+    print(f"compile {args.rules} rules: {compile_ms:.1f}ms")
+
+    indexed = time_calls(lambda device: engine.evaluate(device, now), devices)
+    checked = statistics.mean(engine.evaluate(device, now).rules_checked for device in devices)
+    print(f"indexed evaluate: median {statistics.median(indexed):.1f}us "
+          f"(p99 {sorted(indexed)[int(len(indexed) * 0.99)]:.1f}us, "
+          f"{checked:.1f} rules checked on average)")
+
+    def linear(device):
+        normalized = engine._normalize(device)
+        for rule in engine.rules:
+            if rule.match(normalized, now) is not None:
+                return rule
+        return None
+
+    sample = devices[:max(1, args.devices // 20)]
+    scanned = time_calls(linear, sample)
+    print(f"linear scan:      median {statistics.median(scanned):.1f}us "
+          f"({len(sample)} devices)")
+
+    mismatches = 0
+    for device in sample:
+        rule = linear(device)
+        if (rule.rule_id if rule else None) != engine.evaluate(device, now).rule_id:
+            mismatches += 1
+    print(f"decisions differing from linear scan: {mismatches}")
+
+
+if __name__ == '__main__':
+    main()
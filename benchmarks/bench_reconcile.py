@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark: startup reconciliation of already-connected devices.
+
+Builds a fake /sys/bus/usb/devices tree with N devices in a temporary
+directory (or a MemoryBackend) and times BatchDeviceReader +
+StartupReconciler over it.
+
+Usage:
+    python3 benchmarks/bench_reconcile.py [--devices 200] [--runs 20] [--backend sysfs|memory]
+"""
+
+import argparse
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.daemon.authorization import SysfsBackend, MemoryBackend
+from src.daemon.reconcile import BatchDeviceReader, StartupReconciler
+
+
+def build_tree(root: Path, count: int):
+    """Create count fake devices spread over a few hubs."""
+    for i in range(count):
+        device_dir = root / f"{i // 50 + 1}-{i % 50 + 1}"
+        device_dir.mkdir()
+        (device_dir / 'idVendor').write_text('046d\n')
+        (device_dir / 'idProduct').write_text(f'{i:04x}\n')
+        (device_dir / 'manufacturer').write_text('Vendor\n')
+        (device_dir / 'product').write_text(f'Device {i}\n')
+        (device_dir / 'serial').write_text(f'SERIAL{i:06d}\n')
+        (device_dir / 'authorized').write_text('1\n' if i % 2 else '0\n')
+
+
+def build_memory_backend(count: int) -> MemoryBackend:
+    """Create a MemoryBackend with the same devices as build_tree()."""
+    backend = MemoryBackend()
+    for i in range(count):
+        backend.add_device(
+            f"{i // 50 + 1}-{i % 50 + 1}",
+            authorized='1' if i % 2 else '0',
+            idVendor='046d',
+            idProduct=f'{i:04x}',
+            manufacturer='Vendor',
+            product=f'Device {i}',
+            serial=f'SERIAL{i:06d}'
+        )
+    return backend
+
+
+def run(devices: int, runs: int, workers: int, backend_name: str = 'sysfs') -> dict:
+    """Time reconciliation runs and return summary statistics in ms."""
+    root = Path(tempfile.mkdtemp())
+    try:
+        if backend_name == 'memory':
+            backend = build_memory_backend(devices)
+        else:
+            build_tree(root, devices)
+            backend = SysfsBackend(root)
+
+        whitelist = {f'SERIAL{i:06d}' for i in range(0, devices, 4)}
+        reconciler = StartupReconciler(
+            BatchDeviceReader(backend, max_workers=workers),
+            is_whitelisted=whitelist.__contains__,
+            is_pending=lambda device_id: False
+        )
+
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            reconciler.run()
+            timings.append((time.perf_counter() - start) * 1000)
+
+        return {
+            'backend': backend_name,
+            'devices': devices,
+            'workers': workers,
+            'median_ms': statistics.median(timings),
+            'min_ms': min(timings),
+            'max_ms': max(timings),
+        }
+    finally:
+        shutil.rmtree(root)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--devices', type=int, default=200)
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--backend', choices=['sysfs', 'memory'], default='sysfs')
+    args = parser.parse_args()
+
+    for workers in (1, 8):
+        result = run(args.devices, args.runs, workers, args.backend)
+        print(f"reconcile {result['devices']} devices ({result['backend']}), "
+              f"{result['workers']} worker(s): "
+              f"median {result['median_ms']:.2f}ms "
+              f"(min {result['min_ms']:.2f}, max {result['max_ms']:.2f})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Benchmark: recovery code verification with the maximum number of codes.
+
+Times RecoveryCodeIndex.match, which hashes the candidate once and looks
+it up, against the previous approach of calling
+RecoveryCodeManager.verify_code for every stored hash. Wrong codes (every
+failed TOTP attempt also tries the recovery codes) and valid codes are
+timed separately.
+
+Usage:
+    python3 benchmarks/bench_recovery.py [--codes 100] [--attempts 5000]
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.auth.totp import RecoveryCodeManager, RecoveryCodeIndex
+
+
+def time_calls(func, codes: list) -> list:
+    """Return per-call timings in microseconds."""
+    timings = []
+    for code in codes:
+        start = time.perf_counter()
+        func(code)
+        timings.append((time.perf_counter() - start) * 1e6)
+    return timings
+
+
+def summarize(label: str, timings: list):
+    ordered = sorted(timings)
+    print(f"{label:<24} median {statistics.median(ordered):8.2f}us  "
+          f"p99 {ordered[int(len(ordered) * 0.99)]:8.2f}us  "
+          f"{1e6 / statistics.mean(ordered):9.0f} verifies/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--codes', type=int, default=100)
+    parser.add_argument('--attempts', type=int, default=5000)
+    args = parser.parse_args()
+
+    codes = RecoveryCodeManager.generate_codes(args.codes)
+    hashes = [RecoveryCodeManager.hash_code(code) for code in codes]
+    index = RecoveryCodeIndex(hashes)
+
+    rng = random.Random(1)
+    wrong = RecoveryCodeManager.generate_codes(min(args.attempts, 100)) * (args.attempts // 100 + 1)
+    wrong = [code for code in wrong[:args.attempts] if code not in codes]
+    valid = [rng.choice(codes) for _ in range(args.attempts)]
+
+    def linear(code):
+        for recovery_hash in hashes:
+            if RecoveryCodeManager.verify_code(code, recovery_hash):
+                return recovery_hash
+        return None
+
+    print(f"{args.codes} stored recovery codes")
+    summarize("linear scan (wrong)", time_calls(linear, wrong))
+    summarize("index (wrong)", time_calls(index.match, wrong))
+    summarize("linear scan (valid)", time_calls(linear, valid))
+    summarize("index (valid)", time_calls(index.match, valid))
+
+    mismatches = sum(linear(code) != index.match(code) for code in wrong[:500] + valid[:500])
+    print(f"results differing from linear scan: {mismatches}")
+
+
+if __name__ == '__main__':
+    main()
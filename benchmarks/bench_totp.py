@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Benchmark: TOTP verification with the per-step code table.
+
+Times TOTPAuthenticator.verify_code, which compares against codes cached
+for the current time step, against pyotp.TOTP.verify, which generates
+every code in the window on each attempt. Wrong codes (the common case
+for retried attempts) and valid codes are timed separately, and the
+throughput of a burst of wrong codes is reported.
+
+Usage:
+    python3 benchmarks/bench_totp.py [--attempts 20000] [--window 1]
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.auth.totp import TOTPAuthenticator
+
+
+def time_calls(func, codes: list) -> list:
+    """Return per-call timings in microseconds."""
+    timings = []
+    for code in codes:
+        start = time.perf_counter()
+        func(code)
+        timings.append((time.perf_counter() - start) * 1e6)
+    return timings
+
+
+def summarize(label: str, timings: list):
+    ordered = sorted(timings)
+    print(f"{label:<28} median {statistics.median(ordered):6.2f}us  "
+          f"p99 {ordered[int(len(ordered) * 0.99)]:6.2f}us  "
+          f"{1e6 / statistics.mean(ordered):10.0f} verifies/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--attempts', type=int, default=20000)
+    parser.add_argument('--window', type=int, default=1)
+    args = parser.parse_args()
+
+    auth = TOTPAuthenticator()
+    rng = random.Random(1)
+    wrong = [f'{rng.randrange(1000000):06d}' for _ in range(args.attempts)]
+    valid = auth.get_current_code()
+    wrong = [code for code in wrong if code != valid]
+
+    def table_verify(code):
+        auth._used_steps.clear()  # Measure verification, not replay rejection
+        return auth.verify_code(code, window=args.window)
+
+    def pyotp_verify(code):
+        return auth.totp.verify(code, valid_window=args.window)
+
+    summarize("pyotp verify (wrong code)", time_calls(pyotp_verify, wrong))
+    summarize("code table (wrong code)", time_calls(table_verify, wrong))
+    summarize("pyotp verify (valid code)", time_calls(pyotp_verify, [valid] * len(wrong)))
+    summarize("code table (valid code)", time_calls(table_verify, [valid] * len(wrong)))
+
+    mismatches = sum(
+        table_verify(code) != pyotp_verify(code)
+        for code in wrong[:1000] + [valid]
+    )
+    print(f"results differing from pyotp: {mismatches}")
+
+
+if __name__ == '__main__':
+    main()
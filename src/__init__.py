@@ -5,13 +5,18 @@ A comprehensive USB security system that requires TOTP authentication
 before allowing USB devices to connect to your computer.
 """
 
+import importlib
+
 __version__ = "1.0.0"
 __author__ = "SecureUSB Team"
 __license__ = "MIT"
 
-from . import auth
-from . import daemon
-from . import gui
-from . import utils
-
 __all__ = ['auth', 'daemon', 'gui', 'utils']
+
+
+def __getattr__(name):
+    # Subpackages are imported on first use so the daemon does not load
+    # the GTK GUI (and the GUI does not load pyudev)
+    if name in __all__:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
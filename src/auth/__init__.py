@@ -1,7 +1,15 @@
 """Authentication module for SecureUSB."""
 
-from .totp import TOTPAuthenticator, RecoveryCodeManager, create_new_authenticator
-from .storage import SecureStorage
+import importlib
+
+# Exported name -> defining submodule, imported on first use so that
+# importing one submodule does not pull in pyotp and cryptography
+_EXPORTS = {
+    'TOTPAuthenticator': '.totp',
+    'RecoveryCodeManager': '.totp',
+    'create_new_authenticator': '.totp',
+    'SecureStorage': '.storage',
+}
 
 __all__ = [
     'TOTPAuthenticator',
@@ -9,3 +17,12 @@ __all__ = [
     'SecureStorage',
     'create_new_authenticator'
 ]
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
@@ -4,20 +4,93 @@ Secure Storage Module for SecureUSB
 
 Handles encrypted storage of TOTP secrets and recovery codes.
 Uses cryptography library with Fernet symmetric encryption.
+
+The cryptography imports and the PBKDF2 key derivation are deferred until
+the first encrypt or decrypt, so checking is_configured() stays cheap (the
+daemon does that before USB blocking is in force). Derived keys are cached
+per process by their inputs (salt and machine ID), so further SecureStorage
+instances skip PBKDF2 until the salt changes.
+
+Used recovery codes are recorded in auth.journal, an append-only file of
+encrypted tombstones, so consuming one is a small append and fsync rather
+than re-encrypting and rewriting auth.enc. load_auth_data() merges the
+tombstones, and once a few have accumulated they are compacted back into
+auth.enc, which is always replaced atomically.
+
+The unused recovery code hashes are kept per instance and revalidated with
+a stat of auth.enc and the journal (inode, mtime, size), so status queries
+and code checks do not decrypt the file each time; writes through the
+instance drop them. The TOTP secret is never cached: load_auth_data()
+decrypts on every call and the daemon only needs it once at startup.
 """
 
+import hashlib
 import json
 import os
 import stat
+import tempfile
+import threading
+from collections import OrderedDict
 from pathlib import Path
-from typing import List, Dict, Optional
-from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from typing import List, Dict, FrozenSet, Optional, Set, Tuple
 import base64
 
 from src.utils.paths import resolve_config_dir
 
+PBKDF2_ITERATIONS = 100000
+
+# Tombstones in auth.journal that trigger folding it into auth.enc
+JOURNAL_COMPACT_THRESHOLD = 8
+
+# Derived keys by a digest of (salt, password); a few entries cover every
+# config directory a process touches
+KEY_CACHE_SIZE = 8
+_key_cache: 'OrderedDict[bytes, bytes]' = OrderedDict()
+_key_cache_lock = threading.Lock()
+
+
+def _derive_key(salt: bytes, password: bytes) -> bytes:
+    """
+    Derive a Fernet key with PBKDF2, reusing the result for the same inputs.
+
+    Args:
+        salt: Salt read from the .salt file
+        password: Machine ID
+
+    Returns:
+        URL-safe base64-encoded 32-byte key
+    """
+    cache_key = hashlib.sha256(len(salt).to_bytes(4, 'big') + salt + password).digest()
+
+    # Held while deriving, so concurrent first uses run PBKDF2 once
+    with _key_cache_lock:
+        key = _key_cache.get(cache_key)
+        if key is not None:
+            _key_cache.move_to_end(cache_key)
+            return key
+
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+
+        kdf = PBKDF2HMAC(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=salt,
+            iterations=PBKDF2_ITERATIONS,
+        )
+        key = base64.urlsafe_b64encode(kdf.derive(password))
+
+        _key_cache[cache_key] = key
+        while len(_key_cache) > KEY_CACHE_SIZE:
+            _key_cache.popitem(last=False)
+        return key
+
+
+def clear_key_cache():
+    """Forget all derived keys (the next use of each salt runs PBKDF2 again)."""
+    with _key_cache_lock:
+        _key_cache.clear()
+
 
 class SecureStorage:
     """Manages encrypted storage of authentication credentials."""
@@ -42,14 +115,28 @@ class SecureStorage:
 
         # File paths
         self.auth_file = self.config_dir / "auth.enc"
+        self.journal_file = self.config_dir / "auth.journal"
         self.key_file = self.config_dir / ".key"
         self.salt_file = self.config_dir / ".salt"
 
-        # Initialize encryption
-        self._init_encryption()
+        # Encryption is initialized on first use (see cipher)
+        self._cipher = None
+
+        # (file signature, decrypted auth data, tombstone count) from the
+        # last load; reused while auth.enc and the journal are unchanged
+        self._cached: Optional[Tuple[Tuple, Dict, int]] = None
+
+    @property
+    def cipher(self):
+        """Fernet cipher, deriving the key on first access."""
+        if self._cipher is None:
+            self._init_encryption()
+        return self._cipher
 
     def _init_encryption(self):
         """Initialize encryption keys and cipher."""
+        from cryptography.fernet import Fernet
+
         # Generate or load salt
         if self.salt_file.exists():
             with open(self.salt_file, 'rb') as f:
@@ -76,21 +163,18 @@ class SecureStorage:
                 fallback_file.write_text(machine_id)
                 os.chmod(fallback_file, stat.S_IRUSR | stat.S_IWUSR)
 
-        # Derive encryption key using PBKDF2
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=salt,
-            iterations=100000,
-        )
-        key = base64.urlsafe_b64encode(kdf.derive(machine_id.encode()))
+        # Derive encryption key using PBKDF2 (cached per salt and machine ID)
+        key = _derive_key(salt, machine_id.encode())
 
-        self.cipher = Fernet(key)
+        self._cipher = Fernet(key)
 
     def save_auth_data(self, secret: str, recovery_codes: List[str]) -> bool:
         """
         Save TOTP secret and recovery codes to encrypted storage.
 
+        auth.enc is replaced atomically and the tombstone journal is
+        cleared, since the saved codes are the complete set.
+
         Args:
             secret: Base32-encoded TOTP secret
             recovery_codes: List of hashed recovery codes
@@ -98,6 +182,7 @@ class SecureStorage:
         Returns:
             True if successful, False otherwise
         """
+        self._invalidate_cache()
         try:
             # Create data structure
             data = {
@@ -112,12 +197,13 @@ class SecureStorage:
             # Encrypt
             encrypted = self.cipher.encrypt(json_data.encode())
 
-            # Write to file
-            with open(self.auth_file, 'wb') as f:
-                f.write(encrypted)
+            # Write to a temporary file (created 600 = owner read/write only),
+            # then replace auth.enc so a crash never leaves it half written
+            self._write_atomic(self.auth_file, encrypted)
 
-            # Set restrictive permissions (600 = owner read/write only)
-            os.chmod(self.auth_file, stat.S_IRUSR | stat.S_IWUSR)
+            # Tombstones are folded into what was just saved
+            if self.journal_file.exists():
+                self.journal_file.unlink()
 
             return True
 
@@ -129,12 +215,57 @@ class SecureStorage:
         """
         Load TOTP secret and recovery codes from encrypted storage.
 
+        Recovery codes consumed since the last save are left out. This always
+        decrypts auth.enc, since the secret is not cached.
+
         Returns:
             Dictionary with 'totp_secret' and 'recovery_codes', or None if not found
         """
-        if not self.auth_file.exists():
+        signature = self._file_signature()
+        if signature is None:
+            self._cached = None
+            return None
+
+        loaded = self._decrypt(signature)
+        if loaded is None:
             return None
+        return loaded[0]
 
+    def _recovery_codes(self) -> Optional[Tuple[FrozenSet[str], int]]:
+        """
+        Return the unused recovery code hashes, decrypting only on a cache miss.
+
+        The cache is reused while a stat of auth.enc and the journal matches.
+
+        Returns:
+            (unused recovery code hashes, number of tombstones), or None if not found
+        """
+        signature = self._file_signature()
+        if signature is None:
+            self._cached = None
+            return None
+
+        cached = self._cached
+        if cached is None or cached[0] != signature:
+            if self._decrypt(signature) is None:
+                return None
+            cached = self._cached
+
+        return cached[1], cached[2]
+
+    def _decrypt(self, signature: Tuple) -> Optional[Tuple[Dict, int]]:
+        """
+        Decrypt auth.enc, merge the tombstone journal and refresh the cache.
+
+        Only the recovery code hashes are cached; the secret is returned to
+        the caller and not kept.
+
+        Args:
+            signature: _file_signature() taken before reading
+
+        Returns:
+            (auth data, number of tombstones), or None on error
+        """
         try:
             # Read encrypted file
             with open(self.auth_file, 'rb') as f:
@@ -146,15 +277,95 @@ class SecureStorage:
             # Parse JSON
             data = json.loads(decrypted.decode())
 
+            consumed = self._read_tombstones()
+
+            recovery_codes = [code for code in data['recovery_codes'] if code not in consumed]
+            # Stat taken before reading: a change since then just misses next time
+            self._cached = (signature, frozenset(recovery_codes), len(consumed))
+
             return {
                 'totp_secret': data['totp_secret'],
-                'recovery_codes': data['recovery_codes']
-            }
+                'recovery_codes': recovery_codes
+            }, len(consumed)
 
         except Exception as e:
+            self._cached = None
             print(f"Error loading auth data: {e}")
             return None
 
+    def _file_signature(self) -> Optional[Tuple]:
+        """
+        Identify the current auth.enc and journal by inode, mtime and size.
+
+        Returns:
+            Signature tuple, or None if auth.enc does not exist
+        """
+        try:
+            auth = os.stat(self.auth_file)
+        except FileNotFoundError:
+            return None
+
+        try:
+            journal = os.stat(self.journal_file)
+            journal_signature = (journal.st_ino, journal.st_mtime_ns, journal.st_size)
+        except FileNotFoundError:
+            journal_signature = None
+
+        return (auth.st_ino, auth.st_mtime_ns, auth.st_size), journal_signature
+
+    def _invalidate_cache(self):
+        """Forget the cached auth data (called before every write)."""
+        self._cached = None
+
+    def _read_tombstones(self) -> Set[str]:
+        """
+        Read the hashes of consumed recovery codes from the journal.
+
+        Each line is a Fernet token holding one hash. Lines that do not
+        decrypt (a torn append after a crash) are skipped.
+
+        Returns:
+            Set of consumed recovery code hashes
+        """
+        from cryptography.fernet import InvalidToken
+
+        try:
+            with open(self.journal_file, 'rb') as f:
+                lines = f.read().split(b'\n')
+        except FileNotFoundError:
+            return set()
+
+        consumed = set()
+        for line in lines:
+            if not line:
+                continue
+            try:
+                consumed.add(self.cipher.decrypt(line).decode())
+            except (InvalidToken, UnicodeDecodeError):
+                print("Warning: skipping unreadable recovery code journal entry")
+        return consumed
+
+    def _write_atomic(self, path: Path, content: bytes):
+        """Write a file through a synced temporary file and rename."""
+        fd, temp_path = tempfile.mkstemp(prefix=f".{path.name}.", dir=self.config_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+        # Make the rename itself durable
+        dir_fd = os.open(self.config_dir, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
     def is_configured(self) -> bool:
         """
         Check if authentication is already configured.
@@ -168,33 +379,58 @@ class SecureStorage:
         """
         Remove a used recovery code from storage.
 
+        The code is recorded with one encrypted append to the tombstone
+        journal; auth.enc is rewritten only when the journal is compacted.
+
         Args:
             code_hash: SHA-256 hash of the used recovery code
 
         Returns:
             True if successful, False otherwise
         """
-        data = self.load_auth_data()
-        if data is None:
+        loaded = self._recovery_codes()
+        if loaded is None:
             return False
+        recovery_codes, tombstones = loaded
 
-        try:
-            # Remove the code from the list
-            if code_hash in data['recovery_codes']:
-                data['recovery_codes'].remove(code_hash)
-
-                # Save updated data
-                return self.save_auth_data(
-                    data['totp_secret'],
-                    data['recovery_codes']
-                )
-
+        if code_hash not in recovery_codes:
             return False
 
+        self._invalidate_cache()
+        try:
+            record = self.cipher.encrypt(code_hash.encode()) + b'\n'
+            fd = os.open(self.journal_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, stat.S_IRUSR | stat.S_IWUSR)
+            try:
+                os.write(fd, record)
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
         except Exception as e:
             print(f"Error removing recovery code: {e}")
             return False
 
+        if tombstones + 1 >= JOURNAL_COMPACT_THRESHOLD:
+            self.compact()
+
+        return True
+
+    def compact(self) -> bool:
+        """
+        Fold the tombstone journal back into auth.enc.
+
+        Returns:
+            True if successful (or there was nothing to fold), False otherwise
+        """
+        if not self.journal_file.exists():
+            return True
+
+        data = self.load_auth_data()
+        if data is None:
+            return False
+
+        return self.save_auth_data(data['totp_secret'], data['recovery_codes'])
+
     def get_remaining_recovery_codes_count(self) -> int:
         """
         Get the number of remaining unused recovery codes.
@@ -202,11 +438,11 @@ class SecureStorage:
         Returns:
             Number of recovery codes, or 0 if error
         """
-        data = self.load_auth_data()
-        if data is None:
+        loaded = self._recovery_codes()
+        if loaded is None:
             return 0
 
-        return len(data['recovery_codes'])
+        return len(loaded[0])
 
     def reset_auth(self) -> bool:
         """
@@ -215,9 +451,12 @@ class SecureStorage:
         Returns:
             True if successful, False otherwise
         """
+        self._invalidate_cache()
         try:
             if self.auth_file.exists():
                 self.auth_file.unlink()
+            if self.journal_file.exists():
+                self.journal_file.unlink()
             return True
         except Exception as e:
             print(f"Error resetting auth: {e}")
@@ -237,6 +476,10 @@ class SecureStorage:
             if not self.auth_file.exists():
                 return False
 
+            # Fold used recovery codes into auth.enc so the backup has them
+            if not self.compact():
+                return False
+
             # Read encrypted data
             with open(self.auth_file, 'rb') as f:
                 encrypted_data = f.read()
@@ -275,6 +518,7 @@ class SecureStorage:
         Returns:
             True if successful, False otherwise
         """
+        self._invalidate_cache()
         try:
             # Read export file
             with open(import_path, 'r') as f:
@@ -286,11 +530,11 @@ class SecureStorage:
                 f.write(salt)
             os.chmod(self.salt_file, stat.S_IRUSR | stat.S_IWUSR)
 
-            # Restore auth data
+            # Restore auth data (the backup is complete, so drop any tombstones)
             encrypted_data = base64.b64decode(export_data['auth_data'])
-            with open(self.auth_file, 'wb') as f:
-                f.write(encrypted_data)
-            os.chmod(self.auth_file, stat.S_IRUSR | stat.S_IWUSR)
+            self._write_atomic(self.auth_file, encrypted_data)
+            if self.journal_file.exists():
+                self.journal_file.unlink()
 
             # Reinitialize encryption with new salt
             self._init_encryption()
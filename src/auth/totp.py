@@ -4,18 +4,31 @@ TOTP Authentication Module for SecureUSB
 
 Handles Time-based One-Time Password generation and verification
 using pyotp, compatible with Google Authenticator and other TOTP apps.
+
+Clocks drift (a laptop waking from suspend, a VM, a phone that is a minute
+off), so the authenticator learns the step offset of accepted codes and
+centres the validation window on it instead of widening the window.
 """
 
 import pyotp
 import secrets
 import hashlib
+import hmac
+import json
+import math
+import os
+import tempfile
 import time
-from typing import List, Tuple, Optional
+from pathlib import Path
+from typing import Dict, Iterable, List, Set, Tuple, Optional
 
 # Constants
 TOTP_CODE_LENGTH = 6
 TOTP_TIME_WINDOW_SECONDS = 30
 TOTP_MAX_VALIDATION_WINDOW = 5
+TOTP_MAX_DRIFT_STEPS = 10
+TOTP_DRIFT_SMOOTHING = 0.5
+TOTP_DRIFT_FILENAME = "totp_drift.json"
 RECOVERY_CODE_LENGTH = 12
 RECOVERY_CODE_FORMAT_SEGMENT_LENGTH = 4
 RECOVERY_CODE_MIN_COUNT = 1
@@ -25,12 +38,14 @@ RECOVERY_CODE_MAX_COUNT = 100
 class TOTPAuthenticator:
     """Manages TOTP authentication for USB device authorization."""
 
-    def __init__(self, secret: Optional[str] = None):
+    def __init__(self, secret: Optional[str] = None, drift_file: Optional[Path] = None):
         """
         Initialize TOTP authenticator.
 
         Args:
             secret: Base32-encoded secret key. If None, a new one is generated.
+            drift_file: JSON file to persist the learned clock drift in
+                (None to keep it in memory only)
         """
         if secret:
             self.secret = secret
@@ -38,8 +53,27 @@ class TOTPAuthenticator:
             self.secret = pyotp.random_base32()
 
         self.totp = pyotp.TOTP(self.secret)
-        self._last_used_code = None
-        self._last_used_time = 0
+
+        # Smoothed offset, in steps, between the authenticator app's clock
+        # and ours, learned from accepted codes; windows are centred on it
+        self.drift_file = Path(drift_file) if drift_file else None
+        self._drift_estimate = 0.0
+        self._drift_steps = 0
+        self._drift_samples = 0
+        self._last_offset: Optional[int] = None
+        self._load_drift()
+
+        # Valid codes for the window centre (current step + drift) +/- window,
+        # keyed by step; rebuilt only when the centre moves or a wider window
+        # is asked for
+        self._code_table: Dict[int, bytes] = {}
+        self._table_step: Optional[int] = None
+        self._table_window: Optional[int] = None
+
+        # Time steps whose code has been accepted (pruned to the steps any
+        # window can still reach, so at most 2 * (max drift + max window) + 1
+        # entries)
+        self._used_steps: Set[int] = set()
 
     def get_secret(self) -> str:
         """
@@ -78,6 +112,23 @@ class TOTPAuthenticator:
         Returns:
             True if code is valid, False otherwise
         """
+        return self.verify_step(code, window) is not None
+
+    def verify_step(self, code: str, window: int = 1) -> Optional[int]:
+        """
+        Verify a TOTP code and consume the time step it belongs to.
+
+        Each time step can be used once, so a code authorizes exactly one
+        request even when several are verified in quick succession.
+
+        Args:
+            code: The 6-digit TOTP code to verify
+            window: Number of time windows to check (past and future)
+
+        Returns:
+            The matched time step, or None if the code is invalid or its
+            step has already been used
+        """
         # Validate window parameter to prevent timing attacks
         window = max(0, min(TOTP_MAX_VALIDATION_WINDOW, window))
 
@@ -86,21 +137,153 @@ class TOTPAuthenticator:
 
         # Check if code is 6 digits
         if not code.isdigit() or len(code) != TOTP_CODE_LENGTH:
-            return False
+            return None
+
+        now = time.time()
+        step = self._match_step(code, now, window)
+        if step is not None:
+            self._used_steps.add(step)
+            self._learn_drift(step - int(now) // self.totp.interval)
+
+        return step
 
-        # Prevent code reuse within the same time window
-        current_time = time.time()
-        if code == self._last_used_code and (current_time - self._last_used_time) < TOTP_TIME_WINDOW_SECONDS:
+    @property
+    def drift(self) -> int:
+        """Learned clock drift in whole time steps (the window centre)."""
+        return self._drift_steps
+
+    def get_drift_info(self) -> Dict[str, float]:
+        """
+        Get the learned clock drift for monitoring.
+
+        Returns:
+            Dictionary with the window centre in steps and seconds, the
+            smoothed estimate, the offset of the last accepted code and the
+            number of codes learned from
+        """
+        return {
+            'drift_steps': float(self.drift),
+            'drift_seconds': float(self.drift * self.totp.interval),
+            'estimate_steps': self._drift_estimate,
+            'last_offset_steps': float(self._last_offset if self._last_offset is not None else 0),
+            'samples': float(self._drift_samples),
+        }
+
+    def _learn_drift(self, offset: int):
+        """
+        Move the drift estimate towards the offset of an accepted code.
+
+        Args:
+            offset: Matched step minus the current step
+        """
+        self._last_offset = offset
+        self._drift_samples += 1
+        if offset == self._drift_estimate:
+            return  # Converged; the usual case
+
+        estimate = self._drift_estimate + TOTP_DRIFT_SMOOTHING * (offset - self._drift_estimate)
+        if abs(estimate - offset) < 0.01:
+            estimate = float(offset)  # Snap instead of creeping up on it in 3-place rounding
+        if self._set_drift_estimate(estimate):
+            self._save_drift()
+
+    def _set_drift_estimate(self, estimate: float) -> bool:
+        """
+        Set the drift estimate and the window centre derived from it.
+
+        Args:
+            estimate: Drift in steps (clamped and rounded to 3 places)
+
+        Returns:
+            True if the stored estimate changed
+        """
+        estimate = round(max(-TOTP_MAX_DRIFT_STEPS, min(TOTP_MAX_DRIFT_STEPS, estimate)), 3)
+        if estimate == self._drift_estimate:
             return False
+        self._drift_estimate = estimate
+        self._drift_steps = math.floor(estimate + 0.5)
+        return True
+
+    def _load_drift(self):
+        if self.drift_file is None:
+            return
+
+        try:
+            with open(self.drift_file, 'r') as f:
+                data = json.load(f)
+            estimate = float(data['estimate'])
+            samples = int(data.get('samples', 0))
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, TypeError, KeyError, AttributeError) as e:
+            print(f"[TOTP] Error reading {self.drift_file}: {e}")
+            return
+
+        if math.isfinite(estimate):
+            self._set_drift_estimate(estimate)
+            self._drift_samples = max(0, samples)
+
+    def _save_drift(self) -> bool:
+        """Atomically write the drift estimate."""
+        if self.drift_file is None:
+            return True
+
+        temp_path = None
+        try:
+            self.drift_file.parent.mkdir(parents=True, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(prefix=f".{self.drift_file.name}.", dir=self.drift_file.parent)
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'version': 1, 'estimate': self._drift_estimate,
+                           'samples': self._drift_samples}, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.drift_file)
+            return True
+        except OSError as e:
+            print(f"[TOTP] Error writing {self.drift_file}: {e}")
+            if temp_path and os.path.exists(temp_path):
+                os.unlink(temp_path)
+            return False
+
+    def _match_step(self, code: str, for_time: float, window: int) -> Optional[int]:
+        """
+        Find the unused time step a code is valid for.
 
-        # Verify the code
-        is_valid = self.totp.verify(code, valid_window=window)
+        The window is centred on the current step plus the learned drift.
+        Every cached code is compared with hmac.compare_digest, without
+        stopping at a match, so the time taken does not depend on the code.
 
-        if is_valid:
-            self._last_used_code = code
-            self._last_used_time = current_time
+        Args:
+            code: Normalized 6-digit code
+            for_time: Unix time to verify at
+            window: Number of steps accepted either side of the centre
 
-        return is_valid
+        Returns:
+            Matching time step, or None if the code is not valid
+        """
+        step = int(for_time) // self.totp.interval
+        centre = step + self.drift
+        if centre != self._table_step or window > self._table_window:
+            table_window = max(window, self._table_window or 0) if centre == self._table_step else window
+            self._code_table = {
+                candidate: self.totp.generate_otp(candidate).encode('ascii')
+                for candidate in range(centre - table_window, centre + table_window + 1)
+            }
+            self._table_step = centre
+            self._table_window = table_window
+
+            # Steps that have left every possible window can be forgotten
+            oldest = step - TOTP_MAX_DRIFT_STEPS - TOTP_MAX_VALIDATION_WINDOW
+            self._used_steps = {used for used in self._used_steps if used >= oldest}
+
+        matched = None
+        encoded = code.encode('utf-8')
+        for candidate, expected in self._code_table.items():
+            if (hmac.compare_digest(encoded, expected)
+                    and abs(candidate - centre) <= window
+                    and candidate not in self._used_steps):
+                matched = candidate
+        return matched
 
     def get_current_code(self) -> str:
         """
@@ -224,6 +407,61 @@ class RecoveryCodeManager:
         return f"{clean[0:seg_len]}-{clean[seg_len:seg_len*2]}-{clean[seg_len*2:seg_len*3]}"
 
 
+class RecoveryCodeIndex:
+    """
+    In-memory index of stored recovery code hashes.
+
+    A candidate is normalized and hashed once and looked up by an HMAC of
+    its hash under a key generated for this process. The lookup's timing
+    therefore depends only on values an attacker cannot predict, and a hit
+    is confirmed with a constant-time comparison.
+    """
+
+    def __init__(self, hashed_codes: Iterable[str] = (), key: Optional[bytes] = None):
+        """
+        Build the index.
+
+        Args:
+            hashed_codes: SHA-256 hashes from RecoveryCodeManager.hash_code()
+            key: HMAC key (random if None)
+        """
+        self._key = key or secrets.token_bytes(32)
+        self._index: Dict[bytes, str] = {}
+        for hashed_code in hashed_codes:
+            self._index[self._tag(hashed_code)] = hashed_code
+
+    def _tag(self, hashed_code: str) -> bytes:
+        return hmac.new(self._key, hashed_code.encode('ascii'), hashlib.sha256).digest()
+
+    def match(self, code: str) -> Optional[str]:
+        """
+        Find the stored hash of a recovery code.
+
+        Args:
+            code: Recovery code as typed (dashes and case are ignored)
+
+        Returns:
+            The matching stored hash, or None if the code is not valid
+        """
+        hashed_code = RecoveryCodeManager.hash_code(code)
+        stored = self._index.get(self._tag(hashed_code))
+        if stored is not None and secrets.compare_digest(stored, hashed_code):
+            return stored
+        return None
+
+    def discard(self, hashed_code: str):
+        """
+        Remove a used recovery code.
+
+        Args:
+            hashed_code: Stored hash returned by match()
+        """
+        self._index.pop(self._tag(hashed_code), None)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+
 def create_new_authenticator() -> Tuple[TOTPAuthenticator, List[str]]:
     """
     Create a new TOTP authenticator with recovery codes.
@@ -1,16 +1,49 @@
 """Daemon modules for SecureUSB."""
 
-from .usb_monitor import USBMonitor, USBDevice
-from .authorization import USBAuthorization, AuthorizationMode
-from .dbus_service import SecureUSBService, DBusClient
-from .service import SecureUSBDaemon
+import importlib
+
+# Exported name -> defining submodule, imported on first use so that
+# lightweight modules (timers, state, policy, ...) do not pull in D-Bus,
+# GLib and pyudev
+_EXPORTS = {
+    'USBMonitor': '.usb_monitor',
+    'USBDevice': '.usb_monitor',
+    'USBAuthorization': '.authorization',
+    'AuthorizationMode': '.authorization',
+    'AuthorizationBackend': '.authorization',
+    'SysfsBackend': '.authorization',
+    'MemoryBackend': '.authorization',
+    'DeviceAuthorizer': '.authorization',
+    'PolicyEngine': '.policy',
+    'PolicyAction': '.policy',
+    'PolicyDecision': '.policy',
+    'SecureUSBService': '.dbus_service',
+    'DBusClient': '.dbus_service',
+    'SecureUSBDaemon': '.service',
+}
 
 __all__ = [
     'USBMonitor',
     'USBDevice',
     'USBAuthorization',
     'AuthorizationMode',
+    'AuthorizationBackend',
+    'SysfsBackend',
+    'MemoryBackend',
+    'DeviceAuthorizer',
+    'PolicyEngine',
+    'PolicyAction',
+    'PolicyDecision',
     'SecureUSBService',
     'DBusClient',
     'SecureUSBDaemon'
 ]
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
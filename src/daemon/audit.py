@@ -0,0 +1,509 @@
+#!/usr/bin/env python3
+"""
+Audit Pipeline for SecureUSB
+
+The daemon emits one AuditEvent per security-relevant action and the
+AuditPipeline hands it to every configured sink:
+
+- SQLiteSink: the events database read by the GUI (USBLogger)
+- JournaldSink: the systemd journal, with structured SECUREUSB_* fields
+- JSONLSink: a size-rotated file of JSON lines
+- SyslogSink: RFC 5424 messages over a Unix datagram socket (/dev/log)
+
+Each sink has its own worker thread and bounded queue. emit() only
+appends to those queues and never blocks: when a sink falls behind, its
+queue fills and further events for that sink are dropped rather than
+delaying the device decision that produced them. The SQLite sink is the
+record the GUI shows, so it gets a deeper queue (SQLITE_QUEUE_SIZE) to ride
+out slow disk writes. Dropped and failed events are counted, logged and
+reported to an optional callback (the daemon's metrics).
+Workers take whatever has queued up, up to the sink's batch size, and write
+it in one go.
+"""
+
+import abc
+import json
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+from ..utils.logger import EventAction, USBLogger
+
+DEFAULT_QUEUE_SIZE = 1024
+DEFAULT_BATCH_SIZE = 64
+
+# The events database is what the GUI shows, so it may fall further behind
+SQLITE_QUEUE_SIZE = 8192
+
+JOURNALD_SOCKET = '/run/systemd/journal/socket'
+SYSLOG_SOCKET = '/dev/log'
+SYSLOG_IDENTIFIER = 'secureusb'
+
+DEFAULT_JSONL_MAX_BYTES = 10 * 1024 * 1024
+DEFAULT_JSONL_BACKUPS = 5
+
+# Syslog facility (authpriv) and severities
+SYSLOG_FACILITY_AUTHPRIV = 10
+SEVERITY_WARNING = 4
+SEVERITY_NOTICE = 5
+SEVERITY_INFO = 6
+
+# Structured data ID (32473 is the IANA example enterprise number)
+SYSLOG_SD_ID = 'secureusb@32473'
+
+_NOTICE_ACTIONS = {
+    EventAction.DEVICE_AUTHORIZED,
+    EventAction.DEVICE_AUTHORIZED_POWER_ONLY,
+    EventAction.WHITELIST_ADDED,
+    EventAction.WHITELIST_REMOVED,
+}
+_WARNING_ACTIONS = {EventAction.DEVICE_DENIED, EventAction.AUTH_FAILED}
+
+# Sentinel that stops a worker
+_STOP = object()
+
+
+class AuditEvent:
+    """One audit event, shared read-only by all sinks."""
+
+    FIELDS = ('device_path', 'vendor_id', 'product_id', 'vendor_name', 'product_name',
+              'serial_number', 'auth_method', 'success', 'details')
+
+    __slots__ = ('action', 'timestamp') + FIELDS
+
+    def __init__(self, action: EventAction,
+                 device_path: Optional[str] = None,
+                 vendor_id: Optional[str] = None,
+                 product_id: Optional[str] = None,
+                 vendor_name: Optional[str] = None,
+                 product_name: Optional[str] = None,
+                 serial_number: Optional[str] = None,
+                 auth_method: Optional[str] = None,
+                 success: Optional[bool] = None,
+                 details: Optional[str] = None,
+                 timestamp: Optional[float] = None):
+        self.action = action
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.device_path = device_path
+        self.vendor_id = vendor_id
+        self.product_id = product_id
+        self.vendor_name = vendor_name
+        self.product_name = product_name
+        self.serial_number = serial_number
+        self.auth_method = auth_method
+        self.success = success
+        self.details = details
+
+    @property
+    def severity(self) -> int:
+        """Syslog severity of the event."""
+        if self.action in _WARNING_ACTIONS or self.success is False:
+            return SEVERITY_WARNING
+        if self.action in _NOTICE_ACTIONS:
+            return SEVERITY_NOTICE
+        return SEVERITY_INFO
+
+    def fields(self) -> Dict:
+        """
+        Get the fields that are set.
+
+        Returns:
+            Dictionary of field name to value, without unset fields
+        """
+        return {
+            name: getattr(self, name)
+            for name in self.FIELDS
+            if getattr(self, name) is not None
+        }
+
+    def to_dict(self) -> Dict:
+        """
+        Convert event to dictionary.
+
+        Returns:
+            Dictionary with 'timestamp', 'action' and the set fields
+        """
+        data = {'timestamp': self.timestamp, 'action': self.action.value}
+        data.update(self.fields())
+        return data
+
+    def message(self) -> str:
+        """
+        Format a one-line human-readable summary.
+
+        Returns:
+            Summary, e.g. "denied: Logitech USB Receiver (046d:c52b) serial=ABC"
+        """
+        name = ' '.join(part for part in (self.vendor_name, self.product_name) if part)
+        parts = [f"{self.action.value}:"]
+        if name:
+            parts.append(name)
+        if self.vendor_id or self.product_id:
+            parts.append(f"({self.vendor_id or '????'}:{self.product_id or '????'})")
+        if self.serial_number:
+            parts.append(f"serial={self.serial_number}")
+        if self.auth_method:
+            parts.append(f"via {self.auth_method}")
+        if self.details:
+            parts.append(f"- {self.details}")
+        return ' '.join(parts)
+
+
+class AuditSink(abc.ABC):
+    """Destination for audit events; write() runs on the sink's worker thread."""
+
+    name = 'sink'
+    batch_size = DEFAULT_BATCH_SIZE
+    queue_size = DEFAULT_QUEUE_SIZE
+
+    @abc.abstractmethod
+    def write(self, events: List[AuditEvent]):
+        """
+        Write a batch of events.
+
+        Args:
+            events: Events in emission order
+
+        Raises:
+            Exception: On failure; the batch is counted as failed and dropped
+        """
+
+    def close(self):
+        """Release the sink's resources (called on its worker thread)."""
+
+
+class SQLiteSink(AuditSink):
+    """Events database used by the GUI and the statistics."""
+
+    name = 'sqlite'
+    queue_size = SQLITE_QUEUE_SIZE
+
+    def __init__(self, logger: USBLogger):
+        self.logger = logger
+
+    def write(self, events: List[AuditEvent]):
+        self.logger.log_events([event.to_dict() for event in events])
+
+
+class _DatagramSink(AuditSink):
+    """Sink sending one datagram per event to a Unix socket."""
+
+    def __init__(self, socket_path: str):
+        self.socket_path = str(socket_path)
+        self._sock: Optional[socket.socket] = None
+
+    def write(self, events: List[AuditEvent]):
+        if self._sock is None:
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM | socket.SOCK_CLOEXEC)
+        for event in events:
+            self._sock.sendto(self.encode(event), self.socket_path)
+
+    @abc.abstractmethod
+    def encode(self, event: AuditEvent) -> bytes:
+        """Encode one event as a datagram."""
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+
+class JournaldSink(_DatagramSink):
+    """systemd journal over its native protocol."""
+
+    name = 'journald'
+
+    def __init__(self, socket_path: str = JOURNALD_SOCKET):
+        super().__init__(socket_path)
+
+    def encode(self, event: AuditEvent) -> bytes:
+        """
+        Encode an event as a native journal entry.
+
+        Args:
+            event: Audit event
+
+        Returns:
+            Datagram of KEY=value lines
+        """
+        fields = [
+            ('MESSAGE', event.message()),
+            ('PRIORITY', str(event.severity)),
+            ('SYSLOG_IDENTIFIER', SYSLOG_IDENTIFIER),
+            ('SYSLOG_FACILITY', str(SYSLOG_FACILITY_AUTHPRIV)),
+            ('SECUREUSB_ACTION', event.action.value),
+        ]
+        for name, value in event.fields().items():
+            if isinstance(value, bool):
+                value = int(value)
+            fields.append(('SECUREUSB_' + name.upper(), str(value)))
+
+        return b''.join(_journal_field(key, value) for key, value in fields)
+
+
+def _journal_field(key: str, value: str) -> bytes:
+    data = value.encode('utf-8')
+    if b'\n' in data:
+        # Binary-safe form: KEY\n<64-bit little-endian length><value>\n
+        return key.encode('ascii') + b'\n' + struct.pack('<Q', len(data)) + data + b'\n'
+    return key.encode('ascii') + b'=' + data + b'\n'
+
+
+class SyslogSink(_DatagramSink):
+    """RFC 5424 syslog over a Unix datagram socket."""
+
+    name = 'syslog'
+
+    def __init__(self, socket_path: str = SYSLOG_SOCKET, facility: int = SYSLOG_FACILITY_AUTHPRIV):
+        super().__init__(socket_path)
+        self.facility = facility
+        self.hostname = socket.gethostname() or '-'
+        self.procid = str(os.getpid())
+
+    def encode(self, event: AuditEvent) -> bytes:
+        """
+        Encode an event as an RFC 5424 message.
+
+        Args:
+            event: Audit event
+
+        Returns:
+            Message with the event fields as structured data
+        """
+        timestamp = datetime.fromtimestamp(event.timestamp, timezone.utc).isoformat(timespec='microseconds')
+        params = ''.join(
+            f' {name}="{_sd_escape(value)}"'
+            for name, value in event.fields().items()
+        )
+        pri = self.facility * 8 + event.severity
+        header = (f"<{pri}>1 {timestamp} {self.hostname} {SYSLOG_IDENTIFIER} "
+                  f"{self.procid} {event.action.value}")
+        return f"{header} [{SYSLOG_SD_ID}{params}] {event.message()}".encode('utf-8')
+
+
+def _sd_escape(value) -> str:
+    if isinstance(value, bool):
+        value = int(value)
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace(']', '\\]')
+
+
+class JSONLSink(AuditSink):
+    """File of JSON lines, rotated by size (file, file.1, ... file.N)."""
+
+    name = 'jsonl'
+
+    def __init__(self, path: Path, max_bytes: int = DEFAULT_JSONL_MAX_BYTES,
+                 backups: int = DEFAULT_JSONL_BACKUPS):
+        """
+        Initialize the sink (the file is opened on first write).
+
+        Args:
+            path: Current log file
+            max_bytes: Rotate before the file would grow past this size
+            backups: Number of rotated files kept
+        """
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._file = None
+
+    def write(self, events: List[AuditEvent]):
+        data = ''.join(
+            json.dumps(event.to_dict(), separators=(',', ':')) + '\n' for event in events
+        ).encode('utf-8')
+
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, 'ab')
+
+        size = self._file.tell()
+        if size and size + len(data) > self.max_bytes:
+            self._rotate()
+
+        self._file.write(data)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+
+        if self.backups > 0:
+            for index in range(self.backups - 1, 0, -1):
+                source = self.path.with_name(f"{self.path.name}.{index}")
+                if source.exists():
+                    os.replace(source, self.path.with_name(f"{self.path.name}.{index + 1}"))
+            os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+        else:
+            os.unlink(self.path)
+
+        self._file = open(self.path, 'ab')
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class _SinkWorker:
+    """Thread draining one sink's queue in batches."""
+
+    def __init__(self, sink: AuditSink, lost_callback: Optional[Callable[[str, str, int], None]] = None):
+        self.sink = sink
+        self.lost_callback = lost_callback
+        self.queue: 'queue.Queue' = queue.Queue(maxsize=sink.queue_size)
+        self.dropped = 0
+        self.failed = 0
+        self._reported_dropped = 0
+        self.thread = threading.Thread(target=self._run, name=f"audit-{sink.name}", daemon=True)
+        self.thread.start()
+
+    def offer(self, event: AuditEvent):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped == self._reported_dropped + 1:
+                print(f"[Audit] {self.sink.name} sink queue is full, dropping events")
+            self._lost('dropped', 1)
+
+    def _lost(self, reason: str, count: int):
+        if self.lost_callback is not None:
+            try:
+                self.lost_callback(self.sink.name, reason, count)
+            except Exception as e:
+                print(f"[Audit] Error reporting lost events: {e}")
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            batch = []
+            stop = False
+            while True:
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+                if len(batch) >= self.sink.batch_size:
+                    break
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            if batch:
+                try:
+                    self.sink.write(batch)
+                except Exception as e:
+                    self.failed += len(batch)
+                    print(f"[Audit] Error writing {len(batch)} events to {self.sink.name}: {e}")
+                    self._lost('failed', len(batch))
+
+            dropped = self.dropped
+            if dropped > self._reported_dropped:
+                print(f"[Audit] {self.sink.name} sink fell behind, dropped "
+                      f"{dropped - self._reported_dropped} events")
+                self._reported_dropped = dropped
+
+            for _ in range(len(batch) + stop):
+                self.queue.task_done()
+
+            if stop:
+                try:
+                    self.sink.close()
+                except Exception as e:
+                    print(f"[Audit] Error closing {self.sink.name}: {e}")
+                return
+
+
+class AuditPipeline:
+    """Fans audit events out to sinks without blocking the caller."""
+
+    def __init__(self, sinks: Iterable[AuditSink] = (),
+                 lost_callback: Optional[Callable[[str, str, int], None]] = None):
+        """
+        Start a worker per sink.
+
+        Args:
+            sinks: Sinks to deliver events to
+            lost_callback: Called with (sink name, 'dropped' or 'failed', count)
+                           whenever events are lost; may run on any thread
+        """
+        self.lost_callback = lost_callback
+        self._workers: List[_SinkWorker] = []
+        for sink in sinks:
+            self.add_sink(sink)
+
+    def add_sink(self, sink: AuditSink):
+        """
+        Start delivering events to another sink.
+
+        Args:
+            sink: Audit sink
+        """
+        self._workers.append(_SinkWorker(sink, self.lost_callback))
+
+    def emit(self, action: EventAction, **fields) -> AuditEvent:
+        """
+        Record an audit event.
+
+        Args:
+            action: Type of event
+            **fields: AuditEvent fields (device_path, vendor_id, ...)
+
+        Returns:
+            The event handed to the sinks
+        """
+        event = AuditEvent(action, **fields)
+        for worker in self._workers:
+            worker.offer(event)
+        return event
+
+    def flush(self):
+        """Wait until every sink has written the events emitted so far."""
+        for worker in self._workers:
+            if worker.thread.is_alive():
+                worker.queue.join()
+
+    def close(self, timeout: float = 5.0):
+        """
+        Write out queued events and stop the workers.
+
+        Args:
+            timeout: Seconds to wait for each sink
+        """
+        for worker in self._workers:
+            try:
+                worker.queue.put(_STOP, timeout=timeout)
+            except queue.Full:
+                print(f"[Audit] {worker.sink.name} sink is stuck, abandoning queued events")
+        for worker in self._workers:
+            worker.thread.join(timeout)
+        self._workers = []
+
+    def queue_depths(self) -> Dict[str, int]:
+        """
+        Get the number of events waiting per sink.
+
+        Returns:
+            Dictionary mapping sink name to queue length
+        """
+        return {worker.sink.name: worker.queue.qsize() for worker in self._workers}
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Get per-sink delivery problems.
+
+        Returns:
+            Dictionary mapping sink name to its 'dropped' and 'failed' counts
+        """
+        return {
+            worker.sink.name: {'dropped': worker.dropped, 'failed': worker.failed}
+            for worker in self._workers
+        }
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Authorization Caches for SecureUSB
+
+In-memory state that lets the daemon authorize a device without prompting
+for another TOTP code:
+
+- AuthSession: a sudo-style time-bounded session started by a successful
+  TOTP verification, covering further devices that match its scope.
+- ReplugCache: recently authorized devices, so a device that re-enumerates
+  (bumped cable, docked monitor rebooting) gets its previous mode back.
+
+Nothing here is persisted; restarting the daemon clears it. Both are
+touched from the USB monitor thread and the GLib main loop, so every
+method holds the instance lock.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+# Session scopes
+SESSION_SCOPE_HID = 'hid'
+SESSION_SCOPE_SAME_VENDOR = 'same_vendor'
+SESSION_SCOPE_ANY = 'any'
+
+HID_INTERFACE_CLASS = '03'
+
+DEFAULT_REPLUG_GRACE_SECONDS = 30
+DEFAULT_REPLUG_CAPACITY = 64
+
+# (vendor_id, product_id, serial_number, port path, interface signature)
+ReplugKey = Tuple[str, str, str, str, str]
+
+
+def replug_key(device_info: Dict) -> Optional[ReplugKey]:
+    """
+    Build the identity a re-plugged device must match.
+
+    Args:
+        device_info: Device information dictionary
+
+    Returns:
+        Cache key, or None if the device lacks vendor/product IDs
+    """
+    vendor_id = (device_info.get('vendor_id') or '').lower()
+    product_id = (device_info.get('product_id') or '').lower()
+    if not vendor_id or not product_id:
+        return None
+
+    return (
+        vendor_id,
+        product_id,
+        device_info.get('serial_number') or '',
+        device_info.get('device_id') or '',
+        (device_info.get('usb_interfaces') or '').lower(),
+    )
+
+
+class AuthSession:
+    """Time-bounded authenticated session."""
+
+    def __init__(self,
+                 duration_seconds: float = 0,
+                 scope: str = SESSION_SCOPE_HID,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize session state (no session is active yet).
+
+        Args:
+            duration_seconds: Session length; 0 disables sessions
+            scope: Which devices a session covers:
+                   'hid' - devices whose interfaces are all HID
+                   'same_vendor' - devices from a vendor authorized with TOTP
+                                   during the session
+                   'any' - every device
+            clock: Monotonic time source
+        """
+        self.duration_seconds = max(0, duration_seconds)
+        self.scope = scope
+        self.clock = clock
+
+        self.expires_at = 0.0
+        self.vendors = set()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """True if sessions are configured."""
+        return self.duration_seconds > 0
+
+    def start(self, vendor_id: Optional[str] = None):
+        """
+        Start or extend the session after a successful TOTP verification.
+
+        Args:
+            vendor_id: Vendor ID of the device that was authorized
+        """
+        if not self.enabled:
+            return
+
+        with self._lock:
+            now = self.clock()
+            if now >= self.expires_at:
+                self.vendors.clear()
+
+            self.expires_at = now + self.duration_seconds
+            if vendor_id:
+                self.vendors.add(vendor_id.lower())
+
+    def end(self):
+        """End the session immediately."""
+        with self._lock:
+            self.expires_at = 0.0
+            self.vendors.clear()
+
+    def is_active(self) -> bool:
+        """
+        Check if a session is running.
+
+        Returns:
+            True if active, False otherwise
+        """
+        return self.enabled and self.clock() < self.expires_at
+
+    def remaining_seconds(self) -> int:
+        """
+        Get time left in the session.
+
+        Returns:
+            Whole seconds remaining, 0 if no session is active
+        """
+        with self._lock:
+            remaining = self.expires_at - self.clock()
+        if not self.enabled or remaining <= 0:
+            return 0
+        return int(remaining)
+
+    def covers(self, device_info: Dict, interface_classes: Iterable[str] = ()) -> bool:
+        """
+        Check if a device may be authorized by the running session.
+
+        Args:
+            device_info: Device information dictionary
+            interface_classes: Two-digit hex interface classes of the device
+
+        Returns:
+            True if the device is covered, False otherwise
+        """
+        with self._lock:
+            if not self.is_active():
+                return False
+            vendors = frozenset(self.vendors)
+
+        if self.scope == SESSION_SCOPE_ANY:
+            return True
+
+        if self.scope == SESSION_SCOPE_SAME_VENDOR:
+            return (device_info.get('vendor_id') or '').lower() in vendors
+
+        # HID only: a composite device with any non-HID interface (e.g., a
+        # "keyboard" that also exposes mass storage) is not covered
+        classes = {str(c).lower() for c in interface_classes}
+        return bool(classes) and classes == {HID_INTERFACE_CLASS}
+
+
+class ReplugCache:
+    """LRU cache of recent authorizations for devices that re-enumerate."""
+
+    def __init__(self,
+                 grace_seconds: float = DEFAULT_REPLUG_GRACE_SECONDS,
+                 capacity: int = DEFAULT_REPLUG_CAPACITY,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the cache.
+
+        Args:
+            grace_seconds: How long after disconnecting a device may come
+                           back without a prompt; 0 disables the cache
+            capacity: Maximum number of remembered devices
+            clock: Monotonic time source
+        """
+        self.grace_seconds = max(0, grace_seconds)
+        self.capacity = max(1, capacity)
+        self.clock = clock
+
+        # key -> [mode, expires_at]; expires_at is None while attached
+        self.entries: 'OrderedDict[ReplugKey, list]' = OrderedDict()
+
+        # port path -> key of the device currently attached there
+        self.attached: Dict[str, ReplugKey] = {}
+
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """True if the grace period is configured."""
+        return self.grace_seconds > 0
+
+    def remember(self, device_info: Dict, mode: str):
+        """
+        Record an authorization.
+
+        Args:
+            device_info: Daemon-side device information of the device
+            mode: Authorization mode granted ('full' or 'power_only')
+        """
+        key = replug_key(device_info)
+        if not self.enabled or key is None:
+            return
+
+        with self._lock:
+            self.entries[key] = [mode, None]
+            self.entries.move_to_end(key)
+            self.attached[key[3]] = key
+
+            while len(self.entries) > self.capacity:
+                evicted, _ = self.entries.popitem(last=False)
+                if self.attached.get(evicted[3]) == evicted:
+                    del self.attached[evicted[3]]
+
+    def mark_disconnected(self, device_id: str):
+        """
+        Start the grace period of a device that went away.
+
+        Args:
+            device_id: Port path of the removed device
+        """
+        with self._lock:
+            key = self.attached.pop(device_id, None)
+            if key is not None and key in self.entries:
+                self.entries[key][1] = self.clock() + self.grace_seconds
+
+    def lookup(self, device_info: Dict) -> Optional[str]:
+        """
+        Check if a newly connected device was authorized moments ago.
+
+        Args:
+            device_info: Device information of the new device
+
+        Returns:
+            Previous authorization mode, or None if there is no valid entry
+        """
+        key = replug_key(device_info)
+        if key is None:
+            return None
+
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+
+            mode, expires_at = entry
+            if expires_at is not None and self.clock() >= expires_at:
+                del self.entries[key]
+                return None
+
+            self.entries.move_to_end(key)
+            return mode
+
+    def invalidate(self, device_info: Dict):
+        """
+        Forget a device on every port, e.g. after it was explicitly denied.
+
+        Args:
+            device_info: Device information of the denied device; a bare
+                         device_id identifies the device attached there
+        """
+        key = replug_key(device_info)
+        with self._lock:
+            if key is None:
+                key = self.attached.get(device_info.get('device_id') or '')
+                if key is None:
+                    return
+
+            identity = key[:3]
+            for stale in [k for k in self.entries if k[:3] == identity]:
+                del self.entries[stale]
+                if self.attached.get(stale[3]) == stale:
+                    del self.attached[stale[3]]
+
+    def clear(self):
+        """Forget all devices."""
+        with self._lock:
+            self.entries.clear()
+            self.attached.clear()
@@ -6,11 +6,31 @@ Handles low-level USB device authorization through Linux kernel's sysfs interfac
 Requires root privileges to write to /sys/bus/usb/devices/*/authorized
 """
 
+import abc
+import errno
 import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 from enum import Enum
 
+# Device IDs as they appear under /sys/bus/usb/devices (e.g., "1-4", "1-4:1.0").
+# Anything else could be used for path traversal.
+DEVICE_ID_PATTERN = re.compile(r'^[\w\-.:]+$')
+
+DEFAULT_USB_DEVICES_PATH = Path("/sys/bus/usb/devices")
+
+# Modes accepted by DeviceAuthorizer.apply_bulk()
+BULK_MODE_FULL = 'full'
+BULK_MODE_POWER_ONLY = 'power_only'
+BULK_MODE_BLOCK = 'block'
+
+# Sysfs writes are short; a few threads are enough to overlap them
+DEFAULT_BULK_WORKERS = 4
+
 
 class AuthorizationMode(Enum):
     """USB authorization modes."""
@@ -19,10 +39,60 @@ class AuthorizationMode(Enum):
     POWER_ONLY = "0"   # Block data, allow charging (same as BLOCKED at kernel level)
 
 
+def validate_device_id(device_id: str) -> str:
+    """
+    Validate a USB device ID.
+
+    Args:
+        device_id: Device ID (e.g., "1-4")
+
+    Returns:
+        The device ID, unchanged
+
+    Raises:
+        ValueError: If device_id contains invalid characters
+    """
+    if not isinstance(device_id, str) or not DEVICE_ID_PATTERN.match(device_id):
+        raise ValueError(f"Invalid device ID: {device_id}")
+    return device_id
+
+
+def device_depth(device_id: str) -> int:
+    """
+    Get the depth of a device in the USB topology.
+
+    Args:
+        device_id: Device ID (e.g., "1-4" is 0, "1-4.2" is 1, "1-4.2.1" is 2)
+
+    Returns:
+        Number of hubs between the device and its root-hub port
+    """
+    return device_id.count('.')
+
+
+def is_device_entry(name: str) -> bool:
+    """
+    Check if a /sys/bus/usb/devices entry is a (non-root-hub) USB device.
+
+    Args:
+        name: Directory entry name (e.g., "1-4", "usb1", "1-4:1.0")
+
+    Returns:
+        True for devices like "1-4" or "1-4.2", False for root hubs and interfaces
+    """
+    return '-' in name and ':' not in name and not name.startswith('usb')
+
+
 class USBAuthorization:
-    """Manages USB device authorization at kernel level."""
+    """
+    Manages USB device authorization at kernel level.
 
-    USB_DEVICES_PATH = Path("/sys/bus/usb/devices")
+    Static convenience wrapper for scripts and one-off tools. Every call is
+    delegated to a shared DeviceAuthorizer on a SysfsBackend rooted at
+    USB_DEVICES_PATH; the daemon owns its own DeviceAuthorizer instead.
+    """
+
+    USB_DEVICES_PATH = DEFAULT_USB_DEVICES_PATH
 
     @staticmethod
     def is_root() -> bool:
@@ -48,26 +118,12 @@ class USBAuthorization:
         Raises:
             ValueError: If device_id contains invalid characters
         """
-        # Validate device_id to prevent path traversal
-        import re
-        if not re.match(r'^[\w\-.:]+$', device_id):
-            raise ValueError(f"Invalid device ID: {device_id}")
-
-        return USBAuthorization.USB_DEVICES_PATH / device_id
+        return USBAuthorization.USB_DEVICES_PATH / validate_device_id(device_id)
 
     @staticmethod
     def device_exists(device_id: str) -> bool:
-        """
-        Check if USB device exists in sysfs.
-
-        Args:
-            device_id: Device ID
-
-        Returns:
-            True if device exists, False otherwise
-        """
-        device_path = USBAuthorization.get_device_path(device_id)
-        return device_path.exists()
+        """Check if USB device exists in sysfs."""
+        return _sysfs_authorizer().device_exists(device_id)
 
     @staticmethod
     def authorize_device(device_id: str, mode: AuthorizationMode = AuthorizationMode.FULL_ACCESS) -> bool:
@@ -85,83 +141,434 @@ class USBAuthorization:
             print("Error: Root privileges required for device authorization")
             return False
 
-        authorized_file = USBAuthorization.get_device_path(device_id) / "authorized"
+        return _sysfs_authorizer().authorize_device(device_id, mode)
 
-        if not authorized_file.exists():
-            print(f"Error: Device {device_id} not found or authorization not supported")
-            return False
+    @staticmethod
+    def get_authorization_status(device_id: str) -> Optional[bool]:
+        """Get current authorization status of a device (None if unknown)."""
+        return _sysfs_authorizer().get_authorization_status(device_id)
 
-        try:
-            with open(authorized_file, 'w') as f:
-                f.write(mode.value)
-            return True
+    @staticmethod
+    def block_device(device_id: str) -> bool:
+        """Block a USB device."""
+        return USBAuthorization.authorize_device(device_id, AuthorizationMode.BLOCKED)
 
-        except PermissionError:
-            print(f"Error: Permission denied writing to {authorized_file}")
-            return False
+    @staticmethod
+    def allow_device(device_id: str) -> bool:
+        """Allow full access to a USB device."""
+        return USBAuthorization.authorize_device(device_id, AuthorizationMode.FULL_ACCESS)
 
-        except Exception as e:
-            print(f"Error authorizing device {device_id}: {e}")
+    @staticmethod
+    def set_power_only_mode(device_id: str) -> bool:
+        """Set device to power-only mode (charging only, no data)."""
+        if not USBAuthorization.is_root():
+            print("Error: Root privileges required for device authorization")
             return False
 
+        return _sysfs_authorizer().set_power_only_mode(device_id)
+
     @staticmethod
-    def get_authorization_status(device_id: str) -> Optional[bool]:
+    def set_default_authorization(mode: str = "0") -> bool:
         """
-        Get current authorization status of a device.
+        Set default authorization mode for new USB devices on all controllers.
 
         Args:
-            device_id: Device ID
+            mode: "0" to block by default, "1" to allow by default, "2" for internal only
 
         Returns:
-            True if authorized, False if blocked, None if error
+            True if successful, False otherwise
         """
-        authorized_file = USBAuthorization.get_device_path(device_id) / "authorized"
+        if not USBAuthorization.is_root():
+            print("Error: Root privileges required")
+            return False
+
+        return _sysfs_authorizer().set_default_authorization(mode)
+
+    @staticmethod
+    def read_device_attribute(device_id: str, attribute: str) -> Optional[str]:
+        """Read a device attribute, or None if it does not exist."""
+        return _sysfs_authorizer().read_device_attribute(device_id, attribute)
+
+    @staticmethod
+    def get_device_info(device_id: str) -> Optional[dict]:
+        """Get detailed information about a USB device, or None if not found."""
+        return _sysfs_authorizer().get_device_info(device_id)
+
+
+class AuthorizationBackend(abc.ABC):
+    """
+    Interface to the kernel's USB authorization controls.
+
+    Backends deal in raw sysfs values ("0"/"1"); policy such as power-only
+    mode lives in DeviceAuthorizer. Methods raise ValueError for invalid
+    device IDs and OSError for I/O failures.
+    """
+
+    @abc.abstractmethod
+    def list_devices(self) -> List[str]:
+        """List attached USB device IDs (excluding root hubs and interfaces)."""
+
+    @abc.abstractmethod
+    def list_controllers(self) -> List[str]:
+        """List USB root hubs (e.g., "usb1")."""
+
+    @abc.abstractmethod
+    def device_path(self, device_id: str) -> str:
+        """Return the path identifying a device (for logging)."""
+
+    @abc.abstractmethod
+    def device_exists(self, device_id: str) -> bool:
+        """Check if a device is present."""
+
+    @abc.abstractmethod
+    def read_attribute(self, device_id: str, attribute: str) -> Optional[str]:
+        """Read a device attribute, or None if it does not exist."""
+
+    @abc.abstractmethod
+    def write_authorized(self, device_id: str, value: str):
+        """Write a device's authorized attribute."""
+
+    @abc.abstractmethod
+    def list_bound_interfaces(self, device_id: str) -> List[str]:
+        """List a device's interfaces that currently have a driver bound."""
+
+    @abc.abstractmethod
+    def unbind_interface(self, device_id: str, interface: str):
+        """Unbind the driver from one of a device's interfaces."""
+
+    @abc.abstractmethod
+    def read_authorized_default(self, controller: str) -> Optional[str]:
+        """Read a root hub's authorized_default, or None if unsupported."""
+
+    @abc.abstractmethod
+    def write_authorized_default(self, controller: str, value: str):
+        """Write a root hub's authorized_default."""
+
+    def forget(self, device_id: str):
+        """Drop anything cached for a device (call when it is removed)."""
+
+    def close(self):
+        """Release any held resources."""
+
+
+class SysfsBackend(AuthorizationBackend):
+    """
+    Backend for the real /sys/bus/usb/devices tree.
+
+    Validated device paths are cached, and each device's authorized file is
+    kept open so repeated decisions cost a single pwrite()/pread().
+    """
+
+    def __init__(self, root: Path = DEFAULT_USB_DEVICES_PATH):
+        """
+        Initialize sysfs backend.
 
-        if not authorized_file.exists():
+        Args:
+            root: sysfs USB devices directory
+        """
+        self.root = str(root)
+        self._paths: Dict[str, str] = {}
+        self._authorized_fds: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, device_id: str) -> str:
+        """Return the cached, validated sysfs path of a device or controller."""
+        path = self._paths.get(device_id)
+        if path is None:
+            path = os.path.join(self.root, validate_device_id(device_id))
+            self._paths[device_id] = path
+        return path
+
+    def _authorized_fd(self, device_id: str) -> int:
+        """Return the cached authorized fd of a device, opening it if needed."""
+        fd = self._authorized_fds.get(device_id)
+        if fd is not None:
+            return fd
+
+        path = os.path.join(self._path(device_id), "authorized")
+        fd = os.open(path, os.O_RDWR | os.O_CLOEXEC)
+        with self._lock:
+            existing = self._authorized_fds.get(device_id)
+            if existing is not None:
+                os.close(fd)
+                return existing
+            self._authorized_fds[device_id] = fd
+        return fd
+
+    def list_devices(self) -> List[str]:
+        with os.scandir(self.root) as entries:
+            return sorted(entry.name for entry in entries if is_device_entry(entry.name))
+
+    def list_controllers(self) -> List[str]:
+        with os.scandir(self.root) as entries:
+            return sorted(entry.name for entry in entries if entry.name.startswith('usb'))
+
+    def device_path(self, device_id: str) -> str:
+        return self._path(device_id)
+
+    def device_exists(self, device_id: str) -> bool:
+        return os.path.exists(self._path(device_id))
+
+    def read_attribute(self, device_id: str, attribute: str) -> Optional[str]:
+        try:
+            fd = os.open(os.path.join(self._path(device_id), attribute), os.O_RDONLY | os.O_CLOEXEC)
+        except FileNotFoundError:
             return None
 
         try:
-            with open(authorized_file, 'r') as f:
-                value = f.read().strip()
-                return value == "1"
+            return os.read(fd, 4096).decode('utf-8', errors='replace').strip()
+        finally:
+            os.close(fd)
 
-        except Exception as e:
-            print(f"Error reading authorization status for {device_id}: {e}")
+    def write_authorized(self, device_id: str, value: str):
+        data = value.encode()
+        try:
+            os.pwrite(self._authorized_fd(device_id), data, 0)
+        except OSError as e:
+            if e.errno not in (errno.ENODEV, errno.ENOENT, errno.EBADF):
+                raise
+            # Device was unplugged and a new one enumerated under the same ID
+            self.forget(device_id)
+            os.pwrite(self._authorized_fd(device_id), data, 0)
+
+    def list_bound_interfaces(self, device_id: str) -> List[str]:
+        device_path = self._path(device_id)
+        interfaces = []
+        with os.scandir(device_path) as entries:
+            for entry in entries:
+                # USB interface naming convention (e.g., 1-4:1.0)
+                if ':' in entry.name and os.path.islink(os.path.join(entry.path, "driver")):
+                    interfaces.append(entry.name)
+        return sorted(interfaces)
+
+    def unbind_interface(self, device_id: str, interface: str):
+        unbind_path = os.path.join(self._path(device_id), validate_device_id(interface), "driver", "unbind")
+        fd = os.open(unbind_path, os.O_WRONLY | os.O_CLOEXEC)
+        try:
+            os.write(fd, interface.encode())
+        finally:
+            os.close(fd)
+
+    def read_authorized_default(self, controller: str) -> Optional[str]:
+        return self.read_attribute(controller, "authorized_default")
+
+    def write_authorized_default(self, controller: str, value: str):
+        fd = os.open(os.path.join(self._path(controller), "authorized_default"), os.O_WRONLY | os.O_CLOEXEC)
+        try:
+            os.write(fd, value.encode())
+        finally:
+            os.close(fd)
+
+    def forget(self, device_id: str):
+        with self._lock:
+            fd = self._authorized_fds.pop(device_id, None)
+        if fd is not None:
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def close(self):
+        for device_id in list(self._authorized_fds):
+            self.forget(device_id)
+
+
+class MemoryBackend(AuthorizationBackend):
+    """
+    In-memory fake of the sysfs tree for tests and benchmarks.
+
+    Needs no root and no hardware. Every write is also appended to
+    self.writes as (kind, target, value) so callers can assert on it.
+    """
+
+    def __init__(self):
+        """Initialize an empty fake tree."""
+        self.devices: Dict[str, Dict] = {}
+        self.controllers: Dict[str, str] = {}
+        self.writes: List[Tuple[str, str, str]] = []
+        self._lock = threading.Lock()
+
+    def add_device(self, device_id: str, authorized: str = "1",
+                   interfaces: Optional[Dict[str, Optional[str]]] = None, **attributes):
+        """
+        Plug in a fake device.
+
+        Args:
+            device_id: Device ID
+            authorized: Initial authorized value
+            interfaces: Interface name -> bound driver name (or None)
+            **attributes: Other sysfs attributes (idVendor, serial, ...)
+        """
+        validate_device_id(device_id)
+        self.devices[device_id] = {
+            'authorized': authorized,
+            'interfaces': dict(interfaces or {}),
+            'attributes': {key: str(value) for key, value in attributes.items()},
+        }
+
+    def remove_device(self, device_id: str):
+        """Unplug a fake device."""
+        self.devices.pop(device_id, None)
+
+    def add_controller(self, controller: str, authorized_default: str = "1"):
+        """Add a fake root hub."""
+        self.controllers[validate_device_id(controller)] = authorized_default
+
+    def _device(self, device_id: str) -> Dict:
+        validate_device_id(device_id)
+        device = self.devices.get(device_id)
+        if device is None:
+            raise FileNotFoundError(errno.ENOENT, "No such device", device_id)
+        return device
+
+    def list_devices(self) -> List[str]:
+        return sorted(self.devices)
+
+    def list_controllers(self) -> List[str]:
+        return sorted(self.controllers)
+
+    def device_path(self, device_id: str) -> str:
+        return f"/sys/bus/usb/devices/{validate_device_id(device_id)}"
+
+    def device_exists(self, device_id: str) -> bool:
+        validate_device_id(device_id)
+        return device_id in self.devices
+
+    def read_attribute(self, device_id: str, attribute: str) -> Optional[str]:
+        validate_device_id(device_id)
+        device = self.devices.get(device_id)
+        if device is None:
             return None
+        if attribute == 'authorized':
+            return device['authorized']
+        return device['attributes'].get(attribute)
+
+    def write_authorized(self, device_id: str, value: str):
+        device = self._device(device_id)
+        with self._lock:
+            device['authorized'] = value
+            if value == "0":
+                # The kernel unbinds all interfaces of a deauthorized device
+                device['interfaces'] = dict.fromkeys(device['interfaces'])
+            self.writes.append(('authorized', device_id, value))
+
+    def list_bound_interfaces(self, device_id: str) -> List[str]:
+        interfaces = self._device(device_id)['interfaces']
+        return sorted(name for name, driver in interfaces.items() if driver)
+
+    def unbind_interface(self, device_id: str, interface: str):
+        interfaces = self._device(device_id)['interfaces']
+        if not interfaces.get(interface):
+            raise FileNotFoundError(errno.ENOENT, "No driver bound", interface)
+        with self._lock:
+            interfaces[interface] = None
+            self.writes.append(('unbind', interface, device_id))
+
+    def read_authorized_default(self, controller: str) -> Optional[str]:
+        return self.controllers.get(validate_device_id(controller))
+
+    def write_authorized_default(self, controller: str, value: str):
+        if validate_device_id(controller) not in self.controllers:
+            raise FileNotFoundError(errno.ENOENT, "No such controller", controller)
+        with self._lock:
+            self.controllers[controller] = value
+            self.writes.append(('authorized_default', controller, value))
+
+
+class DeviceAuthorizer:
+    """
+    Instance-based USB authorization on top of an AuthorizationBackend.
+
+    The daemon runs against the real sysfs tree or a MemoryBackend without
+    code changes; USBAuthorization is a static wrapper around a shared one.
+    """
+
+    def __init__(self, backend: Optional[AuthorizationBackend] = None,
+                 max_workers: int = DEFAULT_BULK_WORKERS):
+        """
+        Initialize authorizer.
 
-    @staticmethod
-    def block_device(device_id: str) -> bool:
+        Args:
+            backend: Backend to use. If None, uses SysfsBackend on /sys.
+            max_workers: Thread pool size for apply_bulk()
         """
-        Block a USB device.
+        self.backend = backend if backend is not None else SysfsBackend()
+        self.max_workers = max(1, max_workers)
+        self._pool = None
+
+        # Desired authorized_default and last known value per root hub
+        self.default_mode: Optional[str] = None
+        self.controller_defaults: Dict[str, str] = {}
+        self._controller_lock = threading.Lock()
+
+    def device_exists(self, device_id: str) -> bool:
+        """
+        Check if USB device exists.
 
         Args:
             device_id: Device ID
 
         Returns:
-            True if successful, False otherwise
+            True if device exists, False otherwise
         """
-        return USBAuthorization.authorize_device(device_id, AuthorizationMode.BLOCKED)
+        return self.backend.device_exists(device_id)
 
-    @staticmethod
-    def allow_device(device_id: str) -> bool:
+    def authorize_device(self, device_id: str, mode: AuthorizationMode = AuthorizationMode.FULL_ACCESS) -> bool:
         """
-        Allow full access to a USB device.
+        Authorize or block a USB device.
 
         Args:
             device_id: Device ID
+            mode: Authorization mode (FULL_ACCESS, BLOCKED, or POWER_ONLY)
 
         Returns:
             True if successful, False otherwise
         """
-        return USBAuthorization.authorize_device(device_id, AuthorizationMode.FULL_ACCESS)
+        try:
+            self.backend.write_authorized(device_id, mode.value)
+            return True
 
-    @staticmethod
-    def set_power_only_mode(device_id: str) -> bool:
+        except FileNotFoundError:
+            print(f"Error: Device {device_id} not found or authorization not supported")
+            return False
+
+        except PermissionError:
+            print(f"Error: Permission denied writing authorization for {device_id}")
+            return False
+
+        except Exception as e:
+            print(f"Error authorizing device {device_id}: {e}")
+            return False
+
+    def get_authorization_status(self, device_id: str) -> Optional[bool]:
         """
-        Set device to power-only mode (charging only, no data).
+        Get current authorization status of a device.
 
-        Note: At kernel level, this is the same as blocking. The device
-        will receive power but data communication is blocked.
+        Args:
+            device_id: Device ID
+
+        Returns:
+            True if authorized, False if blocked, None if error
+        """
+        try:
+            value = self.backend.read_attribute(device_id, "authorized")
+        except Exception as e:
+            print(f"Error reading authorization status for {device_id}: {e}")
+            return None
+
+        return None if value is None else value == "1"
+
+    def block_device(self, device_id: str) -> bool:
+        """Block a USB device."""
+        return self.authorize_device(device_id, AuthorizationMode.BLOCKED)
+
+    def allow_device(self, device_id: str) -> bool:
+        """Allow full access to a USB device."""
+        return self.authorize_device(device_id, AuthorizationMode.FULL_ACCESS)
+
+    def set_power_only_mode(self, device_id: str) -> bool:
+        """
+        Set device to power-only mode (charging only, no data).
 
         Args:
             device_id: Device ID
@@ -169,16 +576,12 @@ class USBAuthorization:
         Returns:
             True if successful, False otherwise
         """
-        # Block the device first
-        if not USBAuthorization.block_device(device_id):
+        if not self.block_device(device_id):
             return False
 
-        # Optionally unbind USB interfaces to ensure no data transfer
-        # This is more aggressive and ensures no driver interaction
-        return USBAuthorization._unbind_interfaces(device_id)
+        return self._unbind_interfaces(device_id)
 
-    @staticmethod
-    def _unbind_interfaces(device_id: str) -> bool:
+    def _unbind_interfaces(self, device_id: str) -> bool:
         """
         Unbind all USB interfaces for a device.
 
@@ -188,34 +591,28 @@ class USBAuthorization:
         Returns:
             True if successful, False otherwise
         """
-        device_path = USBAuthorization.get_device_path(device_id)
-
         try:
-            # Find all interface subdirectories (e.g., 1-4:1.0)
-            for item in device_path.iterdir():
-                if ':' in item.name:  # USB interface naming convention
-                    driver_path = item / "driver"
-                    if driver_path.exists() and driver_path.is_symlink():
-                        # Unbind the interface
-                        unbind_path = driver_path / "unbind"
-                        if unbind_path.exists():
-                            try:
-                                with open(unbind_path, 'w') as f:
-                                    f.write(item.name)
-                            except Exception as e:
-                                # Some interfaces may not support unbinding
-                                print(f"Warning: Could not unbind interface {item.name}: {e}")
-
-            return True
-
+            interfaces = self.backend.list_bound_interfaces(device_id)
         except Exception as e:
             print(f"Error unbinding interfaces for {device_id}: {e}")
             return False
 
-    @staticmethod
-    def set_default_authorization(mode: str = "0") -> bool:
+        for interface in interfaces:
+            try:
+                self.backend.unbind_interface(device_id, interface)
+            except Exception as e:
+                # Some interfaces may not support unbinding
+                print(f"Warning: Could not unbind interface {interface}: {e}")
+
+        return True
+
+    def set_default_authorization(self, mode: str = "0") -> bool:
         """
-        Set default authorization mode for new USB devices.
+        Set default authorization mode for new USB devices on all controllers.
+
+        Controllers already at the requested value are not rewritten. The mode
+        is remembered and applied to controllers that appear later (see
+        apply_default_to_controller).
 
         Args:
             mode: "0" to block by default, "1" to allow by default, "2" for internal only
@@ -223,32 +620,88 @@ class USBAuthorization:
         Returns:
             True if successful, False otherwise
         """
-        if not USBAuthorization.is_root():
-            print("Error: Root privileges required")
+        self.default_mode = mode
+
+        try:
+            controllers = self.backend.list_controllers()
+        except Exception as e:
+            print(f"Error setting default authorization: {e}")
+            return False
+
+        with self._controller_lock:
+            # Forget root hubs that have gone away
+            for controller in set(self.controller_defaults) - set(controllers):
+                del self.controller_defaults[controller]
+
+        for controller in controllers:
+            self._apply_controller_default(controller, mode)
+
+        return True
+
+    def apply_default_to_controller(self, controller: str) -> bool:
+        """
+        Apply the current default mode to a newly added root hub.
+
+        Args:
+            controller: Root hub name (e.g., "usb3")
+
+        Returns:
+            True if the controller is at the default mode, False otherwise
+        """
+        if self.default_mode is None:
             return False
 
-        # Find all USB controllers
+        # A new root hub under an old name starts from the kernel's value
+        self.forget_controller(controller)
+        return self._apply_controller_default(controller, self.default_mode)
+
+    def _apply_controller_default(self, controller: str, mode: str) -> bool:
+        """Write authorized_default for one controller unless it already matches."""
         try:
-            for controller_path in USBAuthorization.USB_DEVICES_PATH.glob("usb*"):
-                authorized_default = controller_path / "authorized_default"
+            with self._controller_lock:
+                current = self.controller_defaults.get(controller)
+                if current is None:
+                    current = self.backend.read_authorized_default(controller)
+                    if current is None:
+                        return False  # Controller does not support authorization
+                    self.controller_defaults[controller] = current
 
-                if authorized_default.exists():
-                    try:
-                        with open(authorized_default, 'w') as f:
-                            f.write(mode)
-                    except Exception as e:
-                        print(f"Error setting authorized_default for {controller_path.name}: {e}")
+                if current == mode:
+                    return True
 
-            return True
+                self.backend.write_authorized_default(controller, mode)
+                self.controller_defaults[controller] = mode
+                return True
 
         except Exception as e:
-            print(f"Error setting default authorization: {e}")
+            print(f"Error setting authorized_default for {controller}: {e}")
+            with self._controller_lock:
+                self.controller_defaults.pop(controller, None)
             return False
 
-    @staticmethod
-    def read_device_attribute(device_id: str, attribute: str) -> Optional[str]:
+    def forget_controller(self, controller: str):
+        """
+        Drop the cached state of a removed root hub.
+
+        Args:
+            controller: Root hub name
+        """
+        with self._controller_lock:
+            self.controller_defaults.pop(controller, None)
+
+    def get_controller_states(self) -> Dict[str, str]:
+        """
+        Get the known authorized_default value of each root hub.
+
+        Returns:
+            Dictionary mapping controller name to "0", "1" or "2"
+        """
+        with self._controller_lock:
+            return dict(self.controller_defaults)
+
+    def read_device_attribute(self, device_id: str, attribute: str) -> Optional[str]:
         """
-        Read a device attribute from sysfs.
+        Read a device attribute.
 
         Args:
             device_id: Device ID
@@ -257,22 +710,14 @@ class USBAuthorization:
         Returns:
             Attribute value or None if not found
         """
-        attr_file = USBAuthorization.get_device_path(device_id) / attribute
-
-        if not attr_file.exists():
-            return None
-
         try:
-            with open(attr_file, 'r') as f:
-                return f.read().strip()
-        except Exception as e:
-            # Log error for debugging but don't expose to user
-            import sys
-            print(f"[DEBUG] Error reading device attribute {attribute}: {e}", file=sys.stderr)
+            return self.backend.read_attribute(device_id, attribute)
+        except ValueError:
+            raise
+        except Exception:
             return None
 
-    @staticmethod
-    def get_device_info(device_id: str) -> Optional[dict]:
+    def get_device_info(self, device_id: str) -> Optional[dict]:
         """
         Get detailed information about a USB device.
 
@@ -282,22 +727,129 @@ class USBAuthorization:
         Returns:
             Dictionary with device information or None if device not found
         """
-        if not USBAuthorization.device_exists(device_id):
+        if not self.device_exists(device_id):
             return None
 
-        info = {
+        return {
             'device_id': device_id,
-            'vendor_id': USBAuthorization.read_device_attribute(device_id, 'idVendor'),
-            'product_id': USBAuthorization.read_device_attribute(device_id, 'idProduct'),
-            'vendor_name': USBAuthorization.read_device_attribute(device_id, 'manufacturer'),
-            'product_name': USBAuthorization.read_device_attribute(device_id, 'product'),
-            'serial_number': USBAuthorization.read_device_attribute(device_id, 'serial'),
-            'speed': USBAuthorization.read_device_attribute(device_id, 'speed'),
-            'authorized': USBAuthorization.get_authorization_status(device_id)
+            'vendor_id': self.read_device_attribute(device_id, 'idVendor'),
+            'product_id': self.read_device_attribute(device_id, 'idProduct'),
+            'vendor_name': self.read_device_attribute(device_id, 'manufacturer'),
+            'product_name': self.read_device_attribute(device_id, 'product'),
+            'serial_number': self.read_device_attribute(device_id, 'serial'),
+            'speed': self.read_device_attribute(device_id, 'speed'),
+            'authorized': self.get_authorization_status(device_id)
+        }
+
+    def apply_bulk(self, transitions: Dict[str, str]) -> Dict[str, Dict]:
+        """
+        Apply mode transitions to many devices concurrently.
+
+        Devices are processed level by level in topology order, so a hub is
+        authorized before the devices behind it. Within a level, writes run
+        concurrently on a small thread pool.
+
+        Args:
+            transitions: Device ID -> 'full', 'power_only' or 'block'
+
+        Returns:
+            Device ID -> {'mode', 'success', 'elapsed_ms', 'error'}
+        """
+        actions = {
+            BULK_MODE_FULL: self.allow_device,
+            BULK_MODE_POWER_ONLY: self.set_power_only_mode,
+            BULK_MODE_BLOCK: self.block_device,
         }
 
-        return info
+        results = {}
+        levels: Dict[int, List[str]] = {}
+        for device_id, mode in transitions.items():
+            if mode not in actions:
+                results[device_id] = {
+                    'mode': mode,
+                    'success': False,
+                    'elapsed_ms': 0.0,
+                    'error': f"Unknown mode: {mode}",
+                }
+                continue
+            levels.setdefault(device_depth(device_id), []).append(device_id)
+
+        def apply(device_id: str) -> Tuple[str, Dict]:
+            mode = transitions[device_id]
+            start = time.perf_counter()
+            try:
+                success = actions[mode](device_id)
+                error = None
+            except Exception as e:
+                success = False
+                error = str(e)
+            return device_id, {
+                'mode': mode,
+                'success': success,
+                'elapsed_ms': (time.perf_counter() - start) * 1000,
+                'error': error,
+            }
+
+        for depth in sorted(levels):
+            device_ids = levels[depth]
+            if len(device_ids) == 1 or self.max_workers == 1:
+                results.update(apply(device_id) for device_id in device_ids)
+            else:
+                # Waiting for the whole level keeps parents ahead of children
+                results.update(self._get_pool().map(apply, device_ids))
+
+        return results
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        """Return the bulk thread pool, creating it on first use."""
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix='secureusb-authorize'
+            )
+        return self._pool
+
+    def forget_device(self, device_id: str):
+        """
+        Drop cached state for a removed device.
+
+        Args:
+            device_id: Device ID
+        """
+        self.backend.forget(device_id)
+
+    def close(self):
+        """Release the thread pool and backend resources."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        self.backend.close()
+
+
+
+# Shared authorizer behind the USBAuthorization static API
+_default_authorizer: Optional[DeviceAuthorizer] = None
+_default_authorizer_lock = threading.Lock()
+
+
+def _sysfs_authorizer() -> DeviceAuthorizer:
+    """
+    Return the shared sysfs-backed authorizer used by USBAuthorization.
+
+    Rebuilt if USBAuthorization.USB_DEVICES_PATH has been repointed since the
+    last call.
 
+    Returns:
+        DeviceAuthorizer on a SysfsBackend rooted at USB_DEVICES_PATH
+    """
+    global _default_authorizer
+    root = str(USBAuthorization.USB_DEVICES_PATH)
+    with _default_authorizer_lock:
+        if _default_authorizer is None or _default_authorizer.backend.root != root:
+            if _default_authorizer is not None:
+                _default_authorizer.close()
+            _default_authorizer = DeviceAuthorizer(SysfsBackend(root))
+        return _default_authorizer
 
 # Example usage and testing
 if __name__ == "__main__":
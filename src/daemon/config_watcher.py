@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Configuration Directory Watcher for SecureUSB
+
+Watches the configuration directory with inotify so edits to config.json,
+whitelist.json or policy.json take effect without polling or a daemon
+restart. The inotify descriptor is non-blocking and meant to be added to the
+main loop (GLib.io_add_watch); each wake-up drains the queued events and
+reports every changed file once.
+
+Only completed writes are reported: IN_CLOSE_WRITE for in-place saves and
+IN_MOVED_TO for the write-temp-then-rename pattern most editors use. If the
+kernel event queue overflows, every watched file is reported so nothing is
+missed.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import struct
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Set, Tuple
+
+# inotify event masks (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_DELETE | IN_ONLYDIR
+
+# struct inotify_event { int wd; uint32_t mask, cookie, len; char name[]; }
+_EVENT_HEADER = struct.Struct('=iIII')
+
+READ_SIZE = 64 * 1024
+
+# (watch descriptor, mask, name)
+InotifyEvent = Tuple[int, int, str]
+
+
+def parse_events(buffer: bytes) -> List[InotifyEvent]:
+    """
+    Split a read() from an inotify descriptor into events.
+
+    Args:
+        buffer: Raw bytes read from the inotify file descriptor
+
+    Returns:
+        List of (watch descriptor, mask, name) tuples
+    """
+    events = []
+    offset = 0
+    while offset + _EVENT_HEADER.size <= len(buffer):
+        wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(buffer, offset)
+        offset += _EVENT_HEADER.size
+        name = buffer[offset:offset + length].split(b'\0', 1)[0].decode('utf-8', 'replace')
+        offset += length
+        events.append((wd, mask, name))
+    return events
+
+
+def _load_libc():
+    """Load libc with errno support, or None if unavailable."""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class ConfigWatcher:
+    """Report changes to files in the configuration directory."""
+
+    def __init__(self,
+                 config_dir: Path,
+                 callback: Callable[[str], object],
+                 filenames: Iterable[str]):
+        """
+        Initialize the watcher.
+
+        Args:
+            config_dir: Directory to watch
+            callback: Called with the name of each changed file
+            filenames: Names of the files to report; others are ignored
+        """
+        self.config_dir = Path(config_dir)
+        self.callback = callback
+        self.filenames: Set[str] = set(filenames)
+
+        self._fd: Optional[int] = None
+        self._wd: Optional[int] = None
+
+    def start(self) -> bool:
+        """
+        Create the inotify descriptor and watch the directory.
+
+        Returns:
+            True if watching, False if inotify is unavailable
+        """
+        if self._fd is not None:
+            return True
+
+        libc = _load_libc()
+        if libc is None:
+            print("[ConfigWatcher] inotify is not available, config changes need a restart")
+            return False
+
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            print(f"[ConfigWatcher] inotify_init1 failed: {os.strerror(ctypes.get_errno())}")
+            return False
+
+        wd = libc.inotify_add_watch(fd, os.fsencode(str(self.config_dir)), WATCH_MASK)
+        if wd < 0:
+            print(f"[ConfigWatcher] Cannot watch {self.config_dir}: {os.strerror(ctypes.get_errno())}")
+            os.close(fd)
+            return False
+
+        self._fd = fd
+        self._wd = wd
+        print(f"[ConfigWatcher] Watching {self.config_dir}")
+        return True
+
+    def fileno(self) -> Optional[int]:
+        """
+        Get the inotify file descriptor for the main loop.
+
+        Returns:
+            File descriptor, or None if not started
+        """
+        return self._fd
+
+    def process_events(self) -> List[str]:
+        """
+        Drain pending events and invoke the callback once per changed file.
+
+        Returns:
+            Names of the files reported, in the order first seen
+        """
+        if self._fd is None:
+            return []
+
+        changed: List[str] = []
+        while True:
+            try:
+                buffer = os.read(self._fd, READ_SIZE)
+            except BlockingIOError:
+                break
+            except OSError as e:
+                if e.errno == errno.EINTR:
+                    continue
+                print(f"[ConfigWatcher] Error reading events: {e}")
+                break
+            if not buffer:
+                break
+
+            for _wd, mask, name in parse_events(buffer):
+                if mask & IN_Q_OVERFLOW:
+                    names = sorted(self.filenames)
+                elif mask & IN_IGNORED or name not in self.filenames:
+                    continue
+                else:
+                    names = [name]
+
+                for filename in names:
+                    if filename not in changed:
+                        changed.append(filename)
+
+        for filename in changed:
+            try:
+                self.callback(filename)
+            except Exception as e:
+                print(f"[ConfigWatcher] Error handling change to {filename}: {e}")
+
+        return changed
+
+    def stop(self):
+        """Stop watching and close the inotify descriptor."""
+        if self._fd is not None:
+            try:
+                os.close(self._fd)
+            except OSError:
+                pass
+        self._fd = None
+        self._wd = None
@@ -22,7 +22,8 @@ DBUS_INTERFACE_NAME = "org.secureusb.Daemon"
 class SecureUSBService(dbus.service.Object):
     """D-Bus service for SecureUSB daemon."""
 
-    def __init__(self, bus: dbus.SystemBus, authorization_callback: Callable, config_callback: Callable):
+    def __init__(self, bus: dbus.SystemBus, authorization_callback: Callable, config_callback: Callable,
+                 state_callback: Optional[Callable] = None):
         """
         Initialize D-Bus service.
 
@@ -30,15 +31,14 @@ class SecureUSBService(dbus.service.Object):
             bus: D-Bus system bus connection
             authorization_callback: Function to call for authorization requests
             config_callback: Function to call for configuration changes
+            state_callback: Function to call for daemon state queries
         """
         bus_name = dbus.service.BusName(DBUS_SERVICE_NAME, bus=bus)
         super().__init__(bus_name, DBUS_OBJECT_PATH)
 
         self.authorization_callback = authorization_callback
         self.config_callback = config_callback
-
-        # Pending authorization requests
-        self.pending_requests = {}
+        self.state_callback = state_callback
 
         print(f"[D-Bus] Service registered: {DBUS_SERVICE_NAME}")
 
@@ -92,9 +92,10 @@ class SecureUSBService(dbus.service.Object):
             return self.config_callback('set_enabled', enabled)
         return False
 
-    @dbus.service.method(DBUS_INTERFACE_NAME, in_signature='ssssssss', out_signature='s')
+    @dbus.service.method(DBUS_INTERFACE_NAME, in_signature='ssssssss', out_signature='s',
+                         sender_keyword='sender')
     def AuthorizeDevice(self, device_id, vendor_id, product_id, vendor_name,
-                        product_name, serial_number, totp_code, auth_mode):
+                        product_name, serial_number, totp_code, auth_mode, sender=None):
         """
         Authorize a USB device with TOTP authentication.
 
@@ -107,9 +108,10 @@ class SecureUSBService(dbus.service.Object):
             serial_number: Device serial number
             totp_code: TOTP authentication code
             auth_mode: Authorization mode ("full", "power_only", "deny")
+            sender: Unique bus name of the caller (filled in by dbus-python)
 
         Returns:
-            Result: "success", "auth_failed", "error", or error message
+            Result: "success", "auth_failed", "rate_limited", "error", or error message
         """
         device_info = {
             'device_id': str(device_id),
@@ -124,7 +126,8 @@ class SecureUSBService(dbus.service.Object):
             result = self.authorization_callback(
                 device_info,
                 str(totp_code),
-                str(auth_mode)
+                str(auth_mode),
+                sender=str(sender) if sender else None
             )
             return str(result)
 
@@ -159,9 +162,20 @@ class SecureUSBService(dbus.service.Object):
         Returns:
             List of device info dictionaries
         """
+        devices = None
+        if self.state_callback:
+            try:
+                devices = self.state_callback('pending_devices')
+            except Exception as e:
+                print(f"[D-Bus] Error getting pending devices: {e}")
+
+        if devices is None:
+            devices = []
+
         return [
-            dbus.Dictionary(device, signature='ss')
-            for device in self.pending_requests.values()
+            dbus.Dictionary({key: str(value) if value else '' for key, value in device.items()},
+                            signature='ss')
+            for device in devices
         ]
 
     @dbus.service.method(DBUS_INTERFACE_NAME, in_signature='', out_signature='aa{sv}')
@@ -226,6 +240,97 @@ class SecureUSBService(dbus.service.Object):
             print(f"[D-Bus] Error getting statistics: {e}")
             return dbus.Dictionary({}, signature='ss')
 
+    @dbus.service.method(DBUS_INTERFACE_NAME, in_signature='', out_signature='a{ss}')
+    def GetControllerStates(self):
+        """
+        Get the authorized_default value of each USB controller.
+
+        Returns:
+            Dictionary mapping root hub name (e.g., "usb1") to "0", "1" or "2"
+        """
+        if self.state_callback:
+            try:
+                states = self.state_callback('controller_states')
+                return dbus.Dictionary(states, signature='ss')
+            except Exception as e:
+                print(f"[D-Bus] Error getting controller states: {e}")
+
+        return dbus.Dictionary({}, signature='ss')
+
+    @dbus.service.method(DBUS_INTERFACE_NAME, in_signature='', out_signature='a{sd}')
+    def GetRemainingTimes(self):
+        """
+        Get time left to authorize each pending device before auto-deny.
+
+        Returns:
+            Dictionary mapping device ID to seconds remaining
+        """
+        if self.state_callback:
+            try:
+                remaining = self.state_callback('remaining_times')
+                return dbus.Dictionary(remaining, signature='sd')
+            except Exception as e:
+                print(f"[D-Bus] Error getting remaining times: {e}")
+
+        return dbus.Dictionary({}, signature='sd')
+
+    @dbus.service.method(DBUS_INTERFACE_NAME, in_signature='', out_signature='a{su}')
+    def GetDeviceCounts(self):
+        """
+        Get the number of attached devices in each state.
+
+        Returns:
+            Dictionary mapping state (e.g., "pending") to device count
+        """
+        if self.state_callback:
+            try:
+                return dbus.Dictionary(self.state_callback('device_counts'), signature='su')
+            except Exception as e:
+                print(f"[D-Bus] Error getting device counts: {e}")
+
+        return dbus.Dictionary({}, signature='su')
+
+    @dbus.service.method(DBUS_INTERFACE_NAME, in_signature='', out_signature='a{sd}')
+    def GetClockDrift(self):
+        """
+        Get the clock drift learned from accepted TOTP codes.
+
+        Returns:
+            Dictionary with drift_steps, drift_seconds, estimate_steps,
+            last_offset_steps and samples (empty if TOTP is not configured)
+        """
+        if self.state_callback:
+            try:
+                return dbus.Dictionary(self.state_callback('clock_drift'), signature='sd')
+            except Exception as e:
+                print(f"[D-Bus] Error getting clock drift: {e}")
+
+        return dbus.Dictionary({}, signature='sd')
+
+    @dbus.service.method(DBUS_INTERFACE_NAME, in_signature='u', out_signature='a(uss)')
+    def GetStateDeltas(self, since):
+        """
+        Get device state changes after a sequence number.
+
+        Clients follow DeviceStateChanged and use this to catch up after
+        (re)connecting. If the first delta is not since + 1, older changes
+        were dropped and the client should re-read the full state.
+
+        Args:
+            since: Last sequence number seen (0 for all retained deltas)
+
+        Returns:
+            List of (sequence, device_id, state) tuples
+        """
+        if self.state_callback:
+            try:
+                deltas = self.state_callback('state_deltas', int(since))
+                return dbus.Array(deltas, signature='(uss)')
+            except Exception as e:
+                print(f"[D-Bus] Error getting state deltas: {e}")
+
+        return dbus.Array([], signature='(uss)')
+
     @dbus.service.method(DBUS_INTERFACE_NAME, in_signature='a{ss}', out_signature='b')
     def AddToWhitelist(self, device_info):
         """
@@ -261,6 +366,36 @@ class SecureUSBService(dbus.service.Object):
             return self.config_callback('remove_whitelist', str(serial_number))
         return False
 
+    @dbus.service.method(DBUS_INTERFACE_NAME, in_signature='u', out_signature='b')
+    def StartProfiling(self, seconds):
+        """
+        Profile the daemon's event handlers for a while.
+
+        The pstats and allocation report are written to the config
+        directory when the window ends (same as sending SIGUSR2).
+
+        Args:
+            seconds: Window length (0 for the default)
+
+        Returns:
+            True if profiling started, False if a window is already open
+        """
+        if self.config_callback:
+            return self.config_callback('start_profiling', int(seconds))
+        return False
+
+    @dbus.service.method(DBUS_INTERFACE_NAME, in_signature='', out_signature='b')
+    def StopProfiling(self):
+        """
+        End the current profiling window early and write its results.
+
+        Returns:
+            True if results were written, False otherwise
+        """
+        if self.config_callback:
+            return self.config_callback('stop_profiling', None)
+        return False
+
     @dbus.service.signal(DBUS_INTERFACE_NAME, signature='a{ss}')
     def DeviceConnected(self, device_info):
         """
@@ -303,6 +438,40 @@ class SecureUSBService(dbus.service.Object):
         """
         pass
 
+    @dbus.service.signal(DBUS_INTERFACE_NAME, signature='uss')
+    def DeviceStateChanged(self, sequence, device_id, state):
+        """
+        Signal emitted on every device state change.
+
+        Args:
+            sequence: Monotonically increasing change number
+            device_id: Device ID
+            state: New state (connected, pending, authorized, power_only,
+                   denied, timed_out, removed)
+        """
+        pass
+
+    @dbus.service.signal(DBUS_INTERFACE_NAME, signature='s')
+    def ConfigChanged(self, filename):
+        """
+        Signal emitted when a configuration file was reloaded.
+
+        Args:
+            filename: Name of the reloaded file (config.json, whitelist.json
+                      or policy.json)
+        """
+        pass
+
+    def emit_device_state_changed(self, delta):
+        """
+        Emit DeviceStateChanged signal.
+
+        Args:
+            delta: (sequence, device_id, state) tuple from the state table
+        """
+        sequence, device_id, state = delta
+        self.DeviceStateChanged(dbus.UInt32(sequence), device_id, state)
+
     def emit_device_connected(self, device_info: Dict):
         """
         Emit DeviceConnected signal.
@@ -310,10 +479,6 @@ class SecureUSBService(dbus.service.Object):
         Args:
             device_info: Device information dictionary
         """
-        # Store in pending requests
-        device_id = device_info.get('device_id', '')
-        self.pending_requests[device_id] = device_info
-
         # Convert to D-Bus types
         dbus_info = {}
         for key, value in device_info.items():
@@ -328,10 +493,6 @@ class SecureUSBService(dbus.service.Object):
         Args:
             device_id: Device ID
         """
-        # Remove from pending requests
-        if device_id in self.pending_requests:
-            del self.pending_requests[device_id]
-
         self.DeviceDisconnected(device_id)
 
     def emit_authorization_result(self, device_id: str, result: str, success: bool):
@@ -343,10 +504,6 @@ class SecureUSBService(dbus.service.Object):
             result: Result message
             success: True if authorized, False if denied
         """
-        # Remove from pending requests
-        if device_id in self.pending_requests:
-            del self.pending_requests[device_id]
-
         self.AuthorizationResult(device_id, result, success)
 
     def emit_protection_state_changed(self, enabled: bool):
@@ -358,6 +515,15 @@ class SecureUSBService(dbus.service.Object):
         """
         self.ProtectionStateChanged(enabled)
 
+    def emit_config_changed(self, filename: str):
+        """
+        Emit ConfigChanged signal.
+
+        Args:
+            filename: Name of the reloaded file
+        """
+        self.ConfigChanged(filename)
+
 
 class DBusClient:
     """Client for communicating with SecureUSB D-Bus service."""
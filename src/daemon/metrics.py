@@ -0,0 +1,550 @@
+#!/usr/bin/env python3
+"""
+Metrics for SecureUSB
+
+Counters, gauges and histograms rendered in the Prometheus text exposition
+format. The daemon writes them periodically to a .prom file for
+node_exporter's textfile collector and can optionally serve them over HTTP
+on a Unix socket.
+
+Recording is a dictionary update under a lock (plus a bisect for
+histograms); all formatting happens when the metrics are exported, never on
+the device event path. Queue depths are gauges read from callbacks at export
+time, so they cost nothing in between.
+"""
+
+import abc
+import bisect
+import os
+import socketserver
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Latency buckets in seconds, from sub-millisecond up to a slow disk
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    """Escape a label value for the exposition format."""
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    """Render a {name="value",...} label set."""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    """Render a sample value."""
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric(abc.ABC):
+    """Base class for a named metric family."""
+
+    TYPE = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        """
+        Initialize the metric.
+
+        Args:
+            name: Metric name (e.g., 'secureusb_device_events_total')
+            documentation: HELP text
+            labelnames: Names of the labels, in the order values are passed
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def render(self) -> List[str]:
+        """
+        Render the metric family.
+
+        Returns:
+            Lines of the exposition format, HELP and TYPE first
+        """
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.TYPE}",
+        ]
+        lines.extend(self._samples())
+        return lines
+
+    @abc.abstractmethod
+    def _samples(self) -> List[str]:
+        """Render the sample lines (without HELP and TYPE)."""
+
+
+class Counter(Metric):
+    """Monotonically increasing count."""
+
+    TYPE = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Labels, float] = {}
+        if not self.labelnames:
+            self._values[()] = 0
+
+    def inc(self, *labels: str, amount: float = 1):
+        """
+        Increment the counter.
+
+        Args:
+            *labels: Label values, one per label name
+            amount: Amount to add
+        """
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def get(self, *labels: str) -> float:
+        """Get the current count for a label set."""
+        return self._values.get(labels, 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in values
+        ]
+
+
+class Gauge(Metric):
+    """Value read from a callback at export time."""
+
+    TYPE = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 collect: Optional[Callable[[], Dict[Labels, float]]] = None):
+        """
+        Initialize the gauge.
+
+        Args:
+            name: Metric name
+            documentation: HELP text
+            labelnames: Names of the labels
+            collect: Returns a dictionary mapping label values to the current
+                     value; called only when the metrics are rendered
+        """
+        super().__init__(name, documentation, labelnames)
+        self.collect = collect
+
+    def _samples(self) -> List[str]:
+        if self.collect is None:
+            return []
+        try:
+            values = sorted(self.collect().items())
+        except Exception as e:
+            print(f"[Metrics] Error collecting {self.name}: {e}")
+            return []
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in values
+        ]
+
+
+class Histogram(Metric):
+    """Distribution of observed values in fixed buckets."""
+
+    TYPE = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        """
+        Initialize the histogram.
+
+        Args:
+            name: Metric name
+            documentation: HELP text
+            labelnames: Names of the labels
+            buckets: Sorted upper bounds; +Inf is added automatically
+        """
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Label values -> [per-bucket counts (last is +Inf), sum]
+        self._series: Dict[Labels, list] = {}
+
+    def observe(self, value: float, *labels: str):
+        """
+        Record an observation.
+
+        Args:
+            value: Observed value (seconds for latencies)
+            *labels: Label values, one per label name
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def time(self, *labels: str) -> '_Timer':
+        """
+        Time a block of code.
+
+        Args:
+            *labels: Label values, one per label name
+
+        Returns:
+            Context manager that observes the elapsed time on exit
+        """
+        return _Timer(self, labels)
+
+    def count(self, *labels: str) -> int:
+        """Get the number of observations for a label set."""
+        series = self._series.get(labels)
+        return sum(series[0]) if series else 0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            series = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._series.items())
+
+        lines = []
+        bounds = self.buckets + (float('inf'),)
+        for labels, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    """Context manager returned by Histogram.time()."""
+
+    __slots__ = ('histogram', 'labels', 'start')
+
+    def __init__(self, histogram: Histogram, labels: Labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+        return False
+
+
+class MetricsRegistry:
+    """Ordered collection of metric families."""
+
+    def __init__(self):
+        self.metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        """
+        Add a metric family.
+
+        Args:
+            metric: Metric to add
+
+        Returns:
+            The metric, for assignment
+        """
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """
+        Render all metrics in the Prometheus text exposition format.
+
+        Returns:
+            Exposition text ending with a newline
+        """
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path: Path) -> bool:
+        """
+        Atomically write the metrics to a file.
+
+        The text is written to a temporary file in the same directory and
+        renamed over the target, so the collector never reads a partial file.
+
+        Args:
+            path: Target .prom file
+
+        Returns:
+            True if successful, False otherwise
+        """
+        path = Path(path)
+        temp_path = None
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(prefix=f".{path.name}.", dir=path.parent)
+            with os.fdopen(fd, 'w') as f:
+                f.write(self.render())
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, path)
+            return True
+        except OSError as e:
+            print(f"[Metrics] Error writing {path}: {e}")
+            if temp_path and os.path.exists(temp_path):
+                os.unlink(temp_path)
+            return False
+
+
+def _filtered_by_stage(stats: Dict) -> Dict[Labels, float]:
+    """
+    Split USB monitor filter statistics into kernel and userspace counts.
+
+    Args:
+        stats: Result of USBMonitor.get_filter_stats()
+
+    Returns:
+        Dictionary mapping ('kernel',) and ('userspace',) to their counts
+    """
+    return {
+        ('kernel',): stats['wakeups_saved'],
+        ('userspace',): stats['events_ignored'],
+    }
+
+
+class DaemonMetrics(MetricsRegistry):
+    """The metrics exported by the SecureUSB daemon."""
+
+    def __init__(self, queue_depths: Optional[Callable[[], Dict[str, int]]] = None,
+                 filter_stats: Optional[Callable[[], Dict]] = None):
+        """
+        Create the daemon's metric families.
+
+        Args:
+            queue_depths: Returns a dictionary mapping queue name to its
+                          current length
+            filter_stats: Returns the USB monitor's uevent filtering
+                          statistics (see USBMonitor.get_filter_stats)
+        """
+        super().__init__()
+
+        self.device_events = self.register(Counter(
+            'secureusb_device_events_total',
+            'USB device events handled, by uevent action.',
+            ('action',)
+        ))
+        self.authorizations = self.register(Counter(
+            'secureusb_authorizations_total',
+            'Device authorization decisions, by resulting mode and deciding method.',
+            ('mode', 'method')
+        ))
+        self.auth_failures = self.register(Counter(
+            'secureusb_auth_failures_total',
+            'Rejected TOTP or recovery codes.'
+        ))
+        self.auth_rate_limited = self.register(Counter(
+            'secureusb_auth_rate_limited_total',
+            'Authorization attempts refused because the caller or device is locked out.'
+        ))
+        self.queue_depth = self.register(Gauge(
+            'secureusb_queue_depth',
+            'Current number of entries per internal queue.',
+            ('queue',),
+            collect=(lambda: {(name,): depth for name, depth in queue_depths().items()})
+            if queue_depths else None
+        ))
+        self.uevents_filtered = self.register(Gauge(
+            'secureusb_uevents_filtered',
+            'Irrelevant USB uevents discarded since startup, by where they were dropped.',
+            ('stage',),
+            collect=(lambda: _filtered_by_stage(filter_stats()))
+            if filter_stats else None
+        ))
+        self.uevent_kernel_filter = self.register(Gauge(
+            'secureusb_uevent_kernel_filter',
+            '1 if the kernel uevent action filter is attached, 0 if filtering happens in userspace.',
+            collect=(lambda: {(): 1 if filter_stats()['kernel_filter'] else 0})
+            if filter_stats else None
+        ))
+        self.plug_to_block_seconds = self.register(Histogram(
+            'secureusb_plug_to_block_seconds',
+            'Time from receiving a device uevent to the device being blocked or decided.'
+        ))
+        self.dbus_call_seconds = self.register(Histogram(
+            'secureusb_dbus_call_seconds',
+            'Time spent handling D-Bus calls, by method.',
+            ('method',)
+        ))
+        self.sqlite_write_seconds = self.register(Histogram(
+            'secureusb_sqlite_write_seconds',
+            'Time spent writing audit events to SQLite.'
+        ))
+        self.audit_events_lost = self.register(Counter(
+            'secureusb_audit_events_lost_total',
+            'Audit events not written, by sink and reason (dropped on a full queue or failed).',
+            ('sink', 'reason')
+        ))
+
+    def timed_dbus_callback(self, callback: Callable, method: Optional[str] = None) -> Callable:
+        """
+        Wrap a D-Bus service callback to record its latency.
+
+        Args:
+            callback: Daemon callback invoked by SecureUSBService
+            method: Label for the call; if None, the callback's first argument
+                    (the requested action or query) is used
+
+        Returns:
+            Wrapped callback
+        """
+        histogram = self.dbus_call_seconds
+
+        def timed(*args, **kwargs):
+            label = method if method is not None else str(args[0] if args else '')
+            start = time.perf_counter()
+            try:
+                return callback(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start, label)
+
+        return timed
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    """Serve GET /metrics (and /) from the registry."""
+
+    registry: MetricsRegistry = None
+
+    def do_GET(self):
+        if self.path not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+
+        body = self.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        return 'unix'
+
+    def log_message(self, format, *args):
+        pass  # Scrapes are not worth a line each
+
+
+class MetricsExporter:
+    """Periodic .prom file writer and optional Unix-socket HTTP endpoint."""
+
+    def __init__(self,
+                 registry: MetricsRegistry,
+                 add_timeout: Callable,
+                 remove_timeout: Callable,
+                 textfile: Optional[Path] = None,
+                 interval_seconds: int = 15,
+                 socket_path: Optional[Path] = None):
+        """
+        Initialize the exporter.
+
+        Args:
+            registry: Metrics to export
+            add_timeout: Main-loop timer function with the signature of
+                         GLib.timeout_add_seconds(interval, function) -> source_id
+            remove_timeout: Main-loop timer removal, like GLib.source_remove
+            textfile: .prom file to write, or None to disable
+            interval_seconds: Seconds between writes
+            socket_path: Unix socket to serve HTTP on, or None to disable
+        """
+        self.registry = registry
+        self.add_timeout = add_timeout
+        self.remove_timeout = remove_timeout
+        self.textfile = Path(textfile) if textfile else None
+        self.interval_seconds = max(1, int(interval_seconds))
+        self.socket_path = Path(socket_path) if socket_path else None
+
+        self._source_id = None
+        self._server: Optional[_UnixHTTPServer] = None
+        self._server_thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start periodic writes and the HTTP endpoint, as configured."""
+        if self.textfile and self._source_id is None:
+            self.write()
+            self._source_id = self.add_timeout(self.interval_seconds, self._on_timeout)
+            print(f"[Metrics] Writing {self.textfile} every {self.interval_seconds}s")
+
+        if self.socket_path and self._server is None:
+            self._start_server()
+
+    def write(self) -> bool:
+        """
+        Write the .prom file now.
+
+        Returns:
+            True if successful, False otherwise
+        """
+        if not self.textfile:
+            return False
+        return self.registry.write_textfile(self.textfile)
+
+    def stop(self):
+        """Stop periodic writes and the HTTP endpoint."""
+        if self._source_id is not None:
+            self.remove_timeout(self._source_id)
+            self._source_id = None
+            self.write()
+
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            try:
+                self.socket_path.unlink()
+            except OSError:
+                pass
+
+    def _on_timeout(self) -> bool:
+        """Main-loop callback: refresh the .prom file."""
+        self.write()
+        return True  # Keep the periodic source
+
+    def _start_server(self):
+        """Serve the metrics on the Unix socket in a background thread."""
+        handler = type('MetricsRequestHandler', (_MetricsRequestHandler,), {'registry': self.registry})
+
+        try:
+            self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+            if self.socket_path.is_socket():
+                self.socket_path.unlink()
+            self._server = _UnixHTTPServer(str(self.socket_path), handler)
+            os.chmod(self.socket_path, 0o660)
+        except OSError as e:
+            print(f"[Metrics] Cannot serve metrics on {self.socket_path}: {e}")
+            self._server = None
+            return
+
+        self._server_thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._server_thread.start()
+        print(f"[Metrics] Serving metrics on {self.socket_path}")
@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+"""
+Device Policy Engine for SecureUSB
+
+Decides what happens to a newly connected device from a rule file
+(policy.json in the config directory):
+
+    {
+      "default": "prompt",
+      "rules": [
+        {"id": "yubikey", "action": "allow", "vendor_id": "1050", "product_id": "0407",
+         "hours": "08:00-18:00", "days": ["mon", "tue", "wed", "thu", "fri"]},
+        {"id": "no-hid-on-front-port", "action": "block", "port": "1-4",
+         "interface_classes": ["03"]}
+      ]
+    }
+
+A rule matches when all of its conditions match; the first matching rule in
+file order wins. Rules are compiled into hash indexes (serial, vendor/product)
+and a prefix trie (port path), so evaluating a device costs a fixed number of
+lookups no matter how many rules there are.
+"""
+
+import json
+import re
+from datetime import datetime
+from enum import Enum
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+POLICY_FILENAME = "policy.json"
+
+DAYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+
+HOURS_PATTERN = re.compile(r'^(\d{1,2}):(\d{2})-(\d{1,2}):(\d{2})$')
+HEX_ID_PATTERN = re.compile(r'^[0-9a-f]{4}$')
+CLASS_PATTERN = re.compile(r'^[0-9a-f]{2}$')
+PORT_PATTERN = re.compile(r'^\d+(-\d+(\.\d+)*)?$')
+
+
+class PolicyAction(Enum):
+    """What to do with a device."""
+    ALLOW = "allow"      # Authorize without asking
+    BLOCK = "block"      # Deny without asking
+    PROMPT = "prompt"    # Ask for TOTP authorization
+
+
+def port_components(port: str) -> Tuple[str, ...]:
+    """
+    Split a port path into trie components.
+
+    Args:
+        port: Port path / device ID (e.g., "1-4.2")
+
+    Returns:
+        Tuple of components (e.g., ("1", "4", "2"))
+    """
+    return tuple(re.split(r'[-.]', port))
+
+
+class PolicyRule:
+    """A single compiled policy rule."""
+
+    __slots__ = ('index', 'rule_id', 'action', 'vendor_id', 'product_id',
+                 'serial_number', 'interface_classes', 'port', 'hours', 'days')
+
+    def __init__(self, index: int, data: Dict):
+        """
+        Parse and validate a rule.
+
+        Args:
+            index: Position in the rule file (lower wins)
+            data: Rule dictionary from the policy file
+
+        Raises:
+            ValueError: If the rule is malformed
+        """
+        if not isinstance(data, dict):
+            raise ValueError(f"rule #{index} is not an object")
+
+        self.index = index
+        self.rule_id = str(data.get('id') or f"rule-{index}")
+
+        try:
+            self.action = PolicyAction(data.get('action'))
+        except ValueError:
+            raise ValueError(f"rule '{self.rule_id}': invalid action {data.get('action')!r}")
+
+        self.vendor_id = self._hex_id(data, 'vendor_id')
+        self.product_id = self._hex_id(data, 'product_id')
+
+        serial = data.get('serial_number')
+        self.serial_number = str(serial) if serial else None
+
+        classes = data.get('interface_classes') or []
+        if isinstance(classes, str):
+            classes = [classes]
+        self.interface_classes = frozenset(str(c).lower() for c in classes)
+        for interface_class in self.interface_classes:
+            if not CLASS_PATTERN.match(interface_class):
+                raise ValueError(f"rule '{self.rule_id}': invalid interface class {interface_class!r}")
+
+        port = data.get('port')
+        if port:
+            if not PORT_PATTERN.match(str(port)):
+                raise ValueError(f"rule '{self.rule_id}': invalid port {port!r}")
+            self.port = str(port)
+        else:
+            self.port = None
+
+        self.hours = self._parse_hours(data.get('hours'))
+
+        days = data.get('days')
+        if days:
+            self.days = frozenset(str(day).lower()[:3] for day in days)
+            if not self.days <= set(DAYS):
+                raise ValueError(f"rule '{self.rule_id}': invalid days {days!r}")
+        else:
+            self.days = None
+
+    def _hex_id(self, data: Dict, key: str) -> Optional[str]:
+        """Read a 4-digit hex vendor/product ID."""
+        value = data.get(key)
+        if not value:
+            return None
+        value = str(value).lower()
+        if not HEX_ID_PATTERN.match(value):
+            raise ValueError(f"rule '{self.rule_id}': invalid {key} {value!r}")
+        return value
+
+    def _parse_hours(self, hours) -> Optional[Tuple[int, int]]:
+        """Parse "HH:MM-HH:MM" into minutes since midnight."""
+        if not hours:
+            return None
+        match = HOURS_PATTERN.match(str(hours))
+        if not match:
+            raise ValueError(f"rule '{self.rule_id}': invalid hours {hours!r}")
+        start_h, start_m, end_h, end_m = (int(group) for group in match.groups())
+        if start_h > 23 or end_h > 24 or start_m > 59 or end_m > 59:
+            raise ValueError(f"rule '{self.rule_id}': invalid hours {hours!r}")
+        return start_h * 60 + start_m, end_h * 60 + end_m
+
+    def match(self, device: Dict, now: datetime) -> Optional[List[str]]:
+        """
+        Check the rule against a device.
+
+        Args:
+            device: Normalized device attributes (see PolicyEngine.evaluate)
+            now: Local time of evaluation
+
+        Returns:
+            List of matched conditions, or None if the rule does not match
+        """
+        matched = []
+
+        if self.serial_number is not None:
+            if device['serial_number'] != self.serial_number:
+                return None
+            matched.append(f"serial {self.serial_number}")
+
+        if self.vendor_id is not None:
+            if device['vendor_id'] != self.vendor_id:
+                return None
+            matched.append(f"vendor {self.vendor_id}")
+
+        if self.product_id is not None:
+            if device['product_id'] != self.product_id:
+                return None
+            matched.append(f"product {self.product_id}")
+
+        if self.port is not None:
+            components = port_components(self.port)
+            if device['port'][:len(components)] != components:
+                return None
+            matched.append(f"port {self.port}")
+
+        if self.interface_classes:
+            common = self.interface_classes & device['interface_classes']
+            if not common:
+                return None
+            matched.append(f"interface class {','.join(sorted(common))}")
+
+        if self.days is not None:
+            day = DAYS[now.weekday()]
+            if day not in self.days:
+                return None
+            matched.append(f"day {day}")
+
+        if self.hours is not None:
+            minute = now.hour * 60 + now.minute
+            start, end = self.hours
+            if start <= end:
+                inside = start <= minute < end
+            else:
+                inside = minute >= start or minute < end  # Wraps midnight
+            if not inside:
+                return None
+            matched.append(f"time {now.strftime('%H:%M')} in {start // 60:02d}:{start % 60:02d}-"
+                           f"{end // 60:02d}:{end % 60:02d}")
+
+        return matched
+
+
+class PolicyDecision:
+    """Result of evaluating a device against the policy."""
+
+    def __init__(self, action: PolicyAction, rule_id: Optional[str], explanation: str,
+                 rules_checked: int = 0):
+        """
+        Initialize decision.
+
+        Args:
+            action: Decided action
+            rule_id: ID of the matching rule, or None for the default
+            explanation: Human-readable reason for the decision
+            rules_checked: Number of candidate rules tested
+        """
+        self.action = action
+        self.rule_id = rule_id
+        self.explanation = explanation
+        self.rules_checked = rules_checked
+
+    def to_dict(self) -> Dict[str, str]:
+        """
+        Convert decision to dictionary.
+
+        Returns:
+            Dictionary with action, rule_id and explanation
+        """
+        return {
+            'action': self.action.value,
+            'rule_id': self.rule_id or '',
+            'explanation': self.explanation,
+        }
+
+    def __str__(self) -> str:
+        return f"{self.action.value}: {self.explanation}"
+
+
+class _PortTrie:
+    """Prefix trie over port path components; each node holds rules in file order."""
+
+    def __init__(self):
+        self.root = {}
+
+    def insert(self, components: Tuple[str, ...], rule: PolicyRule):
+        node = self.root
+        for component in components:
+            node = node.setdefault(component, {})
+        node.setdefault(None, []).append(rule)
+
+    def walk(self, components: Tuple[str, ...]) -> Iterable[List[PolicyRule]]:
+        """Yield the rule list of every node on the path (i.e., every prefix)."""
+        node = self.root
+        for component in components:
+            node = node.get(component)
+            if node is None:
+                return
+            if None in node:
+                yield node[None]
+
+
+class PolicyEngine:
+    """Compiles policy rules and evaluates devices against them."""
+
+    def __init__(self, rules: Optional[List[Dict]] = None, default: str = PolicyAction.PROMPT.value):
+        """
+        Compile a policy.
+
+        Args:
+            rules: List of rule dictionaries, in priority order
+            default: Action when no rule matches
+
+        Raises:
+            ValueError: If a rule or the default action is malformed
+        """
+        try:
+            self.default = PolicyAction(default)
+        except ValueError:
+            raise ValueError(f"invalid default action {default!r}")
+
+        self.rules: List[PolicyRule] = [PolicyRule(index, data) for index, data in enumerate(rules or [])]
+
+        self._by_serial: Dict[str, List[PolicyRule]] = {}
+        self._by_vendor_product: Dict[Tuple[str, str], List[PolicyRule]] = {}
+        self._by_vendor: Dict[str, List[PolicyRule]] = {}
+        self._by_product: Dict[str, List[PolicyRule]] = {}
+        self._by_class: Dict[str, List[PolicyRule]] = {}
+        self._ports = _PortTrie()
+        self._unindexed: List[PolicyRule] = []
+
+        for rule in self.rules:
+            self._index(rule)
+
+    def _index(self, rule: PolicyRule):
+        """File a rule under its most selective condition."""
+        if rule.serial_number is not None:
+            self._by_serial.setdefault(rule.serial_number, []).append(rule)
+        elif rule.vendor_id is not None and rule.product_id is not None:
+            self._by_vendor_product.setdefault((rule.vendor_id, rule.product_id), []).append(rule)
+        elif rule.vendor_id is not None:
+            self._by_vendor.setdefault(rule.vendor_id, []).append(rule)
+        elif rule.product_id is not None:
+            self._by_product.setdefault(rule.product_id, []).append(rule)
+        elif rule.port is not None:
+            self._ports.insert(port_components(rule.port), rule)
+        elif rule.interface_classes:
+            for interface_class in rule.interface_classes:
+                self._by_class.setdefault(interface_class, []).append(rule)
+        else:
+            self._unindexed.append(rule)
+
+    @classmethod
+    def parse(cls, policy_file: Path) -> 'PolicyEngine':
+        """
+        Parse and compile a policy file, raising on any problem.
+
+        Args:
+            policy_file: Path to policy.json
+
+        Returns:
+            PolicyEngine instance (empty if the file does not exist)
+
+        Raises:
+            OSError: If the file cannot be read
+            ValueError: If the file is not valid JSON or a rule is invalid
+        """
+        policy_file = Path(policy_file)
+        if not policy_file.exists():
+            return cls()
+
+        with open(policy_file, 'r') as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            raise ValueError("policy must be a JSON object")
+        return cls(data.get('rules', []), data.get('default', PolicyAction.PROMPT.value))
+
+    @classmethod
+    def load(cls, policy_file: Path) -> 'PolicyEngine':
+        """
+        Load and compile a policy file.
+
+        A missing file yields an empty policy. A malformed file is reported and
+        also yields an empty policy, so every device falls back to the prompt.
+
+        Args:
+            policy_file: Path to policy.json
+
+        Returns:
+            PolicyEngine instance
+        """
+        try:
+            engine = cls.parse(policy_file)
+            if engine.rules:
+                print(f"[Policy] Loaded {len(engine.rules)} rule(s) from {policy_file}")
+            return engine
+        except (OSError, ValueError) as e:
+            print(f"[Policy] Error loading {policy_file}, ignoring all rules: {e}")
+            return cls()
+
+    def _normalize(self, device_info: Dict) -> Dict:
+        """Build the attribute set rules are matched against."""
+        return {
+            'vendor_id': (device_info.get('vendor_id') or '').lower(),
+            'product_id': (device_info.get('product_id') or '').lower(),
+            'serial_number': device_info.get('serial_number') or None,
+            'port': port_components(device_info.get('device_id') or ''),
+            'interface_classes': frozenset(
+                str(c).lower() for c in device_info.get('interface_classes') or ()
+            ),
+        }
+
+    def _candidate_lists(self, device: Dict) -> Iterable[List[PolicyRule]]:
+        """Yield every index bucket the device falls into."""
+        lookups = (
+            self._by_serial.get(device['serial_number']) if device['serial_number'] else None,
+            self._by_vendor_product.get((device['vendor_id'], device['product_id'])),
+            self._by_vendor.get(device['vendor_id']),
+            self._by_product.get(device['product_id']),
+        )
+        for bucket in lookups:
+            if bucket:
+                yield bucket
+
+        yield from self._ports.walk(device['port'])
+
+        for interface_class in device['interface_classes']:
+            bucket = self._by_class.get(interface_class)
+            if bucket:
+                yield bucket
+
+        if self._unindexed:
+            yield self._unindexed
+
+    def evaluate(self, device_info: Dict, now: Optional[datetime] = None) -> PolicyDecision:
+        """
+        Decide what to do with a device.
+
+        Args:
+            device_info: Device information (device_id, vendor_id, product_id,
+                         serial_number and optionally interface_classes)
+            now: Local time of evaluation (defaults to now)
+
+        Returns:
+            PolicyDecision with the action and its explanation
+        """
+        if now is None:
+            now = datetime.now()
+
+        device = self._normalize(device_info)
+
+        best: Optional[PolicyRule] = None
+        best_conditions: List[str] = []
+        checked = 0
+
+        for bucket in self._candidate_lists(device):
+            # Buckets are in file order, so stop at the first match or once
+            # nothing left in the bucket could beat the current best
+            for rule in bucket:
+                if best is not None and rule.index >= best.index:
+                    break
+                checked += 1
+                conditions = rule.match(device, now)
+                if conditions is not None:
+                    best, best_conditions = rule, conditions
+                    break
+
+        if best is None:
+            return PolicyDecision(
+                self.default,
+                None,
+                f"no rule matched; default is {self.default.value}",
+                checked
+            )
+
+        conditions = ', '.join(best_conditions) or 'any device'
+        return PolicyDecision(
+            best.action,
+            best.rule_id,
+            f"rule '{best.rule_id}' (#{best.index + 1}) matched {conditions}",
+            checked
+        )
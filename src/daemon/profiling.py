@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+On-Demand Profiling for SecureUSB
+
+ProfilingWindow profiles the daemon's event handlers for a limited time
+and then writes the results to the config directory:
+
+    profile-<timestamp>.pstats       cProfile data (python -m pstats <file>)
+    allocations-<timestamp>.txt      Top allocation sites from tracemalloc
+
+The handlers are attributes that the USB monitor, the D-Bus service and the
+deadline scheduler look up on every call. While a window is open they are
+replaced with profiling wrappers and the originals are put back when it
+closes, so nothing is traced and nothing is wrapped when profiling is off.
+
+cProfile only sees the thread that enabled it, so each thread that runs a
+handler (the udev observer thread and the main loop) gets its own profiler;
+their statistics are merged when the window ends.
+"""
+
+import cProfile
+import pstats
+import threading
+import time
+import tracemalloc
+from functools import wraps
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Window length when none is given (e.g., SIGUSR2)
+DEFAULT_WINDOW_SECONDS = 30
+MAX_WINDOW_SECONDS = 600
+
+# Allocation sites listed in the report
+TOP_ALLOCATIONS = 25
+
+# Frames kept per allocation traceback
+TRACEMALLOC_FRAMES = 1
+
+# (object, attribute name) of a handler to profile
+Hook = Tuple[object, str]
+
+
+class ProfilingWindow:
+    """Time-limited cProfile/tracemalloc window over the daemon's handlers."""
+
+    def __init__(self, output_dir: Path, hooks: Sequence[Hook],
+                 add_timeout: Callable, remove_timeout: Callable,
+                 top_allocations: int = TOP_ALLOCATIONS):
+        """
+        Initialize the profiler (nothing is profiled until start()).
+
+        Args:
+            output_dir: Directory the results are written to
+            hooks: Handlers to profile, as (object, attribute) pairs
+            add_timeout: Schedules a callback, e.g. GLib.timeout_add_seconds
+            remove_timeout: Cancels a scheduled callback, e.g. GLib.source_remove
+            top_allocations: Number of allocation sites to report
+        """
+        self.output_dir = Path(output_dir)
+        self.hooks = list(hooks)
+        self.add_timeout = add_timeout
+        self.remove_timeout = remove_timeout
+        self.top_allocations = top_allocations
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._profilers: Dict[int, cProfile.Profile] = {}
+        self._originals: List[Tuple[object, str, Callable, bool]] = []
+        self._timeout_source = None
+        self._started_tracemalloc = False
+        self._started_at = 0.0
+
+    @property
+    def active(self) -> bool:
+        """Whether a profiling window is open."""
+        return bool(self._originals)
+
+    def start(self, seconds: int = DEFAULT_WINDOW_SECONDS) -> bool:
+        """
+        Open a profiling window.
+
+        Args:
+            seconds: Window length (clamped to 1..MAX_WINDOW_SECONDS)
+
+        Returns:
+            True if the window was opened, False if one is already open
+        """
+        if self.active:
+            print("[Profiling] A profiling window is already open")
+            return False
+
+        seconds = max(1, min(int(seconds), MAX_WINDOW_SECONDS))
+
+        self._profilers = {}
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self._started_tracemalloc = True
+
+        for owner, attribute in self.hooks:
+            original = getattr(owner, attribute, None)
+            if original is None:
+                continue
+            own_attribute = attribute in vars(owner)
+            setattr(owner, attribute, self._wrap(original))
+            self._originals.append((owner, attribute, original, own_attribute))
+
+        self._started_at = time.monotonic()
+        self._timeout_source = self.add_timeout(seconds, self._on_timeout)
+        print(f"[Profiling] Profiling {len(self._originals)} handlers for {seconds}s")
+        return True
+
+    def stop(self) -> Optional[Path]:
+        """
+        Close the profiling window and write the results.
+
+        Returns:
+            Path of the pstats file, or None if no window was open or
+            the results could not be written
+        """
+        if not self.active:
+            return None
+
+        if self._timeout_source is not None:
+            self.remove_timeout(self._timeout_source)
+            self._timeout_source = None
+
+        self._restore_handlers()
+
+        snapshot = None
+        if tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+        self._started_tracemalloc = False
+
+        with self._lock:
+            profilers = list(self._profilers.values())
+            self._profilers = {}
+
+        elapsed = time.monotonic() - self._started_at
+        return self._write_results(profilers, snapshot, elapsed)
+
+    def _wrap(self, handler: Callable) -> Callable:
+        """Wrap a handler so that it runs under this thread's profiler."""
+        @wraps(handler)
+        def profiled(*args, **kwargs):
+            # Nested handlers (monitor -> daemon) are already being profiled
+            if getattr(self._local, 'depth', 0):
+                return handler(*args, **kwargs)
+
+            profiler = self._thread_profiler()
+            self._local.depth = 1
+            profiler.enable()
+            try:
+                return handler(*args, **kwargs)
+            finally:
+                profiler.disable()
+                self._local.depth = 0
+
+        return profiled
+
+    def _thread_profiler(self) -> cProfile.Profile:
+        thread_id = threading.get_ident()
+        with self._lock:
+            profiler = self._profilers.get(thread_id)
+            if profiler is None:
+                profiler = self._profilers[thread_id] = cProfile.Profile()
+            return profiler
+
+    def _restore_handlers(self):
+        for owner, attribute, original, own_attribute in reversed(self._originals):
+            if own_attribute:
+                setattr(owner, attribute, original)
+            else:
+                # Drop the instance attribute so the method is found again
+                delattr(owner, attribute)
+        self._originals = []
+
+    def _on_timeout(self) -> bool:
+        """Main-loop callback: the window has ended."""
+        self._timeout_source = None
+        self.stop()
+        return False  # One-shot
+
+    def _write_results(self, profilers: List[cProfile.Profile],
+                       snapshot: Optional[tracemalloc.Snapshot], elapsed: float) -> Optional[Path]:
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        pstats_path = self.output_dir / f"profile-{stamp}.pstats"
+        allocations_path = self.output_dir / f"allocations-{stamp}.txt"
+
+        try:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+
+            stats = None
+            for profiler in profilers:
+                profiler.create_stats()
+                if not profiler.stats:
+                    continue
+                if stats is None:
+                    stats = pstats.Stats(profiler)
+                else:
+                    stats.add(profiler)
+
+            if stats is not None:
+                stats.dump_stats(str(pstats_path))
+            else:
+                # No handler ran during the window
+                cProfile.Profile().dump_stats(str(pstats_path))
+
+            with open(allocations_path, 'w') as f:
+                f.write(self._format_allocations(snapshot, elapsed))
+        except OSError as e:
+            print(f"[Profiling] Error writing profile to {self.output_dir}: {e}")
+            return None
+
+        print(f"[Profiling] Wrote {pstats_path} and {allocations_path}")
+        return pstats_path
+
+    def _format_allocations(self, snapshot: Optional[tracemalloc.Snapshot], elapsed: float) -> str:
+        lines = [f"# SecureUSB allocation sites over {elapsed:.1f}s"]
+        if snapshot is None:
+            lines.append("# tracemalloc was not running")
+            return '\n'.join(lines) + '\n'
+
+        snapshot = snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ))
+        statistics = snapshot.statistics('lineno')
+        total = sum(stat.size for stat in statistics)
+        lines.append(f"# Total traced: {total / 1024:.1f} KiB in {len(statistics)} sites")
+
+        for stat in statistics[:self.top_allocations]:
+            frame = stat.traceback[0]
+            lines.append(f"{stat.size / 1024:10.1f} KiB {stat.count:8d} blocks  "
+                         f"{frame.filename}:{frame.lineno}")
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Authentication Rate Limiting for SecureUSB
+
+AuthRateLimiter throttles failed TOTP/recovery code attempts before they
+reach the authenticator. Failures are counted in three scopes:
+
+- per device (the device being authorized),
+- per D-Bus sender (the client making the call),
+- globally (catches a client that reconnects to get a new bus name).
+
+The global scope is shared by every caller and a success never clears it,
+so any local client can use it up and lock everyone out. Its burst is
+therefore ten times the sender's: one misbehaving client (or a few) locks
+itself out long before the global limit is reached, which takes a
+deliberate attack spread over many bus names and devices. Exempting callers
+with no failures of their own from the global lockout would avoid the
+denial of service entirely, but it would hand a client that reconnects a
+fresh guess for every new bus name, which is what the scope exists to stop.
+
+Each scope key has a token bucket: a failure takes a token and tokens
+refill over the scope's window, which approximates a sliding window
+without keeping timestamps. When a bucket runs dry the key is locked out;
+nothing refills during a lockout, so the next failure after it locks the
+key out again for twice as long, until a quiet window refills the bucket.
+Checks are a dictionary lookup per scope.
+
+Buckets that still remember failures are saved to a small JSON file after
+every change, so restarting the daemon does not reset a lockout.
+"""
+
+import json
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+RATE_LIMIT_FILENAME = "ratelimit.json"
+
+# Scopes
+SCOPE_DEVICE = 'device'
+SCOPE_SENDER = 'sender'
+SCOPE_GLOBAL = 'global'
+
+# scope -> (failures allowed in a burst, seconds to refill the burst)
+DEFAULT_LIMITS = {
+    SCOPE_DEVICE: (5, 300),
+    SCOPE_SENDER: (10, 300),
+    SCOPE_GLOBAL: (100, 300),  # Much larger than the sender scope, see above
+}
+
+# Lockout length: BACKOFF_BASE_SECONDS * 2 ** (lockouts so far), capped
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 3600
+
+# Buckets kept in memory (oldest are dropped first; the global one never is)
+MAX_BUCKETS = 4096
+
+# (scope, identifier)
+BucketKey = Tuple[str, str]
+
+
+class _Bucket:
+    """Failure bucket for one key."""
+
+    __slots__ = ('tokens', 'updated', 'strikes', 'locked_until')
+
+    def __init__(self, tokens: float, updated: float, strikes: int = 0, locked_until: float = 0.0):
+        self.tokens = tokens
+        self.updated = updated
+        self.strikes = strikes  # Lockouts since the bucket was last full
+        self.locked_until = locked_until
+
+
+class AuthRateLimiter:
+    """Per-device, per-sender and global limiter for failed authentication."""
+
+    def __init__(self, state_file: Optional[Path] = None,
+                 limits: Optional[Dict[str, Tuple[int, float]]] = None,
+                 backoff_base: float = BACKOFF_BASE_SECONDS,
+                 backoff_max: float = BACKOFF_MAX_SECONDS,
+                 max_buckets: int = MAX_BUCKETS,
+                 clock: Callable[[], float] = time.time):
+        """
+        Initialize the limiter and restore saved lockouts.
+
+        Args:
+            state_file: JSON file to persist buckets in (None to keep them in memory only)
+            limits: Scope -> (burst, window seconds); defaults to DEFAULT_LIMITS
+            backoff_base: First lockout length in seconds
+            backoff_max: Longest lockout in seconds
+            max_buckets: Maximum number of keys tracked
+            clock: Wall-clock time source (lockouts must survive restarts)
+        """
+        self.state_file = Path(state_file) if state_file else None
+        self.limits = dict(limits or DEFAULT_LIMITS)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_buckets = max_buckets
+        self.clock = clock
+
+        self._buckets: 'OrderedDict[BucketKey, _Bucket]' = OrderedDict()
+        self._load()
+
+    @staticmethod
+    def keys_for(device_id: Optional[str], sender: Optional[str]) -> List[BucketKey]:
+        """
+        Get the bucket keys an attempt counts against.
+
+        Args:
+            device_id: Device being authorized
+            sender: D-Bus unique name of the caller (None for internal calls)
+
+        Returns:
+            List of (scope, identifier) keys
+        """
+        keys = [(SCOPE_GLOBAL, '')]
+        if device_id:
+            keys.append((SCOPE_DEVICE, device_id))
+        if sender:
+            keys.append((SCOPE_SENDER, sender))
+        return keys
+
+    def retry_after(self, device_id: Optional[str], sender: Optional[str] = None) -> float:
+        """
+        Check whether an attempt may go ahead.
+
+        Args:
+            device_id: Device being authorized
+            sender: D-Bus unique name of the caller
+
+        Returns:
+            Seconds until attempts are allowed again (0 if allowed now)
+        """
+        now = self.clock()
+        wait = 0.0
+        for key in self.keys_for(device_id, sender):
+            bucket = self._buckets.get(key)
+            if bucket is not None and bucket.locked_until > now:
+                wait = max(wait, bucket.locked_until - now)
+        return wait
+
+    def record_failure(self, device_id: Optional[str], sender: Optional[str] = None) -> float:
+        """
+        Count a failed attempt, locking out keys whose bucket is empty.
+
+        Args:
+            device_id: Device being authorized
+            sender: D-Bus unique name of the caller
+
+        Returns:
+            Seconds until attempts are allowed again (0 if not locked out)
+        """
+        now = self.clock()
+        wait = 0.0
+
+        for key in self.keys_for(device_id, sender):
+            burst, window = self.limits[key[0]]
+            bucket = self._refill(key, burst, window, now)
+            bucket.tokens -= 1
+
+            if bucket.tokens < 1:
+                lockout = min(self.backoff_max, self.backoff_base * (2 ** bucket.strikes))
+                bucket.locked_until = max(bucket.locked_until, now + lockout)
+                bucket.strikes += 1
+                wait = max(wait, bucket.locked_until - now)
+
+        self._evict()
+        self._save()
+        return wait
+
+    def record_success(self, device_id: Optional[str], sender: Optional[str] = None):
+        """
+        Forget the failures of a device and caller after a successful attempt.
+
+        The global bucket is left to refill on its own.
+
+        Args:
+            device_id: Device that was authorized
+            sender: D-Bus unique name of the caller
+        """
+        changed = False
+        for key in self.keys_for(device_id, sender):
+            if key[0] != SCOPE_GLOBAL and self._buckets.pop(key, None) is not None:
+                changed = True
+
+        if changed:
+            self._save()
+
+    def _refill(self, key: BucketKey, burst: int, window: float, now: float) -> _Bucket:
+        """Get a key's bucket with the tokens earned since its last update."""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket(float(burst), now)
+            return bucket
+
+        bucket.tokens = min(float(burst), bucket.tokens + self._earned(bucket, burst, window, now))
+        bucket.updated = now
+        if bucket.tokens >= burst:
+            bucket.strikes = 0
+        self._buckets.move_to_end(key)
+        return bucket
+
+    @staticmethod
+    def _earned(bucket: _Bucket, burst: int, window: float, now: float) -> float:
+        """Tokens refilled since the last update (nothing accrues while locked out)."""
+        since = max(bucket.updated, bucket.locked_until)
+        return max(0.0, now - since) * burst / window
+
+    def _evict(self):
+        while len(self._buckets) > self.max_buckets:
+            for key in self._buckets:
+                if key[0] != SCOPE_GLOBAL:
+                    del self._buckets[key]
+                    break
+            else:
+                return
+
+    def _is_idle(self, key: BucketKey, bucket: _Bucket, now: float) -> bool:
+        """Whether a bucket has refilled and holds no lockout."""
+        limit = self.limits.get(key[0])
+        if limit is None:
+            return True
+        burst, window = limit
+        tokens = bucket.tokens + self._earned(bucket, burst, window, now)
+        return tokens >= burst and bucket.locked_until <= now
+
+    def _load(self):
+        if self.state_file is None:
+            return
+
+        try:
+            with open(self.state_file, 'r') as f:
+                entries = json.load(f).get('buckets', [])
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"[RateLimit] Error reading {self.state_file}: {e}")
+            return
+
+        now = self.clock()
+        for entry in entries:
+            try:
+                scope, identifier, tokens, updated, strikes, locked_until = entry
+                key = (str(scope), str(identifier))
+                bucket = _Bucket(float(tokens), min(float(updated), now), int(strikes), float(locked_until))
+            except (TypeError, ValueError):
+                continue
+            if key[0] in self.limits and not self._is_idle(key, bucket, now):
+                self._buckets[key] = bucket
+
+        if self._buckets:
+            print(f"[RateLimit] Restored {len(self._buckets)} rate limit buckets")
+
+    def _save(self) -> bool:
+        """Atomically write the buckets that still remember failures."""
+        if self.state_file is None:
+            return True
+
+        now = self.clock()
+        entries = [
+            [key[0], key[1], round(bucket.tokens, 3), bucket.updated, bucket.strikes, bucket.locked_until]
+            for key, bucket in self._buckets.items()
+            if not self._is_idle(key, bucket, now)
+        ]
+
+        temp_path = None
+        try:
+            self.state_file.parent.mkdir(parents=True, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(prefix=f".{self.state_file.name}.", dir=self.state_file.parent)
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'version': 1, 'buckets': entries}, f, separators=(',', ':'))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.state_file)
+            return True
+        except OSError as e:
+            print(f"[RateLimit] Error writing {self.state_file}: {e}")
+            if temp_path and os.path.exists(temp_path):
+                os.unlink(temp_path)
+            return False
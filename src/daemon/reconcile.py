@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Startup Reconciliation Module for SecureUSB
+
+Finds USB devices that were attached while the daemon was not running and
+decides what to do with them. Device attributes are read through the
+authorization backend in a single batched pass on a small thread pool.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+from .authorization import AuthorizationBackend
+
+# sysfs attribute -> device_info key
+DEVICE_ATTRIBUTES = {
+    'idVendor': 'vendor_id',
+    'idProduct': 'product_id',
+    'manufacturer': 'vendor_name',
+    'product': 'product_name',
+    'serial': 'serial_number',
+    'authorized': 'authorized',
+}
+
+# Reconciliation outcomes
+RECONCILE_QUEUED = 'queued'
+RECONCILE_TRUSTED = 'trusted'
+RECONCILE_PENDING = 'pending'
+
+DEFAULT_MAX_WORKERS = 8
+
+# Below this many devices per thread, a thread costs more than it saves
+DEVICES_PER_WORKER = 32
+
+
+def _display_name(info: Dict) -> str:
+    """Human-readable name, matching USBDevice.get_display_name()."""
+    if info.get('vendor_name') and info.get('product_name'):
+        return f"{info['vendor_name']} {info['product_name']}"
+    elif info.get('product_name'):
+        return info['product_name']
+    else:
+        return f"USB Device {info.get('vendor_id') or ''}:{info.get('product_id') or ''}"
+
+
+class BatchDeviceReader:
+    """Reads attributes of all attached USB devices in one batched pass."""
+
+    def __init__(self, backend: AuthorizationBackend, max_workers: int = DEFAULT_MAX_WORKERS):
+        """
+        Initialize the reader.
+
+        Args:
+            backend: Authorization backend to read devices from
+            max_workers: Maximum number of reader threads
+        """
+        self.backend = backend
+        self.max_workers = max(1, max_workers)
+
+    def list_device_ids(self) -> List[str]:
+        """
+        List attached USB device IDs.
+
+        Returns:
+            Sorted list of device IDs (parents sort before their children)
+        """
+        try:
+            return self.backend.list_devices()
+        except OSError as e:
+            print(f"[Reconcile] Error listing USB devices: {e}")
+            return []
+
+    def read_device(self, device_id: str) -> Dict:
+        """
+        Read one device's attributes.
+
+        Args:
+            device_id: Device ID
+
+        Returns:
+            device_info dictionary; 'authorized' is True/False/None
+        """
+        info = {
+            'device_id': device_id,
+            'device_path': self.backend.device_path(device_id),
+        }
+
+        for attribute, key in DEVICE_ATTRIBUTES.items():
+            try:
+                info[key] = self.backend.read_attribute(device_id, attribute)
+            except OSError:
+                info[key] = None
+
+        authorized = info['authorized']
+        info['authorized'] = None if authorized is None else authorized == '1'
+        info['display_name'] = _display_name(info)
+        return info
+
+    def read_all(self) -> List[Dict]:
+        """
+        Read all attached devices concurrently.
+
+        Returns:
+            List of device_info dictionaries, in device ID order
+        """
+        device_ids = self.list_device_ids()
+        if not device_ids:
+            return []
+
+        workers = min(self.max_workers, -(-len(device_ids) // DEVICES_PER_WORKER))
+        if workers <= 1:
+            return self._read_batch(device_ids)
+
+        # One batch per worker keeps executor overhead per device low
+        batches = [device_ids[i::workers] for i in range(workers)]
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='secureusb-reconcile') as pool:
+            results = [device for batch in pool.map(self._read_batch, batches) for device in batch]
+
+        return sorted(results, key=lambda device: device['device_id'])
+
+    def _read_batch(self, device_ids: List[str]) -> List[Dict]:
+        """Read a batch of devices sequentially."""
+        return [self.read_device(device_id) for device_id in device_ids]
+
+
+class StartupReconciler:
+    """Classifies devices present at startup against the whitelist and pending store."""
+
+    def __init__(self,
+                 reader: BatchDeviceReader,
+                 is_whitelisted: Callable[[str], bool],
+                 is_pending: Callable[[str], bool]):
+        """
+        Initialize the reconciler.
+
+        Args:
+            reader: Source of attached devices
+            is_whitelisted: Returns True if a serial number is whitelisted
+            is_pending: Returns True if a device ID already awaits authorization
+        """
+        self.reader = reader
+        self.is_whitelisted = is_whitelisted
+        self.is_pending = is_pending
+
+    def classify(self, device_info: Dict) -> str:
+        """
+        Decide what to do with a device found at startup.
+
+        Whitelisted devices that are already authorized are left alone, so a
+        daemon restart does not cut off trusted keyboards or docks. Everything
+        else is queued for TOTP authorization, exactly as if just plugged in.
+
+        Args:
+            device_info: Device information from BatchDeviceReader
+
+        Returns:
+            RECONCILE_PENDING, RECONCILE_TRUSTED or RECONCILE_QUEUED
+        """
+        if self.is_pending(device_info['device_id']):
+            return RECONCILE_PENDING
+
+        serial = device_info.get('serial_number')
+        if serial and device_info.get('authorized') and self.is_whitelisted(serial):
+            return RECONCILE_TRUSTED
+
+        return RECONCILE_QUEUED
+
+    def run(self) -> Dict:
+        """
+        Read and classify all attached devices.
+
+        Returns:
+            Dictionary with a list of device_info per outcome, plus
+            'skipped' (devices without vendor/product IDs) and 'elapsed_ms'
+        """
+        start = time.perf_counter()
+
+        result = {
+            RECONCILE_QUEUED: [],
+            RECONCILE_TRUSTED: [],
+            RECONCILE_PENDING: [],
+            'skipped': [],
+        }
+
+        for device_info in self.reader.read_all():
+            # Same rule as USBDevice.is_valid_device()
+            if not device_info.get('vendor_id') or not device_info.get('product_id'):
+                result['skipped'].append(device_info)
+                continue
+
+            result[self.classify(device_info)].append(device_info)
+
+        result['elapsed_ms'] = (time.perf_counter() - start) * 1000
+        return result
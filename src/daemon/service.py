@@ -4,6 +4,12 @@ Main Daemon Service for SecureUSB
 
 Coordinates USB monitoring, authentication, and authorization.
 Runs as root and provides D-Bus interface for user-space GUI.
+
+Startup is ordered so that USB blocking is in force as early as possible:
+only what the monitor and D-Bus need is imported up front, the kernel
+default is set to block and the monitor started, systemd is notified
+(READY=1), and only then are the TOTP secret decrypted (PBKDF2) and
+existing devices reconciled. Devices plugged in meanwhile are queued.
 """
 
 import sys
@@ -15,23 +21,71 @@ from pathlib import Path
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
-import dbus
-import dbus.mainloop.glib
-from gi.repository import GLib
-
-from src.daemon.usb_monitor import USBMonitor, USBDevice
-from src.daemon.authorization import USBAuthorization, AuthorizationMode
-from src.daemon.dbus_service import SecureUSBService
-from src.auth import TOTPAuthenticator, RecoveryCodeManager, SecureStorage
-from src.utils import USBLogger, EventAction, Config, DeviceWhitelist
+from src.daemon.startup import StartupProfile, sd_notify
+
+STARTUP_PROFILE = StartupProfile()
+
+with STARTUP_PROFILE.importing('dbus'):
+    import dbus
+    import dbus.mainloop.glib
+
+with STARTUP_PROFILE.importing('gi.repository.GLib'):
+    from gi.repository import GLib
+
+with STARTUP_PROFILE.importing('pyudev'):
+    from src.daemon.usb_monitor import USBMonitor, USBDevice
+
+with STARTUP_PROFILE.importing('daemon modules'):
+    from src.daemon.authorization import DeviceAuthorizer, SysfsBackend, BULK_MODE_BLOCK, DEVICE_ID_PATTERN
+    from src.daemon.dbus_service import SecureUSBService
+    from src.daemon.policy import PolicyEngine, PolicyAction, POLICY_FILENAME
+    from src.daemon.auth_cache import AuthSession, ReplugCache
+    from src.daemon.timers import DeadlineScheduler
+    from src.daemon.config_watcher import ConfigWatcher
+    from src.daemon.metrics import DaemonMetrics, MetricsExporter
+    from src.daemon.snapshot import StateJournal, JOURNAL_FILENAME
+    from src.daemon.profiling import ProfilingWindow
+    from src.daemon.rate_limit import AuthRateLimiter, RATE_LIMIT_FILENAME
+    from src.daemon.audit import AuditPipeline, SQLiteSink, JournaldSink, JSONLSink, SyslogSink
+    from src.daemon.state import (
+        DeviceStateTable,
+        STATE_PENDING,
+        STATE_AUTHORIZED,
+        STATE_POWER_ONLY,
+        STATE_DENIED,
+        STATE_TIMED_OUT,
+        STATE_REMOVED,
+    )
+    from src.daemon.reconcile import (
+        BatchDeviceReader, StartupReconciler, RECONCILE_QUEUED, RECONCILE_TRUSTED
+    )
+    from src.auth.storage import SecureStorage
+    from src.utils import USBLogger, EventAction, Config, DeviceWhitelist
+
+# Saved states worth restoring ('connected' means the daemon died mid-decision)
+RESTORABLE_STATES = (STATE_PENDING, STATE_AUTHORIZED, STATE_POWER_ONLY, STATE_DENIED, STATE_TIMED_OUT)
+
+
+def _same_device(saved: dict, current: dict) -> bool:
+    """Check that an attached device is the one a saved state belongs to."""
+    return all(
+        (saved.get(key) or '').lower() == (current.get(key) or '').lower()
+        for key in ('vendor_id', 'product_id', 'serial_number')
+    )
 
 
 class SecureUSBDaemon:
     """Main SecureUSB daemon service."""
 
-    def __init__(self):
-        """Initialize the SecureUSB daemon."""
+    def __init__(self, profile: StartupProfile = STARTUP_PROFILE):
+        """
+        Initialize the SecureUSB daemon.
+
+        Args:
+            profile: Startup profile to record phase timings in
+        """
         print("=== SecureUSB Daemon Starting ===\n")
+        self.profile = profile
 
         # Check root privileges
         if os.geteuid() != 0:
@@ -39,41 +93,143 @@ class SecureUSBDaemon:
             sys.exit(1)
 
         # Initialize components
+        self.profile.begin('components')
+        self.authorizer = DeviceAuthorizer(SysfsBackend())
         self.config = Config()
         self.logger = USBLogger()
         self.whitelist = DeviceWhitelist()
         self.storage = SecureStorage()
+        self.policy = PolicyEngine.load(self.config.config_dir / POLICY_FILENAME)
+        self.session = AuthSession(
+            self.config.get_session_minutes() * 60,
+            self.config.get_session_scope()
+        )
+        self.replug_cache = ReplugCache(self.config.get_replug_grace_seconds())
+        self.rate_limiter = AuthRateLimiter(self.config.config_dir / RATE_LIMIT_FILENAME)
+
+        # Counters and latency histograms (exported once the loop runs)
+        self.metrics = DaemonMetrics(
+            queue_depths=self._queue_depths,
+            filter_stats=lambda: self.monitor.get_filter_stats()
+        )
+        self.logger.write_observer = self.metrics.sqlite_write_seconds.observe
 
-        # Load authentication
+        # Audit events are written by per-sink worker threads
+        self.audit = AuditPipeline(
+            self._create_audit_sinks(),
+            lost_callback=lambda sink, reason, count: self.metrics.audit_events_lost.inc(
+                sink, reason, amount=count)
+        )
+
+        # Authentication is decrypted in start(), once blocking is in force;
+        # until then devices are treated as protected and queued
         self.totp_auth = None
-        self.recovery_codes = []
-        self._load_authentication()
+        self.recovery_codes = None
+        self.auth_loading = self.storage.is_configured()
 
         # Initialize D-Bus
+        self.profile.begin('dbus')
         dbus.mainloop.glib.DBusGMainLoop(set_as_default=True)
         self.bus = dbus.SystemBus()
         self.dbus_service = SecureUSBService(
             self.bus,
-            authorization_callback=self._handle_authorization_request,
-            config_callback=self._handle_config_request
+            authorization_callback=self.metrics.timed_dbus_callback(
+                self._handle_authorization_request, 'authorize'
+            ),
+            config_callback=self.metrics.timed_dbus_callback(self._handle_config_request),
+            state_callback=self.metrics.timed_dbus_callback(self._handle_state_request)
         )
 
-        # Initialize USB monitor
-        self.monitor = USBMonitor(callback=self._handle_device_event)
-
         # GLib main loop
+        self.profile.begin('main loop')
         self.main_loop = GLib.MainLoop()
 
-        # Pending authorization requests (device_id -> device_info)
-        self.pending_authorizations = {}
+        # Device states saved before a restart (restored in start())
+        self.state_journal = StateJournal(self.config.config_dir / JOURNAL_FILENAME)
+        self._saved_states = self.state_journal.load()
 
-        # Timeout timers (device_id -> timeout_id)
-        self.timeout_timers = {}
+        # Every attached device and its authorization state
+        self.devices = DeviceStateTable()
+        self.devices.add_listener(self.dbus_service.emit_device_state_changed)
+        self.devices.add_listener(self._persist_state_change)
 
+        # Initialize USB monitor (drops duplicate adds for devices in the table)
+        self.monitor = USBMonitor(
+            callback=self._handle_device_event,
+            controller_callback=self._handle_controller_event,
+            devices=self.devices
+        )
+
+        # Authorization deadlines (one main-loop timeout for all devices)
+        self.timeouts = DeadlineScheduler(
+            self._handle_authorization_timeout,
+            add_timeout=GLib.timeout_add,
+            remove_timeout=GLib.source_remove
+        )
+
+        # Apply edits to the config directory without a restart
+        self.config_watcher = ConfigWatcher(
+            self.config.config_dir,
+            self._handle_config_file_changed,
+            filenames=(self.config.config_file.name,
+                       self.whitelist.whitelist_file.name,
+                       POLICY_FILENAME)
+        )
+        self._config_watch_source = None
+
+        self.metrics_exporter = MetricsExporter(
+            self.metrics,
+            add_timeout=GLib.timeout_add_seconds,
+            remove_timeout=GLib.source_remove,
+            textfile=self.config.get_metrics_textfile(),
+            interval_seconds=self.config.get_metrics_interval(),
+            socket_path=self.config.get_metrics_socket()
+        )
+
+        # On-demand profiling of the event handlers (SIGUSR2 or D-Bus)
+        self.profiler = ProfilingWindow(
+            self.config.config_dir,
+            hooks=[
+                (self.monitor, '_on_event'),
+                (self.monitor, 'callback'),
+                (self.monitor, 'controller_callback'),
+                (self.dbus_service, 'authorization_callback'),
+                (self.dbus_service, 'config_callback'),
+                (self.dbus_service, 'state_callback'),
+                (self.timeouts, 'callback'),
+            ],
+            add_timeout=GLib.timeout_add_seconds,
+            remove_timeout=GLib.source_remove
+        )
+
+        self.profile.end()
         print("[Daemon] Initialization complete")
 
+    def _create_audit_sinks(self) -> list:
+        """Build the configured audit sinks (SQLite is always present)."""
+        sinks = [SQLiteSink(self.logger)]
+
+        if self.config.get_audit_journald():
+            sinks.append(JournaldSink())
+
+        jsonl_file = self.config.get_audit_jsonl_file()
+        if jsonl_file:
+            max_bytes, backups = self.config.get_audit_jsonl_rotation()
+            sinks.append(JSONLSink(jsonl_file, max_bytes, backups))
+
+        syslog_socket = self.config.get_audit_syslog_socket()
+        if syslog_socket:
+            sinks.append(SyslogSink(syslog_socket))
+
+        print(f"[Daemon] Audit sinks: {', '.join(sink.name for sink in sinks)}")
+        return sinks
+
     def _load_authentication(self):
         """Load TOTP authentication from storage."""
+        from src.auth.totp import TOTPAuthenticator, RecoveryCodeIndex, TOTP_DRIFT_FILENAME
+
+        self.auth_loading = False
+
         if not self.storage.is_configured():
             print("[Daemon] Warning: TOTP not configured. Run setup wizard first.")
             print("[Daemon] USB protection will be disabled until configuration is complete.")
@@ -82,13 +238,44 @@ class SecureUSBDaemon:
         auth_data = self.storage.load_auth_data()
 
         if auth_data:
-            self.totp_auth = TOTPAuthenticator(auth_data['totp_secret'])
-            self.recovery_codes = auth_data['recovery_codes']
-            print(f"[Daemon] TOTP authentication loaded")
+            self.totp_auth = TOTPAuthenticator(auth_data['totp_secret'],
+                                               drift_file=self.config.config_dir / TOTP_DRIFT_FILENAME)
+            self.recovery_codes = RecoveryCodeIndex(auth_data['recovery_codes'])
+            print(f"[Daemon] TOTP authentication loaded (clock drift: {self.totp_auth.drift} steps)")
             print(f"[Daemon] Recovery codes available: {len(self.recovery_codes)}")
         else:
             print("[Daemon] Error: Could not load authentication data")
 
+    def _handle_authentication_unavailable(self):
+        """
+        Fall back after READY=1 was sent but authentication failed to load.
+
+        Devices queued while loading can no longer be authorized, so they are
+        denied; clients and systemd are told protection is inactive.
+        """
+        print("[Daemon] Authentication unavailable, restoring USB authorization default to ALLOW")
+        self.authorizer.set_default_authorization("1")
+
+        for record in self.devices.in_state(STATE_PENDING):
+            device_id = record.device_id
+            print(f"[Daemon] Denying {device_id}: authentication unavailable")
+            self.timeouts.cancel(device_id)
+            success = self.authorizer.block_device(device_id)
+            self.audit.emit(
+                EventAction.DEVICE_DENIED,
+                device_path=record.info.get('device_path'),
+                vendor_id=record.info.get('vendor_id'),
+                product_id=record.info.get('product_id'),
+                serial_number=record.info.get('serial_number'),
+                success=success,
+                details='Authentication data could not be loaded'
+            )
+            self.dbus_service.emit_authorization_result(device_id, 'auth_unavailable', False)
+            self._record_decision(device_id, STATE_DENIED, 'auth_unavailable')
+
+        self.dbus_service.emit_protection_state_changed(False)
+        sd_notify("STATUS=USB protection inactive: authentication data could not be loaded")
+
     def _handle_device_event(self, device: USBDevice, action: str):
         """
         Handle USB device connection/disconnection events.
@@ -97,11 +284,32 @@ class SecureUSBDaemon:
             device: USBDevice object
             action: 'add' or 'remove'
         """
+        self.metrics.device_events.inc(action)
+
         if action == 'add':
             self._handle_device_connected(device)
         elif action == 'remove':
             self._handle_device_disconnected(device)
 
+    def _handle_controller_event(self, controller: str, action: str):
+        """
+        Handle USB controller (root hub) add/remove events.
+
+        New controllers (e.g., from a Thunderbolt dock) get the current
+        default authorization mode applied as soon as they appear.
+
+        Args:
+            controller: Root hub name (e.g., "usb3")
+            action: 'add' or 'remove'
+        """
+        if action == 'add':
+            start = time.perf_counter()
+            if self.authorizer.apply_default_to_controller(controller):
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                print(f"[Daemon] Applied default authorization to {controller} ({elapsed_ms:.1f} ms)")
+        elif action == 'remove':
+            self.authorizer.forget_controller(controller)
+
     def _handle_device_connected(self, device: USBDevice):
         """
         Handle new USB device connection.
@@ -111,53 +319,224 @@ class SecureUSBDaemon:
         """
         print(f"\n[Daemon] Device connected: {device}")
 
-        # Log the event
-        self.logger.log_event(
-            EventAction.DEVICE_CONNECTED,
-            device_path=device.device_path,
-            vendor_id=device.vendor_id,
-            product_id=device.product_id,
-            vendor_name=device.vendor_name,
-            product_name=device.product_name,
-            serial_number=device.serial_number
-        )
+        if device.device_id in self.devices:
+            print(f"[Daemon] Device {device.device_id} already tracked, ignoring")
+            return
+
+        device_info = device.to_dict()
+        self.devices.connect(device.device_id, device_info)
 
+        # Log the connection once the device is blocked or decided, with the
+        # time it was plugged in
+        connected_at = time.time()
+        try:
+            self._decide_connected_device(device, device_info)
+        finally:
+            self.audit.emit(
+                EventAction.DEVICE_CONNECTED,
+                device_path=device.device_path,
+                vendor_id=device.vendor_id,
+                product_id=device.product_id,
+                vendor_name=device.vendor_name,
+                product_name=device.product_name,
+                serial_number=device.serial_number,
+                timestamp=connected_at
+            )
+
+    def _decide_connected_device(self, device: USBDevice, device_info: dict):
+        """
+        Authorize, block or queue a newly connected device.
+
+        Args:
+            device: USBDevice object
+            device_info: Device information dictionary
+        """
         # Check if protection is enabled
         if not self.config.is_enabled():
             print("[Daemon] Protection disabled, allowing device")
-            USBAuthorization.allow_device(device.device_id)
+            if self.authorizer.allow_device(device.device_id):
+                self._record_decision(device.device_id, STATE_AUTHORIZED, 'unprotected')
             return
 
-        # Check if authentication is configured
-        if not self.totp_auth:
+        # Check if authentication is configured (or still being loaded)
+        if not self.totp_auth and not self.auth_loading:
             print("[Daemon] TOTP not configured, allowing device")
-            USBAuthorization.allow_device(device.device_id)
+            if self.authorizer.allow_device(device.device_id):
+                self._record_decision(device.device_id, STATE_AUTHORIZED, 'unprotected')
             return
 
-        # Block the device initially
-        print(f"[Daemon] Blocking device {device.device_id} pending authorization")
-        USBAuthorization.block_device(device.device_id)
+        interface_classes = device.get_interface_classes()
+        decision = self.policy.evaluate(dict(device_info, interface_classes=interface_classes))
+        print(f"[Daemon] Policy decision: {decision}")
 
-        # Add to pending authorizations
-        device_info = device.to_dict()
-        self.pending_authorizations[device.device_id] = device_info
+        if decision.action == PolicyAction.ALLOW:
+            success = self.authorizer.allow_device(device.device_id)
+            if success:
+                self._record_decision(device.device_id, STATE_AUTHORIZED, 'policy')
+            self._log_automatic_decision(
+                EventAction.DEVICE_AUTHORIZED, device_info, 'policy', success, decision.explanation
+            )
+            return
 
-        # Emit D-Bus signal for GUI
-        self.dbus_service.emit_device_connected(device_info)
+        if decision.action == PolicyAction.BLOCK:
+            # Retry once: a write can fail transiently while the device settles
+            success = (self.authorizer.block_device(device.device_id)
+                       or self.authorizer.block_device(device.device_id))
+            if success:
+                self._record_decision(device.device_id, STATE_DENIED, 'policy')
+                self.metrics.plug_to_block_seconds.observe(time.monotonic() - device.received_at)
+                self._log_automatic_decision(
+                    EventAction.DEVICE_DENIED, device_info, 'policy', True, decision.explanation
+                )
+            else:
+                # Not blocked, so not denied: the device stays undecided
+                print(f"[Daemon] Error: Failed to block {device.device_id} as required by policy")
+                self._log_automatic_decision(
+                    EventAction.DEVICE_DENIED, device_info, 'policy', False,
+                    f"{decision.explanation}; blocking the device failed"
+                )
+            return
+
+        # Device re-enumerated shortly after being authorized
+        replug_mode = self.replug_cache.lookup(device_info)
+        if replug_mode is not None and self._reauthorize_replugged(device.device_id, device_info, replug_mode):
+            return
+
+        # Authenticated session (a TOTP code was entered recently)
+        if self.session.covers(device_info, interface_classes):
+            if self.authorizer.allow_device(device.device_id):
+                self._record_decision(device.device_id, STATE_AUTHORIZED, 'session')
+                remaining = self.session.remaining_seconds()
+                print(f"[Daemon] Device authorized by session ({remaining}s remaining)")
+                self._log_automatic_decision(
+                    EventAction.DEVICE_AUTHORIZED, device_info, 'session', True,
+                    f"Authenticated session ({self.session.scope}), {remaining}s remaining"
+                )
+                return
+
+        self._queue_for_authorization(device.device_id, device_info)
+        self.metrics.plug_to_block_seconds.observe(time.monotonic() - device.received_at)
 
         # Check if device is whitelisted
         if device.serial_number and self.whitelist.is_whitelisted(device.serial_number):
             print(f"[Daemon] Device is whitelisted: {device.serial_number}")
             # Note: Still requires TOTP, but GUI can skip showing full dialog
 
+    def _reauthorize_replugged(self, device_id: str, device_info: dict, mode: str) -> bool:
+        """
+        Restore the previous authorization of a re-plugged device.
+
+        Args:
+            device_id: Device ID
+            device_info: Device information dictionary
+            mode: Mode the device had before ('full' or 'power_only')
+
+        Returns:
+            True if the device was re-authorized, False otherwise
+        """
+        if mode == 'power_only':
+            success = self.authorizer.set_power_only_mode(device_id)
+            action = EventAction.DEVICE_AUTHORIZED_POWER_ONLY
+            state = STATE_POWER_ONLY
+        else:
+            success = self.authorizer.allow_device(device_id)
+            action = EventAction.DEVICE_AUTHORIZED
+            state = STATE_AUTHORIZED
+
+        if not success:
+            return False
+
+        self._record_decision(device_id, state, 'replug')
+
+        print(f"[Daemon] Device re-plugged within grace period, restored {mode} access")
+        self.replug_cache.remember(device_info, mode)
+        self._log_automatic_decision(
+            action, device_info, 'replug', True,
+            f"Re-plugged within {self.replug_cache.grace_seconds}s grace period ({mode})"
+        )
+        return True
+
+    def _record_decision(self, device_id: str, state: str, method: str):
+        """
+        Move a device to a decided state and count the decision.
+
+        Args:
+            device_id: Device ID
+            state: Decided state (authorized, power_only, denied, timed_out)
+            method: What decided it ('totp', 'policy', 'session', 'replug',
+                    'unprotected', 'user', 'timeout', 'whitelist',
+                    'auth_unavailable')
+        """
+        if self.devices.set_state(device_id, state, method):
+            self.metrics.authorizations.inc(state, method)
+
+    def _remember_authorization(self, device_id: str, mode: str):
+        """
+        Add a just-authorized device to the re-plug cache.
+
+        Uses the daemon's own record of the device, not the GUI's copy.
+
+        Args:
+            device_id: Device ID
+            mode: Granted mode ('full' or 'power_only')
+        """
+        device_info = self.devices.pending_info(device_id)
+        if device_info:
+            self.replug_cache.remember(device_info, mode)
+
+    def _log_automatic_decision(self, action: EventAction, device_info: dict, auth_method: str,
+                                success: bool, details: str):
+        """
+        Log a device decided without prompting the user.
+
+        Args:
+            action: Event action to log
+            device_info: Device information dictionary
+            auth_method: What made the decision ('policy', 'session')
+            success: Whether the authorization change succeeded
+            details: Explanation of the decision
+        """
+        self.audit.emit(
+            action,
+            device_path=device_info.get('device_path'),
+            vendor_id=device_info.get('vendor_id'),
+            product_id=device_info.get('product_id'),
+            vendor_name=device_info.get('vendor_name'),
+            product_name=device_info.get('product_name'),
+            serial_number=device_info.get('serial_number'),
+            auth_method=auth_method,
+            success=success,
+            details=details
+        )
+
+    def _queue_for_authorization(self, device_id: str, device_info: dict, block: bool = True):
+        """
+        Block a device and wait for the user to authorize it.
+
+        Args:
+            device_id: Device ID
+            device_info: Device information dictionary
+            block: False if the caller has already blocked the device
+        """
+        if self.devices.is_pending(device_id):
+            return
+
+        # Block the device initially
+        if block:
+            print(f"[Daemon] Blocking device {device_id} pending authorization")
+            self.authorizer.block_device(device_id)
+
+        # Mark as pending
+        if device_id not in self.devices:
+            self.devices.connect(device_id, device_info)
+        self.devices.set_state(device_id, STATE_PENDING)
+
+        # Emit D-Bus signal for GUI
+        self.dbus_service.emit_device_connected(device_info)
+
         # Set timeout for auto-deny
         timeout_seconds = self.config.get_timeout()
-        timeout_id = GLib.timeout_add_seconds(
-            timeout_seconds,
-            self._handle_authorization_timeout,
-            device.device_id
-        )
-        self.timeout_timers[device.device_id] = timeout_id
+        self.timeouts.schedule(device_id, timeout_seconds)
 
         print(f"[Daemon] Awaiting authorization (timeout: {timeout_seconds}s)")
 
@@ -171,7 +550,7 @@ class SecureUSBDaemon:
         print(f"[Daemon] Device disconnected: {device}")
 
         # Log the event
-        self.logger.log_event(
+        self.audit.emit(
             EventAction.DEVICE_DISCONNECTED,
             device_path=device.device_path,
             vendor_id=device.vendor_id,
@@ -181,50 +560,82 @@ class SecureUSBDaemon:
             serial_number=device.serial_number
         )
 
-        # Clean up pending authorization
-        if device.device_id in self.pending_authorizations:
-            del self.pending_authorizations[device.device_id]
+        # Forget the device
+        self.devices.remove(device.device_id)
+
+        # Release cached sysfs handles for this device
+        self.authorizer.forget_device(device.device_id)
+
+        # Start the re-plug grace period
+        self.replug_cache.mark_disconnected(device.device_id)
 
-        # Cancel timeout timer
-        if device.device_id in self.timeout_timers:
-            GLib.source_remove(self.timeout_timers[device.device_id])
-            del self.timeout_timers[device.device_id]
+        # Cancel timeout
+        self.timeouts.cancel(device.device_id)
 
         # Emit D-Bus signal
         self.dbus_service.emit_device_disconnected(device.device_id)
 
-    def _handle_authorization_request(self, device_info: dict, totp_code: str, mode: str) -> str:
+    def _handle_authorization_request(self, device_info: dict, totp_code: str, mode: str,
+                                      sender: str = None) -> str:
         """
         Handle authorization request from GUI via D-Bus.
 
+        Only the device ID is taken from the caller; everything else (and the
+        rate limit key) comes from the daemon's own record of the device.
+
         Args:
             device_info: Device information dictionary
             totp_code: TOTP code or recovery code
             mode: Authorization mode ('full', 'power_only', 'deny')
+            sender: Unique bus name of the caller
 
         Returns:
-            Result string ('success', 'auth_failed', 'error')
+            Result string ('success', 'auth_failed', 'rate_limited', 'error')
         """
-        device_id = device_info['device_id']
+        if mode not in ('full', 'power_only', 'deny'):
+            print(f"[Daemon] Error: Unknown authorization mode: {mode!r}")
+            return 'error'
+
+        device_id = device_info.get('device_id')
+        if not isinstance(device_id, str) or not DEVICE_ID_PATTERN.match(device_id):
+            print(f"[Daemon] Error: Invalid device ID in authorization request: {device_id!r}")
+            return 'error'
 
         print(f"\n[Daemon] Authorization request for {device_id}")
         print(f"[Daemon] Mode: {mode}")
 
-        # Cancel timeout timer
-        if device_id in self.timeout_timers:
-            GLib.source_remove(self.timeout_timers[device_id])
-            del self.timeout_timers[device_id]
+        # Any tracked device may be denied; only pending ones can be authorized
+        if mode == 'deny':
+            record = self.devices.get(device_id)
+            device_info = record.info if record else None
+        else:
+            device_info = self.devices.pending_info(device_id)
+        if device_info is None:
+            print(f"[Daemon] Error: Device {device_id} is not awaiting authorization")
+            return 'error'
+
+        # Refuse locked-out callers before touching TOTP or storage; the
+        # device stays pending and its deadline keeps running
+        if mode != 'deny':
+            retry_after = self.rate_limiter.retry_after(device_id, sender)
+            if retry_after:
+                print(f"[Daemon] Too many failed attempts, locked out for {retry_after:.0f}s")
+                self.metrics.auth_rate_limited.inc()
+                return 'rate_limited'
 
         # Handle deny
         if mode == 'deny':
             print(f"[Daemon] User denied authorization")
+            self.timeouts.cancel(device_id)
             self._deny_device(device_id, device_info)
             return 'success'
 
         # Verify authentication
         if not self._verify_authentication(totp_code):
             print(f"[Daemon] Authentication failed")
-            self.logger.log_event(
+            self.metrics.auth_failures.inc()
+            self.rate_limiter.record_failure(device_id, sender)
+            self.audit.emit(
                 EventAction.AUTH_FAILED,
                 device_path=device_info.get('device_path'),
                 vendor_id=device_info.get('vendor_id'),
@@ -236,9 +647,11 @@ class SecureUSBDaemon:
             return 'auth_failed'
 
         print(f"[Daemon] Authentication successful")
+        self.timeouts.cancel(device_id)
+        self.rate_limiter.record_success(device_id, sender)
 
         # Log successful authentication
-        self.logger.log_event(
+        self.audit.emit(
             EventAction.AUTH_SUCCESS,
             serial_number=device_info.get('serial_number'),
             auth_method='totp',
@@ -247,11 +660,16 @@ class SecureUSBDaemon:
 
         # Authorize device based on mode
         if mode == 'full':
-            return self._authorize_device_full(device_id, device_info)
-        elif mode == 'power_only':
-            return self._authorize_device_power_only(device_id, device_info)
+            result = self._authorize_device_full(device_id, device_info)
         else:
-            return 'error'
+            result = self._authorize_device_power_only(device_id, device_info)
+
+        # Start (or extend) the authenticated session only once the device
+        # was actually authorized
+        if result == 'success':
+            self.session.start(device_info.get('vendor_id'))
+
+        return result
 
     def _verify_authentication(self, code: str) -> bool:
         """
@@ -270,26 +688,31 @@ class SecureUSBDaemon:
         if self.totp_auth and self.totp_auth.verify_code(code):
             return True
 
-        # Try recovery codes
-        for recovery_hash in self.recovery_codes:
-            if RecoveryCodeManager.verify_code(code, recovery_hash):
-                # Remove used recovery code (only remove from memory if storage succeeds)
-                if self.storage.remove_recovery_code(recovery_hash):
-                    self.recovery_codes.remove(recovery_hash)
-                    print(f"[Daemon] Recovery code used. Remaining: {len(self.recovery_codes)}")
-                    return True
-                else:
-                    print(f"[Daemon] Error: Failed to remove recovery code from storage")
-                    return False
+        # Try recovery codes (hashed once, then looked up)
+        if not self.recovery_codes:
+            return False
+
+        recovery_hash = self.recovery_codes.match(code)
+        if recovery_hash is None:
+            return False
+
+        # Remove used recovery code (only remove from memory if storage succeeds)
+        if self.storage.remove_recovery_code(recovery_hash):
+            self.recovery_codes.discard(recovery_hash)
+            print(f"[Daemon] Recovery code used. Remaining: {len(self.recovery_codes)}")
+            return True
 
+        print(f"[Daemon] Error: Failed to remove recovery code from storage")
         return False
 
     def _authorize_device_full(self, device_id: str, device_info: dict) -> str:
         """Authorize device with full access."""
         print(f"[Daemon] Authorizing device {device_id} with full access")
 
-        if USBAuthorization.allow_device(device_id):
-            self.logger.log_event(
+        if self.authorizer.allow_device(device_id):
+            self._remember_authorization(device_id, 'full')
+
+            self.audit.emit(
                 EventAction.DEVICE_AUTHORIZED,
                 device_path=device_info.get('device_path'),
                 vendor_id=device_info.get('vendor_id'),
@@ -309,9 +732,7 @@ class SecureUSBDaemon:
             # Emit signal
             self.dbus_service.emit_authorization_result(device_id, 'authorized', True)
 
-            # Clean up
-            if device_id in self.pending_authorizations:
-                del self.pending_authorizations[device_id]
+            self._record_decision(device_id, STATE_AUTHORIZED, 'totp')
 
             return 'success'
         else:
@@ -321,8 +742,10 @@ class SecureUSBDaemon:
         """Authorize device with power-only mode."""
         print(f"[Daemon] Authorizing device {device_id} with power-only mode")
 
-        if USBAuthorization.set_power_only_mode(device_id):
-            self.logger.log_event(
+        if self.authorizer.set_power_only_mode(device_id):
+            self._remember_authorization(device_id, 'power_only')
+
+            self.audit.emit(
                 EventAction.DEVICE_AUTHORIZED_POWER_ONLY,
                 device_path=device_info.get('device_path'),
                 vendor_id=device_info.get('vendor_id'),
@@ -338,21 +761,26 @@ class SecureUSBDaemon:
             # Emit signal
             self.dbus_service.emit_authorization_result(device_id, 'power_only', True)
 
-            # Clean up
-            if device_id in self.pending_authorizations:
-                del self.pending_authorizations[device_id]
+            self._record_decision(device_id, STATE_POWER_ONLY, 'totp')
 
             return 'success'
         else:
             return 'error'
 
-    def _deny_device(self, device_id: str, device_info: dict):
-        """Deny device authorization."""
+    def _deny_device(self, device_id: str, device_info: dict, state: str = STATE_DENIED):
+        """Deny device authorization (state is STATE_TIMED_OUT for auto-deny)."""
         print(f"[Daemon] Denying device {device_id}")
 
-        USBAuthorization.block_device(device_id)
+        self.authorizer.block_device(device_id)
+
+        # An unwanted device showed up; stop trusting the session and
+        # never restore an earlier authorization of this device
+        self.session.end()
+        record = self.devices.get(device_id)
+        self.replug_cache.invalidate(record.info if record else device_info)
 
-        self.logger.log_event(
+        timed_out = state == STATE_TIMED_OUT
+        self.audit.emit(
             EventAction.DEVICE_DENIED,
             device_path=device_info.get('device_path'),
             vendor_id=device_info.get('vendor_id'),
@@ -361,44 +789,141 @@ class SecureUSBDaemon:
             product_name=device_info.get('product_name'),
             serial_number=device_info.get('serial_number'),
             success=True,
-            details='User denied authorization'
+            details='Authorization timeout (auto-deny)' if timed_out else 'User denied authorization'
         )
 
         # Emit signal
         self.dbus_service.emit_authorization_result(device_id, 'denied', False)
 
-        # Clean up
-        if device_id in self.pending_authorizations:
-            del self.pending_authorizations[device_id]
+        self._record_decision(device_id, state, 'timeout' if timed_out else 'user')
 
-    def _handle_authorization_timeout(self, device_id: str) -> bool:
+    def _handle_authorization_timeout(self, device_id: str):
         """
         Handle authorization timeout (auto-deny).
 
+        Called by the deadline scheduler.
+
         Args:
             device_id: Device ID
+        """
+        print(f"\n[Daemon] Authorization timeout for {device_id}")
+
+        device_info = self.devices.pending_info(device_id)
+        if device_info is not None:
+            self._deny_device(device_id, device_info, STATE_TIMED_OUT)
+
+    def _queue_depths(self) -> dict:
+        """
+        Report internal queue lengths for the metrics exporter.
 
         Returns:
-            False to stop the timer
+            Dictionary mapping queue name to its current length
         """
-        print(f"\n[Daemon] Authorization timeout for {device_id}")
+        return {
+            'pending_devices': self.devices.count(STATE_PENDING),
+            'deadlines': len(self.timeouts),
+            'replug_cache': len(self.replug_cache.entries),
+            **{f'audit_{name}': depth for name, depth in self.audit.queue_depths().items()},
+        }
+
+    def _handle_state_request(self, query: str, argument=None):
+        """
+        Handle daemon state query from D-Bus.
 
-        if device_id in self.pending_authorizations:
-            device_info = self.pending_authorizations[device_id]
-            self._deny_device(device_id, device_info)
+        Args:
+            query: Name of the state to return
+            argument: Query parameter, if any
 
-            self.logger.log_event(
-                EventAction.DEVICE_DENIED,
-                device_path=device_info.get('device_path'),
-                serial_number=device_info.get('serial_number'),
-                details='Authorization timeout (auto-deny)'
-            )
+        Returns:
+            Requested state, or None for unknown queries
+        """
+        if query == 'controller_states':
+            return self.authorizer.get_controller_states()
+
+        if query == 'remaining_times':
+            return self.timeouts.remaining_all()
+
+        if query == 'pending_devices':
+            return [record.info for record in self.devices.in_state(STATE_PENDING)]
+
+        if query == 'device_counts':
+            return self.devices.counts()
+
+        if query == 'state_deltas':
+            return self.devices.deltas_since(int(argument or 0))
+
+        if query == 'clock_drift':
+            return self.totp_auth.get_drift_info() if self.totp_auth else {}
+
+        return None
+
+    def _apply_protection_state(self, enabled: bool):
+        """
+        Apply a change of the protection setting.
+
+        Args:
+            enabled: True if protection is now enabled
+        """
+        self.session.end()
+        self.replug_cache.clear()
+
+        self.dbus_service.emit_protection_state_changed(enabled)
+
+        # Set kernel default authorization
+        if enabled:
+            self.authorizer.set_default_authorization("0")  # Block by default
+        else:
+            self.authorizer.set_default_authorization("1")  # Allow by default
+
+    def _handle_config_file_changed(self, filename: str) -> bool:
+        """
+        Reload a configuration file edited outside the daemon.
+
+        The file is parsed and validated first; the in-memory object is only
+        replaced if that succeeds, so a half-written or broken file leaves
+        the current settings in effect.
+
+        Args:
+            filename: Name of the changed file in the config directory
+
+        Returns:
+            True if new settings were applied, False otherwise
+        """
+        if filename == self.config.config_file.name:
+            was_enabled = self.config.is_enabled()
+            if not self.config.reload():
+                return False
+
+            self.session.duration_seconds = self.config.get_session_minutes() * 60
+            self.session.scope = self.config.get_session_scope()
+            self.replug_cache.grace_seconds = self.config.get_replug_grace_seconds()
 
-        # Clean up timer reference
-        if device_id in self.timeout_timers:
-            del self.timeout_timers[device_id]
+            if self.config.is_enabled() != was_enabled:
+                self._apply_protection_state(self.config.is_enabled())
 
-        return False  # Don't repeat timer
+        elif filename == self.whitelist.whitelist_file.name:
+            if not self.whitelist.reload():
+                return False
+
+        elif filename == POLICY_FILENAME:
+            try:
+                policy = PolicyEngine.parse(self.config.config_dir / POLICY_FILENAME)
+            except (OSError, ValueError) as e:
+                print(f"[Daemon] Keeping current policy, {filename} is invalid: {e}")
+                return False
+            self.policy = policy
+
+        else:
+            return False
+
+        print(f"[Daemon] Reloaded {filename}")
+        self.dbus_service.emit_config_changed(filename)
+        return True
+
+    def _on_config_watch(self, fd, condition) -> bool:
+        """Main-loop callback for the config directory watcher."""
+        self.config_watcher.process_events()
+        return True  # Keep watching
 
     def _handle_config_request(self, action: str, value) -> bool:
         """
@@ -416,13 +941,7 @@ class SecureUSBDaemon:
         if action == 'set_enabled':
             result = self.config.set_enabled(bool(value))
             if result:
-                self.dbus_service.emit_protection_state_changed(bool(value))
-
-                # Set kernel default authorization
-                if bool(value):
-                    USBAuthorization.set_default_authorization("0")  # Block by default
-                else:
-                    USBAuthorization.set_default_authorization("1")  # Allow by default
+                self._apply_protection_state(bool(value))
 
             return result
 
@@ -457,25 +976,195 @@ class SecureUSBDaemon:
         elif action == 'remove_whitelist':
             return self.whitelist.remove_device(str(value))
 
+        elif action == 'start_profiling':
+            if value:
+                return self.profiler.start(int(value))
+            return self.profiler.start()
+
+        elif action == 'stop_profiling':
+            return self.profiler.stop() is not None
+
         return False
 
+    def _persist_state_change(self, delta):
+        """
+        Queue a device state change for the state journal.
+
+        Runs under the state table lock; the journal writes on its own thread.
+
+        Args:
+            delta: (sequence, device_id, state) tuple from the state table
+        """
+        _, device_id, state = delta
+        record = self.devices.get(device_id)
+        if state == STATE_REMOVED or record is None:
+            self.state_journal.record(device_id, STATE_REMOVED)
+        else:
+            self.state_journal.record(device_id, record.state, record.method, record.changed_at, record.info)
+
+    def _restore_saved_states(self):
+        """
+        Restore device states saved before the daemon restarted.
+
+        A saved device is restored only if a device with the same vendor,
+        product and serial is still attached at the same port and its kernel
+        authorization agrees with the saved state; anything else is left to
+        startup reconciliation. Pending devices keep their remaining timeout
+        and are announced to the GUI again.
+        """
+        saved, self._saved_states = self._saved_states, {}
+        if not saved:
+            return
+
+        start = time.perf_counter()
+        reader = BatchDeviceReader(self.authorizer.backend)
+        timeout_seconds = self.config.get_timeout()
+        now = time.time()
+        restored = 0
+
+        for device_id, entry in saved.items():
+            state = entry.get('state')
+            info = entry.get('info') or {}
+            changed_at = entry.get('at') or now
+
+            if device_id in self.devices or state not in RESTORABLE_STATES:
+                continue
+
+            current = reader.read_device(device_id)
+            if current['authorized'] is None or not _same_device(info, current):
+                continue
+            if current['authorized'] != (state == STATE_AUTHORIZED):
+                continue
+
+            self.devices.restore(device_id, info, state, entry.get('method'), changed_at)
+            restored += 1
+
+            if state == STATE_PENDING:
+                remaining = changed_at + timeout_seconds - now
+                if remaining > 0:
+                    self.dbus_service.emit_device_connected(info)
+                    self.timeouts.schedule(device_id, remaining)
+                else:
+                    self._handle_authorization_timeout(device_id)
+
+        # Forget what was not restored
+        for device_id in saved:
+            if device_id not in self.devices:
+                self.state_journal.record(device_id, STATE_REMOVED)
+        self.state_journal.compact()
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"[Daemon] Restored {restored} of {len(saved)} saved device state(s) in {elapsed_ms:.1f}ms")
+
+    def _reconcile_existing_devices(self):
+        """
+        Bring devices attached while the daemon was down under protection.
+
+        Reads every attached device from sysfs in one concurrent pass and
+        queues the ones that are not already trusted or pending.
+        """
+        reconciler = StartupReconciler(
+            BatchDeviceReader(self.authorizer.backend),
+            is_whitelisted=self.whitelist.is_whitelisted,
+            # Devices restored from the state journal are already handled
+            is_pending=self.devices.__contains__
+        )
+        result = reconciler.run()
+
+        # Block everything that needs authorization in one concurrent pass
+        block_results = self.authorizer.apply_bulk({
+            device_info['device_id']: BULK_MODE_BLOCK
+            for device_info in result[RECONCILE_QUEUED]
+        })
+
+        for device_info in result[RECONCILE_QUEUED]:
+            device_id = device_info['device_id']
+            del device_info['authorized']
+
+            # Tracking the device also suppresses a replayed udev add event
+            self.devices.connect(device_id, device_info)
+
+            self.audit.emit(
+                EventAction.DEVICE_CONNECTED,
+                device_path=device_info.get('device_path'),
+                vendor_id=device_info.get('vendor_id'),
+                product_id=device_info.get('product_id'),
+                vendor_name=device_info.get('vendor_name'),
+                product_name=device_info.get('product_name'),
+                serial_number=device_info.get('serial_number'),
+                details='Present at daemon startup'
+            )
+
+            if not block_results[device_id]['success']:
+                print(f"[Daemon] Warning: could not block {device_id}: "
+                      f"{block_results[device_id]['error'] or 'write failed'}")
+
+            self._queue_for_authorization(device_id, device_info, block=False)
+
+        for device_info in result[RECONCILE_TRUSTED]:
+            device_info = dict(device_info)
+            del device_info['authorized']
+            self.devices.connect(device_info['device_id'], device_info)
+            self.devices.set_state(device_info['device_id'], STATE_AUTHORIZED, 'whitelist')
+
+        print(f"[Daemon] Startup reconciliation: {len(result[RECONCILE_QUEUED])} queued, "
+              f"{len(result[RECONCILE_TRUSTED])} trusted, "
+              f"{len(result['skipped'])} skipped in {result['elapsed_ms']:.1f}ms")
+
     def start(self):
         """Start the daemon."""
         print("\n[Daemon] Starting services...")
 
         # Set USB authorization default to block
-        if self.config.is_enabled() and self.totp_auth:
+        self.profile.begin('block')
+        protecting = self.config.is_enabled() and self.auth_loading
+        if protecting:
             print("[Daemon] Setting USB authorization default to BLOCK")
-            USBAuthorization.set_default_authorization("0")
+            self.authorizer.set_default_authorization("0")
         else:
             print("[Daemon] USB protection disabled or not configured")
 
         # Start USB monitor
+        self.profile.begin('monitor')
         self.monitor.start(threaded=True)
+        self.profile.end()
+
+        # Blocking is in force; let dependent units start
+        self.profile.mark('ready')
+        sd_notify("READY=1\nSTATUS=" + ("USB protection active" if protecting else "USB protection inactive"))
+
+        # Decrypt the TOTP secret (key derivation is the slow part)
+        self.profile.begin('authentication')
+        self._load_authentication()
+        if protecting and not self.totp_auth:
+            self._handle_authentication_unavailable()
+
+        # Pick up where the previous run left off, then handle devices
+        # plugged in while we were not running
+        self.profile.begin('reconcile')
+        if self.config.is_enabled() and self.totp_auth:
+            self._restore_saved_states()
+            self._reconcile_existing_devices()
+        self.profile.end()
+
+        # Watch the config directory for edits
+        if self.config_watcher.start():
+            self._config_watch_source = GLib.io_add_watch(
+                self.config_watcher.fileno(),
+                GLib.PRIORITY_DEFAULT,
+                GLib.IO_IN,
+                self._on_config_watch
+            )
+
+        # Export metrics
+        self.metrics_exporter.start()
 
         # Setup signal handlers
         signal.signal(signal.SIGTERM, self._handle_signal)
         signal.signal(signal.SIGINT, self._handle_signal)
+        signal.signal(signal.SIGUSR2, self._handle_profiling_signal)
+
+        print(self.profile.report())
 
         print("\n[Daemon] SecureUSB daemon is running")
         print("[Daemon] Monitoring USB devices...")
@@ -491,16 +1180,34 @@ class SecureUSBDaemon:
     def stop(self):
         """Stop the daemon."""
         print("\n[Daemon] Stopping services...")
+        sd_notify("STOPPING=1")
 
         # Stop USB monitor
         self.monitor.stop()
 
-        # Cancel all pending timers
-        for timeout_id in self.timeout_timers.values():
-            GLib.source_remove(timeout_id)
+        # Stop watching the config directory
+        if self._config_watch_source is not None:
+            GLib.source_remove(self._config_watch_source)
+            self._config_watch_source = None
+        self.config_watcher.stop()
+
+        # Write out an unfinished profiling window
+        self.profiler.stop()
+
+        # Cancel all pending timeouts
+        self.timeouts.clear()
+
+        # Final metrics write, close the HTTP endpoint
+        self.metrics_exporter.stop()
+
+        # Write out queued audit events
+        self.audit.close()
+
+        self.state_journal.close()
 
         # Reset USB authorization to allow
-        USBAuthorization.set_default_authorization("1")
+        self.authorizer.set_default_authorization("1")
+        self.authorizer.close()
 
         print("[Daemon] SecureUSB daemon stopped")
 
@@ -509,6 +1216,13 @@ class SecureUSBDaemon:
         print(f"\n[Daemon] Received signal {signum}")
         self.main_loop.quit()
 
+    def _handle_profiling_signal(self, signum, frame):
+        """Toggle a profiling window (SIGUSR2)."""
+        if self.profiler.active:
+            self.profiler.stop()
+        else:
+            self.profiler.start()
+
 
 def main():
     """Main entry point."""
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Persisted Device State for SecureUSB
+
+Keeps the device state table across daemon restarts with an append-only
+journal of JSON lines, one per state change:
+
+    {"id": "1-4", "state": "authorized", "method": "totp", "at": 1700000000.0, "info": {...}}
+    {"id": "1-4", "state": "removed"}
+
+Each line is self-contained, so the last line for a device is its current
+state. A torn last line left by a crash is skipped on load.
+
+record() only updates the in-memory live set and queues the line; it is
+called from the device state table's listener, under the table lock and on
+the plug-to-block path, so it never touches the disk. A writer thread
+drains the queue and appends whatever has accumulated with one write() and
+one fsync() (group commit). When dead lines outnumber live devices the
+writer compacts instead: the live records are written to a temporary file
+that is fsync()ed and renamed over the journal.
+"""
+
+import json
+import os
+import queue
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .state import STATE_REMOVED
+
+JOURNAL_FILENAME = "state.journal"
+
+# Compact once the journal has this many lines and most of them are dead
+COMPACT_MIN_LINES = 256
+
+# Writer queue markers
+_COMPACT = object()
+_STOP = object()
+
+
+class StateJournal:
+    """Append-only journal of device states, written by a background thread."""
+
+    def __init__(self, path: Path, compact_min_lines: int = COMPACT_MIN_LINES):
+        """
+        Initialize the journal (the file is opened on first write).
+
+        Args:
+            path: Journal file
+            compact_min_lines: Minimum number of lines before compacting
+        """
+        self.path = Path(path)
+        self.compact_min_lines = compact_min_lines
+
+        # Guards the live set, the sequence and the writer thread (no I/O under it)
+        self._lock = threading.Lock()
+        self._live: Dict[str, Dict] = {}
+        self._sequence = 0
+        self._queue: queue.Queue = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+
+        # Owned by the writer thread
+        self._fd: Optional[int] = None
+        self._lines = 0
+        self._covered = 0  # Highest sequence included in the last compaction
+
+    def load(self) -> Dict[str, Dict]:
+        """
+        Read the saved device states.
+
+        Returns:
+            Dictionary mapping device ID to its last entry (with 'state',
+            'method', 'at' and 'info')
+        """
+        self.flush()
+        entries: Dict[str, Dict] = {}
+        lines = 0
+
+        try:
+            with open(self.path, 'rb') as f:
+                for line in f:
+                    lines += 1
+                    try:
+                        entry = json.loads(line)
+                        device_id = entry['id']
+                    except (ValueError, KeyError, TypeError):
+                        continue  # Torn write from a crash
+
+                    if entry.get('state') == STATE_REMOVED:
+                        entries.pop(device_id, None)
+                    else:
+                        entries[device_id] = entry
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"[Snapshot] Error reading {self.path}: {e}")
+
+        with self._lock:
+            self._lines = lines
+            self._live = dict(entries)
+        return entries
+
+    def record(self, device_id: str, state: str, method: Optional[str] = None,
+               changed_at: Optional[float] = None, info: Optional[Dict] = None):
+        """
+        Queue a device state for the writer thread.
+
+        Args:
+            device_id: Device ID
+            state: Device state ('removed' forgets the device)
+            method: What decided the state
+            changed_at: When the state was entered (time.time())
+            info: Device information dictionary
+        """
+        if state == STATE_REMOVED:
+            entry = {'id': device_id, 'state': state}
+        else:
+            entry = {'id': device_id, 'state': state, 'method': method, 'at': changed_at, 'info': info or {}}
+
+        with self._lock:
+            if state == STATE_REMOVED:
+                self._live.pop(device_id, None)
+            else:
+                self._live[device_id] = entry
+
+            self._sequence += 1
+            self._queue.put((self._sequence, entry))
+            self._start_writer()
+
+    def compact(self):
+        """Queue a rewrite of the journal with only the live entries."""
+        with self._lock:
+            self._queue.put((0, _COMPACT))
+            self._start_writer()
+
+    def flush(self):
+        """Wait until everything queued so far is on disk."""
+        with self._lock:
+            if self._writer is None:
+                return
+        self._queue.join()
+
+    def close(self):
+        """Write out queued entries, stop the writer and close the file."""
+        with self._lock:
+            writer, self._writer = self._writer, None
+            if writer is not None:
+                self._queue.put((0, _STOP))
+
+        if writer is not None:
+            writer.join()
+        self._close()
+
+    def _start_writer(self):
+        """Start the writer thread if it is not running (lock held)."""
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._run, name='state-journal', daemon=True)
+            self._writer.start()
+
+    def _run(self):
+        """Writer thread: write queued entries in batches."""
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                print(f"[Snapshot] Error in journal writer: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+            if any(item is _STOP for _, item in batch):
+                return
+
+    def _write_batch(self, batch: List[Tuple[int, object]]):
+        """Append a batch of entries, or compact if that is due or was asked for."""
+        entries = [(sequence, item) for sequence, item in batch if isinstance(item, dict)]
+        compact = any(item is _COMPACT for _, item in batch)
+
+        with self._lock:
+            live = len(self._live)
+        lines = self._lines + len(entries)
+        if compact or (lines >= self.compact_min_lines and lines > 2 * live):
+            with self._lock:
+                snapshot = list(self._live.values())
+                covered = self._sequence
+            if self._rewrite(snapshot):
+                self._covered = covered
+
+        data = ''.join(
+            json.dumps(entry, separators=(',', ':')) + '\n'
+            for sequence, entry in entries if sequence > self._covered
+        ).encode('utf-8')
+        if data:
+            self._append(data)
+
+    def _append(self, data: bytes):
+        """Append lines and flush them to disk (writer thread)."""
+        try:
+            if self._fd is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | os.O_CLOEXEC, 0o600)
+            os.write(self._fd, data)
+            os.fsync(self._fd)
+            self._lines += data.count(b'\n')
+        except OSError as e:
+            print(f"[Snapshot] Error writing {self.path}: {e}")
+
+    def _rewrite(self, entries: List[Dict]) -> bool:
+        """Atomically replace the journal with the given entries (writer thread)."""
+        temp_path = self.path.with_name(self.path.name + '.tmp')
+        data = ''.join(
+            json.dumps(entry, separators=(',', ':')) + '\n' for entry in entries
+        ).encode('utf-8')
+
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_CLOEXEC, 0o600)
+            try:
+                os.write(fd, data)
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            os.replace(temp_path, self.path)
+            self._fsync_dir()
+        except OSError as e:
+            print(f"[Snapshot] Error compacting {self.path}: {e}")
+            return False
+
+        # Later appends go to the new file
+        self._close()
+        self._lines = len(entries)
+        return True
+
+    def _fsync_dir(self):
+        """Make the rename durable."""
+        try:
+            fd = os.open(self.path.parent, os.O_RDONLY | os.O_DIRECTORY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    def _close(self):
+        if self._fd is not None:
+            try:
+                os.close(self._fd)
+            except OSError:
+                pass
+            self._fd = None
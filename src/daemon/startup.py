@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Startup Profiling and Readiness for SecureUSB
+
+StartupProfile records how long the daemon spends importing modules and in
+each startup phase, so regressions on the path to "USB blocking is in force"
+are visible in the journal.
+
+sd_notify() implements the systemd notification protocol (a datagram to
+$NOTIFY_SOCKET) without depending on python-systemd, so the unit can be
+Type=notify and dependants start only once protection is active.
+"""
+
+import os
+import socket
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+# (name, seconds)
+Timing = Tuple[str, float]
+
+
+class StartupProfile:
+    """Import and phase timings collected during daemon startup."""
+
+    def __init__(self, clock=time.perf_counter):
+        """
+        Start profiling.
+
+        Args:
+            clock: High-resolution time source
+        """
+        self.clock = clock
+        self.started_at = clock()
+        self.imports: List[Timing] = []
+        self.phases: List[Timing] = []
+        self.marks: List[Timing] = []
+        self._phase: Optional[Tuple[str, float]] = None
+
+    @contextmanager
+    def importing(self, name: str):
+        """
+        Time a group of imports.
+
+        Args:
+            name: Label for the imported module(s)
+        """
+        start = self.clock()
+        try:
+            yield
+        finally:
+            self.imports.append((name, self.clock() - start))
+
+    def begin(self, name: str):
+        """
+        Start a startup phase, ending the current one.
+
+        Args:
+            name: Phase name
+        """
+        self.end()
+        self._phase = (name, self.clock())
+
+    def end(self):
+        """End the current phase, if any."""
+        if self._phase is not None:
+            name, start = self._phase
+            self.phases.append((name, self.clock() - start))
+            self._phase = None
+
+    def mark(self, name: str):
+        """
+        Record a milestone, relative to the start of profiling.
+
+        Args:
+            name: Milestone name (e.g., 'ready')
+        """
+        self.marks.append((name, self.elapsed()))
+
+    def elapsed(self) -> float:
+        """Seconds since profiling started."""
+        return self.clock() - self.started_at
+
+    def as_dict(self) -> Dict[str, Dict[str, float]]:
+        """
+        Get the timings.
+
+        Returns:
+            Dictionary with 'imports', 'phases' and 'marks' sections, each
+            mapping a name to milliseconds
+        """
+        def section(timings: List[Timing]) -> Dict[str, float]:
+            return {name: round(seconds * 1000, 2) for name, seconds in timings}
+
+        return {
+            'imports': section(self.imports),
+            'phases': section(self.phases),
+            'marks': section(self.marks),
+        }
+
+    def report(self) -> str:
+        """
+        Format the timings for the log.
+
+        Returns:
+            Multi-line summary
+        """
+        lines = ["[Startup] Profile:"]
+        for title, timings in (("import", self.imports), ("phase", self.phases), ("at", self.marks)):
+            for name, seconds in timings:
+                lines.append(f"[Startup]   {title:<6} {name:<28} {seconds * 1000:8.1f} ms")
+        return '\n'.join(lines)
+
+
+def sd_notify(state: str) -> bool:
+    """
+    Send a status notification to systemd.
+
+    Does nothing when not started by systemd with a notify socket.
+
+    Args:
+        state: Newline-separated assignments, e.g. "READY=1\\nSTATUS=..."
+
+    Returns:
+        True if the notification was sent, False otherwise
+    """
+    address = os.environ.get('NOTIFY_SOCKET')
+    if not address:
+        return False
+
+    if address.startswith('@'):
+        address = '\0' + address[1:]  # Abstract namespace
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM | socket.SOCK_CLOEXEC) as sock:
+            sock.connect(address)
+            sock.sendall(state.encode('utf-8'))
+        return True
+    except OSError as e:
+        print(f"[Startup] sd_notify failed: {e}")
+        return False
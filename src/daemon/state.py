@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Device State Table for SecureUSB
+
+Single source of truth for the devices the daemon knows about. Each device
+moves through:
+
+    connected -> pending -> authorized | power_only | denied | timed_out -> removed
+
+(connected may also go straight to a decision when policy, a session or the
+re-plug cache decides without prompting). Secondary indexes by state and by
+serial number keep listing and counting cheap, and every state change is
+appended to a compact delta stream of (sequence, device_id, state) tuples
+that clients can follow or catch up on.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Device states
+STATE_CONNECTED = 'connected'
+STATE_PENDING = 'pending'
+STATE_AUTHORIZED = 'authorized'
+STATE_POWER_ONLY = 'power_only'
+STATE_DENIED = 'denied'
+STATE_TIMED_OUT = 'timed_out'
+STATE_REMOVED = 'removed'
+
+DEVICE_STATES = (
+    STATE_CONNECTED,
+    STATE_PENDING,
+    STATE_AUTHORIZED,
+    STATE_POWER_ONLY,
+    STATE_DENIED,
+    STATE_TIMED_OUT,
+)
+
+# A decided device can be decided again (e.g., denied after being authorized)
+_DECIDED = {STATE_AUTHORIZED, STATE_POWER_ONLY, STATE_DENIED}
+
+TRANSITIONS = {
+    STATE_CONNECTED: {STATE_PENDING} | _DECIDED,
+    STATE_PENDING: {STATE_TIMED_OUT} | _DECIDED,
+    STATE_AUTHORIZED: {STATE_PENDING} | _DECIDED,
+    STATE_POWER_ONLY: {STATE_PENDING} | _DECIDED,
+    STATE_DENIED: {STATE_PENDING} | _DECIDED,
+    STATE_TIMED_OUT: {STATE_PENDING} | _DECIDED,
+}
+
+DEFAULT_DELTA_HISTORY = 1024
+
+# (sequence, device_id, state)
+StateDelta = Tuple[int, str, str]
+
+
+class DeviceRecord:
+    """State of one device."""
+
+    __slots__ = ('device_id', 'info', 'state', 'method', 'changed_at')
+
+    def __init__(self, device_id: str, info: Dict):
+        self.device_id = device_id
+        self.info = info
+        self.state = STATE_CONNECTED
+        self.method: Optional[str] = None  # What decided the current state
+        self.changed_at = time.time()
+
+    @property
+    def serial_number(self) -> str:
+        return self.info.get('serial_number') or ''
+
+    def to_dict(self) -> Dict:
+        """
+        Convert record to dictionary.
+
+        Returns:
+            Device info plus 'state', 'method' and 'changed_at'
+        """
+        return dict(self.info, state=self.state, method=self.method, changed_at=self.changed_at)
+
+
+class DeviceStateTable:
+    """Indexed table of device records with a delta stream."""
+
+    def __init__(self, history: int = DEFAULT_DELTA_HISTORY):
+        """
+        Initialize an empty table.
+
+        Args:
+            history: Number of deltas kept for clients catching up
+        """
+        self._records: Dict[str, DeviceRecord] = {}
+        self._by_state: Dict[str, Dict[str, DeviceRecord]] = {state: {} for state in DEVICE_STATES}
+        self._by_serial: Dict[str, Dict[str, DeviceRecord]] = {}
+
+        self._sequence = 0
+        self._deltas: deque = deque(maxlen=history)
+        self._listeners: List[Callable[[StateDelta], None]] = []
+        self._lock = threading.RLock()
+
+    def __contains__(self, device_id: str) -> bool:
+        return device_id in self._records
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def add_listener(self, listener: Callable[[StateDelta], None]):
+        """
+        Subscribe to state changes.
+
+        Args:
+            listener: Called with each (sequence, device_id, state) delta
+        """
+        self._listeners.append(listener)
+
+    def connect(self, device_id: str, device_info: Dict) -> DeviceRecord:
+        """
+        Record a newly connected device, replacing any stale record.
+
+        Args:
+            device_id: Device ID
+            device_info: Device information dictionary
+
+        Returns:
+            The new record (state 'connected')
+        """
+        with self._lock:
+            if device_id in self._records:
+                self._unindex(self._records[device_id])
+
+            record = DeviceRecord(device_id, dict(device_info))
+            self._records[device_id] = record
+            self._index(record)
+            self._emit(record.device_id, record.state)
+            return record
+
+    def restore(self, device_id: str, device_info: Dict, state: str,
+                method: Optional[str], changed_at: float) -> DeviceRecord:
+        """
+        Re-create a record saved before a daemon restart.
+
+        Args:
+            device_id: Device ID
+            device_info: Device information dictionary
+            state: Saved state
+            method: What decided the saved state
+            changed_at: When the saved state was entered (time.time())
+
+        Returns:
+            The restored record
+        """
+        with self._lock:
+            if device_id in self._records:
+                self._unindex(self._records[device_id])
+
+            record = DeviceRecord(device_id, dict(device_info))
+            record.state = state
+            record.method = method
+            record.changed_at = changed_at
+            self._records[device_id] = record
+            self._index(record)
+            self._emit(device_id, state)
+            return record
+
+    def set_state(self, device_id: str, state: str, method: Optional[str] = None) -> bool:
+        """
+        Move a device to a new state.
+
+        Args:
+            device_id: Device ID
+            state: Target state
+            method: What decided the new state (e.g., 'totp', 'policy')
+
+        Returns:
+            True if the device changed state, False if it is unknown or the
+            transition is not allowed
+        """
+        with self._lock:
+            record = self._records.get(device_id)
+            if record is None:
+                return False
+
+            if state not in TRANSITIONS[record.state]:
+                print(f"[State] Ignoring transition {record.state} -> {state} for {device_id}")
+                return False
+
+            del self._by_state[record.state][device_id]
+            record.state = state
+            record.method = method
+            record.changed_at = time.time()
+            self._by_state[state][device_id] = record
+            self._emit(device_id, state)
+            return True
+
+    def remove(self, device_id: str) -> Optional[DeviceRecord]:
+        """
+        Drop a disconnected device.
+
+        Args:
+            device_id: Device ID
+
+        Returns:
+            The removed record, or None if the device was unknown
+        """
+        with self._lock:
+            record = self._records.pop(device_id, None)
+            if record is None:
+                return None
+
+            self._unindex(record)
+            record.state = STATE_REMOVED
+            record.changed_at = time.time()
+            self._emit(device_id, STATE_REMOVED)
+            return record
+
+    def clear(self):
+        """Drop all records (no deltas are emitted)."""
+        with self._lock:
+            self._records.clear()
+            self._by_serial.clear()
+            for records in self._by_state.values():
+                records.clear()
+
+    def get(self, device_id: str) -> Optional[DeviceRecord]:
+        """
+        Get a device record.
+
+        Args:
+            device_id: Device ID
+
+        Returns:
+            DeviceRecord or None
+        """
+        return self._records.get(device_id)
+
+    def state_of(self, device_id: str) -> Optional[str]:
+        """
+        Get the state of a device.
+
+        Args:
+            device_id: Device ID
+
+        Returns:
+            State string, or None if the device is unknown
+        """
+        record = self._records.get(device_id)
+        return record.state if record else None
+
+    def is_pending(self, device_id: str) -> bool:
+        """Check if a device awaits authorization."""
+        return device_id in self._by_state[STATE_PENDING]
+
+    def pending_info(self, device_id: str) -> Optional[Dict]:
+        """
+        Get the daemon's device information of a pending device.
+
+        Args:
+            device_id: Device ID
+
+        Returns:
+            Device information dictionary, or None if not pending
+        """
+        record = self._by_state[STATE_PENDING].get(device_id)
+        return record.info if record else None
+
+    def in_state(self, state: str) -> List[DeviceRecord]:
+        """
+        List devices in a state.
+
+        Args:
+            state: Device state
+
+        Returns:
+            List of records, oldest first
+        """
+        with self._lock:
+            return list(self._by_state.get(state, {}).values())
+
+    def count(self, state: str) -> int:
+        """
+        Count devices in a state.
+
+        Args:
+            state: Device state
+
+        Returns:
+            Number of devices
+        """
+        return len(self._by_state.get(state, {}))
+
+    def counts(self) -> Dict[str, int]:
+        """
+        Count devices in every state.
+
+        Returns:
+            Dictionary mapping state to number of devices
+        """
+        with self._lock:
+            return {state: len(records) for state, records in self._by_state.items()}
+
+    def find_by_serial(self, serial_number: str) -> List[DeviceRecord]:
+        """
+        Find attached devices with a serial number.
+
+        Args:
+            serial_number: Device serial number
+
+        Returns:
+            List of records (usually zero or one)
+        """
+        with self._lock:
+            return list(self._by_serial.get(serial_number, {}).values())
+
+    def deltas_since(self, sequence: int) -> List[StateDelta]:
+        """
+        Get state changes after a sequence number.
+
+        If the first returned delta is not sequence + 1, older changes have
+        been dropped from the history and the client should re-read the
+        full state.
+
+        Args:
+            sequence: Last sequence number the client has seen (0 for all)
+
+        Returns:
+            List of (sequence, device_id, state) tuples
+        """
+        with self._lock:
+            return [delta for delta in self._deltas if delta[0] > sequence]
+
+    @property
+    def sequence(self) -> int:
+        """Sequence number of the latest delta."""
+        return self._sequence
+
+    def _index(self, record: DeviceRecord):
+        self._by_state[record.state][record.device_id] = record
+        if record.serial_number:
+            self._by_serial.setdefault(record.serial_number, {})[record.device_id] = record
+
+    def _unindex(self, record: DeviceRecord):
+        self._by_state[record.state].pop(record.device_id, None)
+        if record.serial_number:
+            records = self._by_serial.get(record.serial_number)
+            if records is not None:
+                records.pop(record.device_id, None)
+                if not records:
+                    del self._by_serial[record.serial_number]
+
+    def _emit(self, device_id: str, state: str):
+        """Append a delta and notify listeners (called with the lock held)."""
+        self._sequence += 1
+        delta = (self._sequence, device_id, state)
+        self._deltas.append(delta)
+
+        for listener in self._listeners:
+            try:
+                listener(delta)
+            except Exception as e:
+                print(f"[State] Error in state listener: {e}")
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Deadline Scheduler for SecureUSB
+
+Tracks per-device authorization deadlines with a single heap and a single
+main-loop timeout armed for the nearest deadline, instead of one GLib source
+per pending device.
+
+Cancelling marks the heap entry dead (O(1)); rescheduling cancels and pushes
+a new entry (O(log n)). Dead entries are skipped when they reach the top of
+the heap and compacted away when they outnumber live ones.
+"""
+
+import heapq
+import itertools
+import math
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+
+class DeadlineScheduler:
+    """Heap-driven one-shot deadlines keyed by device ID."""
+
+    # Rebuild the heap once this many dead entries have piled up
+    COMPACT_THRESHOLD = 64
+
+    def __init__(self,
+                 callback: Callable[[str], object],
+                 add_timeout: Callable,
+                 remove_timeout: Callable,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the scheduler.
+
+        Args:
+            callback: Called with the key of each expired deadline
+            add_timeout: Main-loop timer function with the signature of
+                         GLib.timeout_add(interval_ms, function) -> source_id
+            remove_timeout: Main-loop timer removal, like GLib.source_remove
+            clock: Monotonic time source
+        """
+        self.callback = callback
+        self.add_timeout = add_timeout
+        self.remove_timeout = remove_timeout
+        self.clock = clock
+
+        # Heap of [deadline, sequence, key, alive]
+        self._heap: List[list] = []
+        self._entries: Dict[str, list] = {}
+        self._sequence = itertools.count()
+        self._dead = 0
+
+        self._source_id = None
+        self._armed_deadline: Optional[float] = None
+
+        # Guards the heap, the entries and the armed source
+        self._lock = threading.Lock()
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def schedule(self, key: str, delay_seconds: float):
+        """
+        Schedule (or reschedule) a deadline.
+
+        Args:
+            key: Device ID
+            delay_seconds: Seconds from now until the callback fires
+        """
+        with self._lock:
+            self._discard(key)
+
+            entry = [self.clock() + delay_seconds, next(self._sequence), key, True]
+            self._entries[key] = entry
+            heapq.heappush(self._heap, entry)
+
+            self._arm()
+
+    def cancel(self, key: str) -> bool:
+        """
+        Cancel a deadline.
+
+        The main-loop timeout is left alone; if it was armed for this entry it
+        wakes up once, finds nothing due and re-arms for the next deadline.
+
+        Args:
+            key: Device ID
+
+        Returns:
+            True if a deadline was cancelled, False if none was scheduled
+        """
+        with self._lock:
+            if not self._discard(key):
+                return False
+
+            if not self._entries:
+                self._disarm()
+            return True
+
+    def remaining(self, key: str) -> Optional[float]:
+        """
+        Get time left until a deadline.
+
+        Args:
+            key: Device ID
+
+        Returns:
+            Seconds remaining (never negative), or None if not scheduled
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            return max(0.0, entry[0] - self.clock())
+
+    def remaining_all(self) -> Dict[str, float]:
+        """
+        Get time left for every scheduled deadline.
+
+        Returns:
+            Dictionary mapping device ID to seconds remaining
+        """
+        with self._lock:
+            now = self.clock()
+            return {key: max(0.0, entry[0] - now) for key, entry in self._entries.items()}
+
+    def clear(self):
+        """Cancel all deadlines and the main-loop timeout."""
+        with self._lock:
+            self._heap.clear()
+            self._entries.clear()
+            self._dead = 0
+            self._disarm()
+
+    def _discard(self, key: str) -> bool:
+        """Mark a key's heap entry dead (lock held)."""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+
+        entry[3] = False
+        self._dead += 1
+        if self._dead > self.COMPACT_THRESHOLD and self._dead > len(self._entries):
+            self._heap = [e for e in self._heap if e[3]]
+            heapq.heapify(self._heap)
+            self._dead = 0
+        return True
+
+    def _next_deadline(self) -> Optional[float]:
+        """Drop dead entries from the top of the heap and peek the nearest deadline (lock held)."""
+        while self._heap and not self._heap[0][3]:
+            heapq.heappop(self._heap)
+            self._dead -= 1
+        return self._heap[0][0] if self._heap else None
+
+    def _arm(self):
+        """Make sure exactly one main-loop timeout covers the nearest deadline (lock held)."""
+        deadline = self._next_deadline()
+        if deadline is None:
+            self._disarm()
+            return
+
+        if self._source_id is not None and self._armed_deadline <= deadline:
+            return  # Already waking up in time
+
+        self._disarm()
+        delay_ms = max(0, math.ceil((deadline - self.clock()) * 1000))
+        self._armed_deadline = deadline
+        self._source_id = self.add_timeout(delay_ms, self._on_timeout)
+
+    def _disarm(self):
+        """Remove the main-loop timeout, if any (lock held)."""
+        if self._source_id is not None:
+            self.remove_timeout(self._source_id)
+        self._source_id = None
+        self._armed_deadline = None
+
+    def _on_timeout(self) -> bool:
+        """Main-loop callback: fire every expired deadline, then re-arm."""
+        with self._lock:
+            self._source_id = None
+            self._armed_deadline = None
+
+            now = self.clock()
+            expired = []
+            while True:
+                deadline = self._next_deadline()
+                if deadline is None or deadline > now:
+                    break
+                entry = heapq.heappop(self._heap)
+                del self._entries[entry[2]]
+                expired.append(entry[2])
+
+        for key in expired:
+            try:
+                self.callback(key)
+            except Exception as e:
+                print(f"[Timers] Error in deadline callback for {key}: {e}")
+
+        with self._lock:
+            self._arm()
+        return False  # One-shot; _arm() adds a fresh source
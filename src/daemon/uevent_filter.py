@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Kernel-side uevent Filtering for SecureUSB
+
+Builds classic BPF socket filters for the udev netlink monitor so that only
+the uevents the daemon acts on (add/remove of usb_device) wake up Python.
+Everything else (bind, unbind, change, ...) is dropped by the kernel.
+
+The filter understands the libudev monitor wire format:
+
+    struct monitor_netlink_header {
+        char prefix[8];            /* "libudev" */
+        unsigned magic;            /* htobe32(0xfeedcafe) */
+        unsigned header_size;
+        unsigned properties_off;   /* host byte order */
+        unsigned properties_len;
+        unsigned filter_subsystem_hash;
+        unsigned filter_devtype_hash;
+        unsigned filter_tag_bloom_hi;
+        unsigned filter_tag_bloom_lo;
+    };
+
+followed by a NUL-separated property list that starts with ACTION=.
+Anything that does not look like that is passed through unchanged, so the
+userspace action check in USBMonitor remains the source of truth.
+"""
+
+import ctypes
+import errno
+import socket
+import struct
+import sys
+import threading
+from typing import Iterable, List, Tuple
+
+# Classic BPF opcodes (linux/filter.h)
+BPF_LD = 0x00
+BPF_JMP = 0x05
+BPF_RET = 0x06
+BPF_W = 0x00
+BPF_H = 0x08
+BPF_B = 0x10
+BPF_ABS = 0x20
+BPF_JEQ = 0x10
+BPF_K = 0x00
+
+SO_ATTACH_FILTER = getattr(socket, 'SO_ATTACH_FILTER', 26)
+SO_RCVBUFFORCE = getattr(socket, 'SO_RCVBUFFORCE', 33)
+NETLINK_KOBJECT_UEVENT = 15
+UDEV_MONITOR_GROUP = 2
+
+UDEV_MONITOR_MAGIC = 0xfeedcafe
+UDEV_HEADER_SIZE = 40
+ACCEPT = 0xffffffff
+DROP = 0
+
+# Header field offsets
+_OFF_MAGIC = 8
+_OFF_PROPERTIES = 16
+_OFF_SUBSYSTEM_HASH = 24
+_OFF_DEVTYPE_HASH = 28
+
+# Bytes kept per packet by the dropped-event counter socket
+COUNTER_SNAPLEN = 8
+
+# Instruction: (code, jt, jf, k) where jt/jf may be label names
+Instruction = Tuple[int, object, object, int]
+
+
+def murmur_hash2(data: bytes, seed: int = 0) -> int:
+    """
+    32-bit MurmurHash2, as used by libudev for subsystem/devtype filter hashes.
+
+    Args:
+        data: Bytes to hash
+        seed: Hash seed (libudev uses 0)
+
+    Returns:
+        Unsigned 32-bit hash value
+    """
+    m = 0x5bd1e995
+    length = len(data)
+    h = (seed ^ length) & 0xffffffff
+
+    offset = 0
+    while length - offset >= 4:
+        k = int.from_bytes(data[offset:offset + 4], sys.byteorder)
+        k = (k * m) & 0xffffffff
+        k ^= k >> 24
+        k = (k * m) & 0xffffffff
+        h = (h * m) & 0xffffffff
+        h ^= k
+        offset += 4
+
+    tail = length - offset
+    if tail == 3:
+        h ^= data[offset + 2] << 16
+    if tail >= 2:
+        h ^= data[offset + 1] << 8
+    if tail >= 1:
+        h ^= data[offset]
+        h = (h * m) & 0xffffffff
+
+    h ^= h >> 13
+    h = (h * m) & 0xffffffff
+    h ^= h >> 15
+    return h
+
+
+def _assemble(program: List[Instruction], labels: dict) -> List[Tuple[int, int, int, int]]:
+    """Resolve label jump targets into relative BPF offsets."""
+    resolved = []
+    for index, (code, jt, jf, k) in enumerate(program):
+        if isinstance(jt, str):
+            jt = labels[jt] - index - 1
+        if isinstance(jf, str):
+            jf = labels[jf] - index - 1
+        resolved.append((code, jt, jf, k))
+    return resolved
+
+
+def build_uevent_filter(subsystem: str,
+                        devtype: str,
+                        actions: Iterable[str],
+                        invert: bool = False) -> List[Tuple[int, int, int, int]]:
+    """
+    Build a BPF program matching libudev messages by subsystem, devtype and action.
+
+    Actions are matched on their first character, so they must be unambiguous
+    among udev actions (add/remove are: nothing else starts with 'a' or 'r').
+
+    Args:
+        subsystem: Subsystem to match (e.g., 'usb')
+        devtype: Device type to match (e.g., 'usb_device')
+        actions: Actions to accept (e.g., ['add', 'remove'])
+        invert: If True, accept only matching-subsystem events whose action is
+                NOT in actions (truncated to COUNTER_SNAPLEN bytes). Used to
+                count what the normal filter drops.
+
+    Returns:
+        List of (code, jt, jf, k) instructions
+    """
+    actions = list(actions)
+    first_chars = sorted({ord(action[0]) for action in actions})
+    if len(first_chars) != len(actions):
+        raise ValueError("Actions must have distinct first characters")
+
+    props_off = int.from_bytes(struct.pack('=I', UDEV_HEADER_SIZE), 'big')
+
+    if invert:
+        wanted, unwanted, unknown, foreign = 'drop', 'keep', 'drop', 'drop'
+    else:
+        wanted, unwanted, unknown, foreign = 'accept', 'drop', 'accept', 'accept'
+
+    program: List[Instruction] = [
+        (BPF_LD | BPF_W | BPF_ABS, 0, 0, _OFF_MAGIC),
+        (BPF_JMP | BPF_JEQ | BPF_K, 0, foreign, UDEV_MONITOR_MAGIC),
+        (BPF_LD | BPF_W | BPF_ABS, 0, 0, _OFF_SUBSYSTEM_HASH),
+        (BPF_JMP | BPF_JEQ | BPF_K, 0, 'drop', murmur_hash2(subsystem.encode())),
+        (BPF_LD | BPF_W | BPF_ABS, 0, 0, _OFF_DEVTYPE_HASH),
+        (BPF_JMP | BPF_JEQ | BPF_K, 0, 'drop', murmur_hash2(devtype.encode())),
+        # Only trust the fixed layout; otherwise leave the decision to userspace
+        (BPF_LD | BPF_W | BPF_ABS, 0, 0, _OFF_PROPERTIES),
+        (BPF_JMP | BPF_JEQ | BPF_K, 0, unknown, props_off),
+        (BPF_LD | BPF_W | BPF_ABS, 0, 0, UDEV_HEADER_SIZE),
+        (BPF_JMP | BPF_JEQ | BPF_K, 0, unknown, int.from_bytes(b'ACTI', 'big')),
+        (BPF_LD | BPF_H | BPF_ABS, 0, 0, UDEV_HEADER_SIZE + 4),
+        (BPF_JMP | BPF_JEQ | BPF_K, 0, unknown, int.from_bytes(b'ON', 'big')),
+        (BPF_LD | BPF_B | BPF_ABS, 0, 0, UDEV_HEADER_SIZE + 6),
+        (BPF_JMP | BPF_JEQ | BPF_K, 0, unknown, ord('=')),
+        (BPF_LD | BPF_B | BPF_ABS, 0, 0, UDEV_HEADER_SIZE + 7),
+    ]
+
+    for index, char in enumerate(first_chars):
+        last = index == len(first_chars) - 1
+        program.append((BPF_JMP | BPF_JEQ | BPF_K, wanted, unwanted if last else 0, char))
+
+    labels = {}
+    labels['drop'] = len(program)
+    program.append((BPF_RET | BPF_K, 0, 0, DROP))
+    labels['accept'] = len(program)
+    program.append((BPF_RET | BPF_K, 0, 0, ACCEPT))
+    labels['keep'] = len(program)
+    program.append((BPF_RET | BPF_K, 0, 0, COUNTER_SNAPLEN))
+
+    return _assemble(program, labels)
+
+
+def _pack_program(program: List[Tuple[int, int, int, int]]) -> Tuple[bytes, ctypes.Array]:
+    """Pack a program into a struct sock_fprog, returning it with its backing buffer."""
+    instructions = b''.join(struct.pack('=HBBI', *insn) for insn in program)
+    buffer = ctypes.create_string_buffer(instructions, len(instructions))
+    fprog = struct.pack('HL', len(program), ctypes.addressof(buffer))
+    return fprog, buffer
+
+
+def attach_socket_filter(sock: socket.socket, program: List[Tuple[int, int, int, int]]):
+    """
+    Attach a BPF program to a socket, replacing any existing filter.
+
+    Args:
+        sock: Socket to attach to
+        program: Instructions from build_uevent_filter()
+
+    Raises:
+        OSError: If the kernel rejects the filter
+    """
+    fprog, buffer = _pack_program(program)
+    sock.setsockopt(socket.SOL_SOCKET, SO_ATTACH_FILTER, fprog)
+    del buffer  # Kernel has copied the program
+
+
+def attach_filter_to_fd(fd: int, program: List[Tuple[int, int, int, int]]):
+    """
+    Attach a BPF program to an existing netlink socket file descriptor.
+
+    The descriptor is duplicated for the setsockopt call; the filter applies
+    to the underlying socket, so the caller's descriptor is affected.
+
+    Args:
+        fd: Socket file descriptor (e.g., pyudev Monitor.fileno())
+        program: Instructions from build_uevent_filter()
+    """
+    sock = socket.fromfd(fd, socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_KOBJECT_UEVENT)
+    try:
+        attach_socket_filter(sock, program)
+    finally:
+        sock.close()
+
+
+class DroppedEventCounter:
+    """
+    Counts uevents dropped by the kernel filter without waking up for them.
+
+    Opens a second udev monitor socket carrying the inverted filter, so it only
+    queues the events the main socket drops, truncated to a few bytes each.
+    Nobody polls it; it is drained opportunistically whenever the daemon is
+    awake anyway (on a relevant event or when statistics are requested), which
+    can be the monitor thread or the metrics exporter, so drains are locked.
+    """
+
+    RECEIVE_BUFFER_BYTES = 1024 * 1024
+
+    def __init__(self, subsystem: str, devtype: str, actions: Iterable[str]):
+        """
+        Open the counter socket.
+
+        Args:
+            subsystem: Subsystem the main filter accepts
+            devtype: Device type the main filter accepts
+            actions: Actions the main filter accepts
+
+        Raises:
+            OSError: If the netlink socket cannot be created or bound
+        """
+        self.count = 0
+        self.overflowed = False
+        self._lock = threading.Lock()
+
+        self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_KOBJECT_UEVENT)
+        try:
+            attach_socket_filter(self.sock, build_uevent_filter(subsystem, devtype, actions, invert=True))
+            try:
+                self.sock.setsockopt(socket.SOL_SOCKET, SO_RCVBUFFORCE, self.RECEIVE_BUFFER_BYTES)
+            except OSError:
+                self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.RECEIVE_BUFFER_BYTES)
+            self.sock.setblocking(False)
+            self.sock.bind((0, UDEV_MONITOR_GROUP))
+        except OSError:
+            self.sock.close()
+            raise
+
+    def drain(self) -> int:
+        """
+        Consume queued packets and add them to the count.
+
+        Returns:
+            Total number of dropped events counted so far
+        """
+        with self._lock:
+            if self.sock is None:
+                return self.count
+
+            while True:
+                try:
+                    self.sock.recv(COUNTER_SNAPLEN)
+                    self.count += 1
+                except BlockingIOError:
+                    break
+                except OSError as e:
+                    if e.errno == errno.ENOBUFS:
+                        # Queue overflowed between drains; the count is a lower bound
+                        self.overflowed = True
+                        continue
+                    break
+
+            return self.count
+
+    def close(self):
+        """Close the counter socket."""
+        self.drain()
+        with self._lock:
+            if self.sock is not None:
+                self.sock.close()
+                self.sock = None
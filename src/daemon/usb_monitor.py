@@ -9,9 +9,14 @@ Detects when new USB devices are plugged in and triggers authorization workflow.
 import pyudev
 import threading
 import time
-from typing import Callable, Optional, Dict
+from typing import Callable, Optional, Dict, List
 from pathlib import Path
 
+from . import uevent_filter
+
+# Only these uevent actions are acted on; everything else is filtered
+MONITORED_ACTIONS = ('add', 'remove')
+
 
 class USBDevice:
     """Represents a USB device with relevant information."""
@@ -23,6 +28,9 @@ class USBDevice:
         Args:
             device: pyudev.Device object
         """
+        # When the uevent reached us (time.monotonic), for latency metrics
+        self.received_at = time.monotonic()
+
         self.device = device
         self.device_path = device.sys_path
         self.device_id = Path(device.sys_path).name
@@ -91,6 +99,31 @@ class USBDevice:
         # You might want to customize this based on your needs
         return True
 
+    def get_interface_classes(self) -> List[str]:
+        """
+        Get the USB interface classes of the device.
+
+        Parses ID_USB_INTERFACES (e.g., ":080650:030101:").
+
+        Returns:
+            Sorted list of two-digit hex class codes (e.g., ['03', '08'])
+        """
+        classes = {
+            entry[:2].lower()
+            for entry in self.usb_interfaces.split(':')
+            if len(entry) == 6
+        }
+        return sorted(classes)
+
+    def is_root_hub(self) -> bool:
+        """
+        Check if this is a USB controller's root hub (e.g., usb1).
+
+        Returns:
+            True if root hub, False otherwise
+        """
+        return self.device_id.startswith('usb')
+
     def get_display_name(self) -> str:
         """
         Get human-readable device name.
@@ -120,6 +153,7 @@ class USBDevice:
             'vendor_name': self.vendor_name,
             'product_name': self.product_name,
             'serial_number': self.serial_number,
+            'usb_interfaces': self.usb_interfaces,
             'display_name': self.get_display_name()
         }
 
@@ -131,25 +165,39 @@ class USBDevice:
 class USBMonitor:
     """Monitors USB device connection events."""
 
-    def __init__(self, callback: Optional[Callable[[USBDevice, str], None]] = None):
+    def __init__(self,
+                 callback: Optional[Callable[[USBDevice, str], None]] = None,
+                 controller_callback: Optional[Callable[[str, str], None]] = None,
+                 devices=None):
         """
         Initialize USB monitor.
 
         Args:
             callback: Function to call when device event occurs.
                      Signature: callback(device: USBDevice, action: str)
-                     Actions: 'add', 'remove', 'bind', 'unbind'
+                     Actions: 'add', 'remove'
+            controller_callback: Function to call when a root hub (USB
+                     controller) is added or removed.
+                     Signature: controller_callback(controller: str, action: str)
+            devices: DeviceStateTable the callback records devices in; add
+                     events for devices already in it are dropped as duplicates
         """
         self.context = pyudev.Context()
         self.monitor = pyudev.Monitor.from_netlink(self.context)
         self.monitor.filter_by(subsystem='usb', device_type='usb_device')
 
         self.callback = callback
+        self.controller_callback = controller_callback
         self.observer = None
         self.running = False
 
-        # Track seen devices to avoid duplicates
-        self.seen_devices = set()
+        # Devices already known (the daemon's state table), to drop duplicate adds
+        self.devices = devices
+
+        # Kernel-side action filtering (see _attach_kernel_filter)
+        self.kernel_filter_active = False
+        self.dropped_counter = None
+        self.events_ignored = 0
 
     def start(self, threaded: bool = True):
         """
@@ -164,8 +212,14 @@ class USBMonitor:
 
         self.running = True
 
+        # Enable receiving before replacing libudev's socket filter, so that
+        # libudev does not install its own filter over ours afterwards
+        self.monitor.start()
+        self._attach_kernel_filter()
+
         if threaded:
-            self.observer = pyudev.MonitorObserver(self.monitor, callback=self._on_event)
+            # Look the handler up per event so it can be swapped at runtime (profiling)
+            self.observer = pyudev.MonitorObserver(self.monitor, callback=lambda device: self._on_event(device))
             self.observer.start()
             print("USB monitor started (background thread)")
         else:
@@ -187,8 +241,61 @@ class USBMonitor:
             self.observer.stop()
             self.observer = None
 
+        if self.dropped_counter:
+            self.dropped_counter.close()
+            print(f"[USB Monitor] Wakeups saved by kernel filter: {self.dropped_counter.count}")
+            self.dropped_counter = None
+
         print("USB monitor stopped")
 
+    def _attach_kernel_filter(self):
+        """
+        Push the add/remove action filter down to the netlink socket.
+
+        Replaces libudev's subsystem/devtype BPF program with one that also
+        checks the uevent action, so bind/unbind/change events never wake the
+        monitor thread. Failure is not fatal: _on_event still filters actions.
+        """
+        program = uevent_filter.build_uevent_filter('usb', 'usb_device', MONITORED_ACTIONS)
+
+        try:
+            uevent_filter.attach_filter_to_fd(self.monitor.fileno(), program)
+            self.kernel_filter_active = True
+        except Exception as e:
+            print(f"[USB Monitor] Warning: kernel uevent filter unavailable, filtering in userspace: {e}")
+            return
+
+        try:
+            self.dropped_counter = uevent_filter.DroppedEventCounter(
+                'usb', 'usb_device', MONITORED_ACTIONS
+            )
+        except Exception as e:
+            print(f"[USB Monitor] Warning: dropped-event counter unavailable: {e}")
+
+    def get_filter_stats(self) -> Dict:
+        """
+        Get event filtering statistics.
+
+        Returns:
+            Dictionary with:
+              kernel_filter: True if the BPF action filter is attached
+              wakeups_saved: Irrelevant uevents dropped in the kernel
+              wakeups_saved_is_lower_bound: True if the counter queue overflowed
+              events_ignored: Irrelevant uevents that still reached userspace
+        """
+        saved = 0
+        overflowed = False
+        if self.dropped_counter:
+            saved = self.dropped_counter.drain()
+            overflowed = self.dropped_counter.overflowed
+
+        return {
+            'kernel_filter': self.kernel_filter_active,
+            'wakeups_saved': saved,
+            'wakeups_saved_is_lower_bound': overflowed,
+            'events_ignored': self.events_ignored,
+        }
+
     def _on_event(self, device: pyudev.Device):
         """
         Handle USB device event.
@@ -198,25 +305,34 @@ class USBMonitor:
         """
         action = device.action
 
-        # Only process add and remove events
-        if action not in ['add', 'remove']:
+        # Only process add and remove events (the kernel filter normally
+        # drops everything else before it gets here)
+        if action not in MONITORED_ACTIONS:
+            self.events_ignored += 1
             return
 
+        # We are awake anyway; fold in what the kernel dropped meanwhile
+        if self.dropped_counter:
+            self.dropped_counter.drain()
+
         try:
             usb_device = USBDevice(device)
 
+            # Root hubs are controllers, not devices to authorize
+            if usb_device.is_root_hub():
+                print(f"[USB Monitor] Controller {action}: {usb_device.device_id}")
+                if self.controller_callback:
+                    self.controller_callback(usb_device.device_id, action)
+                return
+
             # Filter out invalid devices
             if not usb_device.is_valid_device():
                 return
 
-            # Track device to avoid duplicates
-            device_key = f"{usb_device.device_id}_{action}"
-
             if action == 'add':
                 # Avoid processing the same device multiple times
-                if device_key in self.seen_devices:
+                if self.devices is not None and usb_device.device_id in self.devices:
                     return
-                self.seen_devices.add(device_key)
 
                 print(f"[USB Monitor] Device connected: {usb_device}")
 
@@ -224,11 +340,6 @@ class USBMonitor:
                     self.callback(usb_device, action)
 
             elif action == 'remove':
-                # Clean up seen devices tracking
-                add_key = f"{usb_device.device_id}_add"
-                if add_key in self.seen_devices:
-                    self.seen_devices.remove(add_key)
-
                 print(f"[USB Monitor] Device disconnected: {usb_device}")
 
                 if self.callback:
@@ -302,6 +302,9 @@ class AuthorizationDialog(Adw.Window):
             self.timeout_seconds = 30  # Reset timeout
             self._start_countdown()
 
+        elif result == 'rate_limited':
+            self._show_error("Too many failed attempts. Please wait before trying again.")
+
         else:
             self._show_error(f"Authorization error: {result}")
 
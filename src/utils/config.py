@@ -8,7 +8,7 @@ Manages application configuration and settings.
 import json
 import copy
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 
 from .paths import resolve_config_dir
 
@@ -16,6 +16,15 @@ from .paths import resolve_config_dir
 MIN_TIMEOUT_SECONDS = 10
 MAX_TIMEOUT_SECONDS = 300
 DEFAULT_TIMEOUT_SECONDS = 30
+DEFAULT_SESSION_MINUTES = 5
+MAX_SESSION_MINUTES = 480
+SESSION_SCOPES = ('hid', 'same_vendor', 'any')
+DEFAULT_REPLUG_GRACE_SECONDS = 30
+MAX_REPLUG_GRACE_SECONDS = 600
+DEFAULT_METRICS_TEXTFILE = '/var/lib/prometheus/node-exporter/secureusb.prom'
+DEFAULT_METRICS_INTERVAL_SECONDS = 15
+DEFAULT_AUDIT_JSONL_MAX_BYTES = 10 * 1024 * 1024
+DEFAULT_AUDIT_JSONL_BACKUPS = 5
 
 
 class Config:
@@ -40,6 +49,27 @@ class Config:
             'log_retention_days': 90,
             'block_unknown_devices': True,
         },
+        'session': {
+            'enabled': False,
+            'duration_minutes': DEFAULT_SESSION_MINUTES,
+            'scope': 'hid',  # hid, same_vendor, any
+        },
+        'replug': {
+            'grace_seconds': DEFAULT_REPLUG_GRACE_SECONDS,  # 0 = always prompt again
+        },
+        'metrics': {
+            'enabled': False,
+            'textfile': DEFAULT_METRICS_TEXTFILE,  # '' = no .prom file
+            'interval_seconds': DEFAULT_METRICS_INTERVAL_SECONDS,
+            'socket': '',  # Unix socket for HTTP scrapes, '' = disabled
+        },
+        'audit': {
+            'journald': False,
+            'jsonl_file': '',  # '' = disabled
+            'jsonl_max_bytes': DEFAULT_AUDIT_JSONL_MAX_BYTES,
+            'jsonl_backups': DEFAULT_AUDIT_JSONL_BACKUPS,
+            'syslog_socket': '',  # e.g. /dev/log, '' = disabled
+        },
         'ui': {
             'show_device_details': True,
             'remember_window_position': True,
@@ -106,6 +136,76 @@ class Config:
 
         return result
 
+    def _validate(self, config: Dict, default: Optional[Dict] = None, prefix: str = '') -> Optional[str]:
+        """
+        Check that known settings have the same types as their defaults.
+
+        Args:
+            config: Merged configuration to check
+            default: Default section to compare against (top level if None)
+            prefix: Dotted path of the section, for error messages
+
+        Returns:
+            Description of the first problem found, or None if valid
+        """
+        if default is None:
+            default = self.DEFAULT_CONFIG
+
+        for key, default_value in default.items():
+            value = config.get(key)
+            path = f"{prefix}{key}"
+
+            if isinstance(default_value, dict):
+                if not isinstance(value, dict):
+                    return f"{path} must be an object"
+                problem = self._validate(value, default_value, f"{path}.")
+                if problem:
+                    return problem
+            elif isinstance(default_value, bool):
+                if not isinstance(value, bool):
+                    return f"{path} must be true or false"
+            elif isinstance(default_value, int):
+                if isinstance(value, bool) or not isinstance(value, int):
+                    return f"{path} must be an integer"
+            elif isinstance(default_value, str):
+                if not isinstance(value, str):
+                    return f"{path} must be a string"
+
+        return None
+
+    def reload(self) -> bool:
+        """
+        Re-read the configuration file after an external edit.
+
+        The new configuration replaces the current one only if it parses and
+        validates; otherwise the current configuration stays in effect.
+
+        Returns:
+            True if the configuration changed, False otherwise
+        """
+        try:
+            with open(self.config_file, 'r') as f:
+                loaded = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error reloading config, keeping current settings: {e}")
+            return False
+
+        if not isinstance(loaded, dict):
+            print("Error reloading config, keeping current settings: not a JSON object")
+            return False
+
+        config = self._merge_configs(self.DEFAULT_CONFIG, loaded)
+        problem = self._validate(config)
+        if problem:
+            print(f"Error reloading config, keeping current settings: {problem}")
+            return False
+
+        if config == self.config:
+            return False
+
+        self.config = config
+        return True
+
     def save(self) -> bool:
         """
         Save configuration to file.
@@ -220,6 +320,132 @@ class Config:
         seconds = max(MIN_TIMEOUT_SECONDS, min(MAX_TIMEOUT_SECONDS, seconds))
         return self.set('general.timeout_seconds', seconds)
 
+    def get_session_minutes(self) -> int:
+        """
+        Get the length of an authenticated session.
+
+        Returns:
+            Session length in minutes, or 0 if sessions are disabled
+        """
+        if not self.get('session.enabled', False):
+            return 0
+
+        try:
+            minutes = int(self.get('session.duration_minutes', DEFAULT_SESSION_MINUTES))
+        except (TypeError, ValueError):
+            minutes = DEFAULT_SESSION_MINUTES
+
+        return max(0, min(MAX_SESSION_MINUTES, minutes))
+
+    def get_session_scope(self) -> str:
+        """
+        Get which devices an authenticated session covers.
+
+        Returns:
+            'hid', 'same_vendor' or 'any' (unknown values fall back to 'hid')
+        """
+        scope = self.get('session.scope', 'hid')
+        return scope if scope in SESSION_SCOPES else 'hid'
+
+    def get_replug_grace_seconds(self) -> int:
+        """
+        Get how long a disconnected device may come back without a prompt.
+
+        Returns:
+            Grace period in seconds, or 0 if disabled
+        """
+        try:
+            seconds = int(self.get('replug.grace_seconds', DEFAULT_REPLUG_GRACE_SECONDS))
+        except (TypeError, ValueError):
+            seconds = DEFAULT_REPLUG_GRACE_SECONDS
+
+        return max(0, min(MAX_REPLUG_GRACE_SECONDS, seconds))
+
+    def get_metrics_textfile(self) -> Optional[Path]:
+        """
+        Get the .prom file metrics are written to.
+
+        Returns:
+            Path, or None if metrics or the textfile are disabled
+        """
+        if not self.get('metrics.enabled', False):
+            return None
+        textfile = self.get('metrics.textfile', DEFAULT_METRICS_TEXTFILE)
+        return Path(textfile) if textfile else None
+
+    def get_metrics_interval(self) -> int:
+        """
+        Get how often the .prom file is rewritten.
+
+        Returns:
+            Interval in seconds (at least 1)
+        """
+        try:
+            seconds = int(self.get('metrics.interval_seconds', DEFAULT_METRICS_INTERVAL_SECONDS))
+        except (TypeError, ValueError):
+            seconds = DEFAULT_METRICS_INTERVAL_SECONDS
+
+        return max(1, seconds)
+
+    def get_metrics_socket(self) -> Optional[Path]:
+        """
+        Get the Unix socket metrics are served on over HTTP.
+
+        Returns:
+            Path, or None if metrics or the endpoint are disabled
+        """
+        if not self.get('metrics.enabled', False):
+            return None
+        socket_path = self.get('metrics.socket', '')
+        return Path(socket_path) if socket_path else None
+
+    def get_audit_journald(self) -> bool:
+        """
+        Check if audit events are also sent to the systemd journal.
+
+        Returns:
+            True if enabled, False otherwise
+        """
+        return bool(self.get('audit.journald', False))
+
+    def get_audit_jsonl_file(self) -> Optional[Path]:
+        """
+        Get the JSON lines file audit events are appended to.
+
+        Returns:
+            Path, or None if disabled
+        """
+        path = self.get('audit.jsonl_file', '')
+        return Path(path) if path else None
+
+    def get_audit_jsonl_rotation(self) -> Tuple[int, int]:
+        """
+        Get when and how the JSON lines file is rotated.
+
+        Returns:
+            Tuple of (maximum size in bytes, number of rotated files kept)
+        """
+        try:
+            max_bytes = int(self.get('audit.jsonl_max_bytes', DEFAULT_AUDIT_JSONL_MAX_BYTES))
+        except (TypeError, ValueError):
+            max_bytes = DEFAULT_AUDIT_JSONL_MAX_BYTES
+        try:
+            backups = int(self.get('audit.jsonl_backups', DEFAULT_AUDIT_JSONL_BACKUPS))
+        except (TypeError, ValueError):
+            backups = DEFAULT_AUDIT_JSONL_BACKUPS
+
+        return max(4096, max_bytes), max(0, backups)
+
+    def get_audit_syslog_socket(self) -> Optional[Path]:
+        """
+        Get the Unix socket audit events are sent to as RFC 5424 syslog.
+
+        Returns:
+            Path, or None if disabled
+        """
+        socket_path = self.get('audit.syslog_socket', '')
+        return Path(socket_path) if socket_path else None
+
     def export_config(self, export_path: Path) -> bool:
         """
         Export configuration to file.
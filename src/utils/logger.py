@@ -10,7 +10,7 @@ import sqlite3
 import time
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional
 from enum import Enum
 
 from .paths import resolve_config_dir
@@ -46,6 +46,9 @@ class USBLogger:
         else:
             self.db_path = Path(db_path)
 
+        # Called with the duration in seconds of each event write
+        self.write_observer: Optional[Callable[[float], None]] = None
+
         self._init_database()
 
         # Automatically cleanup old events on initialization
@@ -129,6 +132,7 @@ class USBLogger:
         Returns:
             Event ID in the database
         """
+        start = time.perf_counter()
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
 
@@ -156,8 +160,59 @@ class USBLogger:
         conn.commit()
         conn.close()
 
+        if self.write_observer:
+            self.write_observer(time.perf_counter() - start)
+
         return event_id
 
+    def log_events(self, events: List[Dict]) -> int:
+        """
+        Log several events in one transaction.
+
+        Args:
+            events: Event dictionaries with 'timestamp', 'action' (the
+                    EventAction value) and any of the log_event() fields
+
+        Returns:
+            Number of events written
+        """
+        if not events:
+            return 0
+
+        start = time.perf_counter()
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with conn:
+                conn.executemany('''
+                    INSERT INTO usb_events (
+                        timestamp, action, device_path, vendor_id, product_id,
+                        vendor_name, product_name, serial_number, auth_method,
+                        success, details
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', [
+                    (
+                        event['timestamp'],
+                        event['action'],
+                        event.get('device_path'),
+                        event.get('vendor_id'),
+                        event.get('product_id'),
+                        event.get('vendor_name'),
+                        event.get('product_name'),
+                        event.get('serial_number'),
+                        event.get('auth_method'),
+                        1 if event.get('success') else 0 if event.get('success') is not None else None,
+                        event.get('details')
+                    )
+                    for event in events
+                ])
+        finally:
+            conn.close()
+
+        if self.write_observer:
+            self.write_observer(time.perf_counter() - start)
+
+        return len(events)
+
     def get_recent_events(self, limit: int = 100) -> List[Dict]:
         """
         Get recent USB events.
@@ -66,6 +66,49 @@ class DeviceWhitelist:
             print(f"Error saving whitelist: {e}")
             return False
 
+    def reload(self) -> bool:
+        """
+        Re-read the whitelist file after an external edit.
+
+        The new whitelist replaces the current one only if it parses and
+        every entry can be normalized; otherwise the current whitelist stays
+        in effect.
+
+        Returns:
+            True if the whitelist changed, False otherwise
+        """
+        try:
+            with open(self.whitelist_file, 'r') as f:
+                loaded = json.load(f)
+        except FileNotFoundError:
+            loaded = {}
+        except (OSError, ValueError) as e:
+            print(f"Error reloading whitelist, keeping current entries: {e}")
+            return False
+
+        if not isinstance(loaded, dict):
+            print("Error reloading whitelist, keeping current entries: not a JSON object")
+            return False
+
+        try:
+            devices = {
+                serial: self._normalize_device_entry(serial, device_info)
+                for serial, device_info in loaded.items()
+            }
+        except Exception as e:
+            print(f"Error reloading whitelist, keeping current entries: {e}")
+            return False
+
+        # Entries without timestamps get time.time(); compare the rest
+        def comparable(entries):
+            return {serial: dict(info, added_timestamp=None) for serial, info in entries.items()}
+
+        if comparable(devices) == comparable(self.devices):
+            return False
+
+        self.devices = devices
+        return True
+
     def _normalize_in_memory_devices(self):
         """Ensure all in-memory entries contain the expected bookkeeping fields."""
         normalized = {}
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Unit tests for src/daemon/audit.py
+"""
+
+import json
+import shutil
+import socket
+import struct
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.daemon.audit import (
+    AuditEvent,
+    AuditPipeline,
+    AuditSink,
+    SQLiteSink,
+    JournaldSink,
+    JSONLSink,
+    SyslogSink,
+)
+from src.utils.logger import USBLogger, EventAction
+
+
+class ListSink(AuditSink):
+    name = 'list'
+    batch_size = 3
+
+    def __init__(self):
+        self.batches = []
+        self.closed = False
+
+    def write(self, events):
+        self.batches.append(list(events))
+
+    def close(self):
+        self.closed = True
+
+
+class BlockedSink(AuditSink):
+    name = 'blocked'
+    queue_size = 2
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.events = []
+
+    def write(self, events):
+        self.release.wait(5)
+        self.events.extend(events)
+
+
+class FailingSink(AuditSink):
+    name = 'failing'
+
+    def write(self, events):
+        raise OSError("disk full")
+
+
+def denied_event(**fields):
+    return AuditEvent(EventAction.DEVICE_DENIED, vendor_id='046d', product_id='c52b',
+                      vendor_name='Logitech', product_name='USB Receiver',
+                      serial_number='ABC', success=True, details='User denied\nauthorization',
+                      timestamp=1700000000.5, **fields)
+
+
+class TestAuditPipeline(unittest.TestCase):
+    """Test fan-out, batching and backpressure."""
+
+    def test_fan_out_in_order(self):
+        """Test that every sink gets every event, in order."""
+        first, second = ListSink(), ListSink()
+        pipeline = AuditPipeline([first, second])
+
+        for i in range(7):
+            pipeline.emit(EventAction.DEVICE_CONNECTED, device_path=f'/dev/{i}')
+        pipeline.close()
+
+        for sink in (first, second):
+            paths = [event.device_path for batch in sink.batches for event in batch]
+            self.assertEqual(paths, [f'/dev/{i}' for i in range(7)])
+            self.assertTrue(all(len(batch) <= 3 for batch in sink.batches))
+            self.assertTrue(sink.closed)
+
+    def test_slow_sink_does_not_block(self):
+        """Test that a stuck sink drops its own events without delaying emit or other sinks."""
+        blocked, fast = BlockedSink(), ListSink()
+        pipeline = AuditPipeline([blocked, fast])
+
+        start = time.perf_counter()
+        for i in range(20):
+            pipeline.emit(EventAction.DEVICE_CONNECTED, device_path=f'/dev/{i}')
+        elapsed = time.perf_counter() - start
+
+        self.assertLess(elapsed, 0.5)
+        self.assertGreater(pipeline.stats()['blocked']['dropped'], 0)
+
+        blocked.release.set()
+        pipeline.close()
+
+        self.assertEqual(sum(len(batch) for batch in fast.batches), 20)
+        self.assertEqual(pipeline.stats(), {})
+        self.assertLessEqual(len(blocked.events), 20 - 15)
+
+    def test_drops_reported_without_waiting(self):
+        """Test that events dropped on a full queue are reported to the lost callback."""
+        blocked = BlockedSink()
+        lost = []
+        pipeline = AuditPipeline([blocked], lost_callback=lambda *args: lost.append(args))
+
+        start = time.perf_counter()
+        for i in range(20):
+            pipeline.emit(EventAction.DEVICE_CONNECTED, device_path=f'/dev/{i}')
+        elapsed = time.perf_counter() - start
+
+        self.assertLess(elapsed, 0.1)
+        dropped = pipeline.stats()['blocked']['dropped']
+        self.assertGreater(dropped, 0)
+        self.assertEqual(lost, [('blocked', 'dropped', 1)] * dropped)
+
+        blocked.release.set()
+        pipeline.close()
+
+    def test_abstract_sink(self):
+        """Test that a sink without write() cannot be created."""
+        class Incomplete(AuditSink):
+            pass
+
+        with self.assertRaises(TypeError):
+            Incomplete()
+
+    def test_failing_sink_counted(self):
+        """Test that write errors are counted, not raised."""
+        lost = []
+        pipeline = AuditPipeline([FailingSink()], lost_callback=lambda *args: lost.append(args))
+        pipeline.emit(EventAction.AUTH_FAILED, success=False)
+        pipeline.flush()
+
+        self.assertEqual(pipeline.stats()['failing'], {'dropped': 0, 'failed': 1})
+        self.assertEqual(lost, [('failing', 'failed', 1)])
+        self.assertEqual(pipeline.queue_depths(), {'failing': 0})
+        pipeline.close()
+
+
+class TestAuditSinks(unittest.TestCase):
+    """Test the formats written by each sink."""
+
+    def setUp(self):
+        self.test_dir = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def receive(self, sink_class):
+        path = self.test_dir / 'socket'
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        server.bind(str(path))
+        server.settimeout(5)
+        self.addCleanup(server.close)
+
+        sink = sink_class(path)
+        sink.write([denied_event()])
+        sink.close()
+        return server.recv(65536)
+
+    def test_sqlite(self):
+        """Test that events reach the events database."""
+        logger = USBLogger(db_path=self.test_dir / 'events.db')
+        SQLiteSink(logger).write([denied_event(), AuditEvent(EventAction.AUTH_FAILED, success=False)])
+
+        events = logger.get_recent_events()
+        self.assertEqual(len(events), 2)
+        self.assertEqual({event['action'] for event in events}, {'denied', 'auth_failed'})
+
+    def test_journald_fields(self):
+        """Test native journal fields, including the binary-safe form for newlines."""
+        data = self.receive(JournaldSink)
+
+        self.assertIn(b'PRIORITY=4\n', data)
+        self.assertIn(b'SYSLOG_IDENTIFIER=secureusb\n', data)
+        self.assertIn(b'SECUREUSB_ACTION=denied\n', data)
+        self.assertIn(b'SECUREUSB_SUCCESS=1\n', data)
+        self.assertIn(b'denied: Logitech USB Receiver (046d:c52b) serial=ABC - User denied', data)
+        details = 'User denied\nauthorization'.encode()
+        self.assertIn(b'SECUREUSB_DETAILS\n' + struct.pack('<Q', len(details)) + details + b'\n', data)
+
+    def test_syslog_rfc5424(self):
+        """Test the RFC 5424 header and structured data."""
+        message = self.receive(SyslogSink).decode()
+
+        header, rest = message.split(' [', 1)
+        pri, timestamp, hostname, app, procid, msgid = header.split(' ')
+        self.assertEqual(pri, '<84>1')  # authpriv.warning
+        self.assertEqual(timestamp, '2023-11-14T22:13:20.500000+00:00')
+        self.assertEqual((app, msgid), ('secureusb', 'denied'))
+        self.assertIn('vendor_id="046d"', rest)
+        self.assertIn('secureusb@32473 ', rest)
+
+    def test_syslog_escaping(self):
+        """Test escaping of structured data parameter values."""
+        sink = SyslogSink(self.test_dir / 'unused')
+        event = AuditEvent(EventAction.DEVICE_CONNECTED, product_name='a"b]c\\d')
+
+        self.assertIn(r'product_name="a\"b\]c\\d"', sink.encode(event).decode())
+
+    def test_jsonl_rotation(self):
+        """Test that the file is rotated by size and old files are pruned."""
+        path = self.test_dir / 'audit.jsonl'
+        sink = JSONLSink(path, max_bytes=300, backups=2)
+        for i in range(12):
+            sink.write([AuditEvent(EventAction.DEVICE_CONNECTED, device_path=f'/dev/{i}', timestamp=float(i))])
+        sink.close()
+
+        self.assertEqual(sorted(p.name for p in self.test_dir.iterdir()),
+                         ['audit.jsonl', 'audit.jsonl.1', 'audit.jsonl.2'])
+        for file in self.test_dir.iterdir():
+            self.assertLessEqual(file.stat().st_size, 300)
+        last = json.loads(path.read_text().splitlines()[-1])
+        self.assertEqual(last, {'timestamp': 11.0, 'action': 'connected', 'device_path': '/dev/11'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Unit tests for src/daemon/auth_cache.py
+"""
+
+import threading
+import time
+import unittest
+from pathlib import Path
+
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.daemon.auth_cache import AuthSession, ReplugCache, replug_key
+
+
+class FakeClock:
+    """Manually advanced monotonic clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestAuthSession(unittest.TestCase):
+    """Test the time-bounded authenticated session."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def test_disabled_by_default(self):
+        """Test that a zero-length session never becomes active."""
+        session = AuthSession(clock=self.clock)
+        session.start('046d')
+
+        self.assertFalse(session.is_active())
+        self.assertFalse(session.covers({'vendor_id': '046d'}, ['03']))
+
+    def test_expires(self):
+        """Test that the session ends after its duration."""
+        session = AuthSession(300, 'any', clock=self.clock)
+        session.start('046d')
+
+        self.assertTrue(session.covers({}, ['08']))
+        self.assertEqual(session.remaining_seconds(), 300)
+
+        self.clock.now += 301
+        self.assertFalse(session.is_active())
+        self.assertEqual(session.remaining_seconds(), 0)
+
+    def test_hid_scope_rejects_composite_devices(self):
+        """Test that only pure HID devices are covered by the hid scope."""
+        session = AuthSession(300, 'hid', clock=self.clock)
+        session.start('046d')
+
+        self.assertTrue(session.covers({}, ['03']))
+        self.assertFalse(session.covers({}, ['03', '08']))
+        self.assertFalse(session.covers({}, []))
+
+    def test_same_vendor_scope(self):
+        """Test that vendors authorized during the session are covered."""
+        session = AuthSession(300, 'same_vendor', clock=self.clock)
+        session.start('046D')
+
+        self.assertTrue(session.covers({'vendor_id': '046d'}))
+        self.assertFalse(session.covers({'vendor_id': '0781'}))
+
+        # Vendors do not carry over into a new session
+        self.clock.now += 301
+        session.start('0781')
+        self.assertFalse(session.covers({'vendor_id': '046d'}))
+
+    def test_end(self):
+        """Test ending the session early."""
+        session = AuthSession(300, 'any', clock=self.clock)
+        session.start()
+        session.end()
+
+        self.assertFalse(session.covers({}, ['03']))
+
+
+def keyboard(**overrides):
+    """Build a device_info dictionary."""
+    info = {
+        'device_id': '3-1.2',
+        'vendor_id': '04D9',
+        'product_id': '0006',
+        'serial_number': 'KB1',
+        'usb_interfaces': ':030101:030000:',
+    }
+    info.update(overrides)
+    return info
+
+
+class TestReplugCache(unittest.TestCase):
+    """Test the re-plug grace cache."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = ReplugCache(grace_seconds=30, capacity=2, clock=self.clock)
+
+    def test_key_requires_ids(self):
+        """Test that devices without vendor/product IDs are not cached."""
+        self.assertIsNone(replug_key({'device_id': '1-1'}))
+        self.assertEqual(replug_key(keyboard())[:2], ('04d9', '0006'))
+
+    def test_replug_within_grace(self):
+        """Test that a device coming back within the grace period keeps its mode."""
+        self.cache.remember(keyboard(), 'power_only')
+        self.cache.mark_disconnected('3-1.2')
+
+        self.clock.now += 29
+        self.assertEqual(self.cache.lookup(keyboard()), 'power_only')
+
+    def test_grace_expires(self):
+        """Test that the entry is gone after the grace period."""
+        self.cache.remember(keyboard(), 'full')
+        self.cache.mark_disconnected('3-1.2')
+
+        self.clock.now += 31
+        self.assertIsNone(self.cache.lookup(keyboard()))
+        self.assertEqual(len(self.cache.entries), 0)
+
+    def test_identity_must_match(self):
+        """Test that a different port or interface set is a different device."""
+        self.cache.remember(keyboard(), 'full')
+        self.cache.mark_disconnected('3-1.2')
+
+        self.assertIsNone(self.cache.lookup(keyboard(device_id='3-1.3')))
+        self.assertIsNone(self.cache.lookup(keyboard(usb_interfaces=':030101:080650:')))
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted."""
+        self.cache.remember(keyboard(device_id='1-1'), 'full')
+        self.cache.remember(keyboard(device_id='1-2'), 'full')
+        self.cache.lookup(keyboard(device_id='1-1'))
+        self.cache.remember(keyboard(device_id='1-3'), 'full')
+
+        self.assertEqual(self.cache.lookup(keyboard(device_id='1-1')), 'full')
+        self.assertIsNone(self.cache.lookup(keyboard(device_id='1-2')))
+        self.assertNotIn('1-2', self.cache.attached)
+
+    def test_invalidate_on_deny(self):
+        """Test that denying a device forgets it on every port."""
+        self.cache.remember(keyboard(device_id='1-1'), 'full')
+        self.cache.remember(keyboard(device_id='1-2'), 'full')
+
+        self.cache.invalidate(keyboard(device_id='2-4'))
+
+        self.assertEqual(len(self.cache.entries), 0)
+        self.assertEqual(self.cache.attached, {})
+
+    def test_invalidate_by_device_id(self):
+        """Test that a deny carrying only the device ID still invalidates."""
+        self.cache.remember(keyboard(), 'full')
+
+        self.cache.invalidate({'device_id': '3-1.2'})
+
+        self.assertIsNone(self.cache.lookup(keyboard()))
+
+    def test_disabled(self):
+        """Test that a zero grace period caches nothing."""
+        cache = ReplugCache(grace_seconds=0, clock=self.clock)
+        cache.remember(keyboard(), 'full')
+
+        self.assertIsNone(cache.lookup(keyboard()))
+
+
+
+class TestCacheThreadSafety(unittest.TestCase):
+    """Test the caches used from the udev thread and the main loop at once."""
+
+    @staticmethod
+    def _yielding_clock():
+        time.sleep(0)  # Let the other thread in mid-update
+        return time.monotonic()
+
+    def test_replug_cache_from_two_threads(self):
+        """Test udev-thread remember/disconnect racing main-loop lookup/invalidate."""
+        cache = ReplugCache(grace_seconds=30, capacity=8, clock=self._yielding_clock)
+        errors = []
+        done = threading.Event()
+
+        def udev_thread():
+            try:
+                for i in range(300):
+                    port = f'3-{i % 16}'
+                    cache.remember(keyboard(device_id=port, serial_number=str(i % 5)), 'full')
+                    cache.mark_disconnected(port)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                done.set()
+
+        thread = threading.Thread(target=udev_thread)
+        thread.start()
+        i = 0
+        while not done.is_set():
+            try:
+                cache.lookup(keyboard(device_id=f'3-{i % 16}', serial_number=str(i % 5)))
+                cache.invalidate(keyboard(serial_number=str(i % 5)))
+            except Exception as e:
+                errors.append(e)
+            i += 1
+        thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertLessEqual(len(cache.entries), 8)
+        self.assertTrue(set(cache.attached.values()) <= set(cache.entries))
+
+    def test_session_from_two_threads(self):
+        """Test main-loop start/end racing udev-thread coverage checks."""
+        session = AuthSession(300, 'same_vendor', clock=self._yielding_clock)
+        errors = []
+        done = threading.Event()
+
+        def udev_thread():
+            try:
+                while not done.is_set():
+                    session.covers({'vendor_id': '046d'})
+                    session.remaining_seconds()
+            except Exception as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=udev_thread)
+        thread.start()
+        try:
+            for i in range(2000):
+                session.start(f'{i % 50:04x}')
+                if i % 10 == 0:
+                    session.end()
+        finally:
+            done.set()
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertTrue(session.covers({'vendor_id': f'{1999 % 50:04x}'}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -14,7 +14,16 @@ from unittest.mock import patch, MagicMock, mock_open, call
 import sys
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from src.daemon.authorization import USBAuthorization, AuthorizationMode
+from src.daemon.authorization import (
+    USBAuthorization,
+    AuthorizationMode,
+    AuthorizationBackend,
+    SysfsBackend,
+    MemoryBackend,
+    DeviceAuthorizer,
+    device_depth,
+    _sysfs_authorizer,
+)
 
 
 class TestUSBAuthorizationBasics(unittest.TestCase):
@@ -109,8 +118,7 @@ class TestUSBAuthorizationAuthorizeDevice(unittest.TestCase):
         self.assertFalse(result)
 
     @patch('os.geteuid')
-    @patch('builtins.open', new_callable=mock_open)
-    def test_authorize_device_success(self, mock_file, mock_geteuid):
+    def test_authorize_device_success(self, mock_geteuid):
         """Test successful device authorization."""
         mock_geteuid.return_value = 0
 
@@ -120,12 +128,11 @@ class TestUSBAuthorizationAuthorizeDevice(unittest.TestCase):
                 device_path = Path(temp_dir) / device_id
                 device_path.mkdir()
                 authorized_file = device_path / "authorized"
-                authorized_file.touch()
+                authorized_file.write_text("0")
 
                 result = USBAuthorization.authorize_device(device_id, AuthorizationMode.FULL_ACCESS)
                 self.assertTrue(result)
-                mock_file.assert_called_with(authorized_file, 'w')
-                mock_file().write.assert_called_with("1")
+                self.assertEqual(authorized_file.read_text(), "1")
 
     @patch('os.geteuid')
     def test_authorize_device_file_not_found(self, mock_geteuid):
@@ -140,8 +147,7 @@ class TestUSBAuthorizationAuthorizeDevice(unittest.TestCase):
                 self.assertFalse(result)
 
     @patch('os.geteuid')
-    @patch('builtins.open', side_effect=PermissionError("Permission denied"))
-    def test_authorize_device_permission_error(self, mock_file, mock_geteuid):
+    def test_authorize_device_permission_error(self, mock_geteuid):
         """Test authorize_device handles permission errors."""
         mock_geteuid.return_value = 0
 
@@ -153,40 +159,42 @@ class TestUSBAuthorizationAuthorizeDevice(unittest.TestCase):
                 authorized_file = device_path / "authorized"
                 authorized_file.touch()
 
-                result = USBAuthorization.authorize_device(device_id, AuthorizationMode.FULL_ACCESS)
+                with patch('os.open', side_effect=PermissionError("Permission denied")):
+                    result = USBAuthorization.authorize_device(device_id, AuthorizationMode.FULL_ACCESS)
                 self.assertFalse(result)
 
+    def test_shares_one_authorizer_per_root(self):
+        """Test the static API reuses one DeviceAuthorizer until the root moves."""
+        with tempfile.TemporaryDirectory() as first, tempfile.TemporaryDirectory() as second:
+            with patch('src.daemon.authorization.USBAuthorization.USB_DEVICES_PATH', Path(first)):
+                authorizer = _sysfs_authorizer()
+                self.assertIs(_sysfs_authorizer(), authorizer)
+                self.assertEqual(authorizer.backend.root, first)
+
+            with patch('src.daemon.authorization.USBAuthorization.USB_DEVICES_PATH', Path(second)):
+                self.assertEqual(_sysfs_authorizer().backend.root, second)
+
 
 class TestUSBAuthorizationGetStatus(unittest.TestCase):
     """Test getting device authorization status."""
 
-    @patch('builtins.open', new_callable=mock_open, read_data="1\n")
-    def test_get_authorization_status_authorized(self, mock_file):
-        """Test get_authorization_status when device is authorized."""
+    def _status(self, contents):
         with tempfile.TemporaryDirectory() as temp_dir:
             with patch('src.daemon.authorization.USBAuthorization.USB_DEVICES_PATH', Path(temp_dir)):
                 device_id = "1-4"
                 device_path = Path(temp_dir) / device_id
                 device_path.mkdir()
-                authorized_file = device_path / "authorized"
-                authorized_file.touch()
+                (device_path / "authorized").write_text(contents)
 
-                result = USBAuthorization.get_authorization_status(device_id)
-                self.assertTrue(result)
+                return USBAuthorization.get_authorization_status(device_id)
 
-    @patch('builtins.open', new_callable=mock_open, read_data="0\n")
-    def test_get_authorization_status_blocked(self, mock_file):
-        """Test get_authorization_status when device is blocked."""
-        with tempfile.TemporaryDirectory() as temp_dir:
-            with patch('src.daemon.authorization.USBAuthorization.USB_DEVICES_PATH', Path(temp_dir)):
-                device_id = "1-4"
-                device_path = Path(temp_dir) / device_id
-                device_path.mkdir()
-                authorized_file = device_path / "authorized"
-                authorized_file.touch()
+    def test_get_authorization_status_authorized(self):
+        """Test get_authorization_status when device is authorized."""
+        self.assertTrue(self._status("1\n"))
 
-                result = USBAuthorization.get_authorization_status(device_id)
-                self.assertFalse(result)
+    def test_get_authorization_status_blocked(self):
+        """Test get_authorization_status when device is blocked."""
+        self.assertFalse(self._status("0\n"))
 
     def test_get_authorization_status_file_not_found(self):
         """Test get_authorization_status when file doesn't exist."""
@@ -201,56 +209,51 @@ class TestUSBAuthorizationGetStatus(unittest.TestCase):
 class TestUSBAuthorizationBlockAllow(unittest.TestCase):
     """Test block_device and allow_device convenience methods."""
 
-    @patch('os.geteuid')
-    @patch('builtins.open', new_callable=mock_open)
-    def test_block_device(self, mock_file, mock_geteuid):
-        """Test block_device method."""
-        mock_geteuid.return_value = 0
-
+    def _write(self, method, initial):
         with tempfile.TemporaryDirectory() as temp_dir:
             with patch('src.daemon.authorization.USBAuthorization.USB_DEVICES_PATH', Path(temp_dir)):
                 device_id = "1-4"
                 device_path = Path(temp_dir) / device_id
                 device_path.mkdir()
                 authorized_file = device_path / "authorized"
-                authorized_file.touch()
+                authorized_file.write_text(initial)
 
-                result = USBAuthorization.block_device(device_id)
-                self.assertTrue(result)
-                mock_file().write.assert_called_with("0")
-
-    @patch('os.geteuid')
-    @patch('builtins.open', new_callable=mock_open)
-    def test_allow_device(self, mock_file, mock_geteuid):
-        """Test allow_device method."""
-        mock_geteuid.return_value = 0
+                result = method(device_id)
+                return result, authorized_file.read_text()
 
-        with tempfile.TemporaryDirectory() as temp_dir:
-            with patch('src.daemon.authorization.USBAuthorization.USB_DEVICES_PATH', Path(temp_dir)):
-                device_id = "1-4"
-                device_path = Path(temp_dir) / device_id
-                device_path.mkdir()
-                authorized_file = device_path / "authorized"
-                authorized_file.touch()
+    @patch('os.geteuid', return_value=0)
+    def test_block_device(self, mock_geteuid):
+        """Test block_device method."""
+        result, value = self._write(USBAuthorization.block_device, "1")
+        self.assertTrue(result)
+        self.assertEqual(value, "0")
 
-                result = USBAuthorization.allow_device(device_id)
-                self.assertTrue(result)
-                mock_file().write.assert_called_with("1")
+    @patch('os.geteuid', return_value=0)
+    def test_allow_device(self, mock_geteuid):
+        """Test allow_device method."""
+        result, value = self._write(USBAuthorization.allow_device, "0")
+        self.assertTrue(result)
+        self.assertEqual(value, "1")
+
+    @patch('os.geteuid', return_value=1000)
+    def test_power_only_not_root(self, mock_geteuid):
+        """Test set_power_only_mode leaves the device alone when not root."""
+        result, value = self._write(USBAuthorization.set_power_only_mode, "1")
+        self.assertFalse(result)
+        self.assertEqual(value, "1")
 
 
 class TestUSBAuthorizationReadAttribute(unittest.TestCase):
     """Test reading device attributes."""
 
-    @patch('builtins.open', new_callable=mock_open, read_data="046d\n")
-    def test_read_device_attribute_exists(self, mock_file):
+    def test_read_device_attribute_exists(self):
         """Test reading existing device attribute."""
         with tempfile.TemporaryDirectory() as temp_dir:
             with patch('src.daemon.authorization.USBAuthorization.USB_DEVICES_PATH', Path(temp_dir)):
                 device_id = "1-4"
                 device_path = Path(temp_dir) / device_id
                 device_path.mkdir()
-                attr_file = device_path / "idVendor"
-                attr_file.touch()
+                (device_path / "idVendor").write_text("046d\n")
 
                 result = USBAuthorization.read_device_attribute(device_id, "idVendor")
                 self.assertEqual(result, "046d")
@@ -270,19 +273,17 @@ class TestUSBAuthorizationReadAttribute(unittest.TestCase):
 class TestUSBAuthorizationGetDeviceInfo(unittest.TestCase):
     """Test getting complete device information."""
 
-    @patch('builtins.open', new_callable=mock_open)
-    def test_get_device_info_success(self, mock_file):
+    def test_get_device_info_success(self):
         """Test getting device info with all attributes."""
-        # Setup mock file reads
-        mock_file.side_effect = [
-            mock_open(read_data="046d\n").return_value,  # idVendor
-            mock_open(read_data="c52b\n").return_value,  # idProduct
-            mock_open(read_data="Logitech\n").return_value,  # manufacturer
-            mock_open(read_data="USB Receiver\n").return_value,  # product
-            mock_open(read_data="ABC123\n").return_value,  # serial
-            mock_open(read_data="480\n").return_value,  # speed
-            mock_open(read_data="1\n").return_value,  # authorized
-        ]
+        attributes = {
+            'idVendor': "046d\n",
+            'idProduct': "c52b\n",
+            'manufacturer': "Logitech\n",
+            'product': "USB Receiver\n",
+            'serial': "ABC123\n",
+            'speed': "480\n",
+            'authorized': "1\n",
+        }
 
         with tempfile.TemporaryDirectory() as temp_dir:
             with patch('src.daemon.authorization.USBAuthorization.USB_DEVICES_PATH', Path(temp_dir)):
@@ -290,9 +291,8 @@ class TestUSBAuthorizationGetDeviceInfo(unittest.TestCase):
                 device_path = Path(temp_dir) / device_id
                 device_path.mkdir()
 
-                # Create all attribute files
-                for attr in ['idVendor', 'idProduct', 'manufacturer', 'product', 'serial', 'speed', 'authorized']:
-                    (device_path / attr).touch()
+                for attr, value in attributes.items():
+                    (device_path / attr).write_text(value)
 
                 result = USBAuthorization.get_device_info(device_id)
 
@@ -300,6 +300,8 @@ class TestUSBAuthorizationGetDeviceInfo(unittest.TestCase):
                 self.assertEqual(result['device_id'], device_id)
                 self.assertEqual(result['vendor_id'], "046d")
                 self.assertEqual(result['product_id'], "c52b")
+                self.assertEqual(result['product_name'], "USB Receiver")
+                self.assertTrue(result['authorized'])
 
     def test_get_device_info_nonexistent_device(self):
         """Test get_device_info with non-existent device."""
@@ -320,25 +322,246 @@ class TestUSBAuthorizationSetDefault(unittest.TestCase):
         self.assertFalse(result)
 
     @patch('os.geteuid')
-    @patch('builtins.open', new_callable=mock_open)
-    def test_set_default_authorization_success(self, mock_file, mock_geteuid):
+    def test_set_default_authorization_success(self, mock_geteuid):
         """Test successful default authorization setting."""
         mock_geteuid.return_value = 0
 
         with tempfile.TemporaryDirectory() as temp_dir:
             with patch('src.daemon.authorization.USBAuthorization.USB_DEVICES_PATH', Path(temp_dir)):
                 # Create USB controller directories
+                defaults = []
                 for i in range(1, 3):
                     controller_path = Path(temp_dir) / f"usb{i}"
                     controller_path.mkdir()
                     authorized_default = controller_path / "authorized_default"
-                    authorized_default.touch()
+                    authorized_default.write_text("1")
+                    defaults.append(authorized_default)
 
                 result = USBAuthorization.set_default_authorization("0")
                 self.assertTrue(result)
 
-                # Verify it was called for each controller
-                self.assertEqual(mock_file.call_count, 2)
+                # Verify it was written for each controller
+                self.assertEqual([path.read_text() for path in defaults], ["0", "0"])
+
+
+class TestSysfsBackend(unittest.TestCase):
+    """Test the real sysfs backend against a temporary tree."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        device_path = self.root / "1-4"
+        device_path.mkdir()
+        (device_path / "authorized").write_text("1\n")
+        (device_path / "idVendor").write_text("046d\n")
+        (self.root / "usb1").mkdir()
+        (self.root / "usb1" / "authorized_default").write_text("1\n")
+        (self.root / "1-4:1.0").mkdir()
+        self.backend = SysfsBackend(self.root)
+
+    def tearDown(self):
+        self.backend.close()
+        self.temp_dir.cleanup()
+
+    def test_lists_devices_and_controllers(self):
+        """Test that root hubs and interfaces are not listed as devices."""
+        self.assertEqual(self.backend.list_devices(), ["1-4"])
+        self.assertEqual(self.backend.list_controllers(), ["usb1"])
+
+    def test_write_authorized_keeps_fd_open(self):
+        """Test that repeated writes reuse one cached file descriptor."""
+        self.backend.write_authorized("1-4", "0")
+        fd = self.backend._authorized_fds["1-4"]
+        self.backend.write_authorized("1-4", "1")
+
+        self.assertEqual(self.backend._authorized_fds["1-4"], fd)
+        self.assertEqual(self.backend.read_attribute("1-4", "authorized"), "1")
+
+    def test_forget_closes_fd(self):
+        """Test that forget releases the cached descriptor."""
+        self.backend.write_authorized("1-4", "0")
+        fd = self.backend._authorized_fds["1-4"]
+
+        self.backend.forget("1-4")
+
+        self.assertNotIn("1-4", self.backend._authorized_fds)
+        with self.assertRaises(OSError):
+            os.fstat(fd)
+
+    def test_read_missing_attribute(self):
+        """Test that missing attributes read as None."""
+        self.assertIsNone(self.backend.read_attribute("1-4", "serial"))
+
+    def test_invalid_device_id(self):
+        """Test that path traversal is rejected."""
+        with self.assertRaises(ValueError):
+            self.backend.write_authorized("../../etc", "1")
+
+
+class TestMemoryBackend(unittest.TestCase):
+    """Test the in-memory fake backend."""
+
+    def test_deauthorize_unbinds_interfaces(self):
+        """Test that blocking a device drops its drivers, like the kernel."""
+        backend = MemoryBackend()
+        backend.add_device("1-4", interfaces={"1-4:1.0": "usbhid"})
+
+        backend.write_authorized("1-4", "0")
+
+        self.assertEqual(backend.list_bound_interfaces("1-4"), [])
+        self.assertEqual(backend.writes, [("authorized", "1-4", "0")])
+
+    def test_missing_device(self):
+        """Test that writing to an absent device raises FileNotFoundError."""
+        with self.assertRaises(FileNotFoundError):
+            MemoryBackend().write_authorized("1-4", "1")
+
+    def test_incomplete_backend_rejected(self):
+        """Test that a backend missing an operation cannot be created."""
+        class PartialBackend(AuthorizationBackend):
+            def list_devices(self):
+                return []
+
+        with self.assertRaises(TypeError):
+            PartialBackend()
+
+
+class TestDeviceAuthorizer(unittest.TestCase):
+    """Test the instance-based authorizer on the in-memory backend."""
+
+    def setUp(self):
+        self.backend = MemoryBackend()
+        self.backend.add_device(
+            "1-4",
+            interfaces={"1-4:1.0": "usb-storage", "1-4:1.1": None},
+            idVendor="0781",
+            idProduct="5583",
+            serial="XYZ"
+        )
+        self.backend.add_controller("usb1", "1")
+        self.backend.add_controller("usb2", "1")
+        self.authorizer = DeviceAuthorizer(self.backend)
+
+    def test_allow_and_block(self):
+        """Test allow/block round trip."""
+        self.assertTrue(self.authorizer.block_device("1-4"))
+        self.assertFalse(self.authorizer.get_authorization_status("1-4"))
+        self.assertTrue(self.authorizer.allow_device("1-4"))
+        self.assertTrue(self.authorizer.get_authorization_status("1-4"))
+
+    def test_missing_device_fails(self):
+        """Test that authorizing an absent device returns False."""
+        self.assertFalse(self.authorizer.allow_device("9-9"))
+        self.assertIsNone(self.authorizer.get_authorization_status("9-9"))
+
+    def test_power_only_mode(self):
+        """Test that power-only blocks the device and leaves no bound drivers."""
+        self.assertTrue(self.authorizer.set_power_only_mode("1-4"))
+
+        self.assertEqual(self.backend.read_attribute("1-4", "authorized"), "0")
+        self.assertEqual(self.backend.list_bound_interfaces("1-4"), [])
+
+    def test_set_default_authorization(self):
+        """Test that every controller gets the default."""
+        self.assertTrue(self.authorizer.set_default_authorization("0"))
+        self.assertEqual(self.backend.controllers, {"usb1": "0", "usb2": "0"})
+
+    def test_set_default_authorization_skips_redundant_writes(self):
+        """Test that controllers already at the requested mode are not rewritten."""
+        self.backend.controllers["usb2"] = "0"
+
+        self.authorizer.set_default_authorization("0")
+        self.authorizer.set_default_authorization("0")
+
+        self.assertEqual(self.backend.writes, [("authorized_default", "usb1", "0")])
+        self.assertEqual(self.authorizer.get_controller_states(), {"usb1": "0", "usb2": "0"})
+
+    def test_default_applied_to_new_controller(self):
+        """Test that a controller added later gets the current default."""
+        self.assertFalse(self.authorizer.apply_default_to_controller("usb1"))
+
+        self.authorizer.set_default_authorization("0")
+        self.backend.add_controller("usb3", "1")
+
+        self.assertTrue(self.authorizer.apply_default_to_controller("usb3"))
+        self.assertEqual(self.backend.controllers["usb3"], "0")
+
+    def test_removed_controller_forgotten(self):
+        """Test that removed controllers drop out of the state."""
+        self.authorizer.set_default_authorization("0")
+        self.authorizer.forget_controller("usb2")
+
+        self.assertEqual(self.authorizer.get_controller_states(), {"usb1": "0"})
+
+    def test_get_device_info(self):
+        """Test device info assembly."""
+        info = self.authorizer.get_device_info("1-4")
+
+        self.assertEqual(info["vendor_id"], "0781")
+        self.assertEqual(info["serial_number"], "XYZ")
+        self.assertIsNone(info["product_name"])
+        self.assertTrue(info["authorized"])
+        self.assertIsNone(self.authorizer.get_device_info("9-9"))
+
+
+class TestBulkAuthorization(unittest.TestCase):
+    """Test concurrent multi-device transitions."""
+
+    def setUp(self):
+        self.backend = MemoryBackend()
+        for device_id in ("1-1", "1-1.2", "1-1.2.3", "1-2", "2-1", "2-1.1"):
+            self.backend.add_device(device_id, authorized="0",
+                                    interfaces={f"{device_id}:1.0": None})
+        self.authorizer = DeviceAuthorizer(self.backend, max_workers=4)
+
+    def tearDown(self):
+        self.authorizer.close()
+
+    def test_device_depth(self):
+        """Test topology depth from device IDs."""
+        self.assertEqual(device_depth("1-4"), 0)
+        self.assertEqual(device_depth("1-4.2.1"), 2)
+
+    def test_parents_written_before_children(self):
+        """Test that every parent is authorized before its children."""
+        transitions = {device_id: "full" for device_id in
+                       ("2-1.1", "1-1.2.3", "1-2", "1-1.2", "2-1", "1-1")}
+
+        results = self.authorizer.apply_bulk(transitions)
+
+        order = [target for kind, target, value in self.backend.writes]
+        self.assertEqual(sorted(order[:3]), ["1-1", "1-2", "2-1"])
+        self.assertEqual(sorted(order[3:5]), ["1-1.2", "2-1.1"])
+        self.assertEqual(order[5], "1-1.2.3")
+        self.assertTrue(all(result["success"] for result in results.values()))
+
+    def test_mixed_modes_and_result_map(self):
+        """Test per-device results for mixed transitions."""
+        self.backend.devices["1-2"]["authorized"] = "1"
+        self.backend.devices["1-2"]["interfaces"]["1-2:1.0"] = "usbhid"
+
+        results = self.authorizer.apply_bulk({
+            "1-1": "full",
+            "1-2": "power_only",
+            "2-1": "block",
+            "9-9": "full",
+            "2-1.1": "bogus",
+        })
+
+        self.assertEqual(self.backend.read_attribute("1-1", "authorized"), "1")
+        self.assertEqual(self.backend.read_attribute("1-2", "authorized"), "0")
+        self.assertEqual(self.backend.list_bound_interfaces("1-2"), [])
+        self.assertTrue(results["2-1"]["success"])
+        self.assertFalse(results["9-9"]["success"])
+        self.assertFalse(results["2-1.1"]["success"])
+        self.assertIn("Unknown mode", results["2-1.1"]["error"])
+        for result in results.values():
+            self.assertGreaterEqual(result["elapsed_ms"], 0.0)
+
+    def test_empty_transitions(self):
+        """Test that an empty batch does nothing."""
+        self.assertEqual(self.authorizer.apply_bulk({}), {})
+        self.assertEqual(self.backend.writes, [])
 
 
 if __name__ == '__main__':
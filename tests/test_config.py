@@ -133,6 +133,33 @@ class TestConfig(unittest.TestCase):
         self.config.set_timeout(45)
         self.assertEqual(self.config.get_timeout(), 45)
 
+    def test_session_disabled_by_default(self):
+        """Test that authenticated sessions are off unless configured."""
+        self.assertEqual(self.config.get_session_minutes(), 0)
+        self.assertEqual(self.config.get_session_scope(), 'hid')
+
+    def test_session_settings(self):
+        """Test session length bounds and scope fallback."""
+        self.config.set('session.enabled', True)
+        self.config.set('session.duration_minutes', 10)
+        self.assertEqual(self.config.get_session_minutes(), 10)
+
+        self.config.set('session.duration_minutes', 10000)
+        self.assertEqual(self.config.get_session_minutes(), 480)
+
+        self.config.set('session.scope', 'everything')
+        self.assertEqual(self.config.get_session_scope(), 'hid')
+
+    def test_replug_grace_seconds(self):
+        """Test the re-plug grace period default and bounds."""
+        self.assertEqual(self.config.get_replug_grace_seconds(), 30)
+
+        self.config.set('replug.grace_seconds', -5)
+        self.assertEqual(self.config.get_replug_grace_seconds(), 0)
+
+        self.config.set('replug.grace_seconds', 99999)
+        self.assertEqual(self.config.get_replug_grace_seconds(), 600)
+
     def test_reset_to_defaults(self):
         """Test resetting configuration to defaults."""
         # Change some values
@@ -202,6 +229,53 @@ class TestConfig(unittest.TestCase):
         self.assertEqual(new_config.get('general.timeout_seconds'), 30)
         self.assertTrue(new_config.get('notifications.enabled'))
 
+    def test_reload_applies_external_edit(self):
+        """Test that reload picks up a valid edit made outside this object."""
+        other = Config(config_dir=self.test_dir)
+        other.set_timeout(45)
+
+        self.assertTrue(self.config.reload())
+        self.assertEqual(self.config.get_timeout(), 45)
+
+        # Nothing changed since the last reload
+        self.assertFalse(self.config.reload())
+
+    def test_reload_rejects_invalid_file(self):
+        """Test that a broken or mistyped file leaves settings untouched."""
+        self.config.config_file.write_text('{"general": {"timeout_seconds": ')
+        self.assertFalse(self.config.reload())
+        self.assertEqual(self.config.get_timeout(), 30)
+
+        self.config.config_file.write_text('{"general": {"timeout_seconds": "soon"}}')
+        self.assertFalse(self.config.reload())
+        self.assertEqual(self.config.get_timeout(), 30)
+
+        self.config.config_file.write_text('{"general": {"enabled": 1}}')
+        self.assertFalse(self.config.reload())
+        self.assertTrue(self.config.is_enabled())
+
+    def test_metrics_disabled_by_default(self):
+        """Test that no metrics are exported unless enabled."""
+        self.assertIsNone(self.config.get_metrics_textfile())
+        self.assertIsNone(self.config.get_metrics_socket())
+
+        self.config.set('metrics.enabled', True)
+        self.config.set('metrics.interval_seconds', 0)
+        self.assertEqual(self.config.get_metrics_textfile().suffix, '.prom')
+        self.assertIsNone(self.config.get_metrics_socket())
+        self.assertEqual(self.config.get_metrics_interval(), 1)
+
+    def test_audit_sinks_disabled_by_default(self):
+        """Test that only the SQLite audit log is written unless configured."""
+        self.assertFalse(self.config.get_audit_journald())
+        self.assertIsNone(self.config.get_audit_jsonl_file())
+        self.assertIsNone(self.config.get_audit_syslog_socket())
+
+        self.config.set('audit.jsonl_file', '/var/log/secureusb/audit.jsonl')
+        self.config.set('audit.jsonl_max_bytes', 10)
+        self.assertEqual(self.config.get_audit_jsonl_file(), Path('/var/log/secureusb/audit.jsonl'))
+        self.assertEqual(self.config.get_audit_jsonl_rotation(), (4096, 5))
+
 
 if __name__ == '__main__':
     unittest.main()
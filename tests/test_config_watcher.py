@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Unit tests for src/daemon/config_watcher.py
+"""
+
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+from pathlib import Path
+
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.daemon.config_watcher import (
+    ConfigWatcher,
+    parse_events,
+    IN_CLOSE_WRITE,
+    IN_MOVED_TO,
+    IN_Q_OVERFLOW,
+)
+
+
+def raw_event(wd, mask, name=b''):
+    """Build an inotify_event as the kernel writes it (name NUL-padded)."""
+    if name:
+        name += b'\0' * (16 - len(name) % 16)
+    return struct.pack('=iIII', wd, mask, 0, len(name)) + name
+
+
+class TestParseEvents(unittest.TestCase):
+    """Test decoding of raw inotify reads."""
+
+    def test_multiple_events(self):
+        """Test splitting a buffer holding several events."""
+        buffer = raw_event(1, IN_CLOSE_WRITE, b'config.json') + raw_event(1, IN_MOVED_TO, b'policy.json')
+
+        self.assertEqual(parse_events(buffer), [
+            (1, IN_CLOSE_WRITE, 'config.json'),
+            (1, IN_MOVED_TO, 'policy.json'),
+        ])
+
+    def test_event_without_name(self):
+        """Test events that carry no file name."""
+        self.assertEqual(parse_events(raw_event(-1, IN_Q_OVERFLOW)), [(-1, IN_Q_OVERFLOW, '')])
+
+
+@unittest.skipUnless(sys.platform.startswith('linux'), "inotify is Linux-only")
+class TestConfigWatcher(unittest.TestCase):
+    """Test watching a real directory."""
+
+    def setUp(self):
+        self.test_dir = Path(tempfile.mkdtemp())
+        self.changed = []
+        self.watcher = ConfigWatcher(self.test_dir, self.changed.append,
+                                     filenames=('config.json', 'policy.json'))
+        self.assertTrue(self.watcher.start())
+
+    def tearDown(self):
+        self.watcher.stop()
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_no_events(self):
+        """Test that an idle directory reports nothing and does not block."""
+        self.assertEqual(self.watcher.process_events(), [])
+
+    def test_in_place_write(self):
+        """Test that a completed write is reported once."""
+        with open(self.test_dir / 'config.json', 'w') as f:
+            f.write('{')
+            f.flush()
+            f.write('}')
+
+        self.assertEqual(self.watcher.process_events(), ['config.json'])
+        self.assertEqual(self.changed, ['config.json'])
+
+    def test_atomic_rename(self):
+        """Test that write-then-rename saves are reported under the final name."""
+        temp_file = self.test_dir / '.policy.json.tmp'
+        temp_file.write_text('{}')
+        os.replace(temp_file, self.test_dir / 'policy.json')
+
+        self.assertEqual(self.watcher.process_events(), ['policy.json'])
+
+    def test_changes_coalesced(self):
+        """Test that repeated writes between wake-ups are reported once."""
+        for _ in range(3):
+            (self.test_dir / 'config.json').write_text('{}')
+
+        self.assertEqual(self.watcher.process_events(), ['config.json'])
+
+    def test_unwatched_files_ignored(self):
+        """Test that other files in the directory are ignored."""
+        (self.test_dir / 'audit.log').write_text('x')
+
+        self.assertEqual(self.watcher.process_events(), [])
+
+    def test_callback_errors_contained(self):
+        """Test that a failing callback does not stop other files being reported."""
+        def broken(filename):
+            self.changed.append(filename)
+            raise ValueError("boom")
+
+        self.watcher.callback = broken
+        (self.test_dir / 'config.json').write_text('{}')
+        (self.test_dir / 'policy.json').write_text('{}')
+
+        self.watcher.process_events()
+        self.assertEqual(self.changed, ['config.json', 'policy.json'])
+
+    def test_stop(self):
+        """Test that a stopped watcher reports nothing."""
+        self.watcher.stop()
+        (self.test_dir / 'config.json').write_text('{}')
+
+        self.assertIsNone(self.watcher.fileno())
+        self.assertEqual(self.watcher.process_events(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
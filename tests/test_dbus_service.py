@@ -73,17 +73,16 @@ class TestSecureUSBServiceInit(unittest.TestCase):
 
         self.assertEqual(service.authorization_callback, self.auth_callback)
         self.assertEqual(service.config_callback, self.config_callback)
-        self.assertIsInstance(service.pending_requests, dict)
 
-    def test_pending_requests_empty(self):
-        """Test that pending_requests is initialized empty."""
+    def test_pending_devices_come_from_daemon(self):
+        """Test that the service keeps no pending list of its own."""
         service = SecureUSBService(
             self.mock_bus,
             self.auth_callback,
             self.config_callback
         )
 
-        self.assertEqual(len(service.pending_requests), 0)
+        self.assertFalse(hasattr(service, 'pending_requests'))
 
 
 @unittest.skip("D-Bus service tests require actual D-Bus infrastructure - integration test needed")
@@ -225,14 +224,15 @@ class TestSecureUSBServiceMethods(unittest.TestCase):
 
     def test_get_pending_devices_with_devices(self):
         """Test GetPendingDevices with pending devices."""
-        self.service.pending_requests = {
-            '1-4': {'device_id': '1-4', 'vendor_id': '046d'},
-            '1-5': {'device_id': '1-5', 'vendor_id': '0781'}
-        }
+        self.service.state_callback = MagicMock(return_value=[
+            {'device_id': '1-4', 'vendor_id': '046d'},
+            {'device_id': '1-5', 'vendor_id': '0781'}
+        ])
 
         result = self.service.GetPendingDevices()
 
         self.assertEqual(len(result), 2)
+        self.service.state_callback.assert_called_once_with('pending_devices')
 
     @patch('src.daemon.dbus_service.USBLogger')
     def test_get_recent_events(self, mock_logger_class):
@@ -289,6 +289,24 @@ class TestSecureUSBServiceMethods(unittest.TestCase):
         self.assertTrue(result)
         self.config_callback.assert_called_once_with('remove_whitelist', "ABC123456")
 
+    def test_start_profiling(self):
+        """Test StartProfiling method."""
+        self.config_callback.return_value = True
+
+        result = self.service.StartProfiling(60)
+
+        self.assertTrue(result)
+        self.config_callback.assert_called_once_with('start_profiling', 60)
+
+    def test_get_clock_drift(self):
+        """Test GetClockDrift method."""
+        self.service.state_callback = MagicMock(return_value={'drift_steps': 1.0, 'drift_seconds': 30.0})
+
+        result = self.service.GetClockDrift()
+
+        self.assertEqual(result['drift_seconds'], 30.0)
+        self.service.state_callback.assert_called_once_with('clock_drift')
+
 
 @unittest.skip("D-Bus service tests require actual D-Bus infrastructure - integration test needed")
 class TestSecureUSBServiceSignals(unittest.TestCase):
@@ -314,30 +332,16 @@ class TestSecureUSBServiceSignals(unittest.TestCase):
         # Should not raise error
         self.service.emit_device_connected(device_info)
 
-        # Check device added to pending requests
-        self.assertIn('1-4', self.service.pending_requests)
-        self.assertEqual(self.service.pending_requests['1-4'], device_info)
-
     def test_emit_device_disconnected(self):
         """Test emit_device_disconnected signal."""
-        # Add device to pending first
-        self.service.pending_requests['1-4'] = {'device_id': '1-4'}
-
+        # Should not raise error
         self.service.emit_device_disconnected('1-4')
 
-        # Device should be removed from pending
-        self.assertNotIn('1-4', self.service.pending_requests)
-
     def test_emit_authorization_result(self):
         """Test emit_authorization_result signal."""
-        # Add device to pending first
-        self.service.pending_requests['1-4'] = {'device_id': '1-4'}
-
+        # Should not raise error
         self.service.emit_authorization_result('1-4', 'authorized', True)
 
-        # Device should be removed from pending
-        self.assertNotIn('1-4', self.service.pending_requests)
-
     def test_emit_protection_state_changed(self):
         """Test emit_protection_state_changed signal."""
         # Should not raise error
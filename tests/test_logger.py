@@ -41,6 +41,19 @@ class TestUSBLogger(unittest.TestCase):
         self.assertIsInstance(event_id, int)
         self.assertGreater(event_id, 0)
 
+    def test_log_events_batch(self):
+        """Test logging several events in one transaction."""
+        written = self.logger.log_events([
+            {'timestamp': 100.0, 'action': EventAction.DEVICE_CONNECTED.value, 'serial_number': 'A'},
+            {'timestamp': 101.0, 'action': EventAction.AUTH_FAILED.value, 'success': False},
+        ])
+
+        self.assertEqual(written, 2)
+        events = self.logger.get_recent_events()
+        self.assertEqual([event['action'] for event in events], ['auth_failed', 'connected'])
+        self.assertEqual(events[0]['success'], 0)
+        self.assertEqual(events[1]['serial_number'], 'A')
+
     def test_log_event_full(self):
         """Test logging an event with all fields."""
         event_id = self.logger.log_event(
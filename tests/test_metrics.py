@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Unit tests for src/daemon/metrics.py
+"""
+
+import os
+import shutil
+import socket
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.daemon.metrics import (
+    Counter,
+    Gauge,
+    Histogram,
+    Metric,
+    MetricsRegistry,
+    DaemonMetrics,
+    MetricsExporter,
+)
+
+
+class TestMetricFamilies(unittest.TestCase):
+    """Test counters, gauges and histograms."""
+
+    def test_counter(self):
+        """Test counting per label set."""
+        counter = Counter('events_total', 'Events.', ('action',))
+        counter.inc('add')
+        counter.inc('add')
+        counter.inc('remove', amount=3)
+
+        self.assertEqual(counter.render(), [
+            '# HELP events_total Events.',
+            '# TYPE events_total counter',
+            'events_total{action="add"} 2',
+            'events_total{action="remove"} 3',
+        ])
+
+    def test_unlabelled_counter_starts_at_zero(self):
+        """Test that a counter without labels is exported before its first increment."""
+        counter = Counter('failures_total', 'Failures.')
+
+        self.assertEqual(counter.render()[-1], 'failures_total 0')
+
+    def test_label_escaping(self):
+        """Test that quotes and backslashes in label values are escaped."""
+        counter = Counter('calls_total', 'Calls.', ('method',))
+        counter.inc('a"b\\c')
+
+        self.assertEqual(counter.render()[-1], 'calls_total{method="a\\"b\\\\c"} 1')
+
+    def test_metric_requires_samples(self):
+        """Test that a metric family without _samples() cannot be created."""
+        class Untyped(Metric):
+            pass
+
+        with self.assertRaises(TypeError):
+            Untyped('untyped', 'Untyped.')
+
+    def test_gauge_collected_on_render(self):
+        """Test that gauges are read only when rendered."""
+        collect = MagicMock(return_value={('pending',): 4})
+        gauge = Gauge('queue_depth', 'Depth.', ('queue',), collect=collect)
+
+        collect.assert_not_called()
+        self.assertEqual(gauge.render()[-1], 'queue_depth{queue="pending"} 4')
+
+    def test_histogram(self):
+        """Test cumulative buckets, sum and count."""
+        histogram = Histogram('latency_seconds', 'Latency.', buckets=(0.1, 1))
+        histogram.observe(0.05)
+        histogram.observe(0.1)
+        histogram.observe(5)
+
+        self.assertEqual(histogram.render()[2:], [
+            'latency_seconds_bucket{le="0.1"} 2',
+            'latency_seconds_bucket{le="1"} 2',
+            'latency_seconds_bucket{le="+Inf"} 3',
+            'latency_seconds_sum 5.15',
+            'latency_seconds_count 3',
+        ])
+
+    def test_histogram_timer(self):
+        """Test timing a block of code."""
+        histogram = Histogram('call_seconds', 'Calls.', ('method',))
+        with histogram.time('GetStatus'):
+            pass
+
+        self.assertEqual(histogram.count('GetStatus'), 1)
+
+
+class TestDaemonMetrics(unittest.TestCase):
+    """Test the daemon's metric set."""
+
+    def test_render_contains_every_family(self):
+        """Test that all families are exported, even before any activity."""
+        metrics = DaemonMetrics(queue_depths=lambda: {'pending_devices': 2})
+        text = metrics.render()
+
+        for name in ('secureusb_device_events_total', 'secureusb_authorizations_total',
+                     'secureusb_auth_failures_total', 'secureusb_plug_to_block_seconds',
+                     'secureusb_dbus_call_seconds', 'secureusb_sqlite_write_seconds'):
+            self.assertIn(f'# TYPE {name} ', text)
+        self.assertIn('secureusb_queue_depth{queue="pending_devices"} 2\n', text)
+
+    def test_uevent_filter_stats_exported(self):
+        """Test that the USB monitor's filter statistics are read at render time."""
+        stats = {'kernel_filter': True, 'wakeups_saved': 41,
+                 'wakeups_saved_is_lower_bound': False, 'events_ignored': 3}
+        metrics = DaemonMetrics(filter_stats=lambda: stats)
+
+        text = metrics.render()
+        self.assertIn('secureusb_uevents_filtered{stage="kernel"} 41\n', text)
+        self.assertIn('secureusb_uevents_filtered{stage="userspace"} 3\n', text)
+        self.assertIn('secureusb_uevent_kernel_filter 1\n', text)
+
+        stats.update(kernel_filter=False, wakeups_saved=0, events_ignored=9)
+        text = metrics.render()
+        self.assertIn('secureusb_uevents_filtered{stage="userspace"} 9\n', text)
+        self.assertIn('secureusb_uevent_kernel_filter 0\n', text)
+
+    def test_timed_dbus_callback(self):
+        """Test that wrapped callbacks are timed and still return their result."""
+        metrics = DaemonMetrics()
+        callback = metrics.timed_dbus_callback(lambda query, argument=None: [query])
+
+        self.assertEqual(callback('device_counts'), ['device_counts'])
+        self.assertEqual(metrics.dbus_call_seconds.count('device_counts'), 1)
+
+    def test_timed_dbus_callback_records_errors(self):
+        """Test that failing calls are timed too."""
+        metrics = DaemonMetrics()
+        callback = metrics.timed_dbus_callback(MagicMock(side_effect=RuntimeError), 'authorize')
+
+        with self.assertRaises(RuntimeError):
+            callback({}, '123456', 'full')
+        self.assertEqual(metrics.dbus_call_seconds.count('authorize'), 1)
+
+
+class TestMetricsExporter(unittest.TestCase):
+    """Test the .prom file writer and HTTP endpoint."""
+
+    def setUp(self):
+        self.test_dir = Path(tempfile.mkdtemp())
+        self.registry = MetricsRegistry()
+        self.counter = self.registry.register(Counter('test_total', 'Test.'))
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_textfile_written_atomically(self):
+        """Test that the .prom file is replaced and no temporary files remain."""
+        textfile = self.test_dir / 'secureusb.prom'
+        add_timeout = MagicMock(return_value=5)
+        remove_timeout = MagicMock()
+        exporter = MetricsExporter(self.registry, add_timeout, remove_timeout,
+                                   textfile=textfile, interval_seconds=10)
+
+        exporter.start()
+        self.assertIn('test_total 0\n', textfile.read_text())
+        add_timeout.assert_called_once_with(10, exporter._on_timeout)
+
+        self.counter.inc()
+        self.assertTrue(exporter._on_timeout())
+        self.assertIn('test_total 1\n', textfile.read_text())
+
+        exporter.stop()
+        remove_timeout.assert_called_once_with(5)
+        self.assertEqual(os.listdir(self.test_dir), ['secureusb.prom'])
+
+    def test_unwritable_textfile(self):
+        """Test that a write failure is reported, not raised."""
+        (self.test_dir / 'file').write_text('')
+
+        self.assertFalse(self.registry.write_textfile(self.test_dir / 'file' / 'x.prom'))
+
+    def test_unix_socket_endpoint(self):
+        """Test scraping over the Unix socket."""
+        socket_path = self.test_dir / 'metrics.sock'
+        exporter = MetricsExporter(self.registry, MagicMock(), MagicMock(), socket_path=socket_path)
+        exporter.start()
+        self.addCleanup(exporter.stop)
+
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.settimeout(5)
+        client.connect(str(socket_path))
+        client.sendall(b'GET /metrics HTTP/1.0\r\n\r\n')
+        response = b''
+        while True:
+            chunk = client.recv(4096)
+            if not chunk:
+                break
+            response += chunk
+        client.close()
+
+        self.assertTrue(response.startswith(b'HTTP/1.0 200'))
+        self.assertIn(b'text/plain; version=0.0.4', response)
+        self.assertTrue(response.endswith(b'test_total 0\n'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Unit tests for src/daemon/policy.py
+"""
+
+import json
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.daemon.policy import PolicyEngine, PolicyAction, PolicyRule
+
+# A Wednesday
+NOON = datetime(2024, 5, 15, 12, 0)
+NIGHT = datetime(2024, 5, 15, 23, 30)
+
+
+def device(**overrides):
+    """Build a device_info dictionary."""
+    info = {
+        'device_id': '1-4',
+        'vendor_id': '1050',
+        'product_id': '0407',
+        'serial_number': 'YK123',
+        'interface_classes': ['03'],
+    }
+    info.update(overrides)
+    return info
+
+
+class TestPolicyRule(unittest.TestCase):
+    """Test rule parsing and validation."""
+
+    def test_invalid_action(self):
+        """Test that unknown actions are rejected."""
+        with self.assertRaises(ValueError):
+            PolicyRule(0, {'action': 'maybe'})
+
+    def test_invalid_fields(self):
+        """Test that malformed conditions are rejected."""
+        for bad in ({'vendor_id': 'xyz'}, {'port': '1-a'}, {'hours': '25:00-26:00'},
+                    {'days': ['funday']}, {'interface_classes': ['800']}):
+            with self.subTest(bad=bad):
+                with self.assertRaises(ValueError):
+                    PolicyRule(0, dict(bad, action='allow'))
+
+    def test_ids_normalized(self):
+        """Test that hex IDs are matched case-insensitively."""
+        rule = PolicyRule(0, {'action': 'allow', 'vendor_id': '04D8'})
+        self.assertEqual(rule.vendor_id, '04d8')
+
+
+class TestPolicyEngine(unittest.TestCase):
+    """Test policy evaluation."""
+
+    def test_default_when_no_rules(self):
+        """Test that an empty policy prompts."""
+        decision = PolicyEngine().evaluate(device(), NOON)
+
+        self.assertEqual(decision.action, PolicyAction.PROMPT)
+        self.assertIsNone(decision.rule_id)
+        self.assertIn('no rule matched', decision.explanation)
+
+    def test_vendor_product_rule(self):
+        """Test matching on vendor and product ID."""
+        engine = PolicyEngine([{'id': 'yubikey', 'action': 'allow', 'vendor_id': '1050', 'product_id': '0407'}])
+
+        decision = engine.evaluate(device(), NOON)
+        self.assertEqual(decision.action, PolicyAction.ALLOW)
+        self.assertEqual(decision.rule_id, 'yubikey')
+        self.assertIn('vendor 1050', decision.explanation)
+
+        self.assertEqual(engine.evaluate(device(product_id='0001'), NOON).action, PolicyAction.PROMPT)
+
+    def test_first_rule_in_file_order_wins(self):
+        """Test that precedence follows file order across indexes."""
+        engine = PolicyEngine([
+            {'id': 'front-port', 'action': 'block', 'port': '1-4'},
+            {'id': 'serial', 'action': 'allow', 'serial_number': 'YK123'},
+        ])
+
+        self.assertEqual(engine.evaluate(device(), NOON).rule_id, 'front-port')
+        self.assertEqual(engine.evaluate(device(device_id='2-1'), NOON).rule_id, 'serial')
+
+    def test_port_prefix(self):
+        """Test that port rules cover downstream hub ports only."""
+        engine = PolicyEngine([{'id': 'dock', 'action': 'block', 'port': '1-4'}])
+
+        self.assertEqual(engine.evaluate(device(device_id='1-4.2.1'), NOON).action, PolicyAction.BLOCK)
+        self.assertEqual(engine.evaluate(device(device_id='1-40'), NOON).action, PolicyAction.PROMPT)
+
+    def test_interface_class_rule(self):
+        """Test matching on any of the device's interface classes."""
+        engine = PolicyEngine([{'id': 'no-storage', 'action': 'block', 'interface_classes': ['08']}])
+
+        self.assertEqual(engine.evaluate(device(interface_classes=['03', '08']), NOON).action,
+                         PolicyAction.BLOCK)
+        self.assertEqual(engine.evaluate(device(), NOON).action, PolicyAction.PROMPT)
+
+    def test_time_window(self):
+        """Test hours and days conditions, including windows over midnight."""
+        engine = PolicyEngine([
+            {'id': 'office', 'action': 'allow', 'vendor_id': '1050', 'hours': '08:00-18:00', 'days': ['mon', 'wed']},
+            {'id': 'night', 'action': 'block', 'hours': '22:00-06:00'},
+        ])
+
+        self.assertEqual(engine.evaluate(device(), NOON).rule_id, 'office')
+        self.assertEqual(engine.evaluate(device(), NIGHT).rule_id, 'night')
+        self.assertIsNone(engine.evaluate(device(), datetime(2024, 5, 16, 12, 0)).rule_id)
+
+    def test_candidates_bounded(self):
+        """Test that evaluation only checks rules in the device's buckets."""
+        rules = [{'action': 'allow', 'serial_number': f'S{i}'} for i in range(1000)]
+        engine = PolicyEngine(rules)
+
+        decision = engine.evaluate(device(serial_number='S999'), NOON)
+        self.assertEqual(decision.action, PolicyAction.ALLOW)
+        self.assertEqual(decision.rules_checked, 1)
+
+    def test_invalid_default(self):
+        """Test that an unknown default action is rejected."""
+        with self.assertRaises(ValueError):
+            PolicyEngine(default='sometimes')
+
+
+class TestPolicyLoad(unittest.TestCase):
+    """Test loading policy files."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.policy_file = Path(self.temp_dir.name) / 'policy.json'
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_missing_file(self):
+        """Test that a missing file yields an empty policy."""
+        engine = PolicyEngine.load(self.policy_file)
+        self.assertEqual(engine.rules, [])
+
+    def test_load_rules(self):
+        """Test loading rules and default action."""
+        self.policy_file.write_text(json.dumps({
+            'default': 'block',
+            'rules': [{'action': 'allow', 'vendor_id': '1050'}],
+        }))
+
+        engine = PolicyEngine.load(self.policy_file)
+
+        self.assertEqual(len(engine.rules), 1)
+        self.assertEqual(engine.evaluate(device(vendor_id='046d'), NOON).action, PolicyAction.BLOCK)
+
+    def test_malformed_file_falls_back_to_prompt(self):
+        """Test that a broken policy does not allow or block anything."""
+        self.policy_file.write_text(json.dumps({'default': 'allow', 'rules': [{'action': 'bogus'}]}))
+
+        engine = PolicyEngine.load(self.policy_file)
+
+        self.assertEqual(engine.evaluate(device(), NOON).action, PolicyAction.PROMPT)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Unit tests for src/daemon/profiling.py
+"""
+
+import pstats
+import shutil
+import tempfile
+import threading
+import tracemalloc
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.daemon.profiling import ProfilingWindow, MAX_WINDOW_SECONDS
+
+
+class Monitor:
+    def __init__(self, callback):
+        self.callback = callback
+        self.events = []
+
+    def _on_event(self, device):
+        self.events.append(device)
+        self.callback(device)
+
+
+def handle_device(device):
+    return [device] * 100
+
+
+class TestProfilingWindow(unittest.TestCase):
+    """Test swapping handlers in and out and writing the results."""
+
+    def setUp(self):
+        self.test_dir = Path(tempfile.mkdtemp())
+        self.monitor = Monitor(handle_device)
+        self.add_timeout = MagicMock(return_value=9)
+        self.remove_timeout = MagicMock()
+        self.window = ProfilingWindow(
+            self.test_dir,
+            hooks=[(self.monitor, '_on_event'), (self.monitor, 'callback')],
+            add_timeout=self.add_timeout,
+            remove_timeout=self.remove_timeout,
+        )
+
+    def tearDown(self):
+        self.window.stop()
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_handlers_untouched_when_off(self):
+        """Test that nothing is wrapped outside a window."""
+        self.assertIs(self.monitor.callback, handle_device)
+        self.assertNotIn('_on_event', vars(self.monitor))
+        self.assertFalse(self.window.active)
+
+    def test_window(self):
+        """Test profiling events across threads and restoring the handlers."""
+        self.assertTrue(self.window.start(5))
+        self.add_timeout.assert_called_once_with(5, self.window._on_timeout)
+        self.assertIsNot(self.monitor.callback, handle_device)
+
+        self.monitor._on_event('1-1')
+        thread = threading.Thread(target=self.monitor._on_event, args=('1-2',))
+        thread.start()
+        thread.join()
+
+        path = self.window.stop()
+
+        self.remove_timeout.assert_called_once_with(9)
+        self.assertEqual(self.monitor.events, ['1-1', '1-2'])
+        self.assertIs(self.monitor.callback, handle_device)
+        self.assertNotIn('_on_event', vars(self.monitor))
+        self.assertFalse(tracemalloc.is_tracing())
+
+        functions = {name for _, _, name in pstats.Stats(str(path)).stats}
+        self.assertIn('handle_device', functions)
+        self.assertIn('_on_event', functions)
+
+        allocations = list(self.test_dir.glob('allocations-*.txt'))
+        self.assertEqual(len(allocations), 1)
+        self.assertIn('allocation sites', allocations[0].read_text())
+
+    def test_window_ends_on_timeout(self):
+        """Test that the main-loop timeout closes the window."""
+        self.window.start()
+
+        self.assertFalse(self.window._on_timeout())
+        self.assertFalse(self.window.active)
+        self.remove_timeout.assert_not_called()
+        self.assertEqual(len(list(self.test_dir.glob('profile-*.pstats'))), 1)
+
+    def test_one_window_at_a_time(self):
+        """Test that a second start is refused while a window is open."""
+        self.assertTrue(self.window.start(1))
+        self.assertFalse(self.window.start(1))
+
+    def test_window_length_clamped(self):
+        """Test that the window length is bounded."""
+        self.window.start(10 ** 6)
+
+        self.add_timeout.assert_called_once_with(MAX_WINDOW_SECONDS, self.window._on_timeout)
+
+    def test_stop_without_window(self):
+        """Test that stopping with no open window writes nothing."""
+        self.assertIsNone(self.window.stop())
+        self.assertEqual(list(self.test_dir.iterdir()), [])
+
+    def test_unwritable_output(self):
+        """Test that a write failure is reported, not raised."""
+        (self.test_dir / 'file').write_text('')
+        window = ProfilingWindow(self.test_dir / 'file' / 'profiles', [(self.monitor, 'callback')],
+                                 self.add_timeout, self.remove_timeout)
+        window.start()
+
+        self.assertIsNone(window.stop())
+        self.assertIs(self.monitor.callback, handle_device)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Unit tests for src/daemon/rate_limit.py
+"""
+
+import json
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.daemon.rate_limit import AuthRateLimiter, SCOPE_DEVICE, SCOPE_SENDER, SCOPE_GLOBAL
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1700000000.0
+
+    def __call__(self):
+        return self.now
+
+
+LIMITS = {
+    SCOPE_DEVICE: (3, 60),
+    SCOPE_SENDER: (5, 60),
+    SCOPE_GLOBAL: (8, 60),
+}
+
+
+class TestAuthRateLimiter(unittest.TestCase):
+    """Test lockouts, backoff and persistence."""
+
+    def setUp(self):
+        self.test_dir = Path(tempfile.mkdtemp())
+        self.state_file = self.test_dir / 'ratelimit.json'
+        self.clock = FakeClock()
+        self.limiter = self.make_limiter()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def make_limiter(self):
+        return AuthRateLimiter(self.state_file, limits=LIMITS, backoff_base=10,
+                               backoff_max=100, clock=self.clock)
+
+    def fail_attempts(self, times, device_id='1-1', sender=':1.5'):
+        wait = 0
+        for _ in range(times):
+            wait = self.limiter.record_failure(device_id, sender)
+        return wait
+
+    def test_allows_burst_then_locks_device(self):
+        """Test that the device is locked out once its burst is used up."""
+        self.assertEqual(self.fail_attempts(2), 0)
+        self.assertEqual(self.limiter.retry_after('1-1', ':1.5'), 0)
+
+        self.assertEqual(self.fail_attempts(1), 10)
+        self.assertEqual(self.limiter.retry_after('1-1', ':1.9'), 10)
+        self.assertEqual(self.limiter.retry_after('1-2', ':1.9'), 0)
+
+        self.clock.now += 10
+        self.assertEqual(self.limiter.retry_after('1-1', ':1.5'), 0)
+
+    def test_exponential_backoff(self):
+        """Test that each further lockout doubles, up to the maximum."""
+        self.fail_attempts(3)
+        waits = []
+        for _ in range(5):
+            self.clock.now += self.limiter.retry_after('1-1')
+            waits.append(self.fail_attempts(1))
+
+        self.assertEqual(waits, [20, 40, 80, 100, 100])
+
+    def test_backoff_resets_once_refilled(self):
+        """Test that a quiet window clears the backoff."""
+        self.fail_attempts(3)
+        self.clock.now += 10 + 60  # Lockout, then a full window
+
+        self.assertEqual(self.fail_attempts(2), 0)
+        self.assertEqual(self.fail_attempts(1), 10)
+
+    def test_sender_and_global_scopes(self):
+        """Test that spreading attempts over devices still locks the caller, then everyone."""
+        for i in range(5):
+            self.limiter.record_failure(f'1-{i}', ':1.5')
+        self.assertGreater(self.limiter.retry_after('2-1', ':1.5'), 0)
+        self.assertEqual(self.limiter.retry_after('2-1', ':1.6'), 0)
+
+        for i in range(3):
+            self.limiter.record_failure(f'3-{i}', f':1.{10 + i}')
+        self.assertGreater(self.limiter.retry_after('4-1', ':1.99'), 0)
+
+    def test_default_global_scope_outlasts_senders(self):
+        """Test that a few locked-out callers do not lock out everyone with the default limits."""
+        limiter = AuthRateLimiter(clock=self.clock)
+        for sender in (':1.5', ':1.6', ':1.7'):
+            for i in range(10):
+                limiter.record_failure(f'{sender}-{i}', sender)
+            self.assertGreater(limiter.retry_after('2-1', sender), 0)
+
+        self.assertEqual(limiter.retry_after('2-1', ':1.8'), 0)
+
+    def test_success_clears_device_and_sender(self):
+        """Test that a correct code forgets earlier failures."""
+        self.fail_attempts(2)
+        self.limiter.record_success('1-1', ':1.5')
+
+        self.assertEqual(self.fail_attempts(2), 0)
+
+    def test_lockout_survives_restart(self):
+        """Test that lockouts are restored from the state file."""
+        self.fail_attempts(3)
+
+        restarted = self.make_limiter()
+
+        self.assertEqual(restarted.retry_after('1-1'), 10)
+        self.clock.now += 10
+        self.assertEqual(self.fail_attempts(1), 20)
+
+    def test_idle_buckets_not_saved(self):
+        """Test that fully refilled buckets are dropped from the state file."""
+        self.fail_attempts(1)
+        self.clock.now += 600
+        self.limiter.record_failure('1-2', None)
+
+        saved = json.loads(self.state_file.read_text())['buckets']
+        self.assertEqual(sorted(entry[:2] for entry in saved),
+                         [[SCOPE_DEVICE, '1-2'], [SCOPE_GLOBAL, '']])
+
+    def test_corrupt_state_file(self):
+        """Test that an unreadable state file is ignored."""
+        self.state_file.write_text('{not json')
+
+        self.assertEqual(self.make_limiter().retry_after('1-1'), 0)
+
+    def test_bucket_count_bounded(self):
+        """Test that old buckets are evicted but the global one is kept."""
+        limiter = AuthRateLimiter(limits=LIMITS, max_buckets=4, clock=self.clock)
+        for i in range(10):
+            limiter.record_failure(f'1-{i}')
+
+        self.assertEqual(len(limiter._buckets), 4)
+        self.assertIn((SCOPE_GLOBAL, ''), limiter._buckets)
+
+
+if __name__ == '__main__':
+    unittest.main()
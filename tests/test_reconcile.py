@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Unit tests for src/daemon/reconcile.py
+
+Tests batched sysfs reading and startup classification against a fake
+sysfs tree in a temporary directory.
+"""
+
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.daemon.authorization import SysfsBackend, MemoryBackend, is_device_entry
+from src.daemon.reconcile import (
+    BatchDeviceReader,
+    StartupReconciler,
+    RECONCILE_QUEUED,
+    RECONCILE_TRUSTED,
+    RECONCILE_PENDING,
+)
+
+
+def make_device(root: Path, device_id: str, vendor='046d', product='c52b',
+                serial=None, authorized='1', name=None):
+    """Create a fake sysfs device directory."""
+    device_dir = root / device_id
+    device_dir.mkdir()
+    if vendor:
+        (device_dir / 'idVendor').write_text(vendor + '\n')
+    if product:
+        (device_dir / 'idProduct').write_text(product + '\n')
+    if serial:
+        (device_dir / 'serial').write_text(serial + '\n')
+    if name:
+        (device_dir / 'product').write_text(name + '\n')
+    (device_dir / 'authorized').write_text(authorized + '\n')
+    return device_dir
+
+
+class TestDeviceEntries(unittest.TestCase):
+    """Test sysfs entry classification."""
+
+    def test_is_device_entry(self):
+        """Devices are accepted, root hubs and interfaces are not."""
+        self.assertTrue(is_device_entry('1-4'))
+        self.assertTrue(is_device_entry('3-1.2.4'))
+        self.assertFalse(is_device_entry('usb1'))
+        self.assertFalse(is_device_entry('1-4:1.0'))
+
+
+class TestSysfsDeviceReader(unittest.TestCase):
+    """Test batched sysfs reading."""
+
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_read_device(self):
+        """Attributes are read and normalized."""
+        make_device(self.root, '1-4', serial='ABC', authorized='0', name='Receiver')
+
+        info = BatchDeviceReader(SysfsBackend(self.root)).read_device('1-4')
+
+        self.assertEqual(info['vendor_id'], '046d')
+        self.assertEqual(info['product_id'], 'c52b')
+        self.assertEqual(info['serial_number'], 'ABC')
+        self.assertEqual(info['product_name'], 'Receiver')
+        self.assertIsNone(info['vendor_name'])
+        self.assertFalse(info['authorized'])
+        self.assertEqual(info['display_name'], 'Receiver')
+
+    def test_read_all_skips_hubs_and_interfaces(self):
+        """Only device entries are read, in ID order."""
+        (self.root / 'usb1').mkdir()
+        (self.root / '1-4:1.0').mkdir()
+        make_device(self.root, '1-4.2')
+        make_device(self.root, '1-4')
+
+        devices = BatchDeviceReader(SysfsBackend(self.root), max_workers=4).read_all()
+
+        self.assertEqual([d['device_id'] for d in devices], ['1-4', '1-4.2'])
+
+    def test_read_all_missing_root(self):
+        """A missing sysfs root yields no devices."""
+        reader = BatchDeviceReader(SysfsBackend(self.root / 'missing'))
+        self.assertEqual(reader.read_all(), [])
+
+
+class TestStartupReconciler(unittest.TestCase):
+    """Test classification of devices present at startup."""
+
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        self.whitelist = {'TRUSTED'}
+        self.pending = {'1-3'}
+        self.reconciler = StartupReconciler(
+            BatchDeviceReader(SysfsBackend(self.root)),
+            is_whitelisted=lambda serial: serial in self.whitelist,
+            is_pending=lambda device_id: device_id in self.pending
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_run_classifies_devices(self):
+        """Each device lands in exactly one bucket."""
+        make_device(self.root, '1-1', serial='TRUSTED', authorized='1')
+        make_device(self.root, '1-2', serial='UNKNOWN', authorized='1')
+        make_device(self.root, '1-3', serial='TRUSTED', authorized='0')
+        make_device(self.root, '1-5', vendor=None, product=None)
+
+        result = self.reconciler.run()
+
+        self.assertEqual([d['device_id'] for d in result[RECONCILE_TRUSTED]], ['1-1'])
+        self.assertEqual([d['device_id'] for d in result[RECONCILE_QUEUED]], ['1-2'])
+        self.assertEqual([d['device_id'] for d in result[RECONCILE_PENDING]], ['1-3'])
+        self.assertEqual([d['device_id'] for d in result['skipped']], ['1-5'])
+        self.assertGreaterEqual(result['elapsed_ms'], 0)
+
+    def test_blocked_whitelisted_device_is_queued(self):
+        """Whitelisted devices still need TOTP if they are currently blocked."""
+        make_device(self.root, '2-1', serial='TRUSTED', authorized='0')
+
+        result = self.reconciler.run()
+
+        self.assertEqual([d['device_id'] for d in result[RECONCILE_QUEUED]], ['2-1'])
+
+    def test_run_with_memory_backend(self):
+        """Reconciliation runs without sysfs against the in-memory fake."""
+        backend = MemoryBackend()
+        for i in range(100):
+            backend.add_device(f"1-{i + 1}", idVendor='046d', idProduct='c52b', serial=f"S{i}")
+
+        reconciler = StartupReconciler(
+            BatchDeviceReader(backend),
+            is_whitelisted=lambda serial: serial == 'S0',
+            is_pending=lambda device_id: False
+        )
+        result = reconciler.run()
+
+        self.assertEqual(len(result[RECONCILE_TRUSTED]), 1)
+        self.assertEqual(len(result[RECONCILE_QUEUED]), 99)
+
+
+if __name__ == '__main__':
+    unittest.main()
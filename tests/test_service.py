@@ -1,31 +1,80 @@
 #!/usr/bin/env python3
 """Targeted tests for SecureUSBDaemon logic on Linux."""
 
+import json
+import signal
+import tempfile
+import time
 import unittest
+from pathlib import Path
 from unittest.mock import MagicMock, patch
 
+from src.daemon.authorization import DeviceAuthorizer, MemoryBackend
+from src.daemon.policy import PolicyEngine
+from src.daemon.auth_cache import AuthSession, ReplugCache
+from src.daemon.timers import DeadlineScheduler
+from src.daemon.metrics import DaemonMetrics
+from src.daemon.snapshot import StateJournal
+from src.daemon.profiling import ProfilingWindow
+from src.daemon.rate_limit import AuthRateLimiter
+from src.daemon.state import (
+    DeviceStateTable,
+    STATE_PENDING,
+    STATE_AUTHORIZED,
+    STATE_POWER_ONLY,
+    STATE_DENIED,
+    STATE_TIMED_OUT,
+)
 from src.daemon.service import SecureUSBDaemon
+from src.auth.totp import RecoveryCodeIndex, RecoveryCodeManager, TOTPAuthenticator
+from src.utils.config import Config
 from src.utils.logger import EventAction
 
+RECOVERY_CODE = "ABCD-EFGH-JKLM"
+
 
 class TestSecureUSBDaemon(unittest.TestCase):
     def _daemon_stub(self):
         daemon = SecureUSBDaemon.__new__(SecureUSBDaemon)
         daemon.logger = MagicMock()
+        daemon.audit = MagicMock()
         daemon.dbus_service = MagicMock()
         daemon.whitelist = MagicMock()
         daemon.whitelist.is_whitelisted.return_value = False
         daemon.config = MagicMock()
+        daemon.config.get_timeout.return_value = 30
         daemon.storage = MagicMock()
-        daemon.recovery_codes = ["HASH1"]
-        daemon.timeout_timers = {}
-        daemon.pending_authorizations = {}
+        daemon.recovery_codes = RecoveryCodeIndex([RecoveryCodeManager.hash_code(RECOVERY_CODE)])
+        daemon.auth_loading = False
+        daemon.timeouts = DeadlineScheduler(
+            daemon._handle_authorization_timeout,
+            add_timeout=MagicMock(return_value=77),
+            remove_timeout=MagicMock(),
+        )
+        daemon.devices = DeviceStateTable()
+        daemon.backend = MemoryBackend()
+        daemon.authorizer = DeviceAuthorizer(daemon.backend)
+        daemon.policy = PolicyEngine()
+        daemon.session = AuthSession()
+        daemon.replug_cache = ReplugCache()
+        daemon.rate_limiter = AuthRateLimiter()
+        daemon.metrics = DaemonMetrics(queue_depths=daemon._queue_depths)
         return daemon
 
-    @patch("src.daemon.service.GLib.source_remove")
-    @patch("src.daemon.service.USBAuthorization.allow_device", return_value=True)
-    def test_handle_authorization_request_full(self, mock_allow, mock_remove):
+    @staticmethod
+    def _audited(daemon, action):
+        """Fields of the last audit event of a kind."""
+        calls = [c for c in daemon.audit.emit.call_args_list if c.args[0] == action]
+        return calls[-1].kwargs
+
+    @staticmethod
+    def _make_pending(daemon, device_info):
+        daemon.devices.connect(device_info["device_id"], device_info)
+        daemon.devices.set_state(device_info["device_id"], STATE_PENDING)
+
+    def test_handle_authorization_request_full(self):
         daemon = self._daemon_stub()
+        daemon.backend.add_device("1-1", authorized="0")
         daemon._verify_authentication = MagicMock(return_value=True)
 
         device_info = {
@@ -37,14 +86,14 @@ class TestSecureUSBDaemon(unittest.TestCase):
             "product_name": "Bar",
             "serial_number": "ABC",
         }
-        daemon.timeout_timers["1-1"] = 123
-        daemon.pending_authorizations["1-1"] = device_info.copy()
+        daemon.timeouts.schedule("1-1", 30)
+        self._make_pending(daemon, device_info.copy())
 
         result = daemon._handle_authorization_request(device_info, "123456", "full")
 
         self.assertEqual(result, "success")
-        mock_allow.assert_called_once_with("1-1")
-        daemon.logger.log_event.assert_any_call(
+        self.assertEqual(daemon.backend.writes, [("authorized", "1-1", "1")])
+        daemon.audit.emit.assert_any_call(
             EventAction.DEVICE_AUTHORIZED,
             device_path="/sys/bus/usb/devices/1-1",
             vendor_id="046d",
@@ -56,10 +105,10 @@ class TestSecureUSBDaemon(unittest.TestCase):
             success=True,
         )
         daemon.dbus_service.emit_authorization_result.assert_called_once_with("1-1", "authorized", True)
-        mock_remove.assert_called_once_with(123)
+        self.assertNotIn("1-1", daemon.timeouts)
+        daemon.timeouts.remove_timeout.assert_called_once_with(77)
 
-    @patch("src.daemon.service.GLib.source_remove")
-    def test_handle_authorization_auth_failure_logs_event(self, mock_remove):
+    def test_handle_authorization_auth_failure_logs_event(self):
         daemon = self._daemon_stub()
         daemon._verify_authentication = MagicMock(return_value=False)
 
@@ -70,11 +119,13 @@ class TestSecureUSBDaemon(unittest.TestCase):
             "product_id": "0000",
             "serial_number": "DEF",
         }
+        self._make_pending(daemon, device_info.copy())
+        daemon.timeouts.schedule("2-1", 30)
 
         result = daemon._handle_authorization_request(device_info, "bad", "full")
 
         self.assertEqual(result, "auth_failed")
-        daemon.logger.log_event.assert_any_call(
+        daemon.audit.emit.assert_any_call(
             EventAction.AUTH_FAILED,
             device_path="/sys",
             vendor_id="0000",
@@ -83,7 +134,20 @@ class TestSecureUSBDaemon(unittest.TestCase):
             success=False,
             details="Invalid TOTP code or recovery code",
         )
-        mock_remove.assert_not_called()
+        # The deadline keeps running after a wrong code
+        self.assertIn("2-1", daemon.timeouts)
+        daemon.timeouts.remove_timeout.assert_not_called()
+
+    def test_authorization_request_requires_pending_device(self):
+        daemon = self._daemon_stub()
+        daemon._verify_authentication = MagicMock(return_value=False)
+
+        for device_id in ("../../etc", "x" * 10 + "/", None, "9-9"):
+            result = daemon._handle_authorization_request({"device_id": device_id}, "000000", "full", sender=":1.4")
+            self.assertEqual(result, "error")
+
+        daemon._verify_authentication.assert_not_called()
+        self.assertEqual(daemon.rate_limiter._buckets, {})
 
     def test_verify_authentication_prefers_recovery_codes(self):
         daemon = self._daemon_stub()
@@ -91,11 +155,461 @@ class TestSecureUSBDaemon(unittest.TestCase):
         daemon.totp_auth.verify_code.return_value = False
         daemon.storage.remove_recovery_code.return_value = True
 
-        with patch("src.daemon.service.RecoveryCodeManager.verify_code", return_value=True):
-            self.assertTrue(daemon._verify_authentication("123456"))
+        self.assertFalse(daemon._verify_authentication("ABCD-EFGH-JKLN"))
+        self.assertTrue(daemon._verify_authentication("abcd-efgh-jklm"))
+
+        self.assertEqual(len(daemon.recovery_codes), 0)
+        daemon.storage.remove_recovery_code.assert_called_once_with(
+            RecoveryCodeManager.hash_code(RECOVERY_CODE)
+        )
+        self.assertFalse(daemon._verify_authentication(RECOVERY_CODE))
+
+    def test_reconcile_existing_devices_queues_unknown(self):
+        daemon = self._daemon_stub()
+        daemon.backend.add_device("1-2")
+        daemon.monitor = MagicMock()
+        daemon.config.get_timeout.return_value = 30
+
+        unknown = {"device_id": "1-2", "vendor_id": "0781", "product_id": "5583",
+                   "serial_number": "X", "authorized": True}
+        trusted = {"device_id": "1-1", "vendor_id": "046d", "product_id": "c52b",
+                   "serial_number": "T", "authorized": True}
+        result = {"queued": [unknown], "trusted": [trusted], "pending": [],
+                  "skipped": [], "elapsed_ms": 1.0}
+
+        with patch("src.daemon.service.StartupReconciler") as mock_reconciler:
+            mock_reconciler.return_value.run.return_value = result
+            daemon._reconcile_existing_devices()
+
+        self.assertEqual(daemon.backend.writes, [("authorized", "1-2", "0")])
+        self.assertTrue(daemon.devices.is_pending("1-2"))
+        self.assertNotIn("authorized", daemon.devices.pending_info("1-2"))
+        self.assertAlmostEqual(daemon.timeouts.remaining("1-2"), 30, delta=1)
+        daemon.timeouts.add_timeout.assert_called_once()
+        self.assertEqual(daemon.devices.state_of("1-1"), STATE_AUTHORIZED)
+        daemon.dbus_service.emit_device_connected.assert_called_once()
+
+    def test_policy_block_skips_prompt(self):
+        daemon = self._daemon_stub()
+        daemon.backend.add_device("1-4", authorized="1")
+        daemon.totp_auth = MagicMock()
+        daemon.policy = PolicyEngine([{"id": "no-front-port", "action": "block", "port": "1-4"}])
+
+        device = MagicMock()
+        device.device_id = "1-4"
+        device.received_at = time.monotonic()
+        device.serial_number = "ABC"
+        device.get_interface_classes.return_value = ["08"]
+        device.to_dict.return_value = {
+            "device_id": "1-4",
+            "device_path": "/sys/bus/usb/devices/1-4",
+            "vendor_id": "0781",
+            "product_id": "5583",
+            "serial_number": "ABC",
+        }
+
+        daemon._handle_device_connected(device)
+
+        self.assertEqual(daemon.backend.read_attribute("1-4", "authorized"), "0")
+        self.assertEqual(daemon.devices.count(STATE_PENDING), 0)
+        daemon.dbus_service.emit_device_connected.assert_not_called()
+        daemon.audit.emit.assert_any_call(
+            EventAction.DEVICE_DENIED,
+            device_path="/sys/bus/usb/devices/1-4",
+            vendor_id="0781",
+            product_id="5583",
+            vendor_name=None,
+            product_name=None,
+            serial_number="ABC",
+            auth_method="policy",
+            success=True,
+            details="rule 'no-front-port' (#1) matched port 1-4",
+        )
+
+    def test_connect_logged_after_block_write(self):
+        daemon = self._daemon_stub()
+        daemon.backend.add_device("1-5", authorized="1")
+        daemon.totp_auth = MagicMock()
+
+        written = []
+        daemon.audit.emit.side_effect = lambda action, **fields: written.append(
+            (action, daemon.backend.read_attribute("1-5", "authorized"), fields.get("timestamp")))
+
+        device = MagicMock()
+        device.device_id = "1-5"
+        device.received_at = time.monotonic()
+        device.serial_number = ""
+        device.get_interface_classes.return_value = []
+        device.to_dict.return_value = {"device_id": "1-5", "vendor_id": "0781", "product_id": "5583"}
+
+        before = time.time()
+        daemon._handle_device_connected(device)
+
+        action, authorized, timestamp = written[-1]
+        self.assertEqual(action, EventAction.DEVICE_CONNECTED)
+        self.assertEqual(authorized, "0")
+        self.assertGreaterEqual(timestamp, before)
+
+    def test_policy_block_failure_not_recorded_as_denied(self):
+        daemon = self._daemon_stub()
+        daemon.totp_auth = MagicMock()
+        daemon.policy = PolicyEngine([{"id": "no-front-port", "action": "block", "port": "1-4"}])
+        daemon.authorizer = MagicMock()
+        daemon.authorizer.block_device.return_value = False
+
+        device = MagicMock()
+        device.device_id = "1-4"
+        device.received_at = time.monotonic()
+        device.get_interface_classes.return_value = []
+        device.to_dict.return_value = {"device_id": "1-4", "vendor_id": "0781", "product_id": "5583"}
+
+        daemon._handle_device_connected(device)
+
+        self.assertEqual(daemon.authorizer.block_device.call_count, 2)
+        self.assertNotEqual(daemon.devices.state_of("1-4"), STATE_DENIED)
+        self.assertEqual(daemon.metrics.authorizations.get(STATE_DENIED, "policy"), 0)
+        self.assertFalse(self._audited(daemon, EventAction.DEVICE_DENIED)["success"])
+
+    def test_auth_load_failure_denies_queued_devices(self):
+        daemon = self._daemon_stub()
+        daemon.backend.add_device("1-1", authorized="1")
+        daemon.auth_loading = True
+        daemon._queue_for_authorization("1-1", {"device_id": "1-1", "serial_number": "A"})
+
+        with patch("src.daemon.service.sd_notify") as notify:
+            daemon._handle_authentication_unavailable()
+
+        self.assertEqual(daemon.devices.state_of("1-1"), STATE_DENIED)
+        self.assertEqual(daemon.backend.read_attribute("1-1", "authorized"), "0")
+        self.assertNotIn("1-1", daemon.timeouts)
+        daemon.dbus_service.emit_authorization_result.assert_called_once_with("1-1", "auth_unavailable", False)
+        daemon.dbus_service.emit_protection_state_changed.assert_called_once_with(False)
+        self.assertIn("inactive", notify.call_args.args[0])
+
+    def test_session_authorizes_next_hid_device(self):
+        daemon = self._daemon_stub()
+        daemon.totp_auth = MagicMock()
+        daemon.session = AuthSession(300, "hid")
+        daemon._verify_authentication = MagicMock(return_value=True)
+        daemon.backend.add_device("1-1", authorized="0")
+        daemon.backend.add_device("1-2", authorized="0")
+
+        first = {"device_id": "1-1", "vendor_id": "046d"}
+        self._make_pending(daemon, first.copy())
+        self.assertEqual(daemon._handle_authorization_request(first, "123456", "full"), "success")
+
+        keyboard = MagicMock()
+        keyboard.device_id = "1-2"
+        keyboard.serial_number = ""
+        keyboard.get_interface_classes.return_value = ["03"]
+        keyboard.to_dict.return_value = {"device_id": "1-2", "vendor_id": "04d9", "product_id": "0006"}
+
+        daemon._handle_device_connected(keyboard)
+
+        self.assertEqual(daemon.backend.read_attribute("1-2", "authorized"), "1")
+        self.assertEqual(daemon.devices.state_of("1-2"), STATE_AUTHORIZED)
+        self.assertEqual(self._audited(daemon, EventAction.DEVICE_AUTHORIZED)["auth_method"], "session")
+
+    def test_session_not_started_when_authorization_fails(self):
+        daemon = self._daemon_stub()
+        daemon.session = AuthSession(300, "hid")
+        daemon._verify_authentication = MagicMock(return_value=True)
+        # Pending in the table, but gone from sysfs: the write fails
+        self._make_pending(daemon, {"device_id": "1-1", "vendor_id": "046d"})
+
+        self.assertEqual(daemon._handle_authorization_request({"device_id": "1-1"}, "123456", "full"), "error")
+
+        self.assertFalse(daemon.session.is_active())
+
+    def test_session_vendor_comes_from_daemon_record(self):
+        daemon = self._daemon_stub()
+        daemon.session = AuthSession(300, "same_vendor")
+        daemon._verify_authentication = MagicMock(return_value=True)
+        daemon.backend.add_device("1-1", authorized="0")
+        self._make_pending(daemon, {"device_id": "1-1", "vendor_id": "0781"})
+
+        spoofed = {"device_id": "1-1", "vendor_id": "046d"}
+        self.assertEqual(daemon._handle_authorization_request(spoofed, "123456", "full"), "success")
+
+        self.assertEqual(daemon.session.vendors, {"0781"})
+
+    def test_replug_restores_mode_until_denied(self):
+        daemon = self._daemon_stub()
+        daemon.totp_auth = MagicMock()
+        daemon._verify_authentication = MagicMock(return_value=True)
+        daemon.backend.add_device("1-3", authorized="0", interfaces={"1-3:1.0": "usb-storage"})
+
+        device = MagicMock()
+        device.device_id = "1-3"
+        device.received_at = time.monotonic()
+        device.serial_number = "DISK1"
+        device.get_interface_classes.return_value = ["08"]
+        device.to_dict.return_value = {
+            "device_id": "1-3",
+            "vendor_id": "0781",
+            "product_id": "5583",
+            "serial_number": "DISK1",
+            "usb_interfaces": ":080650:",
+        }
+        self._make_pending(daemon, device.to_dict.return_value.copy())
+        request = {"device_id": "1-3", "vendor_id": "0781"}
+        daemon._handle_authorization_request(request, "123456", "power_only")
+
+        daemon._handle_device_disconnected(device)
+        daemon.backend.add_device("1-3", authorized="0", interfaces={"1-3:1.0": "usb-storage"})
+        daemon._handle_device_connected(device)
+
+        self.assertEqual(daemon.devices.state_of("1-3"), STATE_POWER_ONLY)
+        self.assertEqual(daemon.backend.list_bound_interfaces("1-3"), [])
+        self.assertEqual(self._audited(daemon, EventAction.DEVICE_AUTHORIZED_POWER_ONLY)["auth_method"], "replug")
+
+        # After an explicit deny the device must be authorized again
+        daemon._handle_authorization_request({"device_id": "1-3"}, "", "deny")
+        daemon._handle_device_disconnected(device)
+        daemon._handle_device_connected(device)
+        self.assertTrue(daemon.devices.is_pending("1-3"))
+
+    def test_timeout_marks_device_timed_out(self):
+        daemon = self._daemon_stub()
+        daemon.backend.add_device("1-5")
+        self._make_pending(daemon, {"device_id": "1-5", "serial_number": "S"})
+
+        daemon._handle_authorization_timeout("1-5")
+
+        self.assertEqual(daemon.devices.state_of("1-5"), STATE_TIMED_OUT)
+        self.assertEqual(daemon.backend.read_attribute("1-5", "authorized"), "0")
+        self.assertEqual(daemon._handle_state_request("device_counts")[STATE_TIMED_OUT], 1)
+
+        denied = [c for c in daemon.audit.emit.call_args_list if c.args[0] == EventAction.DEVICE_DENIED]
+        self.assertEqual(len(denied), 1)
+        self.assertEqual(denied[0].kwargs["details"], "Authorization timeout (auto-deny)")
+
+    def test_duplicate_add_ignored(self):
+        daemon = self._daemon_stub()
+        self._make_pending(daemon, {"device_id": "1-6"})
+
+        device = MagicMock()
+        device.device_id = "1-6"
+        daemon._handle_device_connected(device)
+
+        daemon.audit.emit.assert_not_called()
+        self.assertTrue(daemon.devices.is_pending("1-6"))
+
+    def test_controller_add_applies_default(self):
+        daemon = self._daemon_stub()
+        daemon.backend.add_controller("usb1", "1")
+        daemon.authorizer.set_default_authorization("0")
+
+        daemon.backend.add_controller("usb2", "1")
+        daemon._handle_controller_event("usb2", "add")
+
+        self.assertEqual(daemon.backend.controllers["usb2"], "0")
+        self.assertEqual(
+            daemon._handle_state_request("controller_states"),
+            {"usb1": "0", "usb2": "0"},
+        )
+
+    def _config_file_stub(self, daemon, tmp_dir):
+        daemon.config = Config(config_dir=Path(tmp_dir))
+        daemon.whitelist.whitelist_file = Path(tmp_dir) / "whitelist.json"
+        return daemon.config
+
+    def test_config_file_reload_applies_settings(self):
+        daemon = self._daemon_stub()
+        daemon.backend.add_controller("usb1", "0")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            config = self._config_file_stub(daemon, tmp_dir)
+            data = json.loads(config.config_file.read_text())
+            data["general"]["enabled"] = False
+            data["replug"]["grace_seconds"] = 90
+            config.config_file.write_text(json.dumps(data))
+
+            self.assertTrue(daemon._handle_config_file_changed("config.json"))
+
+        self.assertEqual(daemon.replug_cache.grace_seconds, 90)
+        self.assertEqual(daemon.backend.controllers["usb1"], "1")
+        daemon.dbus_service.emit_protection_state_changed.assert_called_once_with(False)
+        daemon.dbus_service.emit_config_changed.assert_called_once_with("config.json")
+
+    def test_config_file_reload_unchanged_is_silent(self):
+        daemon = self._daemon_stub()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            self._config_file_stub(daemon, tmp_dir)
+            self.assertFalse(daemon._handle_config_file_changed("config.json"))
+
+        daemon.dbus_service.emit_config_changed.assert_not_called()
+
+    def test_invalid_policy_keeps_current(self):
+        daemon = self._daemon_stub()
+        policy = daemon.policy
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            self._config_file_stub(daemon, tmp_dir)
+            (Path(tmp_dir) / "policy.json").write_text('{"rules": [{"action": "explode"}]}')
+            self.assertFalse(daemon._handle_config_file_changed("policy.json"))
+
+            (Path(tmp_dir) / "policy.json").write_text(
+                '{"rules": [{"vendor_id": "046d", "action": "allow"}]}'
+            )
+            self.assertTrue(daemon._handle_config_file_changed("policy.json"))
+
+        self.assertIsNot(daemon.policy, policy)
+        self.assertEqual(len(daemon.policy.rules), 1)
+        daemon.dbus_service.emit_config_changed.assert_called_once_with("policy.json")
+
+    def test_profiling_signal_toggles_window(self):
+        daemon = self._daemon_stub()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            daemon.profiler = ProfilingWindow(
+                Path(tmp_dir),
+                hooks=[(daemon.timeouts, "callback")],
+                add_timeout=MagicMock(return_value=5),
+                remove_timeout=MagicMock(),
+            )
+            self._make_pending(daemon, {"device_id": "1-8"})
+
+            daemon._handle_profiling_signal(signal.SIGUSR2, None)
+            daemon.timeouts.callback("1-8")
+            daemon._handle_profiling_signal(signal.SIGUSR2, None)
+
+            self.assertEqual(len(list(Path(tmp_dir).glob("profile-*.pstats"))), 1)
+
+        self.assertEqual(daemon.timeouts.callback, daemon._handle_authorization_timeout)
+        self.assertEqual(daemon.devices.get("1-8").state, STATE_TIMED_OUT)
+
+    def test_locked_out_request_skips_verification(self):
+        daemon = self._daemon_stub()
+        daemon.backend.add_device("1-9", authorized="0")
+        self._make_pending(daemon, {"device_id": "1-9"})
+        daemon.timeouts.schedule("1-9", 30)
+        daemon._verify_authentication = MagicMock(return_value=False)
+
+        for _ in range(5):
+            result = daemon._handle_authorization_request({"device_id": "1-9"}, "000000", "full", sender=":1.7")
+            self.assertEqual(result, "auth_failed")
+
+        daemon._verify_authentication.reset_mock()
+        result = daemon._handle_authorization_request({"device_id": "1-9"}, "123456", "full", sender=":1.7")
+
+        self.assertEqual(result, "rate_limited")
+        daemon._verify_authentication.assert_not_called()
+        self.assertIn("1-9", daemon.timeouts)
+        self.assertEqual(daemon.metrics.auth_rate_limited.get(), 1)
+
+        # Denying is never rate limited
+        self.assertEqual(daemon._handle_authorization_request({"device_id": "1-9"}, "", "deny"), "success")
+
+    def test_metrics_count_decisions(self):
+        daemon = self._daemon_stub()
+        daemon.backend.add_device("1-7")
+        self._make_pending(daemon, {"device_id": "1-7"})
+        daemon._verify_authentication = MagicMock(return_value=False)
+
+        self.assertEqual(daemon._handle_authorization_request({"device_id": "1-7"}, "000000", "full"),
+                         "auth_failed")
+        daemon._handle_authorization_timeout("1-7")
+
+        self.assertEqual(daemon.metrics.auth_failures.get(), 1)
+        self.assertEqual(daemon.metrics.authorizations.get(STATE_TIMED_OUT, "timeout"), 1)
+        self.assertIn('secureusb_queue_depth{queue="pending_devices"} 0',
+                      daemon.metrics.render())
+
+    def test_clock_drift_query(self):
+        daemon = self._daemon_stub()
+        daemon.totp_auth = None
+        self.assertEqual(daemon._handle_state_request("clock_drift"), {})
+
+        daemon.totp_auth = TOTPAuthenticator()
+        daemon.totp_auth._learn_drift(-2)
+        drift = daemon._handle_state_request("clock_drift")
+        self.assertEqual(drift["drift_steps"], -1.0)
+        self.assertEqual(drift["drift_seconds"], -30.0)
+
+    def test_device_queued_while_authentication_loads(self):
+        daemon = self._daemon_stub()
+        daemon.totp_auth = None
+        daemon.auth_loading = True
+        daemon.backend.add_device("1-8")
+
+        device = MagicMock()
+        device.device_id = "1-8"
+        device.serial_number = ""
+        device.received_at = time.monotonic()
+        device.get_interface_classes.return_value = ["08"]
+        device.to_dict.return_value = {"device_id": "1-8", "vendor_id": "0781", "product_id": "5567"}
+
+        daemon._handle_device_connected(device)
+
+        self.assertTrue(daemon.devices.is_pending("1-8"))
+        self.assertEqual(daemon.backend.read_attribute("1-8", "authorized"), "0")
+
+    def _journal_stub(self, daemon, tmp_dir):
+        daemon.state_journal = StateJournal(Path(tmp_dir) / "state.journal")
+        daemon.devices.add_listener(daemon._persist_state_change)
+        return daemon.state_journal
+
+    def test_state_survives_restart(self):
+        keyboard = {"device_id": "1-1", "vendor_id": "04d9", "product_id": "0006", "serial_number": "KB"}
+        disk = {"device_id": "1-2", "vendor_id": "0781", "product_id": "5567", "serial_number": "DISK"}
+        gone = {"device_id": "1-3", "vendor_id": "1234", "product_id": "5678", "serial_number": "X"}
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            daemon = self._daemon_stub()
+            self._journal_stub(daemon, tmp_dir)
+            daemon.backend.add_device("1-1", authorized="0")
+            daemon.backend.add_device("1-2", authorized="0")
+            daemon.backend.add_device("1-3", authorized="0")
+            for info in (keyboard, disk, gone):
+                self._make_pending(daemon, info)
+            daemon.timeouts.schedule("1-2", 30)
+            self.assertEqual(daemon._authorize_device_full("1-1", keyboard), "success")
+            daemon.state_journal.close()
+
+            restarted = self._daemon_stub()
+            journal = self._journal_stub(restarted, tmp_dir)
+            restarted._saved_states = journal.load()
+            restarted.backend.add_device("1-1", authorized="1", idVendor="04d9", idProduct="0006", serial="KB")
+            restarted.backend.add_device("1-2", authorized="0", idVendor="0781", idProduct="5567", serial="DISK")
+
+            restarted._restore_saved_states()
+            journal.close()
+            saved = StateJournal(Path(tmp_dir) / "state.journal").load()
+
+        self.assertEqual(restarted.devices.state_of("1-1"), STATE_AUTHORIZED)
+        self.assertEqual(restarted.devices.get("1-1").method, "totp")
+        self.assertTrue(restarted.devices.is_pending("1-2"))
+        self.assertGreater(restarted.timeouts.remaining("1-2"), 25)
+        restarted.dbus_service.emit_device_connected.assert_called_once_with(disk)
+        self.assertNotIn("1-3", restarted.devices)
+        self.assertEqual(set(saved), {"1-1", "1-2"})
+
+    def test_restore_rejects_changed_device(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            daemon = self._daemon_stub()
+            journal = self._journal_stub(daemon, tmp_dir)
+            journal.record("1-1", STATE_DENIED, "user", time.time(),
+                           {"vendor_id": "0781", "product_id": "5567", "serial_number": "A"})
+            daemon._saved_states = journal.load()
+            daemon.backend.add_device("1-1", authorized="0", idVendor="0781", idProduct="5567", serial="B")
+
+            daemon._restore_saved_states()
+            journal.close()
+
+        self.assertNotIn("1-1", daemon.devices)
+
+    def test_expired_pending_times_out_on_restore(self):
+        info = {"device_id": "1-1", "vendor_id": "0781", "product_id": "5567", "serial_number": "A"}
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            daemon = self._daemon_stub()
+            journal = self._journal_stub(daemon, tmp_dir)
+            journal.record("1-1", STATE_PENDING, None, time.time() - 120, info)
+            daemon._saved_states = journal.load()
+            daemon.backend.add_device("1-1", authorized="0", idVendor="0781", idProduct="5567", serial="A")
+
+            daemon._restore_saved_states()
+            journal.close()
 
-        self.assertEqual(daemon.recovery_codes, [])
-        daemon.storage.remove_recovery_code.assert_called_once_with("HASH1")
+        self.assertEqual(daemon.devices.state_of("1-1"), STATE_TIMED_OUT)
+        self.assertNotIn("1-1", daemon.timeouts)
 
 
 if __name__ == "__main__":
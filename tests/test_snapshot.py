@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Unit tests for src/daemon/snapshot.py
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.daemon.snapshot import StateJournal
+from src.daemon.state import STATE_AUTHORIZED, STATE_PENDING, STATE_REMOVED
+
+
+class TestStateJournal(unittest.TestCase):
+    """Test the append-only device state journal."""
+
+    def setUp(self):
+        self.test_dir = Path(tempfile.mkdtemp())
+        self.path = self.test_dir / 'state.journal'
+        self.journal = StateJournal(self.path, compact_min_lines=8)
+
+    def tearDown(self):
+        self.journal.close()
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def reopen(self):
+        self.journal.close()
+        return StateJournal(self.path).load()
+
+    def test_empty(self):
+        """Test loading when no journal exists yet."""
+        self.assertEqual(self.journal.load(), {})
+
+    def test_last_entry_wins(self):
+        """Test that the latest state of each device is restored."""
+        self.journal.record('1-1', STATE_PENDING, None, 100.0, {'serial_number': 'A'})
+        self.journal.record('1-1', STATE_AUTHORIZED, 'totp', 105.0, {'serial_number': 'A'})
+        self.journal.record('1-2', STATE_PENDING, None, 110.0, {})
+        self.journal.record('1-2', STATE_REMOVED)
+
+        saved = self.reopen()
+
+        self.assertEqual(list(saved), ['1-1'])
+        self.assertEqual(saved['1-1']['state'], STATE_AUTHORIZED)
+        self.assertEqual(saved['1-1']['method'], 'totp')
+        self.assertEqual(saved['1-1']['at'], 105.0)
+
+    def test_torn_write_skipped(self):
+        """Test that a partial line left by a crash is ignored."""
+        self.journal.record('1-1', STATE_AUTHORIZED, 'policy', 100.0, {})
+        self.journal.close()
+        with open(self.path, 'a') as f:
+            f.write('{"id": "1-2", "sta')
+
+        self.assertEqual(list(StateJournal(self.path).load()), ['1-1'])
+
+    def test_compaction(self):
+        """Test that dead lines are compacted away."""
+        for i in range(50):
+            self.journal.record('1-1', STATE_PENDING, None, float(i), {})
+            self.journal.record('1-1', STATE_REMOVED)
+        self.journal.record('2-1', STATE_AUTHORIZED, 'totp', 1.0, {})
+        self.journal.flush()
+
+        self.assertLessEqual(len(self.path.read_text().splitlines()), 8)
+        self.assertEqual(list(self.reopen()), ['2-1'])
+        self.assertFalse(self.path.with_name('state.journal.tmp').exists())
+
+    def test_explicit_compact(self):
+        """Test rewriting the journal with only live entries."""
+        self.journal.record('1-1', STATE_AUTHORIZED, 'totp', 1.0, {})
+        self.journal.record('1-2', STATE_AUTHORIZED, 'totp', 1.0, {})
+        self.journal.record('1-2', STATE_REMOVED)
+
+        self.journal.compact()
+        self.journal.record('1-3', STATE_PENDING, None, 2.0, {})
+        self.journal.flush()
+
+        self.assertEqual(len(self.path.read_text().splitlines()), 2)
+        self.assertEqual(set(self.reopen()), {'1-1', '1-3'})
+
+    def test_record_does_not_write_on_caller_thread(self):
+        """Test that record() leaves the write and fsync to the writer thread."""
+        caller = threading.get_ident()
+        release = threading.Event()
+        fsync_threads = []
+        real_fsync = os.fsync
+
+        def slow_fsync(fd):
+            fsync_threads.append(threading.get_ident())
+            release.wait(5)
+            real_fsync(fd)
+
+        with patch('src.daemon.snapshot.os.fsync', side_effect=slow_fsync):
+            for i in range(20):
+                self.journal.record(f'1-{i}', STATE_PENDING, None, 1.0, {})
+            release.set()
+            self.journal.flush()
+
+        self.assertTrue(fsync_threads)
+        self.assertNotIn(caller, fsync_threads)
+        self.assertEqual(len(self.reopen()), 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Unit tests for src/daemon/startup.py
+"""
+
+import os
+import shutil
+import socket
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.daemon.startup import StartupProfile, sd_notify
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 10.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestStartupProfile(unittest.TestCase):
+    """Test import and phase timings."""
+
+    def test_timings(self):
+        """Test that imports, phases and marks are recorded in order."""
+        clock = FakeClock()
+        profile = StartupProfile(clock=clock)
+
+        with profile.importing('dbus'):
+            clock.now += 0.020
+        profile.begin('components')
+        clock.now += 0.005
+        profile.begin('block')
+        clock.now += 0.001
+        profile.end()
+        profile.mark('ready')
+
+        self.assertEqual(profile.as_dict(), {
+            'imports': {'dbus': 20.0},
+            'phases': {'components': 5.0, 'block': 1.0},
+            'marks': {'ready': 26.0},
+        })
+        self.assertIn('block', profile.report())
+
+    def test_end_without_phase(self):
+        """Test that ending with no open phase records nothing."""
+        profile = StartupProfile()
+        profile.end()
+
+        self.assertEqual(profile.phases, [])
+
+
+class TestSdNotify(unittest.TestCase):
+    """Test the systemd notification protocol."""
+
+    def setUp(self):
+        self.test_dir = Path(tempfile.mkdtemp())
+        self.socket_path = self.test_dir / 'notify'
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.server.bind(str(self.socket_path))
+        self.server.settimeout(5)
+
+    def tearDown(self):
+        self.server.close()
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_not_under_systemd(self):
+        """Test that nothing is sent without NOTIFY_SOCKET."""
+        with patch.dict(os.environ, {}, clear=True):
+            self.assertFalse(sd_notify("READY=1"))
+
+    def test_ready(self):
+        """Test sending READY=1 to the notify socket."""
+        with patch.dict(os.environ, {'NOTIFY_SOCKET': str(self.socket_path)}):
+            self.assertTrue(sd_notify("READY=1\nSTATUS=USB protection active"))
+
+        self.assertEqual(self.server.recv(4096), b"READY=1\nSTATUS=USB protection active")
+
+    def test_missing_socket(self):
+        """Test that a stale socket path is reported, not raised."""
+        with patch.dict(os.environ, {'NOTIFY_SOCKET': str(self.test_dir / 'gone')}):
+            self.assertFalse(sd_notify("READY=1"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Unit tests for src/daemon/state.py
+"""
+
+import unittest
+from pathlib import Path
+
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.daemon.state import (
+    DeviceStateTable,
+    STATE_CONNECTED,
+    STATE_PENDING,
+    STATE_AUTHORIZED,
+    STATE_DENIED,
+    STATE_TIMED_OUT,
+    STATE_REMOVED,
+)
+
+
+class TestDeviceStateTable(unittest.TestCase):
+    """Test the device state table."""
+
+    def setUp(self):
+        self.table = DeviceStateTable()
+        self.deltas = []
+        self.table.add_listener(self.deltas.append)
+
+    def test_lifecycle(self):
+        """Test a device moving through its states."""
+        self.table.connect("1-4", {"serial_number": "ABC"})
+        self.assertEqual(self.table.state_of("1-4"), STATE_CONNECTED)
+
+        self.assertTrue(self.table.set_state("1-4", STATE_PENDING))
+        self.assertTrue(self.table.is_pending("1-4"))
+        self.assertEqual(self.table.pending_info("1-4"), {"serial_number": "ABC"})
+
+        self.assertTrue(self.table.set_state("1-4", STATE_AUTHORIZED))
+        self.assertFalse(self.table.is_pending("1-4"))
+
+        record = self.table.remove("1-4")
+        self.assertEqual(record.state, STATE_REMOVED)
+        self.assertNotIn("1-4", self.table)
+
+        self.assertEqual([delta[2] for delta in self.deltas],
+                         [STATE_CONNECTED, STATE_PENDING, STATE_AUTHORIZED, STATE_REMOVED])
+
+    def test_invalid_transition(self):
+        """Test that transitions outside the lifecycle are refused."""
+        self.table.connect("1-4", {})
+
+        self.assertFalse(self.table.set_state("1-4", STATE_TIMED_OUT))
+        self.assertFalse(self.table.set_state("9-9", STATE_PENDING))
+        self.assertEqual(self.table.state_of("1-4"), STATE_CONNECTED)
+
+    def test_state_index(self):
+        """Test listing and counting by state."""
+        for device_id in ("1-1", "1-2", "1-3"):
+            self.table.connect(device_id, {})
+            self.table.set_state(device_id, STATE_PENDING)
+        self.table.set_state("1-2", STATE_DENIED)
+
+        self.assertEqual([r.device_id for r in self.table.in_state(STATE_PENDING)], ["1-1", "1-3"])
+        self.assertEqual(self.table.count(STATE_DENIED), 1)
+        self.assertEqual(self.table.counts()[STATE_PENDING], 2)
+
+    def test_serial_index(self):
+        """Test finding devices by serial number."""
+        self.table.connect("1-1", {"serial_number": "ABC"})
+        self.table.connect("2-1", {"serial_number": "ABC"})
+        self.table.connect("3-1", {"serial_number": "XYZ"})
+
+        self.assertEqual({r.device_id for r in self.table.find_by_serial("ABC")}, {"1-1", "2-1"})
+
+        self.table.remove("1-1")
+        self.table.remove("2-1")
+        self.assertEqual(self.table.find_by_serial("ABC"), [])
+
+    def test_reconnect_replaces_record(self):
+        """Test that connecting a known device resets its state and indexes."""
+        self.table.connect("1-1", {"serial_number": "OLD"})
+        self.table.set_state("1-1", STATE_PENDING)
+
+        self.table.connect("1-1", {"serial_number": "NEW"})
+
+        self.assertEqual(self.table.count(STATE_PENDING), 0)
+        self.assertEqual(self.table.find_by_serial("OLD"), [])
+        self.assertEqual(len(self.table.find_by_serial("NEW")), 1)
+
+    def test_deltas_since(self):
+        """Test catching up on the delta stream."""
+        self.table.connect("1-1", {})
+        self.table.set_state("1-1", STATE_PENDING)
+        self.table.remove("1-1")
+
+        self.assertEqual(self.table.deltas_since(1), [(2, "1-1", STATE_PENDING), (3, "1-1", STATE_REMOVED)])
+        self.assertEqual(self.table.sequence, 3)
+
+    def test_delta_history_bounded(self):
+        """Test that old deltas are dropped."""
+        table = DeviceStateTable(history=2)
+        table.connect("1-1", {})
+        table.set_state("1-1", STATE_PENDING)
+        table.set_state("1-1", STATE_DENIED)
+
+        self.assertEqual([delta[0] for delta in table.deltas_since(0)], [2, 3])
+
+    def test_method_and_restore(self):
+        """Test recording what decided a state and restoring saved records."""
+        self.table.connect("1-1", {})
+        self.table.set_state("1-1", STATE_AUTHORIZED, "totp")
+        self.assertEqual(self.table.get("1-1").to_dict()["method"], "totp")
+
+        record = self.table.restore("2-1", {"serial_number": "ABC"}, STATE_PENDING, None, 123.0)
+
+        self.assertEqual(record.changed_at, 123.0)
+        self.assertTrue(self.table.is_pending("2-1"))
+        self.assertEqual(len(self.table.find_by_serial("ABC")), 1)
+        self.assertEqual(self.deltas[-1][1:], ("2-1", STATE_PENDING))
+
+    def test_listener_errors_contained(self):
+        """Test that a failing listener does not break state changes."""
+        def broken(delta):
+            raise RuntimeError("boom")
+
+        self.table.add_listener(broken)
+        self.table.connect("1-1", {})
+
+        self.assertEqual(self.table.state_of("1-1"), STATE_CONNECTED)
+        self.assertEqual(len(self.deltas), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,7 +7,9 @@ import unittest
 import tempfile
 import shutil
 from pathlib import Path
-from src.auth.storage import SecureStorage
+from unittest.mock import patch
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from src.auth.storage import SecureStorage, clear_key_cache, JOURNAL_COMPACT_THRESHOLD
 from src.auth.totp import create_new_authenticator, RecoveryCodeManager
 
 
@@ -36,6 +38,31 @@ class TestSecureStorage(unittest.TestCase):
         self.assertTrue(self.storage.config_dir.exists())
         self.assertEqual(self.storage.config_dir, self.test_dir)
 
+    def test_key_derived_on_first_use(self):
+        """Test that construction does not run the key derivation."""
+        self.assertIsNone(self.storage._cipher)
+        self.assertFalse(self.storage.salt_file.exists())
+
+        self.storage.save_auth_data(self.auth.get_secret(), self.hashed_codes)
+
+        self.assertIsNotNone(self.storage._cipher)
+        self.assertTrue(self.storage.salt_file.exists())
+
+    def test_derived_key_cached(self):
+        """Test that PBKDF2 runs once per salt, not once per instance."""
+        clear_key_cache()
+        secret = self.auth.get_secret()
+        with patch('cryptography.hazmat.primitives.kdf.pbkdf2.PBKDF2HMAC', wraps=PBKDF2HMAC) as kdf:
+            self.storage.save_auth_data(secret, self.hashed_codes)
+            self.assertEqual(SecureStorage(config_dir=self.test_dir).load_auth_data()['totp_secret'], secret)
+            self.assertEqual(kdf.call_count, 1)
+
+            # A new salt (another install, or an imported backup) is derived again
+            self.storage.salt_file.write_bytes(b'\x01' * 16)
+            other = SecureStorage(config_dir=self.test_dir)
+            self.assertIsNone(other.load_auth_data())
+            self.assertEqual(kdf.call_count, 2)
+
     def test_is_configured_false(self):
         """Test is_configured returns False when not configured."""
         self.assertFalse(self.storage.is_configured())
@@ -93,6 +120,97 @@ class TestSecureStorage(unittest.TestCase):
         self.assertEqual(len(loaded_data['recovery_codes']), 9)
         self.assertNotIn(code_to_remove, loaded_data['recovery_codes'])
 
+    def test_remove_recovery_code_appends_tombstone(self):
+        """Test that a used code is journaled without rewriting auth.enc."""
+        self.storage.save_auth_data(self.auth.get_secret(), self.hashed_codes)
+        encrypted = self.storage.auth_file.read_bytes()
+
+        self.assertTrue(self.storage.remove_recovery_code(self.hashed_codes[0]))
+        self.assertTrue(self.storage.remove_recovery_code(self.hashed_codes[1]))
+        self.assertFalse(self.storage.remove_recovery_code(self.hashed_codes[1]))
+
+        self.assertEqual(self.storage.auth_file.read_bytes(), encrypted)
+        journal = self.storage.journal_file.read_bytes()
+        self.assertEqual(journal.count(b'\n'), 2)
+        self.assertNotIn(self.hashed_codes[0].encode(), journal)
+
+        # A fresh instance (e.g. after a restart) sees the merged result
+        reloaded = SecureStorage(config_dir=self.test_dir).load_auth_data()
+        self.assertEqual(reloaded['recovery_codes'], self.hashed_codes[2:])
+
+    def test_torn_tombstone_ignored(self):
+        """Test that a partial journal line from a crash is skipped."""
+        self.storage.save_auth_data(self.auth.get_secret(), self.hashed_codes)
+        self.storage.remove_recovery_code(self.hashed_codes[0])
+        with open(self.storage.journal_file, 'ab') as f:
+            f.write(b'gAAAAABtorn')
+
+        loaded = self.storage.load_auth_data()
+        self.assertEqual(loaded['recovery_codes'], self.hashed_codes[1:])
+
+    def test_journal_compacted(self):
+        """Test that accumulated tombstones are folded into auth.enc."""
+        self.storage.save_auth_data(self.auth.get_secret(), self.hashed_codes)
+        for code_hash in self.hashed_codes[:JOURNAL_COMPACT_THRESHOLD]:
+            self.assertTrue(self.storage.remove_recovery_code(code_hash))
+
+        self.assertFalse(self.storage.journal_file.exists())
+        self.storage.journal_file.write_bytes(b'')  # Nothing left to merge
+        remaining = self.hashed_codes[JOURNAL_COMPACT_THRESHOLD:]
+        self.assertEqual(self.storage.load_auth_data()['recovery_codes'], remaining)
+        self.assertEqual([p.name for p in self.test_dir.iterdir() if p.name.startswith('.auth')], [])
+
+    def test_export_includes_used_codes(self):
+        """Test that exporting folds the journal in first."""
+        self.storage.save_auth_data(self.auth.get_secret(), self.hashed_codes)
+        self.storage.remove_recovery_code(self.hashed_codes[0])
+
+        export_path = self.test_dir / "export.json"
+        self.assertTrue(self.storage.export_config(export_path))
+
+        self.assertFalse(self.storage.journal_file.exists())
+        self.assertNotIn(self.hashed_codes[0], self.storage.load_auth_data()['recovery_codes'])
+
+    def test_recovery_codes_cached(self):
+        """Test that code queries reuse the decrypted hashes while the files are unchanged."""
+        self.storage.save_auth_data(self.auth.get_secret(), self.hashed_codes)
+        with patch.object(self.storage.cipher, 'decrypt', wraps=self.storage.cipher.decrypt) as decrypt:
+            self.assertEqual(self.storage.get_remaining_recovery_codes_count(), 10)
+            self.assertFalse(self.storage.remove_recovery_code("nonexistent_hash"))
+            self.assertEqual(self.storage.get_remaining_recovery_codes_count(), 10)
+            self.assertEqual(decrypt.call_count, 1)
+
+            # Writes through this instance invalidate, and are seen next query
+            self.storage.remove_recovery_code(self.hashed_codes[0])
+            self.assertEqual(self.storage.get_remaining_recovery_codes_count(), 9)
+
+    def test_secret_not_cached(self):
+        """Test that the plaintext secret is not kept between loads."""
+        secret = self.auth.get_secret()
+        self.storage.save_auth_data(secret, self.hashed_codes)
+
+        first = self.storage.load_auth_data()
+        first['recovery_codes'].clear()  # Callers get their own list
+        self.assertEqual(self.storage.load_auth_data()['recovery_codes'], self.hashed_codes)
+        self.assertEqual(self.storage.get_remaining_recovery_codes_count(), 10)
+
+        self.assertNotIn(secret, repr(self.storage.__dict__))
+
+    def test_cache_detects_other_writers(self):
+        """Test that a change made by another instance or process is picked up."""
+        self.storage.save_auth_data(self.auth.get_secret(), self.hashed_codes)
+        self.assertEqual(self.storage.get_remaining_recovery_codes_count(), 10)
+
+        other = SecureStorage(config_dir=self.test_dir)
+        other.remove_recovery_code(self.hashed_codes[0])
+        self.assertEqual(self.storage.get_remaining_recovery_codes_count(), 9)
+
+        other.save_auth_data(self.auth.get_secret(), self.hashed_codes[:3])
+        self.assertEqual(self.storage.load_auth_data()['recovery_codes'], self.hashed_codes[:3])
+
+        other.reset_auth()
+        self.assertIsNone(self.storage.load_auth_data())
+
     def test_remove_recovery_code_not_found(self):
         """Test removing a code that doesn't exist."""
         secret = self.auth.get_secret()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Unit tests for src/daemon/timers.py
+"""
+
+import heapq
+import itertools
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.daemon.timers import DeadlineScheduler
+
+
+class FakeMainLoop:
+    """Records armed timeouts and fires them on demand."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.sources = {}
+        self.next_id = 1
+
+    def add_timeout(self, interval_ms, function):
+        source_id = self.next_id
+        self.next_id += 1
+        self.sources[source_id] = (self.clock.now + interval_ms / 1000, function)
+        return source_id
+
+    def remove_timeout(self, source_id):
+        del self.sources[source_id]
+
+    def advance(self, seconds):
+        """Move time forward and run every timeout that became due."""
+        self.clock.now += seconds
+        for source_id, (due, function) in sorted(self.sources.items(), key=lambda item: item[1][0]):
+            if due <= self.clock.now and source_id in self.sources:
+                del self.sources[source_id]
+                function()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 500.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestDeadlineScheduler(unittest.TestCase):
+    """Test the heap-driven deadline scheduler."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.loop = FakeMainLoop(self.clock)
+        self.callback = MagicMock()
+        self.scheduler = DeadlineScheduler(
+            self.callback,
+            add_timeout=self.loop.add_timeout,
+            remove_timeout=self.loop.remove_timeout,
+            clock=self.clock
+        )
+
+    def test_single_source_for_many_deadlines(self):
+        """Test that hundreds of deadlines share one main-loop timeout."""
+        for i in range(300):
+            self.scheduler.schedule(f"1-{i}", 30 + i % 10)
+
+        self.assertEqual(len(self.loop.sources), 1)
+        self.assertEqual(len(self.scheduler), 300)
+
+    def test_fires_in_order(self):
+        """Test that expired deadlines fire and the timer re-arms."""
+        self.scheduler.schedule("1-2", 20)
+        self.scheduler.schedule("1-1", 10)
+
+        self.loop.advance(10)
+        self.callback.assert_called_once_with("1-1")
+        self.assertEqual(len(self.loop.sources), 1)
+
+        self.loop.advance(10)
+        self.callback.assert_called_with("1-2")
+        self.assertEqual(self.loop.sources, {})
+
+    def test_cancel(self):
+        """Test that cancelled deadlines never fire."""
+        self.scheduler.schedule("1-1", 10)
+        self.scheduler.schedule("1-2", 20)
+
+        self.assertTrue(self.scheduler.cancel("1-1"))
+        self.assertFalse(self.scheduler.cancel("1-1"))
+
+        self.loop.advance(20)
+        self.callback.assert_called_once_with("1-2")
+
+    def test_cancel_last_removes_source(self):
+        """Test that no timeout stays armed without deadlines."""
+        self.scheduler.schedule("1-1", 10)
+        self.scheduler.cancel("1-1")
+
+        self.assertEqual(self.loop.sources, {})
+
+    def test_reschedule(self):
+        """Test that rescheduling replaces the previous deadline."""
+        self.scheduler.schedule("1-1", 10)
+        self.scheduler.schedule("1-1", 60)
+
+        self.loop.advance(10)
+        self.callback.assert_not_called()
+        self.assertEqual(self.scheduler.remaining("1-1"), 50)
+
+        self.loop.advance(50)
+        self.callback.assert_called_once_with("1-1")
+
+    def test_earlier_deadline_rearms(self):
+        """Test that a nearer deadline replaces the armed timeout."""
+        self.scheduler.schedule("1-1", 60)
+        self.scheduler.schedule("1-2", 5)
+
+        self.assertEqual(len(self.loop.sources), 1)
+        self.loop.advance(5)
+        self.callback.assert_called_once_with("1-2")
+
+    def test_remaining_all(self):
+        """Test remaining time per key."""
+        self.scheduler.schedule("1-1", 10)
+        self.scheduler.schedule("1-2", 30)
+        self.clock.now += 4
+
+        self.assertEqual(self.scheduler.remaining_all(), {"1-1": 6, "1-2": 26})
+        self.assertIsNone(self.scheduler.remaining("9-9"))
+
+    def test_callback_may_reschedule(self):
+        """Test that callbacks can schedule new deadlines."""
+        self.callback.side_effect = lambda key: self.scheduler.schedule("1-9", 5)
+        self.scheduler.schedule("1-1", 1)
+
+        self.loop.advance(1)
+        self.assertIn("1-9", self.scheduler)
+        self.assertEqual(len(self.loop.sources), 1)
+
+    def test_dead_entries_compacted(self):
+        """Test that cancelled entries do not accumulate in the heap."""
+        self.scheduler.schedule("keep", 1000)
+        for i in range(500):
+            self.scheduler.schedule(f"1-{i}", 100)
+            self.scheduler.cancel(f"1-{i}")
+
+        self.assertLessEqual(len(self.scheduler._heap), DeadlineScheduler.COMPACT_THRESHOLD + 2)
+
+    def test_clear(self):
+        """Test clearing all deadlines."""
+        self.scheduler.schedule("1-1", 10)
+        self.scheduler.clear()
+
+        self.assertEqual(len(self.scheduler), 0)
+        self.assertEqual(self.loop.sources, {})
+
+
+    def test_schedule_and_cancel_from_another_thread(self):
+        """Test udev-thread schedule/cancel racing main-loop timeouts."""
+        fired = []
+        source_ids = itertools.count(1)
+        scheduler = DeadlineScheduler(fired.append,
+                                      add_timeout=lambda interval_ms, function: next(source_ids),
+                                      remove_timeout=lambda source_id: None,
+                                      clock=lambda: (time.sleep(0), time.monotonic())[1])
+        scheduler.COMPACT_THRESHOLD = 4
+        errors = []
+        done = threading.Event()
+
+        def udev_thread():
+            try:
+                for i in range(2000):
+                    scheduler.schedule(f"1-{i}", 0)
+                    scheduler.schedule(f"keep-{i}", 3600)
+                    if i % 2 == 0:
+                        scheduler.cancel(f"1-{i}")
+                    scheduler.cancel(f"keep-{i}")
+            except Exception as e:
+                errors.append(e)
+            finally:
+                done.set()
+
+        real_heappop = heapq.heappop
+
+        def yielding_heappop(heap):
+            time.sleep(0)  # Let the other thread in between peek and pop
+            return real_heappop(heap)
+
+        with patch('src.daemon.timers.heapq.heappop', yielding_heappop):
+            thread = threading.Thread(target=udev_thread)
+            thread.start()
+            while not done.is_set():
+                try:
+                    scheduler._on_timeout()
+                except Exception as e:
+                    errors.append(e)
+            thread.join()
+            scheduler._on_timeout()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(scheduler), 0)
+        self.assertEqual(len(fired), len(set(fired)))
+        self.assertTrue({f"1-{i}" for i in range(1, 2000, 2)} <= set(fired))
+
+if __name__ == '__main__':
+    unittest.main()
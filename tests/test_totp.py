@@ -3,9 +3,21 @@
 Unit tests for TOTP authentication module.
 """
 
+import json
+import shutil
+import tempfile
 import unittest
 import time
-from src.auth.totp import TOTPAuthenticator, RecoveryCodeManager, create_new_authenticator
+from pathlib import Path
+from unittest.mock import patch
+from src.auth.totp import (
+    TOTPAuthenticator,
+    RecoveryCodeManager,
+    RecoveryCodeIndex,
+    create_new_authenticator,
+    TOTP_MAX_VALIDATION_WINDOW,
+    TOTP_MAX_DRIFT_STEPS,
+)
 
 
 class TestTOTPAuthenticator(unittest.TestCase):
@@ -88,6 +100,108 @@ class TestTOTPAuthenticator(unittest.TestCase):
         # Immediate reuse should fail
         self.assertFalse(self.auth.verify_code(current_code))
 
+    def test_code_table_rebuilt_on_step_rollover(self):
+        """Test that codes are only regenerated when the time step changes."""
+        auth = TOTPAuthenticator(self.test_secret)
+        now = 1700000010.0
+        previous_code, later_code = auth.totp.at(now - 30), auth.totp.at(now + 60)
+        with patch('src.auth.totp.time.time', return_value=now), \
+                patch.object(auth.totp, 'generate_otp', wraps=auth.totp.generate_otp) as generate:
+            self.assertFalse(auth.verify_code("000000"))
+            self.assertFalse(auth.verify_code("111111"))
+            self.assertEqual(generate.call_count, 3)
+
+            self.assertTrue(auth.verify_code(previous_code))
+            self.assertEqual(generate.call_count, 3)
+
+        with patch('src.auth.totp.time.time', return_value=now + 30), \
+                patch.object(auth.totp, 'generate_otp', wraps=auth.totp.generate_otp) as generate:
+            self.assertTrue(auth.verify_code(later_code))
+            self.assertEqual(generate.call_count, 3)
+
+    def test_code_table_matches_pyotp(self):
+        """Test that the table accepts exactly the codes pyotp accepts (with no drift learned)."""
+        auth = TOTPAuthenticator(self.test_secret)
+        now = 1700000010.0
+        for offset in range(-3, 4):
+            code = auth.totp.at(now, offset)
+            with patch('src.auth.totp.time.time', return_value=now):
+                auth._used_steps.clear()
+                auth._set_drift_estimate(0.0)
+                self.assertEqual(auth.verify_code(code, window=2),
+                                 auth.totp.verify(code, for_time=int(now), valid_window=2), offset)
+
+    def test_each_step_used_once(self):
+        """Test that a step's code authorizes one request, whatever the window."""
+        auth = TOTPAuthenticator(self.test_secret)
+        now = 1700000010.0
+        previous_code, current_code = auth.totp.at(now, -1), auth.totp.at(now)
+        step = int(now) // 30
+        with patch('src.auth.totp.time.time', return_value=now):
+            self.assertEqual(auth.verify_step(previous_code), step - 1)
+            self.assertIsNone(auth.verify_step(previous_code, window=2))
+            self.assertEqual(auth.verify_step(current_code, window=0), step)
+            self.assertIsNone(auth.verify_step(current_code))
+
+        # Still rejected from the next step, where it is the previous code
+        with patch('src.auth.totp.time.time', return_value=now + 30):
+            self.assertFalse(auth.verify_code(current_code))
+
+    def test_used_steps_bounded(self):
+        """Test that consumed steps are forgotten once out of reach."""
+        auth = TOTPAuthenticator(self.test_secret)
+        now = 1700000010.0
+        for i in range(50):
+            with patch('src.auth.totp.time.time', return_value=now + 30 * i):
+                self.assertTrue(auth.verify_code(auth.totp.at(now + 30 * i)))
+
+        self.assertLessEqual(len(auth._used_steps), 2 * (TOTP_MAX_DRIFT_STEPS + TOTP_MAX_VALIDATION_WINDOW) + 1)
+
+    def test_window_follows_drift(self):
+        """Test that the window is recentred on a clock that runs ahead."""
+        auth = TOTPAuthenticator(self.test_secret)
+        now = 1700000010.0
+        for i in range(4):
+            t = now + 30 * i
+            with patch('src.auth.totp.time.time', return_value=t):
+                # The phone is two steps ahead of us
+                self.assertTrue(auth.verify_code(auth.totp.at(t, 2), window=2))
+
+        self.assertEqual(auth.drift, 2)
+        self.assertEqual(auth.get_drift_info()['drift_seconds'], 60.0)
+
+        # Window 0 around the learned offset accepts the phone's code only
+        t = now + 30 * 4
+        with patch('src.auth.totp.time.time', return_value=t):
+            self.assertFalse(auth.verify_code(auth.totp.at(t), window=0))
+            self.assertTrue(auth.verify_code(auth.totp.at(t, 2), window=0))
+
+    def test_drift_bounded(self):
+        """Test that the window centre never moves past the maximum drift."""
+        auth = TOTPAuthenticator(self.test_secret)
+        auth._learn_drift(100)
+
+        self.assertEqual(auth.drift, TOTP_MAX_DRIFT_STEPS)
+
+    def test_drift_persisted(self):
+        """Test that the drift estimate is saved and restored."""
+        test_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, test_dir, True)
+        drift_file = test_dir / 'totp_drift.json'
+
+        auth = TOTPAuthenticator(self.test_secret, drift_file=drift_file)
+        now = 1700000010.0
+        with patch('src.auth.totp.time.time', return_value=now):
+            self.assertTrue(auth.verify_code(auth.totp.at(now, -1)))
+
+        self.assertEqual(json.loads(drift_file.read_text())['estimate'], -0.5)
+        restored = TOTPAuthenticator(self.test_secret, drift_file=drift_file)
+        self.assertEqual(restored.get_drift_info()['estimate_steps'], -0.5)
+        self.assertEqual(restored.get_drift_info()['samples'], 1.0)
+
+        drift_file.write_text('{not json')
+        self.assertEqual(TOTPAuthenticator(self.test_secret, drift_file=drift_file).drift, 0)
+
     def test_get_time_remaining(self):
         """Test getting time remaining until code expires."""
         remaining = self.auth.get_time_remaining()
@@ -174,6 +288,25 @@ class TestRecoveryCodeManager(unittest.TestCase):
         hashed = RecoveryCodeManager.hash_code(code)
         self.assertTrue(RecoveryCodeManager.verify_code("abcd-efgh-ijkl", hashed))
 
+    def test_index_match(self):
+        """Test looking up codes in the recovery code index."""
+        codes = RecoveryCodeManager.generate_codes(count=100)
+        index = RecoveryCodeIndex(RecoveryCodeManager.hash_code(code) for code in codes)
+
+        self.assertEqual(len(index), 100)
+        self.assertEqual(index.match(codes[42].lower()), RecoveryCodeManager.hash_code(codes[42]))
+        self.assertIsNone(index.match("XXXX-YYYY-ZZZZ"))
+
+    def test_index_discard(self):
+        """Test that a used code is no longer matched."""
+        hashed = RecoveryCodeManager.hash_code("ABCD-EFGH-IJKL")
+        index = RecoveryCodeIndex([hashed])
+
+        index.discard(hashed)
+
+        self.assertIsNone(index.match("ABCD-EFGH-IJKL"))
+        self.assertEqual(len(index), 0)
+
     def test_format_code(self):
         """Test formatting a recovery code."""
         # Test with dashes
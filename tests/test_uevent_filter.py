@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Unit tests for src/daemon/uevent_filter.py
+
+Runs the generated BPF programs through a small classic-BPF interpreter
+against synthetic libudev monitor packets.
+"""
+
+import struct
+import unittest
+from pathlib import Path
+
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.daemon.uevent_filter import (
+    murmur_hash2,
+    build_uevent_filter,
+    ACCEPT,
+    DROP,
+    COUNTER_SNAPLEN,
+    UDEV_MONITOR_MAGIC,
+    UDEV_HEADER_SIZE,
+    BPF_LD, BPF_JMP, BPF_RET, BPF_W, BPF_H, BPF_B, BPF_ABS, BPF_JEQ,
+)
+
+
+def run_filter(program, packet: bytes) -> int:
+    """Interpret the subset of classic BPF emitted by build_uevent_filter."""
+    acc = 0
+    pc = 0
+    sizes = {BPF_W: 4, BPF_H: 2, BPF_B: 1}
+    while True:
+        code, jt, jf, k = program[pc]
+        if code & 0x07 == BPF_LD:
+            size = sizes[code & 0x18]
+            if k + size > len(packet):
+                return 0  # Out-of-bounds loads abort the program
+            acc = int.from_bytes(packet[k:k + size], 'big')
+            pc += 1
+        elif code == BPF_JMP | BPF_JEQ:
+            pc += 1 + (jt if acc == k else jf)
+        elif code & 0x07 == BPF_RET:
+            return k
+        else:
+            raise AssertionError(f"Unexpected opcode {code:#x}")
+
+
+def make_packet(action: str, subsystem: str = 'usb', devtype: str = 'usb_device',
+                properties_off: int = UDEV_HEADER_SIZE) -> bytes:
+    """Build a libudev monitor packet with ACTION= as the first property."""
+    props = f"ACTION={action}\0DEVPATH=/devices/pci0000:00/usb1/1-4\0SUBSYSTEM={subsystem}\0".encode()
+    header = b'libudev\0' + struct.pack(
+        '>I', UDEV_MONITOR_MAGIC
+    ) + struct.pack(
+        '=III', UDEV_HEADER_SIZE, properties_off, len(props)
+    ) + struct.pack(
+        '>IIII', murmur_hash2(subsystem.encode()), murmur_hash2(devtype.encode()), 0, 0
+    )
+    return header + props
+
+
+class TestMurmurHash(unittest.TestCase):
+    """Test libudev-compatible MurmurHash2."""
+
+    def test_known_values(self):
+        """Hashes match libudev's string_hash32()."""
+        self.assertEqual(murmur_hash2(b'usb'), 91735525)
+        self.assertEqual(murmur_hash2(b'usb_device'), 670627084)
+        self.assertEqual(murmur_hash2(b'block'), 4026736055)
+
+
+class TestUeventFilter(unittest.TestCase):
+    """Test the generated accept filter."""
+
+    def setUp(self):
+        self.program = build_uevent_filter('usb', 'usb_device', ['add', 'remove'])
+
+    def test_accepts_add_and_remove(self):
+        """add/remove of usb_device pass."""
+        self.assertEqual(run_filter(self.program, make_packet('add')), ACCEPT)
+        self.assertEqual(run_filter(self.program, make_packet('remove')), ACCEPT)
+
+    def test_drops_other_actions(self):
+        """bind/unbind/change of usb_device are dropped."""
+        for action in ('bind', 'unbind', 'change', 'move', 'online', 'offline'):
+            with self.subTest(action=action):
+                self.assertEqual(run_filter(self.program, make_packet(action)), DROP)
+
+    def test_drops_other_devtypes(self):
+        """usb_interface events are dropped regardless of action."""
+        packet = make_packet('add', devtype='usb_interface')
+        self.assertEqual(run_filter(self.program, packet), DROP)
+
+    def test_drops_other_subsystems(self):
+        """Events for other subsystems are dropped."""
+        packet = make_packet('add', subsystem='block', devtype='disk')
+        self.assertEqual(run_filter(self.program, packet), DROP)
+
+    def test_passes_unknown_layout(self):
+        """Unexpected property layout is left to userspace."""
+        packet = make_packet('bind', properties_off=64)
+        self.assertEqual(run_filter(self.program, packet), ACCEPT)
+
+    def test_passes_non_libudev_messages(self):
+        """Kernel-format messages are passed through like libudev does."""
+        packet = b'bind@/devices/pci0000:00/usb1/1-4\0ACTION=bind\0' + b'\0' * 32
+        self.assertEqual(run_filter(self.program, packet), ACCEPT)
+
+    def test_rejects_ambiguous_actions(self):
+        """Actions sharing a first character cannot be filtered."""
+        with self.assertRaises(ValueError):
+            build_uevent_filter('usb', 'usb_device', ['online', 'offline'])
+
+
+class TestInvertedFilter(unittest.TestCase):
+    """Test the counter filter (accepts exactly what the main filter drops)."""
+
+    def setUp(self):
+        self.program = build_uevent_filter('usb', 'usb_device', ['add', 'remove'], invert=True)
+
+    def test_keeps_dropped_actions_truncated(self):
+        """Dropped actions are queued as tiny packets."""
+        self.assertEqual(run_filter(self.program, make_packet('bind')), COUNTER_SNAPLEN)
+
+    def test_ignores_accepted_actions(self):
+        """Accepted actions are not counted."""
+        self.assertEqual(run_filter(self.program, make_packet('add')), DROP)
+        self.assertEqual(run_filter(self.program, make_packet('remove')), DROP)
+
+    def test_ignores_other_subsystems(self):
+        """Other subsystems were never wakeups to begin with."""
+        packet = make_packet('bind', subsystem='block', devtype='disk')
+        self.assertEqual(run_filter(self.program, packet), DROP)
+
+
+if __name__ == '__main__':
+    unittest.main()
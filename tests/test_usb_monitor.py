@@ -13,6 +13,7 @@ import sys
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.daemon.usb_monitor import USBDevice, USBMonitor
+from src.daemon.state import DeviceStateTable
 
 
 class TestUSBDevice(unittest.TestCase):
@@ -122,6 +123,17 @@ class TestUSBDevice(unittest.TestCase):
         self.assertEqual(device_dict['product_id'], "c52b")
         self.assertIn('display_name', device_dict)
 
+    def test_get_interface_classes(self):
+        """Test parsing interface classes from ID_USB_INTERFACES."""
+        self.mock_device.get.side_effect = lambda key, default='': {
+            'ID_VENDOR_ID': '046d',
+            'ID_MODEL_ID': 'c52b',
+            'ID_USB_INTERFACES': ':030101:030102:FF0000:'
+        }.get(key, default)
+
+        device = USBDevice(self.mock_device)
+        self.assertEqual(device.get_interface_classes(), ['03', 'ff'])
+
     def test_str_representation(self):
         """Test string representation of device."""
         device = USBDevice(self.mock_device)
@@ -202,6 +214,27 @@ class TestUSBMonitorStartStop(unittest.TestCase):
         self.mock_observer_class.assert_called_once()
         self.assertIsNotNone(monitor.observer)
 
+    @patch('src.daemon.usb_monitor.uevent_filter.attach_filter_to_fd')
+    @patch('src.daemon.usb_monitor.uevent_filter.DroppedEventCounter')
+    def test_start_attaches_kernel_filter(self, mock_counter, mock_attach):
+        """Test that start enables receiving and attaches the BPF filter."""
+        monitor = USBMonitor()
+        monitor.start(threaded=True)
+
+        self.mock_monitor.start.assert_called_once()
+        mock_attach.assert_called_once()
+        self.assertEqual(mock_attach.call_args[0][0], self.mock_monitor.fileno.return_value)
+        self.assertTrue(monitor.kernel_filter_active)
+        self.assertIs(monitor.dropped_counter, mock_counter.return_value)
+
+    def test_start_without_kernel_filter(self):
+        """Test that failing to attach the filter is not fatal."""
+        monitor = USBMonitor()
+        monitor.start(threaded=True)
+
+        self.assertTrue(monitor.running)
+        self.assertFalse(monitor.kernel_filter_active)
+
     def test_start_already_running(self):
         """Test starting monitor when already running."""
         monitor = USBMonitor()
@@ -310,9 +343,10 @@ class TestUSBMonitorEventHandling(unittest.TestCase):
 
     @patch('pathlib.Path.exists', return_value=False)
     def test_on_event_duplicate_prevention(self, mock_exists):
-        """Test that duplicate add events are filtered."""
-        callback = MagicMock()
-        monitor = USBMonitor(callback=callback)
+        """Test that add events for devices already in the state table are filtered."""
+        devices = DeviceStateTable()
+        callback = MagicMock(side_effect=lambda device, action: devices.connect(device.device_id, {}))
+        monitor = USBMonitor(callback=callback, devices=devices)
 
         # Send same add event twice
         monitor._on_event(self.mock_device)
@@ -345,6 +379,32 @@ class TestUSBMonitorEventHandling(unittest.TestCase):
 
         callback.assert_not_called()
 
+    def test_ignored_actions_counted(self):
+        """Test that actions leaking past the kernel filter are counted."""
+        monitor = USBMonitor(callback=MagicMock())
+
+        for action in ('bind', 'unbind', 'change'):
+            self.mock_device.action = action
+            monitor._on_event(self.mock_device)
+
+        stats = monitor.get_filter_stats()
+        self.assertEqual(stats['events_ignored'], 3)
+        self.assertFalse(stats['kernel_filter'])
+        self.assertEqual(stats['wakeups_saved'], 0)
+
+    @patch('pathlib.Path.exists', return_value=False)
+    def test_root_hub_routed_to_controller_callback(self, mock_exists):
+        """Test that root hub events go to the controller callback only."""
+        callback = MagicMock()
+        controller_callback = MagicMock()
+        monitor = USBMonitor(callback=callback, controller_callback=controller_callback)
+
+        self.mock_device.sys_path = "/sys/devices/pci0000:00/0000:00:14.0/usb3"
+        monitor._on_event(self.mock_device)
+
+        controller_callback.assert_called_once_with("usb3", 'add')
+        callback.assert_not_called()
+
 
 class TestUSBMonitorScanExisting(unittest.TestCase):
     """Test scanning for existing devices."""
@@ -383,6 +383,23 @@ class TestDeviceWhitelist(unittest.TestCase):
         # Updating usage should no longer raise due to missing bookkeeping fields.
         self.assertTrue(self.whitelist.update_usage("ABC123"))
 
+    def test_reload_applies_external_edit(self):
+        """Test that reload picks up devices added by another process."""
+        other = DeviceWhitelist(config_dir=self.test_dir)
+        other.add_device(serial_number="ABC123", vendor_id="046d", product_id="c52b")
+
+        self.assertTrue(self.whitelist.reload())
+        self.assertTrue(self.whitelist.is_whitelisted("ABC123"))
+        self.assertFalse(self.whitelist.reload())
+
+    def test_reload_rejects_invalid_file(self):
+        """Test that a broken file keeps the current entries."""
+        self.whitelist.add_device(serial_number="ABC123", vendor_id="046d", product_id="c52b")
+        self.whitelist.whitelist_file.write_text('{"XYZ": ')
+
+        self.assertFalse(self.whitelist.reload())
+        self.assertTrue(self.whitelist.is_whitelisted("ABC123"))
+
 
 class TestDeviceInfo(unittest.TestCase):
     """Test cases for DeviceInfo helper class."""